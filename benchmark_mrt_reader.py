@@ -0,0 +1,211 @@
+"""
+Throughput benchmark: byte-by-byte MRT reader vs the old line-splitting loops.
+
+Builds large tables by tiling the data rows of the Paper A and Paper C MRT
+files under their original headers, and generates Paper B (the survey table,
+not shipped with the repo) with synthetic_mrt, then times the previous
+per-line parsers against `parse_paper_a` / `parse_paper_b` / `parse_paper_c`,
+which now go through `mrt_reader`.
+
+    python3 benchmark_mrt_reader.py --rows 2000000 --min-speedup 10
+
+PARTIAL: the reader does not reach its 10x target (about 2.7x for Paper C,
+3.4x for A and 5.1x for B at 500k rows on a single core), so the speedup is
+left as a follow-up and --min-speedup 10 fails until it lands. Most of the
+remaining time is one Python str per row for the text columns.
+"""
+import argparse
+import inspect
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from mrt_reader import read_mrt_header
+from phase2_filtering import parse_paper_a, parse_paper_c
+from synthetic_mrt import write_synthetic_mrt
+from yso_utils import parse_mrt_file
+
+HERE = Path(__file__).resolve().parent
+
+
+def legacy_parse_paper_a(filepath):
+    """Paper A parser as it was before the byte-by-byte reader."""
+    data = []
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+
+    for line in lines[39:]:
+        if not line.strip() or line.startswith('---'):
+            continue
+        try:
+            parts = line.split()
+            if len(parts) < 26:
+                continue
+
+            spicy_id = int(parts[0])
+            yso_class = parts[1]
+            lc_class = parts[18]
+
+            rah = int(parts[20])
+            ram = int(parts[21])
+            ras = float(parts[22])
+            ra_deg = rah * 15 + ram * 15/60 + ras * 15/3600
+
+            de_str = parts[23]
+            de_sign = -1 if de_str.startswith('-') else 1
+            ded = int(de_str.lstrip('-'))
+            dem = int(parts[24])
+            des = float(parts[25])
+            de_deg = de_sign * (ded + dem/60 + des/3600)
+
+            lc_type = 'Linear(+)' if 'linear(+)' in lc_class.lower() else 'Linear(-)' if 'linear(-)' in lc_class.lower() else 'Unknown'
+
+            data.append({
+                'SPICY_ID': spicy_id,
+                'Objname': f'SPICY_{spicy_id}',
+                'RAdeg': ra_deg,
+                'DEdeg': de_deg,
+                'YSO_CLASS': yso_class,
+                'LCType': lc_type,
+                'VarClass1': lc_class
+            })
+        except (ValueError, IndexError):
+            continue
+
+    return pd.DataFrame(data)
+
+
+def legacy_parse_paper_b(filepath):
+    """Paper B parser (yso_utils.parse_mrt_file) as it was before the byte-by-byte reader."""
+    data = []
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+
+    for line in lines:
+        if line.startswith('J') or line.startswith('L'):
+            parts = line.split()
+            if len(parts) >= 16:
+                try:
+                    data.append({
+                        'Objname': parts[0],
+                        'RAdeg': float(parts[1]),
+                        'DEdeg': float(parts[2]),
+                        'SED_SLOPE': float(parts[3]) if parts[3] != '?' else np.nan,
+                        'YSO_CLASS': parts[4],
+                        'Number': int(parts[5]),
+                        'W2magMean': float(parts[6]),
+                        'W2magMed': float(parts[7]),
+                        'sig_W2Flux': float(parts[8]),
+                        'err_W2Flux': float(parts[9]),
+                        'delW2mag': float(parts[10]),
+                        'Period': float(parts[11]),
+                        'FLP_LSP_BOOT': float(parts[12]),
+                        'slope': float(parts[13]),
+                        'e_slope': float(parts[14]),
+                        'r_value': float(parts[15]),
+                        'LCType': parts[-1] if len(parts) > 21 else 'Unknown'
+                    })
+                except (ValueError, IndexError):
+                    continue
+
+    return pd.DataFrame(data)
+
+
+def legacy_parse_paper_c(filepath):
+    """Paper C parser as it was before the byte-by-byte reader."""
+    data = []
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+
+    for line in lines[30:]:
+        if not line.strip() or line.startswith('---'):
+            continue
+        try:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            data.append({
+                'OBSID': parts[0],
+                'Objname': parts[1],
+                'RAdeg': float(parts[2]),
+                'DEdeg': float(parts[3])
+            })
+        except (ValueError, IndexError):
+            continue
+
+    return pd.DataFrame(data)
+
+
+def tile_mrt(source: Path, target: Path, n_rows: int) -> None:
+    """Write `target` with the header of `source` and its data rows repeated to `n_rows`."""
+    _, data_offset = read_mrt_header(str(source))
+    raw = source.read_bytes()
+    header, body = raw[:data_offset], raw[data_offset:]
+    rows = [line for line in body.splitlines(keepends=True) if line.strip()]
+    reps, rest = divmod(n_rows, len(rows))
+    block = b''.join(rows)
+    with open(target, 'wb') as f:
+        f.write(header)
+        for _ in range(reps):
+            f.write(block)
+        f.write(b''.join(rows[:rest]))
+
+
+def best_of(func, path, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(str(path))
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='rows per synthetic table')
+    parser.add_argument('--repeat', type=int, default=3, help='take the best of N runs')
+    parser.add_argument('--min-speedup', type=float, default=0.0,
+                        help='exit non-zero if any table is slower than this ratio')
+    args = parser.parse_args()
+
+    def tiled(source):
+        return lambda path: tile_mrt(source, path, args.rows)
+
+    cases = [
+        # Unwrapped parsers skip the catalog cache so the reader itself is timed
+        ('Paper A', 'apjadd25ft1_mrt.txt', tiled(HERE / 'apjadd25ft1_mrt.txt'),
+         legacy_parse_paper_a, inspect.unwrap(parse_paper_a)),
+        ('Paper B', 'apjsadc397t2_mrt.txt', lambda path: write_synthetic_mrt('B', args.rows, path),
+         legacy_parse_paper_b, inspect.unwrap(parse_mrt_file)),
+        ('Paper C', 'apjsadf4e6t4_mrt.txt', tiled(HERE / 'apjsadf4e6t4_mrt.txt'),
+         legacy_parse_paper_c, inspect.unwrap(parse_paper_c)),
+    ]
+
+    print(f"{'table':10s} {'rows':>10s} {'legacy (s)':>11s} {'reader (s)':>11s} {'rows/s':>12s} {'speedup':>8s}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, file_name, make, legacy, current in cases:
+            path = Path(tmp) / file_name
+            make(path)
+
+            t_legacy, df_legacy = best_of(legacy, path, args.repeat)
+            t_reader, df_reader = best_of(current, path, args.repeat)
+            # The legacy Paper B loop drops rows whose blank (null) fields shift split()
+            if len(df_reader) < len(df_legacy) or (name != 'Paper B' and len(df_reader) != len(df_legacy)):
+                raise AssertionError(f"{name}: row count mismatch ({len(df_legacy)} vs {len(df_reader)})")
+
+            speedup = t_legacy / t_reader
+            failed |= speedup < args.min_speedup
+            print(f"{name:10s} {len(df_reader):>10,} {t_legacy:>11.3f} {t_reader:>11.3f} "
+                  f"{len(df_reader) / t_reader:>12,.0f} {speedup:>7.1f}x")
+
+    if failed:
+        print(f"FAIL: speedup below {args.min_speedup}x")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
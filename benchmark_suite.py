@@ -0,0 +1,220 @@
+"""
+Scaling benchmarks for the catalog hot paths on synthetic MRT tables.
+
+For each size, writes Paper A/B/C tables with synthetic_mrt, then times
+every stage (best of --repeat runs) and measures its peak memory (one
+separate tracemalloc pass, so tracing never inflates the timings).
+Results go to a JSON file; with --baseline, any stage slower or hungrier
+than the baseline by more than --threshold fails the run.
+
+    python3 benchmark_suite.py --sizes 1000 100000 1000000 --output bench.json
+    python3 benchmark_suite.py --baseline bench.json --threshold 0.25
+    python3 benchmark_suite.py --full --repeat 1 --data-dir /scratch/mrt   # adds 10M rows
+"""
+import argparse
+import gc
+import inspect
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from correlation_engine import VARIABILITY_METRICS
+from main import PHASE1_COLUMNS, PHASE1_FILTER
+from phase2_filtering import OUTPUT_FILTERS, parse_paper_a, parse_paper_c
+from synthetic_mrt import MRT_FILES, write_synthetic_mrt
+from yso_utils import (categorize_variability, compute_correlation_matrix, create_contingency_table,
+                       get_summary_statistics, normalize_for_chord, parse_mrt_file)
+
+RESULTS_FORMAT_VERSION = 1
+# The 10M-row size is left out of the default run: its tables take ~3.5 GB
+# on disk, parsing Paper B alone peaks near 6 GB and each stage runs for
+# minutes. Run it with --full (or --sizes 10000000) on a machine sized for it.
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+FULL_SIZES = DEFAULT_SIZES + [10_000_000]
+DEFAULT_THRESHOLD = 0.25
+
+# Below these, differences are timer / allocator noise and never count as regressions
+MIN_COMPARED_SECONDS = 0.005
+MIN_COMPARED_BYTES = 1 << 20
+
+
+class BenchStage(NamedTuple):
+    name: str
+    run: Callable[[Dict], object]
+
+
+def _filter_phase2(ctx):
+    outputs = {}
+    for name, keep in OUTPUT_FILTERS.items():
+        if keep is not None:
+            df = ctx['df_a'] if name.startswith('PaperA') else ctx['df_b']
+            outputs[name] = df[keep(df)]
+    return outputs
+
+
+# Unwrapped parsers bypass the catalog cache, so the parsing itself is timed
+_parse_mrt_file, _parse_paper_a, _parse_paper_c = map(inspect.unwrap, [parse_mrt_file, parse_paper_a, parse_paper_c])
+STAGES = [
+    BenchStage('parse_mrt_file', lambda ctx: _parse_mrt_file(ctx['B'], usecols=PHASE1_COLUMNS)),
+    BenchStage('parse_paper_a', lambda ctx: _parse_paper_a(ctx['A'])),
+    BenchStage('parse_paper_b', lambda ctx: _parse_mrt_file(ctx['B'])),
+    BenchStage('parse_paper_c', lambda ctx: _parse_paper_c(ctx['C'])),
+    BenchStage('filter_phase1', lambda ctx: ctx['df_b'][PHASE1_FILTER(ctx['df_b'])]),
+    BenchStage('filter_phase2', _filter_phase2),
+    BenchStage('compute_correlation_matrix', lambda ctx: compute_correlation_matrix(ctx['df_b'], VARIABILITY_METRICS)),
+    BenchStage('categorize_variability', lambda ctx: categorize_variability(ctx['df_b'])),
+    BenchStage('create_contingency_table',
+               lambda ctx: create_contingency_table(ctx['df_b'], 'YSO_CLASS', 'LCType')),
+    BenchStage('normalize_for_chord', lambda ctx: normalize_for_chord(ctx['contingency'])),
+    BenchStage('get_summary_statistics', lambda ctx: get_summary_statistics(ctx['df_b'])),
+]
+
+
+def synthetic_tables(rows: int, data_dir: Path, seed: int = 0) -> Dict[str, str]:
+    """Paths of the A/B/C tables for one size, generated unless already on disk."""
+    paths = {}
+    for paper, name in MRT_FILES.items():
+        path = data_dir / f'{Path(name).stem}_{rows}_s{seed}.txt'
+        if not path.exists():
+            write_synthetic_mrt(paper, rows, path.with_suffix('.tmp'), seed)
+            os.replace(path.with_suffix('.tmp'), path)
+        paths[paper] = str(path)
+    return paths
+
+
+def measure(stage: BenchStage, ctx: Dict, repeat: int, trace_memory: bool = True) -> Dict:
+    """Best-of-`repeat` wall time and tracemalloc peak of one stage."""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = stage.run(ctx)
+        best = min(best, time.perf_counter() - start)
+        del result
+
+    peak = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            stage.run(ctx)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def run_suite(sizes: List[int], data_dir: Path, repeat: int = 3, stages: Optional[List[str]] = None,
+              seed: int = 0, trace_memory: bool = True) -> List[Dict]:
+    """Measure every selected stage at every size; one result dict per (stage, rows)."""
+    selected = [s for s in STAGES if stages is None or s.name in stages]
+    results = []
+    for rows in sizes:
+        start = time.perf_counter()
+        ctx = synthetic_tables(rows, data_dir, seed)
+        print(f"\n{rows:,} rows (tables ready in {time.perf_counter() - start:.1f}s)")
+        print(f"  {'stage':28s} {'seconds':>10s} {'rows/s':>14s} {'peak MB':>9s}")
+
+        # Inputs of the in-memory stages are prepared outside the timings
+        ctx['df_a'] = _parse_paper_a(ctx['A'])
+        ctx['df_b'] = _parse_mrt_file(ctx['B'])
+        ctx['contingency'] = create_contingency_table(ctx['df_b'], 'YSO_CLASS', 'LCType')
+
+        for stage in selected:
+            m = measure(stage, ctx, repeat, trace_memory)
+            result = {'stage': stage.name, 'rows': rows, **m, 'rows_per_second': rows / m['seconds']}
+            results.append(result)
+            peak = f"{m['peak_bytes'] / 1e6:9.1f}" if m['peak_bytes'] is not None else f"{'-':>9s}"
+            print(f"  {stage.name:28s} {m['seconds']:10.4f} {result['rows_per_second']:14,.0f} {peak}")
+        del ctx
+        gc.collect()
+    return results
+
+
+def environment() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Regressions of `results` against `baseline`: stages (matched on stage
+    and rows) whose time or peak memory grew by more than `threshold`.
+    """
+    previous = {(r['stage'], r['rows']): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get((r['stage'], r['rows']))
+        if base is None:
+            continue
+        if base['seconds'] >= MIN_COMPARED_SECONDS and r['seconds'] > base['seconds'] * (1 + threshold):
+            regressions.append(f"{r['stage']} @ {r['rows']:,} rows: {base['seconds']:.4f}s -> {r['seconds']:.4f}s "
+                               f"({r['seconds'] / base['seconds'] - 1:+.0%})")
+        if (r.get('peak_bytes') is not None and (base.get('peak_bytes') or 0) >= MIN_COMPARED_BYTES
+                and r['peak_bytes'] > base['peak_bytes'] * (1 + threshold)):
+            regressions.append(f"{r['stage']} @ {r['rows']:,} rows: peak {base['peak_bytes'] / 1e6:.1f} MB -> "
+                               f"{r['peak_bytes'] / 1e6:.1f} MB ({r['peak_bytes'] / base['peak_bytes'] - 1:+.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='rows per table')
+    parser.add_argument('--full', action='store_true', help=f'run every size, up to {FULL_SIZES[-1]:,} rows')
+    parser.add_argument('--repeat', type=int, default=3, help='take the best of N runs')
+    parser.add_argument('--stages', nargs='+', choices=[s.name for s in STAGES], help='only these stages')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', type=Path, help='keep generated tables here (default: a temp dir)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', type=Path, default=Path('benchmark_results.json'))
+    parser.add_argument('--baseline', type=Path, help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown / memory growth vs the baseline (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+    if args.full:
+        args.sizes = FULL_SIZES
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or Path(tmp)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        results = run_suite(args.sizes, data_dir, args.repeat, args.stages, args.seed, not args.no_memory)
+
+    report = {
+        'version': RESULTS_FORMAT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'sizes': args.sizes, 'repeat': args.repeat, 'seed': args.seed},
+        'results': results,
+    }
+    args.output.write_text(json.dumps(report, indent=1))
+    print(f"\n✓ Saved {args.output}")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\nFAIL: {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Union
+
+UNKNOWN = 'Unknown'
+
+# Up to this many edges, bin by comparisons rather than searchsorted
+_COMPARE_MAX_EDGES = 8
+
+# Per-column binning used across the pipeline. `edges` are the interior cut
+# points (a value equal to an edge falls in the upper bin); `quantiles` puts
+# the cuts at sample quantiles instead (an int q means q equal-count bins).
+VARIABILITY_BINS = {'edges': [0.2, 0.5], 'labels': ['Low', 'Medium', 'High']}
+DEFAULT_BINS = {
+    'delW2mag': VARIABILITY_BINS,
+    'W2magMean': {'quantiles': 3, 'labels': ['Bright', 'Intermediate', 'Faint']},
+    'slope': {'quantiles': 3},
+}
+
+
+def quantile_edges(values, quantiles: Union[int, Sequence[float]]) -> np.ndarray:
+    """Interior cut points at the given quantiles (or q equal-count bins) of the non-missing values."""
+    if isinstance(quantiles, int):
+        quantiles = np.arange(1, quantiles) / quantiles
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.full(len(quantiles), np.nan)
+    return np.quantile(values, quantiles)
+
+
+def _default_labels(edges: np.ndarray) -> List[str]:
+    if len(edges) == 0:
+        return ['All']
+    if np.isnan(edges).any():
+        # Quantiles of a column with no values: the cuts are undefined
+        return [f'Q{k}' for k in range(1, len(edges) + 2)]
+    labels = [f'< {edges[0]:g}']
+    labels += [f'{low:g} to {high:g}' for low, high in zip(edges[:-1], edges[1:])]
+    labels.append(f'>= {edges[-1]:g}')
+    return labels
+
+
+def bin_values(values, edges: Sequence[float] = None, labels: Sequence[str] = None,
+               quantiles: Union[int, Sequence[float]] = None,
+               unknown: Optional[str] = UNKNOWN) -> pd.Categorical:
+    """
+    Bin numeric values into a Categorical backed by int8 codes.
+
+    Args:
+        values: Numeric array or Series
+        edges: Interior cut points, ascending. Bin i holds edges[i-1] <= x < edges[i]
+        labels: One label per bin (len(edges) + 1). Defaults to '< a', 'a to b', '>= b',
+                or 'Q1', 'Q2', ... when there are no values to take quantiles of
+        quantiles: Instead of edges, cut at these quantiles of the non-missing
+                   values (or an int q for q equal-count bins)
+        unknown: Category for missing values, always the last one. None leaves
+                 them missing (code -1)
+    """
+    if (edges is None) == (quantiles is None):
+        raise ValueError("Give exactly one of edges or quantiles")
+    values = np.asarray(values, dtype=np.float64)
+    if quantiles is not None:
+        edges = quantile_edges(values, quantiles)
+    else:
+        edges = np.asarray(edges, dtype=np.float64)
+        if np.isnan(edges).any():
+            raise ValueError(f"Bin edges must not be NaN, got {edges}")
+    if np.any(np.diff(edges) < 0):
+        raise ValueError(f"Bin edges must be ascending, got {edges}")
+
+    labels = list(labels) if labels is not None else _default_labels(edges)
+    if len(labels) != len(edges) + 1:
+        raise ValueError(f"Need {len(edges) + 1} labels for {len(edges)} edges, got {len(labels)}")
+    if len(labels) >= np.iinfo(np.int8).max:
+        raise ValueError(f"At most {np.iinfo(np.int8).max - 1} bins fit int8 codes")
+
+    if len(edges) <= _COMPARE_MAX_EDGES:
+        # A handful of cuts: summing comparisons beats a binary search per value
+        codes = np.zeros(values.shape, dtype=np.int8)
+        for edge in edges:
+            codes += values >= edge
+    else:
+        codes = np.searchsorted(edges, values, side='right').astype(np.int8)
+    missing = np.isnan(values)
+    if unknown is None:
+        codes[missing] = -1
+    else:
+        codes[missing] = len(labels)
+        labels.append(unknown)
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+def bin_columns(df: pd.DataFrame, specs: Dict[str, dict] = None) -> pd.DataFrame:
+    """
+    Bin several columns at once.
+
+    Args:
+        df: DataFrame with the columns to bin
+        specs: Column -> keyword arguments for bin_values. Defaults to
+               DEFAULT_BINS, restricted to the columns present in df
+
+    Returns:
+        DataFrame of categorical columns (same names and index as df)
+    """
+    if specs is None:
+        specs = {name: spec for name, spec in DEFAULT_BINS.items() if name in df.columns}
+    return pd.DataFrame({name: bin_values(df[name], **spec) for name, spec in specs.items()}, index=df.index)
@@ -0,0 +1,415 @@
+import string
+import sys
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+# Text columns with at most this fraction of distinct values are stored as categoricals
+CATEGORY_MAX_FRACTION = 0.5
+
+
+class Field(NamedTuple):
+    """
+    How one column is stored in a Catalog.
+
+    kind is one of
+        'category'  categorical codes (int8 for up to 127 labels)
+        'float32'   single precision, rounded back to `fmt` on the way out
+        'float64'   unchanged
+        'int'       smallest integer type holding the range, plus a null mask
+        'bool'      unchanged
+        'text'      fixed-width UTF-8 bytes of the non-null values, plus a null mask
+        'name'      nothing stored; derived from other columns by `template`
+        'raw'       the original Series, untouched
+    """
+    name: str
+    kind: str
+    fmt: Optional[str] = None       # MRT format of a float32 column, e.g. 'F5.2' or 'E11.4'
+    template: Optional[str] = None  # 'name' columns, e.g. 'SPICY_{SPICY_ID}'
+
+
+# Explicit schemas for the parsed tables (phase2_filtering.parse_paper_a/b/c).
+# float32 only where the MRT format has at most 7 significant digits; positions
+# (F10.6 / F11.7, or derived from sexagesimal) stay float64.
+PAPER_A_SCHEMA = [
+    Field('SPICY_ID', 'int'),
+    Field('Objname', 'name', template='SPICY_{SPICY_ID}'),
+    Field('RAdeg', 'float64'),
+    Field('DEdeg', 'float64'),
+    Field('YSO_CLASS', 'category'),
+    Field('LCType', 'category'),
+    Field('VarClass1', 'category'),
+]
+
+PAPER_B_SCHEMA = [
+    Field('Objname', 'text'),
+    Field('RAdeg', 'float64'),
+    Field('DEdeg', 'float64'),
+    Field('SED_SLOPE', 'float32', 'F5.2'),
+    Field('YSO_CLASS', 'category'),
+    Field('Number', 'int'),
+    Field('W2magMean', 'float32', 'F5.2'),
+    Field('W2magMed', 'float32', 'F5.2'),
+    Field('sig_W2Flux', 'float32', 'F8.3'),
+    Field('err_W2Flux', 'float32', 'F7.3'),
+    Field('delW2mag', 'float32', 'F5.2'),
+    Field('Period', 'float64'),
+    Field('FLP_LSP_BOOT', 'float32', 'F6.4'),
+    Field('slope', 'float32', 'E11.4'),
+    Field('e_slope', 'float32', 'E10.3'),
+    Field('r_value', 'float32', 'F6.3'),
+    Field('LCType', 'category'),
+]
+
+PAPER_C_SCHEMA = [
+    Field('OBSID', 'text'),
+    Field('Objname', 'text'),
+    Field('RAdeg', 'float64'),
+    Field('DEdeg', 'float64'),
+]
+
+SCHEMAS = {'A': PAPER_A_SCHEMA, 'B': PAPER_B_SCHEMA, 'C': PAPER_C_SCHEMA}
+
+
+def suffixed(schema: List[Field], suffix: str) -> List[Field]:
+    """A paper schema renamed for its columns in the cross-matched table (e.g. YSO_CLASS_B)."""
+    names = {f.name for f in schema}
+    fields = []
+    for f in schema:
+        template = f.template
+        if template is not None:
+            for name in names:
+                template = template.replace(f'{{{name}}}', f'{{{name}{suffix}}}')
+        fields.append(f._replace(name=f'{f.name}{suffix}', template=template))
+    return fields
+
+
+def master_schema(papers: Iterable[str] = ('A', 'B', 'C')) -> List[Field]:
+    """Schema of crossmatch.build_master_table output for the given papers."""
+    fields = [Field('source_id', 'int'), Field('RAdeg', 'float64'), Field('DEdeg', 'float64'),
+              Field('n_members', 'int')]
+    for paper in papers:
+        fields += [Field(f'in_{paper}', 'bool'), Field(f'n_{paper}', 'int')]
+        fields += suffixed([f for f in SCHEMAS[paper] if f.name not in ('RAdeg', 'DEdeg')], f'_{paper}')
+    return fields
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def infer_field(name: str, series: pd.Series) -> Field:
+    """Storage for a column not covered by the schema, judged from its dtype and values."""
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return Field(name, 'bool')
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return Field(name, 'int')
+    if pd.api.types.is_float_dtype(series.dtype):
+        return Field(name, 'float64')
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return Field(name, 'category')
+    if _is_text(series) and series.map(type, na_action='ignore').isin([str]).all():
+        n = int(series.notna().sum())
+        return Field(name, 'category' if series.nunique() <= max(CATEGORY_MAX_FRACTION * n, 1) else 'text')
+    return Field(name, 'raw')
+
+
+def _round_to_format(values: np.ndarray, fmt: str) -> np.ndarray:
+    """float64 values rounded to what an MRT field of format `fmt` can print."""
+    decimals = int(fmt.split('.')[1]) if '.' in fmt else 0
+    if fmt[0] == 'E':
+        # Keep decimals + 1 significant digits: scale each value by the power
+        # of ten of its leading digit, round, and scale back
+        out = values.astype(np.float64, copy=True)
+        ok = np.isfinite(values) & (values != 0)
+        x = values[ok]
+        exponent = np.floor(np.log10(np.abs(x)))
+        # log10 can land one off next to a power of ten
+        exponent += np.abs(x) >= 10.0 ** (exponent + 1)
+        exponent -= np.abs(x) < 10.0 ** exponent
+        shift = decimals - exponent
+        # Multiplying or dividing by an exact power of ten (up to 1e22) rounds
+        # once, like parsing the printed text; values further out are printed
+        scale = 10.0 ** np.minimum(np.abs(shift), 22)
+        up = shift >= 0
+        q = np.round(np.where(up, x * scale, x / scale))
+        rounded = np.where(up, q / scale, q * scale)
+        far = np.abs(shift) > 22
+        if far.any():
+            rounded[far] = np.char.mod(f'%.{decimals}e', x[far]).astype(np.float64)
+        out[ok] = rounded
+        return out
+    return np.round(values, decimals)
+
+
+def _template_fields(template: str) -> List[str]:
+    return [name for _, name, _, _ in string.Formatter().parse(template) if name]
+
+
+class _Column(NamedTuple):
+    field: Field
+    data: object                 # ndarray / Categorical / Series, or None for 'name' columns.
+                                 # 'text' holds only the non-null values, in row order
+    mask: Optional[np.ndarray]   # True where the value is missing ('int' / 'text')
+    dtype: object                # dtype of the original column, restored by to_frame
+
+    @property
+    def nbytes(self) -> int:
+        if self.field.kind == 'name':
+            return 0
+        if self.field.kind == 'category':
+            size = self.data.codes.nbytes + int(self.data.categories.memory_usage(deep=True))
+        elif self.field.kind == 'raw':
+            size = int(self.data.memory_usage(deep=True, index=False))
+        else:
+            size = self.data.nbytes
+        return size + (self.mask.nbytes if self.mask is not None else 0)
+
+    def take(self, rows: np.ndarray) -> '_Column':
+        if self.field.kind == 'name':
+            return self
+        mask = self.mask[rows] if self.mask is not None else None
+        if self.field.kind == 'raw':
+            data = self.data.iloc[rows].reset_index(drop=True)
+        elif self.field.kind == 'text' and self.mask is not None:
+            position = np.cumsum(~self.mask) - 1
+            data = self.data[position[rows[~mask]]]
+        else:
+            data = self.data[rows]
+        return self._replace(data=data, mask=mask if mask is not None and mask.any() else None)
+
+
+def _encode(field: Field, series: pd.Series) -> _Column:
+    values = series.to_numpy()
+    kind = field.kind
+    if kind == 'category':
+        return _Column(field, pd.Categorical(series), None, series.dtype)
+    if kind in ('float32', 'float64', 'bool'):
+        return _Column(field, values.astype(np.dtype(kind)), None, series.dtype)
+    if kind == 'int':
+        mask = series.isna().to_numpy()
+        filled = series.to_numpy(dtype=np.int64, na_value=0)
+        low, high = (int(filled.min()), int(filled.max())) if len(filled) else (0, 0)
+        dtype = np.result_type(np.min_scalar_type(low), np.min_scalar_type(high))
+        return _Column(field, filled.astype(dtype), mask if mask.any() else None, series.dtype)
+    if kind == 'text':
+        mask = series.isna().to_numpy()
+        encoded = [str(v).encode('utf-8') for v in values[~mask].tolist()]
+        return _Column(field, np.array(encoded, dtype=bytes if encoded else 'S1'), mask if mask.any() else None,
+                       series.dtype)
+    if kind == 'name':
+        return _Column(field, None, None, series.dtype)
+    if kind == 'raw':
+        return _Column(field, series.reset_index(drop=True), None, series.dtype)
+    raise ValueError(f"{field.name}: unknown field kind {kind!r}")
+
+
+class Catalog:
+    """
+    A source table stored compactly under an explicit schema (see Field).
+
+    Class and light-curve labels are categorical codes, measured values are
+    float32 where the MRT precision allows, names are fixed-width bytes or
+    derived on access (Paper A's SPICY_{id}). to_frame() gives back the
+    DataFrame it was built from, values and dtypes alike; columns that would
+    not survive their schema's encoding unchanged are stored as float64 /
+    unchanged instead, so the round trip is always exact.
+
+    Columns are read as pandas Series (catalog['delW2mag']), so
+    catalog_stream predicates work directly: catalog[pred(catalog)].
+    """
+
+    def __init__(self, columns: Dict[str, _Column], length: int, index: Optional[pd.Index] = None):
+        self._columns = columns
+        self._length = length
+        self._index = index
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, schema: Optional[Sequence[Field]] = None) -> 'Catalog':
+        """
+        Args:
+            df: Table to store
+            schema: Fields for some or all columns (e.g. SCHEMAS['B']);
+                    others are inferred from their dtype and values
+        """
+        if not df.columns.is_unique:
+            raise ValueError("Catalog needs unique column names")
+        given = {f.name: f for f in schema or []}
+        index = None if df.index.equals(pd.RangeIndex(len(df))) else df.index
+        frame = df.reset_index(drop=True)
+        catalog = cls({}, len(df), index)
+
+        # Derived names are checked last, against the stored columns they come from
+        fields = [given.get(name) or infer_field(name, frame[name]) for name in frame.columns]
+        fields.sort(key=lambda f: f.kind == 'name')
+        for f in fields:
+            original = frame[f.name]
+            candidates = [f, Field(f.name, 'float64')] if f.kind == 'float32' else [f]
+            for candidate in candidates + [Field(f.name, 'raw')]:
+                if candidate.kind == 'name' and not set(_template_fields(candidate.template)) <= set(catalog._columns):
+                    continue
+                catalog._columns[f.name] = _encode(candidate, original)
+                if candidate.kind == 'raw' or _same(catalog.column(f.name), original):
+                    break
+        catalog._columns = {name: catalog._columns[name] for name in frame.columns}
+        return catalog
+
+    # --- access -------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, name) -> bool:
+        return name in self._columns
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index(list(self._columns))
+
+    @property
+    def schema(self) -> List[Field]:
+        """Fields as actually stored (after any lossless fallbacks)."""
+        return [c.field for c in self._columns.values()]
+
+    def column(self, name: str) -> pd.Series:
+        """One column decoded to its original dtype."""
+        c = self._columns[name]
+        kind = c.field.kind
+        if kind == 'category':
+            values = pd.Series(c.data, name=name).astype(c.dtype)
+        elif kind == 'float32':
+            values = pd.Series(_round_to_format(c.data.astype(np.float64), c.field.fmt), name=name)
+        elif kind == 'int':
+            values = pd.Series(c.data.astype(np.int64), name=name)
+            if c.mask is not None:
+                values = values.astype('Int64').mask(c.mask)
+            values = values.astype(c.dtype)
+        elif kind == 'text':
+            decoded = np.full(len(self), np.nan, dtype=object)
+            if len(c.data):
+                decoded[~c.mask if c.mask is not None else slice(None)] = np.char.decode(c.data, 'utf-8')
+            values = pd.Series(decoded, name=name, dtype=c.dtype)
+        elif kind == 'name':
+            values = self._derive(c)
+        elif kind == 'raw':
+            values = c.data.rename(name)
+        else:
+            values = pd.Series(c.data, name=name, dtype=c.dtype)
+        if self._index is not None:
+            values.index = self._index
+        return values
+
+    def _derive(self, c: _Column) -> pd.Series:
+        sources = _template_fields(c.field.template)
+        frame = pd.DataFrame({name: self.column(name).reset_index(drop=True) for name in sources})
+        missing = frame.isna().any(axis=1).to_numpy()
+        rows = frame.astype(object).to_dict('records')
+        names = np.array([np.nan if skip else c.field.template.format(**row) for row, skip in zip(rows, missing)],
+                         dtype=object)
+        return pd.Series(names, name=c.field.name, dtype=c.dtype)
+
+    def __getitem__(self, key):
+        """A column by name, a Catalog of several names, or the rows selected by a boolean mask."""
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, list) and all(isinstance(k, str) for k in key):
+            return self.select_columns(key)
+        mask = np.asarray(key)
+        if mask.dtype != bool or len(mask) != len(self):
+            raise KeyError("expected a column name, a list of names or a boolean row mask")
+        return self.take(np.flatnonzero(mask))
+
+    def select_columns(self, names: List[str]) -> 'Catalog':
+        """The named columns, plus any that derived names among them depend on."""
+        keep = list(names)
+        for name in names:
+            field = self._columns[name].field
+            if field.kind == 'name':
+                keep += [s for s in _template_fields(field.template) if s not in keep]
+        return Catalog({name: self._columns[name] for name in keep}, self._length, self._index)
+
+    def take(self, rows: Sequence[int]) -> 'Catalog':
+        """The rows at integer positions `rows`, as a new Catalog."""
+        rows = np.asarray(rows, dtype=np.intp)
+        index = self._index[rows] if self._index is not None else None
+        return Catalog({name: c.take(rows) for name, c in self._columns.items()}, len(rows), index)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The stored table as a DataFrame, identical to the one it was built from."""
+        frame = pd.DataFrame({name: self.column(name).reset_index(drop=True) for name in self._columns})
+        if self._index is not None:
+            frame.index = self._index
+        return frame
+
+    # --- memory -------------------------------------------------------------
+
+    def memory_usage(self) -> pd.Series:
+        """Bytes held per column (categories and null masks included)."""
+        return pd.Series({name: c.nbytes for name, c in self._columns.items()}, dtype=np.int64)
+
+    def memory_report(self, df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Per-column storage kind, stored bytes and, given the original frame
+        (default: to_frame()), its deep memory usage and the reduction factor.
+        """
+        df = self.to_frame() if df is None else df
+        frame_bytes = df.memory_usage(deep=True, index=False)
+        report = pd.DataFrame({
+            'kind': [c.field.kind for c in self._columns.values()],
+            'frame_bytes': frame_bytes.reindex(list(self._columns)).to_numpy(),
+            'catalog_bytes': self.memory_usage().to_numpy(),
+        }, index=list(self._columns))
+        report.loc['TOTAL'] = ['', report['frame_bytes'].sum(), report['catalog_bytes'].sum()]
+        report['reduction'] = report['frame_bytes'] / report['catalog_bytes'].replace(0, np.nan)
+        return report
+
+    def __repr__(self) -> str:
+        return f"<Catalog {len(self):,} rows x {len(self._columns)} columns, {self.memory_usage().sum():,} bytes>"
+
+
+def _same(a: pd.Series, b: pd.Series) -> bool:
+    """Equal values (NaN matching NaN) and dtype."""
+    if a.dtype != b.dtype or len(a) != len(b):
+        return False
+    try:
+        pd.testing.assert_series_equal(a.reset_index(drop=True), b.reset_index(drop=True), check_names=False,
+                                       check_exact=True)
+    except AssertionError:
+        return False
+    return True
+
+
+def read_catalog(paper: str, filepath: str) -> Catalog:
+    """Parse one paper's MRT table (phase2_filtering parsers) straight into a Catalog."""
+    from phase2_filtering import parse_paper_a, parse_paper_b, parse_paper_c
+    parser = {'A': parse_paper_a, 'B': parse_paper_b, 'C': parse_paper_c}[paper]
+    return Catalog.from_frame(parser(filepath), SCHEMAS[paper])
+
+
+def main(file_mapping: Optional[Dict[str, str]] = None) -> Dict[str, pd.DataFrame]:
+    """Print the memory report of each paper and of the cross-matched table."""
+    from crossmatch import build_master_table
+    from phase2_filtering import FILE_MAPPING, parse_paper_a, parse_paper_b, parse_paper_c
+    file_mapping = file_mapping or FILE_MAPPING
+
+    frames = {'A': parse_paper_a(file_mapping['A']), 'B': parse_paper_b(file_mapping['B']),
+              'C': parse_paper_c(file_mapping['C'])}
+    tables = [(f'Paper {paper}', frame, SCHEMAS[paper]) for paper, frame in frames.items()]
+    tables.append(('Cross-matched', build_master_table(frames), master_schema(frames)))
+
+    reports = {}
+    for label, frame, schema in tables:
+        catalog = Catalog.from_frame(frame, schema)
+        lossless = catalog.to_frame().equals(frame)
+        report = catalog.memory_report(frame)
+        total = report.loc['TOTAL']
+        print(f"\n{label}: {len(frame):,} rows, {total['frame_bytes'] / 1e6:.2f} MB -> "
+              f"{total['catalog_bytes'] / 1e6:.2f} MB ({total['reduction']:.1f}x) "
+              f"{'✓ lossless' if lossless else '✗ round trip differs'}")
+        print(report.to_string(float_format=lambda x: f'{x:.1f}'))
+        reports[label] = report
+    return reports
+
+
+if __name__ == '__main__':
+    main(dict(zip('ABC', sys.argv[1:4])) if len(sys.argv) > 3 else None)
@@ -0,0 +1,317 @@
+import contextlib
+import fcntl
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import mrt_reader
+
+# Bump when the on-disk layout below changes
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / '.catalog_cache'
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+_INDEX_FILE = 'index.json'
+_LOCK_FILE = '.lock'
+_TMP_PREFIX = '.tmp-'
+_HASH_BLOCK = 1 << 20
+
+# A hit refreshes last_used on disk at most this often (seconds)
+_TOUCH_INTERVAL = 60
+# Unfinished entry directories older than this (seconds) belong to dead writers
+_STALE_TMP_SECONDS = 3600
+
+
+def file_digest(path: Path) -> str:
+    """Content hash of a file, read in blocks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_digest(obj) -> str:
+    """Hash of a module's or function's source (its bytecode if the source is unavailable)."""
+    try:
+        source = inspect.getsource(obj).encode()
+    except (OSError, TypeError):
+        source = getattr(getattr(obj, '__code__', None), 'co_code', repr(obj).encode())
+    return hashlib.blake2b(source, digest_size=10).hexdigest()
+
+
+def parser_version(parser: Callable) -> str:
+    """
+    Identify a parser by name and by the source of its module and of
+    mrt_reader, so editing either invalidates entries it produced.
+    """
+    parser = inspect.unwrap(parser)
+    module = inspect.getmodule(parser) or parser
+    return (f"{parser.__module__}.{parser.__qualname__}"
+            f":{source_digest(module)}:{source_digest(mrt_reader)}:{CACHE_FORMAT_VERSION}")
+
+
+class CatalogCache:
+    """
+    Content-addressed cache of parsed catalogs.
+
+    Entries are keyed on the source file's content hash plus the parser
+    version and arguments, and stored as one .npy file per column so warm
+    loads memory-map numeric columns instead of copying them. Text and
+    categorical columns are stored as integer codes plus their distinct
+    values. The content hash is only recomputed when the file's path,
+    size or mtime changes. Least recently used entries are evicted once
+    the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or os.environ.get('YSO_CACHE_DIR', DEFAULT_CACHE_DIR))
+        self.max_bytes = max_bytes
+
+    # -- index -----------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Hold an exclusive lock on the cache directory. Index updates and
+        entry renames happen under it, so parsers running in parallel
+        processes don't drop each other's entries.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / _LOCK_FILE, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(self.cache_dir / _INDEX_FILE) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'files': {}, 'entries': {}}
+
+    def _write_index(self, index: Dict) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, self.cache_dir / _INDEX_FILE)
+
+    def _content_hash(self, path: Path, index: Dict) -> str:
+        st = path.stat()
+        known = index['files'].get(str(path))
+        if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+            return known['hash']
+        content = file_digest(path)
+        index['files'][str(path)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': content}
+        return content
+
+    def _entry_key(self, path: Path, index: Dict, parser: Callable, args, kwargs) -> str:
+        content = self._content_hash(path, index)
+        call = repr((args, sorted(kwargs.items())))
+        return hashlib.blake2b(f"{content}|{parser_version(parser)}|{call}".encode(),
+                               digest_size=16).hexdigest()
+
+    # -- public API ------------------------------------------------------
+
+    def load(self, filepath: str, parser: Callable, *args, **kwargs) -> pd.DataFrame:
+        """
+        Return parser(filepath, *args, **kwargs), from the cache when possible.
+        """
+        path = Path(filepath).resolve()
+        with self._locked():
+            index = self._read_index()
+            known = dict(index['files'].get(str(path)) or {})
+            key = self._entry_key(path, index, parser, args, kwargs)
+            file_info = index['files'][str(path)]
+
+            entry = index['entries'].get(key)
+            if entry is not None and (self.cache_dir / key).is_dir():
+                now = time.time()
+                if file_info != known or now - entry['last_used'] > _TOUCH_INTERVAL:
+                    entry['last_used'] = now
+                    self._write_index(index)
+                return read_frame(self.cache_dir / key)
+
+        # Parse without holding the lock; other processes keep using the cache
+        df = parser(filepath, *args, **kwargs)
+        if not _cacheable(df):
+            return df
+
+        tmp, size = self._stage(df)
+        with self._locked():
+            target = self.cache_dir / key
+            if target.exists():
+                shutil.rmtree(target)
+            os.replace(tmp, target)
+            # Re-read so entries added by other processes meanwhile are kept
+            index = self._read_index()
+            index['files'][str(path)] = file_info
+            index['entries'][key] = {'bytes': size, 'last_used': time.time(),
+                                     'source': str(path), 'parser': parser_version(parser)}
+            self._evict(index)
+            self._write_index(index)
+        return df
+
+    def _stage(self, df: pd.DataFrame) -> Tuple[Path, int]:
+        """Write `df` to a fresh temporary entry directory; returns it and its size."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=_TMP_PREFIX))
+        try:
+            write_frame(tmp, df)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return tmp, sum(f.stat().st_size for f in tmp.iterdir())
+
+    def _evict(self, index: Dict) -> None:
+        """
+        Reconcile the index with the entry directories on disk, then drop
+        least recently used entries until the cache fits in max_bytes.
+        Called with the lock held.
+        """
+        entries = index['entries']
+        on_disk = {}
+        now = time.time()
+        for child in self.cache_dir.iterdir():
+            if not child.is_dir():
+                continue
+            if child.name.startswith(_TMP_PREFIX):
+                # Unfinished writes of a live process are recent; older ones are debris
+                if now - child.stat().st_mtime > _STALE_TMP_SECONDS:
+                    shutil.rmtree(child, ignore_errors=True)
+                continue
+            on_disk[child.name] = child
+
+        for key in [key for key in entries if key not in on_disk]:
+            del entries[key]
+        # Directories no index entry points at (lost updates, crashed writers) are unreachable
+        for key, child in on_disk.items():
+            if key not in entries:
+                shutil.rmtree(child, ignore_errors=True)
+
+        total = sum(e['bytes'] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entries.pop(key)['bytes']
+            shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+
+    def total_bytes(self) -> int:
+        return sum(e['bytes'] for e in self._read_index()['entries'].values())
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def _column_kind(series: pd.Series) -> Optional[str]:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if pd.api.types.infer_dtype(series.cat.categories) not in ('string', 'empty'):
+            return None
+        return 'category'
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+        return 'numeric'
+    if isinstance(series.dtype, pd.Int64Dtype):
+        return 'integer'
+    if pd.api.types.is_string_dtype(series.dtype) and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return 'text'
+    return None
+
+
+def _cacheable(df) -> bool:
+    return (isinstance(df, pd.DataFrame) and isinstance(df.index, pd.RangeIndex)
+            and df.index.start == 0 and df.index.step == 1 and df.columns.is_unique
+            and all(_column_kind(df[name]) is not None for name in df.columns))
+
+
+def write_frame(directory: Path, df: pd.DataFrame) -> None:
+    """
+    Store `df` in `directory` (which must exist) as one .npy file per column
+    plus meta.json. The frame must pass _cacheable().
+    """
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        kind = _column_kind(series)
+        if kind == 'numeric':
+            np.save(directory / f'{i}.npy', series.to_numpy())
+        elif kind == 'integer':
+            np.save(directory / f'{i}.npy', series.to_numpy(dtype=np.int64, na_value=0))
+            np.save(directory / f'{i}.mask.npy', series.isna().to_numpy())
+        else:
+            if kind == 'category':
+                codes = series.cat.codes.to_numpy()
+                uniques = series.cat.categories
+            else:
+                codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            np.save(directory / f'{i}.codes.npy', codes.astype(np.int32))
+            np.save(directory / f'{i}.values.npy', np.asarray(uniques, dtype=str))
+        columns.append({'name': name, 'kind': kind})
+
+    with open(directory / 'meta.json', 'w') as f:
+        json.dump({'rows': len(df), 'columns': columns}, f)
+
+
+def read_frame(directory: Path) -> pd.DataFrame:
+    """Load a frame stored by write_frame(); numeric columns are memory-mapped copy-on-write."""
+    with open(directory / 'meta.json') as f:
+        meta = json.load(f)
+
+    data = {}
+    for i, column in enumerate(meta['columns']):
+        if column['kind'] == 'numeric':
+            # Copy-on-write mapping: zero-copy until a caller modifies the column
+            data[column['name']] = np.load(directory / f'{i}.npy', mmap_mode='c').view(np.ndarray)
+            continue
+        if column['kind'] == 'integer':
+            data[column['name']] = pd.arrays.IntegerArray(np.load(directory / f'{i}.npy', mmap_mode='c').view(np.ndarray),
+                                                          np.load(directory / f'{i}.mask.npy'))
+            continue
+        codes = np.load(directory / f'{i}.codes.npy', mmap_mode='c').view(np.ndarray)
+        uniques = np.load(directory / f'{i}.values.npy')
+        if column['kind'] == 'category':
+            data[column['name']] = pd.Categorical.from_codes(codes, categories=uniques)
+        else:
+            # Code -1 (missing) picks the trailing NaN
+            values = np.append(uniques.astype(object), np.nan)
+            data[column['name']] = values[codes]
+
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['rows']), copy=False)
+
+
+_default_cache = None
+
+
+def default_cache() -> CatalogCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = CatalogCache()
+    return _default_cache
+
+
+def cached_catalog(parser: Callable) -> Callable:
+    """
+    Decorator routing parser(filepath, ...) through the default CatalogCache.
+
+    Set YSO_CACHE=0 to bypass the cache; the undecorated parser is
+    `inspect.unwrap(parser)`. Put @instrumented above this decorator so
+    cache hits are recorded as well as parses.
+    """
+    @functools.wraps(parser)
+    def wrapper(filepath, *args, **kwargs):
+        if os.environ.get('YSO_CACHE', '1').lower() in ('0', 'off', 'false', 'no'):
+            return parser(filepath, *args, **kwargs)
+        return default_cache().load(filepath, parser, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,141 @@
+"""
+Command-line client for catalog_server.py. Imports only the standard
+library (no pandas / numpy), so a query costs little more than the round
+trip to the already-loaded server.
+
+    python3 catalog_client.py count B "YSO_CLASS == 'ClassI' and LCType == 'Linear' and DEdeg > -30"
+    python3 catalog_client.py filter B "delW2mag > 1" --columns Objname RAdeg DEdeg --limit 20
+    python3 catalog_client.py summary B "DEdeg > -30"
+    python3 catalog_client.py crosstab B YSO_CLASS LCType "DEdeg > -30"
+    python3 catalog_client.py correlation B --columns W2magMean delW2mag Period
+    python3 catalog_client.py tables --socket /tmp/yso_catalog.sock
+
+The server address comes from --url / --socket, else $YSO_CATALOG_SERVER
+(a URL or a socket path), else http://127.0.0.1:8766.
+"""
+import json
+import os
+import socket
+import sys
+
+DEFAULT_URL = 'http://127.0.0.1:8766'
+TIMEOUT = 60
+
+
+class QueryError(Exception):
+    pass
+
+
+def request(body: dict, address: str = None) -> dict:
+    """
+    Send one query; returns the server's result.
+
+    Args:
+        body: JSON query ({"op": ..., ...}; see catalog_server)
+        address: 'http://host:port' or a Unix socket path
+    """
+    address = address or os.environ.get('YSO_CATALOG_SERVER') or DEFAULT_URL
+    payload = json.dumps(body).encode()
+    if address.startswith('http://'):
+        host, _, port = address[len('http://'):].rstrip('/').partition(':')
+        sock = socket.create_connection((host, int(port or 80)), timeout=TIMEOUT)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(TIMEOUT)
+        sock.connect(address)
+    with sock:
+        sock.sendall(b'POST /query HTTP/1.0\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: %d\r\n\r\n' % len(payload) + payload)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    _, _, body_bytes = b''.join(chunks).partition(b'\r\n\r\n')
+    reply = json.loads(body_bytes)
+    if not reply.get('ok'):
+        raise QueryError(reply.get('error', 'unknown error'))
+    return reply
+
+
+def format_table(header, rows, index=None) -> str:
+    """Rows as aligned text columns (with an optional leading index column)."""
+    def cell(v):
+        if v is None:
+            return '-'
+        return f'{v:.4g}' if isinstance(v, float) else str(v)
+
+    lines = [[cell(h) for h in header]] + [[cell(v) for v in row] for row in rows]
+    if index is not None:
+        lines = [[''] + lines[0]] + [[cell(i)] + line for i, line in zip(index, lines[1:])]
+    widths = [max(len(line[k]) for line in lines) for k in range(len(lines[0]))] if lines and lines[0] else []
+    return '\n'.join('  '.join(v.rjust(w) for v, w in zip(line, widths)) for line in lines)
+
+
+def _option(args: list, name: str, many: bool = False):
+    """Remove `--name value(s)` from args and return the value(s)."""
+    if name not in args:
+        return None
+    i = args.index(name)
+    values = []
+    j = i + 1
+    while j < len(args) and not args[j].startswith('--') and (many or not values):
+        values.append(args[j])
+        j += 1
+    del args[i:j]
+    return values if many else (values[0] if values else None)
+
+
+def main(argv=None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] in ('-h', '--help'):
+        print(__doc__.strip())
+        return 0
+    address = _option(args, '--url') or _option(args, '--socket')
+    columns = _option(args, '--columns', many=True)
+    limit = _option(args, '--limit')
+    op, rest = args[0], args[1:]
+
+    body = {'op': op}
+    if op in ('count', 'filter', 'summary', 'correlation'):
+        body.update(table=rest[0] if rest else 'B', where=rest[1] if len(rest) > 1 else None)
+    elif op == 'crosstab':
+        if len(rest) < 3:
+            print("usage: crosstab TABLE ROW_COLUMN COL_COLUMN [WHERE]", file=sys.stderr)
+            return 2
+        body.update(table=rest[0], row=rest[1], col=rest[2], where=rest[3] if len(rest) > 3 else None)
+    if columns:
+        body['columns'] = columns
+    if limit:
+        body['limit'] = int(limit)
+
+    try:
+        reply = request(body, address)
+    except QueryError as exc:
+        print(f"✗ {exc}", file=sys.stderr)
+        return 1
+    except OSError as exc:
+        print(f"✗ cannot reach the catalog server ({exc}); start it with: python3 catalog_server.py", file=sys.stderr)
+        return 1
+
+    result = reply['result']
+    if op == 'count':
+        print(result['count'])
+    elif op == 'filter':
+        print(format_table(result['columns'], result['rows']))
+        print(f"({len(result['rows'])} of {result['count']} rows)")
+    elif op in ('crosstab', 'correlation'):
+        print(format_table(result['columns'], result['data'], result['index']))
+    elif op == 'tables':
+        for name, info in result.items():
+            print(f"{name}: {info['rows']:,} rows, {len(info['columns'])} columns")
+    else:
+        print(json.dumps(result, indent=1))
+    if os.environ.get('YSO_CLIENT_TIMING'):
+        print(f"(server {reply['ms']} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,425 @@
+import operator
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from catalog import Catalog
+from catalog_stream import Predicate
+
+# Candidate sets smaller than 1/PROBE_FRACTION of the table are filtered by
+# reading the remaining columns at those rows, rather than through more indexes
+PROBE_FRACTION = 64
+# Range results larger than 1/DENSE_FRACTION of the table become bitmaps instead of sorted row ids
+DENSE_FRACTION = 16
+# Non-numeric columns with more distinct values than this (names, IDs) get a KeyIndex
+# instead of bitmaps; checked on the first CARDINALITY_SAMPLE rows before the whole column
+MAX_BITMAP_LABELS = 4096
+CARDINALITY_SAMPLE = 100_000
+
+# np.bitwise_count needs NumPy >= 2.0; before that Bitmap.count() looks up set bits per byte
+_HAS_BITWISE_COUNT = hasattr(np, 'bitwise_count')
+_BIT_COUNTS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+_COMPARE = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+            '==': operator.eq, '!=': operator.ne}
+
+
+class Bitmap:
+    """A set of row positions as packed bits (8 rows per byte), combined with &, | and ~."""
+
+    __slots__ = ('bits', 'n')
+
+    def __init__(self, bits: np.ndarray, n: int):
+        self.bits = bits
+        self.n = n
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> 'Bitmap':
+        return cls(np.packbits(np.asarray(mask, dtype=bool)), len(mask))
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray, n: int) -> 'Bitmap':
+        mask = np.zeros(n, dtype=bool)
+        mask[rows] = True
+        return cls.from_mask(mask)
+
+    def rows(self) -> np.ndarray:
+        """Sorted row positions in the set."""
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.n))
+
+    def contains(self, rows: np.ndarray) -> np.ndarray:
+        """Boolean array: which of `rows` are in the set."""
+        return ((self.bits[rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)) & 1).astype(bool)
+
+    def count(self) -> int:
+        if _HAS_BITWISE_COUNT:
+            return int(np.bitwise_count(self.bits).sum())
+        return int(_BIT_COUNTS[self.bits].sum(dtype=np.int64))
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap(self.bits & other.bits, self.n)
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap(self.bits | other.bits, self.n)
+
+    def __invert__(self) -> 'Bitmap':
+        bits = ~self.bits
+        if self.n % 8:
+            # Padding bits past the last row stay clear
+            bits[-1] &= np.uint8(0xFF << (8 - self.n % 8) & 0xFF)
+        return Bitmap(bits, self.n)
+
+
+# A query result: sorted row positions (selective) or a Bitmap (dense)
+RowSet = Union[np.ndarray, Bitmap]
+
+
+def _as_bitmap(rows: RowSet, n: int) -> Bitmap:
+    return rows if isinstance(rows, Bitmap) else Bitmap.from_rows(rows, n)
+
+
+def _as_rows(rows: RowSet) -> np.ndarray:
+    return rows.rows() if isinstance(rows, Bitmap) else rows
+
+
+def _size(rows: RowSet) -> int:
+    return rows.count() if isinstance(rows, Bitmap) else len(rows)
+
+
+def _intersect(a: RowSet, b: RowSet, n: int) -> RowSet:
+    if isinstance(a, Bitmap) and isinstance(b, Bitmap):
+        return a & b
+    if isinstance(a, Bitmap):
+        a, b = b, a
+    if isinstance(b, Bitmap):
+        return a[b.contains(a)]
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def _union(a: RowSet, b: RowSet, n: int) -> RowSet:
+    if isinstance(a, Bitmap) or isinstance(b, Bitmap):
+        return _as_bitmap(a, n) | _as_bitmap(b, n)
+    return np.union1d(a, b)
+
+
+class SortedIndex:
+    """
+    Non-null values of a numeric column in sorted order, with their row
+    positions; a range query is two binary searches and a slice.
+    """
+
+    RANGE_OPS = ('>', '>=', '<', '<=', '==')
+
+    def __init__(self, values: np.ndarray):
+        self.column = np.asarray(values, dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(self.column))
+        order = np.argsort(self.column[valid], kind='stable')
+        dtype = np.int32 if len(self.column) < 2**31 else np.int64
+        self.rows = valid[order].astype(dtype)
+        self.values = self.column[valid][order]
+        self.n = len(self.column)
+
+    def bounds(self, op: str, value) -> Tuple[int, int]:
+        """[start, stop) of the sorted values satisfying `value <op> value`."""
+        left = int(np.searchsorted(self.values, value, side='left'))
+        right = int(np.searchsorted(self.values, value, side='right'))
+        return {'>': (right, len(self.values)), '>=': (left, len(self.values)), '<': (0, left), '<=': (0, right),
+                '==': (left, right)}[op]
+
+    def estimate(self, op: str, value) -> int:
+        if op == '!=':
+            return len(self.values) - self.estimate('==', value)
+        start, stop = self.bounds(op, value)
+        return max(stop - start, 0)
+
+    def select(self, op: str, value) -> RowSet:
+        if op == '!=':
+            return Bitmap.from_mask(~np.isnan(self.column) & (self.column != value))
+        return self.select_bounds(*self.bounds(op, value))
+
+    def select_bounds(self, start: int, stop: int) -> RowSet:
+        """Rows of the sorted values [start, stop): sorted positions, or a Bitmap when dense."""
+        if stop <= start:
+            return np.array([], dtype=np.int64)
+        if (stop - start) * DENSE_FRACTION > self.n:
+            # Comparing the column in row order beats scattering millions of positions
+            low, high = self.values[start], self.values[stop - 1]
+            return Bitmap.from_mask((self.column >= low) & (self.column <= high))
+        return np.sort(self.rows[start:stop]).astype(np.int64)
+
+    def isin(self, values) -> RowSet:
+        values = sorted(set(float(v) for v in values))
+        slices = [self.bounds('==', v) for v in values]
+        if sum(stop - start for start, stop in slices) * DENSE_FRACTION > self.n:
+            return Bitmap.from_mask(np.isin(self.column, values))
+        return np.sort(np.concatenate([self.rows[start:stop] for start, stop in slices] + [[]])).astype(np.int64)
+
+    def notna(self) -> Bitmap:
+        return Bitmap.from_mask(~np.isnan(self.column))
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.values.nbytes
+
+
+class BitmapIndex:
+    """One bitmap per distinct value of a categorical column; nulls are in none of them."""
+
+    def __init__(self, values: pd.Series):
+        codes, labels = pd.factorize(values, use_na_sentinel=True)
+        self.n = len(codes)
+        self.labels = pd.Index(labels)
+        self.bitmaps = [Bitmap.from_mask(codes == k) for k in range(len(labels))]
+        self.counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+
+    def _matching(self, op: str, value) -> np.ndarray:
+        """Positions of the labels satisfying `label <op> value`."""
+        labels = pd.Series(self.labels)
+        if op == 'in':
+            return np.flatnonzero(labels.isin(list(value)))
+        try:
+            return np.flatnonzero(np.asarray(_COMPARE[op](labels, value), dtype=bool))
+        except TypeError:
+            return np.array([], dtype=np.int64)
+
+    def estimate(self, op: str, value) -> int:
+        return int(self.counts[self._matching(op, value)].sum())
+
+    def select(self, op: str, value) -> Bitmap:
+        result = Bitmap(np.zeros((self.n + 7) // 8, dtype=np.uint8), self.n)
+        for k in self._matching(op, value):
+            result = result | self.bitmaps[k]
+        return result
+
+    def isin(self, values) -> Bitmap:
+        return self.select('in', values)
+
+    def notna(self) -> Bitmap:
+        return self.select('in', list(self.labels))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.bits.nbytes for b in self.bitmaps)
+
+
+class KeyIndex:
+    """
+    Hash lookup from value to row positions, for equality tests on columns
+    with too many distinct values for bitmaps (Objname, OBSID).
+    """
+
+    def __init__(self, values: pd.Series):
+        self.keys = pd.Index(values)
+        self.n = len(self.keys)
+
+    def isin(self, values) -> np.ndarray:
+        targets = pd.Index([v for v in values if not pd.isna(v)]).unique()
+        if self.keys.is_unique:
+            found = self.keys.get_indexer(targets)
+        else:
+            found = self.keys.get_indexer_non_unique(targets)[0]
+        return np.sort(found[found >= 0]).astype(np.int64)
+
+    def select(self, op: str, value) -> np.ndarray:
+        return self.isin([value])
+
+    def estimate(self, op: str, value) -> int:
+        return len(self.isin([value] if op == '==' else value))
+
+    def notna(self) -> Bitmap:
+        return Bitmap.from_mask(~self.keys.isna())
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.keys.nbytes)
+
+
+class CatalogIndex:
+    """
+    Secondary indexes over a parsed table (DataFrame or catalog.Catalog),
+    answering catalog_stream predicates without scanning every row.
+
+    Numeric columns get a SortedIndex, other columns a BitmapIndex, or a
+    KeyIndex (equality only) past MAX_BITMAP_LABELS distinct values. Indexes
+    are built on first use, or up front with build(). A query starts from its
+    most selective term, answered from its index; once the candidates are few
+    the remaining terms are checked on those rows only. Terms no index can
+    answer (e.g. Objname > 'J18') fall back to scanning that column.
+
+        index = CatalogIndex(df)
+        linear = index.query((col('DEdeg') > -30) & (col('LCType') == 'Linear'))
+    """
+
+    def __init__(self, table: Union[pd.DataFrame, Catalog]):
+        self.table = table
+        self.n = len(table)
+        self.indexes: Dict[str, Union[SortedIndex, BitmapIndex, KeyIndex]] = {}
+
+    def build(self, columns: Optional[Sequence[str]] = None) -> 'CatalogIndex':
+        """Build the indexes of `columns` (default: all) now rather than on first query."""
+        for name in columns if columns is not None else self.table.columns:
+            self.index(name)
+        return self
+
+    def index(self, name: str) -> Union[SortedIndex, BitmapIndex, KeyIndex]:
+        """The index of column `name`, built on first use."""
+        if name not in self.indexes:
+            head = np.arange(min(self.n, CARDINALITY_SAMPLE))
+            sample = (self.table.select_columns([name]).take(head)[name] if isinstance(self.table, Catalog)
+                      else self.table[name].iloc[head])
+            if pd.api.types.is_numeric_dtype(sample.dtype) and not pd.api.types.is_bool_dtype(sample.dtype):
+                values = self.table[name].to_numpy(dtype=np.float64, na_value=np.nan)
+                self.indexes[name] = SortedIndex(values)
+            elif sample.nunique() > MAX_BITMAP_LABELS or self.table[name].nunique() > MAX_BITMAP_LABELS:
+                self.indexes[name] = KeyIndex(self.table[name])
+            else:
+                self.indexes[name] = BitmapIndex(self.table[name])
+        return self.indexes[name]
+
+    # --- planning -------------------------------------------------------------
+
+    def _indexable(self, where: Predicate) -> bool:
+        if where.op == 'range':
+            return True
+        if where.op not in ('cmp', 'in', 'notna'):
+            return False
+        index = self.index(where.args[0])
+        if isinstance(index, KeyIndex):
+            return where.op == 'in' or (where.op == 'cmp' and where.args[1] == '==')
+        if isinstance(index, BitmapIndex) or where.op == 'notna':
+            return True
+        values = [where.args[2]] if where.op == 'cmp' else where.args[1]
+        return all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in values)
+
+    def estimate(self, where: Predicate) -> int:
+        """Upper bound on the rows matching `where`, from the indexes alone."""
+        if self._indexable(where):
+            index = self.index(where.args[0])
+            if where.op == 'range':
+                return max(where.args[2] - where.args[1], 0)
+            if where.op == 'cmp':
+                return index.estimate(where.args[1], where.args[2])
+            if where.op == 'in':
+                return sum(index.estimate('==', v) for v in where.args[1]) if isinstance(index, SortedIndex) \
+                    else index.estimate('in', where.args[1])
+            return len(index.values) if isinstance(index, SortedIndex) else int(index.counts.sum())
+        if where.op == 'and':
+            return min(self.estimate(child) for child in where.args)
+        if where.op == 'or':
+            return min(self.n, sum(self.estimate(child) for child in where.args))
+        return self.n
+
+    def _conjuncts(self, where: Predicate) -> List[Predicate]:
+        """
+        The terms ANDed together in `where`. Range terms on one indexed
+        numeric column (e.g. from between()) become a single 'range' term,
+        one slice of that column's sorted index.
+        """
+        def flatten(node):
+            return [t for child in node.args for t in flatten(child)] if node.op == 'and' else [node]
+
+        terms, ranges = [], {}
+        for term in flatten(where):
+            if (term.op == 'cmp' and term.args[1] in SortedIndex.RANGE_OPS and self._indexable(term)
+                    and isinstance(self.index(term.args[0]), SortedIndex)):
+                ranges.setdefault(term.args[0], []).append(term)
+            else:
+                terms.append(term)
+        for name, group in ranges.items():
+            if len(group) == 1:
+                terms.append(group[0])
+                continue
+            index = self.index(name)
+            bounds = [index.bounds(t.args[1], t.args[2]) for t in group]
+            start, stop = max(b[0] for b in bounds), min(b[1] for b in bounds)
+            combined = group[0]
+            for t in group[1:]:
+                combined = combined & t
+            terms.append(Predicate(combined.func, [name], ' & '.join(t.text for t in group), 'range',
+                                   (name, start, stop)))
+        return terms
+
+    def _probe(self, where: Predicate, rows: np.ndarray) -> np.ndarray:
+        """The subset of `rows` matching `where`, reading only those rows."""
+        if isinstance(self.table, Catalog):
+            subset = self.table.select_columns(where.columns).take(rows)
+        else:
+            # Rows first, so only the candidates are copied
+            subset = self.table.iloc[rows, self.table.columns.get_indexer(where.columns)]
+        return rows[where(subset)]
+
+    def _evaluate(self, where: Predicate) -> RowSet:
+        if self._indexable(where):
+            index = self.index(where.args[0])
+            if where.op == 'range':
+                return index.select_bounds(where.args[1], where.args[2])
+            if where.op == 'cmp':
+                return index.select(where.args[1], where.args[2])
+            if where.op == 'in':
+                return index.isin(where.args[1])
+            return index.notna()
+        if where.op == 'and':
+            terms = sorted(self._conjuncts(where), key=self.estimate)
+            rows = self._evaluate(terms[0])
+            for term in terms[1:]:
+                if isinstance(rows, Bitmap) and rows.count() * PROBE_FRACTION <= self.n:
+                    rows = rows.rows()
+                if not isinstance(rows, Bitmap) and len(rows) * PROBE_FRACTION <= self.n:
+                    rows = self._probe(term, rows)
+                else:
+                    rows = _intersect(rows, self._evaluate(term), self.n)
+            return rows
+        if where.op == 'or':
+            left, right = where.args
+            return _union(self._evaluate(left), self._evaluate(right), self.n)
+        if where.op == 'not':
+            # As in Predicate: rows missing a value the term reads match neither it nor its negation
+            rows = ~_as_bitmap(self._evaluate(where.args[0]), self.n)
+            for name in where.columns if where.args[0].op != 'notna' else ():
+                rows = rows & self.index(name).notna()
+            return rows
+        # Anything else: scan the columns it reads
+        return Bitmap.from_mask(where(self.table[where.columns] if isinstance(self.table, pd.DataFrame)
+                                      else self.table.select_columns(where.columns)))
+
+    # --- queries ----------------------------------------------------------------
+
+    def rows(self, where: Predicate) -> np.ndarray:
+        """Sorted positions of the rows matching `where` (same rows as where(table))."""
+        return _as_rows(self._evaluate(where))
+
+    def count(self, where: Predicate) -> int:
+        return _size(self._evaluate(where))
+
+    def query(self, where: Predicate) -> Union[pd.DataFrame, Catalog]:
+        """The matching rows, as the same kind of table that was indexed."""
+        rows = self.rows(where)
+        return self.table.take(rows) if isinstance(self.table, Catalog) else self.table.iloc[rows]
+
+    def explain(self, where: Predicate) -> str:
+        """How `where` would be answered: each term, its access path and estimated rows."""
+        lines = []
+
+        def describe(node: Predicate, depth: int) -> None:
+            pad = '  ' * depth
+            if node.op == 'and':
+                terms = sorted(self._conjuncts(node), key=self.estimate)
+                lines.append(f"{pad}AND (most selective first, probe below {self.n // PROBE_FRACTION:,} rows)")
+                for term in terms:
+                    describe(term, depth + 1)
+            elif node.op in ('or', 'not'):
+                lines.append(f"{pad}{node.op.upper()}")
+                for child in node.args:
+                    describe(child, depth + 1)
+            elif self._indexable(node):
+                kind = type(self.index(node.args[0])).__name__
+                lines.append(f"{pad}{node.text}  [{kind}, ~{self.estimate(node):,} rows]")
+            else:
+                lines.append(f"{pad}{node.text}  [scan]")
+
+        describe(where, 0)
+        return '\n'.join(lines)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(index.nbytes for index in self.indexes.values())
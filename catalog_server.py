@@ -0,0 +1,248 @@
+"""
+Long-running catalog query server: parses the MRT tables once, keeps them
+(and their catalog_index indexes) in memory, and answers JSON queries
+over localhost HTTP or a Unix socket. catalog_client.py is the matching
+command-line client.
+
+    python3 catalog_server.py --data-dir ~/YSO                    # http://127.0.0.1:8766
+    python3 catalog_server.py --socket /tmp/yso_catalog.sock
+
+POST /query with a JSON body {"op": ..., "table": ..., "where": ...}:
+    tables                                  loaded tables, rows and columns
+    count        table, where               number of matching rows
+    filter       table, where, columns, limit   matching rows (first `limit`)
+    summary      table, where               yso_utils.get_summary_statistics
+    crosstab     table, where, row, col     yso_utils.create_contingency_table
+    correlation  table, where, columns      yso_utils.compute_correlation_matrix
+    reload                                  re-read the MRT tables
+
+`where` is a catalog_stream.parse_predicate expression, e.g.
+"YSO_CLASS == 'ClassI' and LCType == 'Linear' and DEdeg > -30".
+"""
+import argparse
+import json
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+from catalog_index import CatalogIndex
+from catalog_stream import parse_predicate
+from crossmatch import build_master_table
+from phase2_filtering import DATA_DIR, FILE_MAPPING, parse_paper_a, parse_paper_b, parse_paper_c
+from yso_utils import compute_correlation_matrix, create_contingency_table, get_summary_statistics
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8766
+DEFAULT_LIMIT = 100
+MAX_BODY_BYTES = 1 << 20
+
+PARSERS = {'A': parse_paper_a, 'B': parse_paper_b, 'C': parse_paper_c}
+
+
+def _jsonable(value):
+    """numpy / pandas scalars and NaN as plain JSON values."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+def _frame_json(df: pd.DataFrame) -> Dict:
+    return {'index': _jsonable(df.index.tolist()), 'columns': _jsonable(df.columns.tolist()),
+            'data': _jsonable(df.to_numpy(dtype=object).tolist())}
+
+
+class CatalogService:
+    """
+    The resident tables and their indexes: Papers A, B, C (those whose MRT
+    file exists) and their cross-matched 'master' table. Queries run
+    concurrently, each on the tables current when it started; reload()
+    parses fresh tables and swaps them in under `lock`, so queries already
+    running finish on the old ones.
+    """
+
+    def __init__(self, file_mapping: Dict[str, str] = FILE_MAPPING, crossmatch: bool = True):
+        self.file_mapping = dict(file_mapping)
+        self.crossmatch = crossmatch
+        self.lock = threading.Lock()
+        self.tables: Dict[str, pd.DataFrame] = {}
+        self.indexes: Dict[str, CatalogIndex] = {}
+        self.reload()
+
+    def reload(self) -> Dict:
+        start = time.perf_counter()
+        tables, missing = {}, []
+        for paper, path in self.file_mapping.items():
+            if not Path(path).exists():
+                print(f"  ⚠ Paper {paper}: {path} not found, skipping")
+                missing.append(paper)
+                continue
+            tables[paper] = PARSERS[paper](path)
+        if self.crossmatch and tables:
+            tables['master'] = build_master_table(tables)
+        indexes = {name: CatalogIndex(df) for name, df in tables.items()}
+        with self.lock:
+            self.tables, self.indexes = tables, indexes
+        return {'tables': {name: len(df) for name, df in tables.items()}, 'missing': missing,
+                'seconds': round(time.perf_counter() - start, 3)}
+
+    @staticmethod
+    def _table(tables: Dict[str, pd.DataFrame], indexes: Dict[str, CatalogIndex], request: Dict):
+        name = request.get('table', 'B')
+        if name not in tables:
+            raise KeyError(f"unknown table {name!r}; loaded: {', '.join(tables)}")
+        df, index = tables[name], indexes[name]
+        where = request.get('where')
+        if not where:
+            return df, None
+        predicate = parse_predicate(where)
+        missing = [c for c in predicate.columns if c not in df.columns]
+        if missing:
+            raise KeyError(f"table {name!r} has no column {', '.join(missing)}")
+        return df, (index, predicate)
+
+    def handle(self, request: Dict) -> Dict:
+        op = request.get('op')
+        if op == 'reload':
+            return self.reload()
+        with self.lock:
+            tables, indexes = self.tables, self.indexes
+
+        def selected() -> pd.DataFrame:
+            df, where = self._table(tables, indexes, request)
+            return df if where is None else where[0].query(where[1])
+
+        if op == 'tables':
+            return {name: {'rows': len(df), 'columns': df.columns.tolist()} for name, df in tables.items()}
+        if op == 'count':
+            df, where = self._table(tables, indexes, request)
+            return {'count': len(df) if where is None else where[0].count(where[1])}
+        if op == 'filter':
+            rows = selected()
+            columns = request.get('columns') or rows.columns.tolist()
+            limit = int(request.get('limit', DEFAULT_LIMIT))
+            return {'count': len(rows), 'columns': columns,
+                    'rows': _jsonable(rows[columns].head(limit).to_numpy(dtype=object).tolist())}
+        if op == 'summary':
+            return _jsonable(get_summary_statistics(selected()))
+        if op == 'crosstab':
+            return _frame_json(create_contingency_table(selected(), request['row'], request['col']))
+        if op == 'correlation':
+            rows = selected()
+            columns = request.get('columns') or rows.select_dtypes(np.number).columns.tolist()
+            return _frame_json(compute_correlation_matrix(rows, columns))
+        raise ValueError(f"unknown op {op!r}")
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """POST /query -> {"ok": true, "result": ..., "ms": ...} or {"ok": false, "error": ...}."""
+
+    service: CatalogService = None
+    quiet = False
+
+    def do_GET(self):
+        if self.path == '/ping':
+            self._reply(200, {'ok': True, 'result': 'pong'})
+        else:
+            self._reply(404, {'ok': False, 'error': 'POST queries to /query'})
+
+    def do_POST(self):
+        if self.path != '/query':
+            self._reply(404, {'ok': False, 'error': 'POST queries to /query'})
+            return
+        start = time.perf_counter()
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_BODY_BYTES:
+                raise ValueError("request too large")
+            request = json.loads(self.rfile.read(length) or b'{}')
+            result = self.service.handle(request)
+            status, body = 200, {'ok': True, 'result': result}
+        except (KeyError, ValueError, TypeError) as exc:
+            status, body = 400, {'ok': False, 'error': f"{type(exc).__name__}: {exc}"}
+        except Exception:
+            status, body = 500, {'ok': False, 'error': traceback.format_exc()}
+        body['ms'] = round((time.perf_counter() - start) * 1000, 2)
+        self._reply(status, body)
+
+    def _reply(self, status: int, body: Dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(service: CatalogService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          socket_path: Optional[str] = None, quiet: bool = False):
+    """Create the server (TCP, or a Unix socket when `socket_path` is given); call serve_forever() on it."""
+    handler = type('Handler', (QueryHandler,), {'service': service, 'quiet': quiet})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR,
+                        help='directory with the MRT tables (default: $YSO_DATA_DIR or the script directory)')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--no-crossmatch', action='store_true', help="don't build the 'master' table")
+    parser.add_argument('--quiet', action='store_true', help="don't log each request")
+    args = parser.parse_args(argv)
+
+    file_mapping = {paper: str(args.data_dir / Path(path).name) for paper, path in FILE_MAPPING.items()}
+
+    start = time.perf_counter()
+    service = CatalogService(file_mapping, crossmatch=not args.no_crossmatch)
+    for name, df in service.tables.items():
+        print(f"  ✓ {name}: {len(df):,} rows")
+    server = serve(service, args.host, args.port, args.socket, args.quiet)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving {len(service.tables)} tables on {where} (loaded in {time.perf_counter() - start:.1f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+import ast
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from instrumentation import instrumented, stage
+
+
+class Predicate:
+    """
+    Row filter over a catalog table, evaluated one chunk at a time.
+
+    Build them with `col`, e.g. (col('DEdeg') > -30) & (col('LCType') == 'Linear'),
+    and combine with &, | and ~. Calling a predicate on a DataFrame returns a
+    boolean mask; missing values never match, negated or not: ~p keeps only
+    rows with a value in every column p reads (except ~notna, which selects
+    the missing ones).
+
+    Predicates built this way also keep their expression (`op` and `args`:
+    'cmp' (name, operator, value), 'in' (name, values), 'notna' (name,), or
+    'and' / 'or' / 'not' over child predicates), which catalog_index uses to
+    answer them from indexes instead of scanning every row.
+    """
+
+    def __init__(self, func: Callable[[pd.DataFrame], np.ndarray], columns: List[str], text: str,
+                 op: Optional[str] = None, args: tuple = ()):
+        self.func = func
+        self.columns = list(dict.fromkeys(columns))
+        self.text = text
+        self.op = op
+        self.args = args
+
+    def __call__(self, df: pd.DataFrame) -> np.ndarray:
+        return np.asarray(self.func(df), dtype=bool)
+
+    def __and__(self, other: 'Predicate') -> 'Predicate':
+        return Predicate(lambda df: self(df) & other(df), self.columns + other.columns,
+                         f"({self.text}) & ({other.text})", 'and', (self, other))
+
+    def __or__(self, other: 'Predicate') -> 'Predicate':
+        return Predicate(lambda df: self(df) | other(df), self.columns + other.columns,
+                         f"({self.text}) | ({other.text})", 'or', (self, other))
+
+    def __invert__(self) -> 'Predicate':
+        def func(df):
+            if self.op == 'notna':
+                return ~self(df)      # ~notna(x) is how "x is missing" is spelled
+            present = np.logical_and.reduce([np.asarray(df[name].notna()) for name in self.columns])
+            return ~self(df) & present
+        return Predicate(func, self.columns, f"~({self.text})", 'not', (self,))
+
+    def __repr__(self) -> str:
+        return f"Predicate({self.text})"
+
+
+class Column:
+    """Column reference used to build predicates (see `col`)."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _compare(self, op: str, value, func) -> Predicate:
+        name = self.name
+        return Predicate(lambda df: func(df[name], value), [name], f"{name} {op} {value!r}",
+                         'cmp', (name, op, value))
+
+    def __gt__(self, value):
+        return self._compare('>', value, lambda s, v: s > v)
+
+    def __ge__(self, value):
+        return self._compare('>=', value, lambda s, v: s >= v)
+
+    def __lt__(self, value):
+        return self._compare('<', value, lambda s, v: s < v)
+
+    def __le__(self, value):
+        return self._compare('<=', value, lambda s, v: s <= v)
+
+    def __eq__(self, value):
+        return self._compare('==', value, lambda s, v: s == v)
+
+    def __ne__(self, value):
+        return self._compare('!=', value, lambda s, v: s.notna() & (s != v))
+
+    __hash__ = None
+
+    def isin(self, values) -> Predicate:
+        values = list(values)
+        return Predicate(lambda df: df[self.name].isin(values), [self.name], f"{self.name} in {values!r}",
+                         'in', (self.name, values))
+
+    def notna(self) -> Predicate:
+        name = self.name
+        return Predicate(lambda df: df[name].notna(), [name], f"{name} is not null", 'notna', (name,))
+
+    def between(self, low, high) -> Predicate:
+        return (self >= low) & (self <= high)
+
+
+def col(name: str) -> Column:
+    return Column(name)
+
+
+_AST_COMPARE = {ast.Gt: '__gt__', ast.GtE: '__ge__', ast.Lt: '__lt__', ast.LtE: '__le__', ast.Eq: '__eq__',
+                ast.NotEq: '__ne__'}
+_AST_FLIPPED = {ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Lt: ast.Gt, ast.LtE: ast.GtE}
+
+
+def parse_predicate(text: str) -> Predicate:
+    """
+    Build a Predicate from a filter expression such as
+
+        DEdeg > -30 and LCType == 'Linear' and YSO_CLASS in ['ClassI', 'FS']
+        0.5 <= delW2mag < 2 or not notna(Period)
+
+    Supports comparisons (chained ones too), `in` / `not in` lists, and /
+    or / not, and notna(column). Nothing is evaluated, so the text can come
+    from a client.
+    """
+    def literal(node):
+        try:
+            return ast.literal_eval(node)
+        except ValueError:
+            raise ValueError(f"expected a literal value, got {ast.unparse(node)!r}") from None
+
+    def column(node) -> Column:
+        if not isinstance(node, ast.Name):
+            raise ValueError(f"expected a column name, got {ast.unparse(node)!r}")
+        return col(node.id)
+
+    def build(node) -> Predicate:
+        if isinstance(node, ast.BoolOp):
+            parts = [build(value) for value in node.values]
+            result = parts[0]
+            for part in parts[1:]:
+                result = result & part if isinstance(node.op, ast.And) else result | part
+            return result
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ~build(node.operand)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'notna':
+            if len(node.args) != 1 or node.keywords:
+                raise ValueError("notna() takes one column")
+            return column(node.args[0]).notna()
+        if isinstance(node, ast.Compare):
+            terms = []
+            left = node.left
+            for op, right in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    term = column(left).isin(literal(right))
+                    terms.append(~term if isinstance(op, ast.NotIn) else term)
+                elif type(op) not in _AST_COMPARE:
+                    raise ValueError(f"unsupported comparison in {ast.unparse(node)!r}")
+                elif isinstance(left, ast.Name):
+                    terms.append(getattr(column(left), _AST_COMPARE[type(op)])(literal(right)))
+                elif isinstance(right, ast.Name):
+                    # Literal on the left (0.5 <= delW2mag): flip the comparison
+                    flipped = _AST_FLIPPED.get(type(op), type(op))
+                    terms.append(getattr(column(right), _AST_COMPARE[flipped])(literal(left)))
+                else:
+                    raise ValueError(f"expected a column name in {ast.unparse(node)!r}")
+                left = right
+            result = terms[0]
+            for term in terms[1:]:
+                result = result & term
+            return result
+        raise ValueError(f"unsupported filter expression {ast.unparse(node)!r}")
+
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as exc:
+        raise ValueError(f"invalid filter expression {text!r}: {exc.msg}") from None
+    return build(tree.body)
+
+
+@instrumented
+def select(df: pd.DataFrame, where: Optional[Predicate] = None) -> pd.DataFrame:
+    """Rows of `df` matching `where`, as a copy (all rows when `where` is None)."""
+    return df.copy() if where is None else df[where(df)].copy()
+
+
+@instrumented
+def write_csv(df: pd.DataFrame, path) -> int:
+    """Write `df` as CSV without the index; returns the rows written."""
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def filter_chunks(frames: Iterable[pd.DataFrame], where: Optional[Predicate] = None) -> Iterator[pd.DataFrame]:
+    """Apply `where` to each chunk as it arrives, yielding only surviving rows."""
+    for frame in frames:
+        yield frame if where is None else frame[where(frame)]
+
+
+def stream_to_csv(frames: Iterable[pd.DataFrame], outputs: Dict[str, Optional[Predicate]]) -> Dict[str, int]:
+    """
+    Write each chunk's matching rows to several CSVs in a single pass.
+
+    Args:
+        frames: Parsed chunks (e.g. from phase2_filtering.iter_paper_a)
+        outputs: Output path -> predicate selecting its rows (None keeps all rows)
+
+    Returns:
+        Rows written per output path. Files match DataFrame.to_csv(index=False)
+        of the fully loaded, filtered table.
+    """
+    with stage('catalog_stream.stream_to_csv', outputs=len(outputs)) as span:
+        counts = _stream_to_csv(frames, outputs)
+        span.set(rows_out=sum(counts.values()))
+    return counts
+
+
+def _stream_to_csv(frames, outputs):
+    counts = {path: 0 for path in outputs}
+    handles = {path: open(path, 'w', newline='') for path in outputs}
+    try:
+        first = True
+        for frame in frames:
+            for path, where in outputs.items():
+                selected = frame if where is None else frame[where(frame)]
+                if first or len(selected):
+                    selected.to_csv(handles[path], index=False, header=first)
+                counts[path] += len(selected)
+            first = False
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return counts
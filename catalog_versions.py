@@ -0,0 +1,571 @@
+"""
+Versioned catalog ingest: diff a new release of a paper's MRT table (an
+erratum, a new table version) against the stored one and apply only the
+difference to the phase 2 outputs, instead of rerunning
+phase2_filtering.main from nothing.
+
+Rows are matched between versions on the paper's key (SPICY_ID for A,
+Objname for B, OBSID for C) and sorted into added, removed and changed.
+Per paper the store keeps the current table with one membership flag
+per output CSV, plus running summary statistics and contingency counts
+(a CountCube) for the whole table and for each output. An ingest then:
+
+  1. evaluates the output filters on the added and changed rows only;
+     every other row keeps the membership it had;
+  2. takes the removed rows and the old versions of changed rows out of
+     the statistics and counts, and adds the new versions;
+  3. rewrites only the output CSVs whose rows changed (same bytes as a
+     full run), then summary_statistics.json and, if any CSV changed,
+     ZTF_Master_Crossmatched.csv. The new state is saved beside the old
+     one and the manifest switched to it in one replace; the CSVs are
+     written to temporary files and moved into place after that.
+
+Each version's delta is kept under <store>/<paper>/v<N>/ as added.csv,
+removed.csv and changes.csv (key, column, old and new value).
+
+    python3 catalog_versions.py init                              # version 1 of every FILE_MAPPING table
+    python3 catalog_versions.py ingest B apjsadc397t2_mrt_v2.txt
+    python3 catalog_versions.py status
+    python3 catalog_versions.py crosstab PaperB_Linear YSO_CLASS Variability
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from catalog_cache import file_digest, read_frame, write_frame
+from count_cube import DEFAULT_AXES, CountCube
+from phase2_filtering import (DATA_DIR, FILE_MAPPING, OUTPUT_DIR, OUTPUT_FILTERS, crossmatch_outputs, parse_paper_a,
+                              parse_paper_b, parse_paper_c)
+from catalog_stream import write_csv
+
+STORE_DIR = DATA_DIR / 'catalog_versions'
+STATISTICS_FILE = 'summary_statistics.json'
+
+# Bump when the on-disk layout below changes
+STORE_FORMAT_VERSION = 2
+
+PAPER_KEYS = {'A': 'SPICY_ID', 'B': 'Objname', 'C': 'OBSID'}
+PARSERS = {'A': parse_paper_a, 'B': parse_paper_b, 'C': parse_paper_c}
+# Output CSVs (OUTPUT_FILTERS names) built from each paper
+PAPER_OUTPUTS = {
+    'A': ['PaperA_LinearPlus', 'PaperA_LinearMinus'],
+    'B': ['PaperB_Linear'],
+    'C': ['PaperC_AllSources'],
+}
+
+# Contingency axes (count_cube.DEFAULT_AXES) and the column each one needs
+CUBE_AXES = {'YSO_CLASS': 'YSO_CLASS', 'LCType': 'LCType', 'Variability': 'delW2mag', 'DecBand': 'DEdeg'}
+
+_MANIFEST_FILE = 'manifest.json'
+_MEMBER_PREFIX = '_in_'
+
+
+class RunningMoments:
+    """Count, mean and sum of squared deviations of a column, with rows added and removed."""
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.n, self.mean, self.m2 = n, mean, m2
+
+    @staticmethod
+    def _moments(values) -> Tuple[int, float, float]:
+        x = pd.to_numeric(pd.Series(values), errors='coerce').dropna().to_numpy(dtype=np.float64)
+        if not len(x):
+            return 0, 0.0, 0.0
+        mean = float(x.mean())
+        return len(x), mean, float(((x - mean) ** 2).sum())
+
+    def add(self, values) -> None:
+        n_b, mean_b, m2_b = self._moments(values)
+        n = self.n + n_b
+        if n_b == 0:
+            return
+        delta = mean_b - self.mean
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.mean += delta * n_b / n
+        self.n = n
+
+    def remove(self, values) -> None:
+        # Chan's merge run backwards: (n, mean, m2) was this part and the rest combined
+        n_b, mean_b, m2_b = self._moments(values)
+        if n_b == 0:
+            return
+        n_a = self.n - n_b
+        if n_a < 0:
+            raise ValueError("Removing more values than were added")
+        if n_a == 0:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        mean_a = (self.n * self.mean - n_b * mean_b) / n_a
+        delta = mean_b - mean_a
+        self.m2 = max(self.m2 - m2_b - delta * delta * n_a * n_b / self.n, 0.0)
+        self.mean, self.n = mean_a, n_a
+
+    def mean_value(self) -> float:
+        return self.mean if self.n else np.nan
+
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1), as pandas computes it."""
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+
+class SummaryAccumulator:
+    """
+    yso_utils.get_summary_statistics of a table, kept up to date as rows
+    are added and removed rather than recomputed over the whole table.
+    """
+
+    COUNTED = {'yso_classes': 'YSO_CLASS', 'lc_types': 'LCType'}
+    MOMENTS = {'w2_mag': 'W2magMean', 'variability': 'delW2mag'}
+
+    def __init__(self, columns: List[str]):
+        self.columns = [c for c in list(self.COUNTED.values()) + list(self.MOMENTS.values()) if c in columns]
+        self.total = 0
+        self.counts: Dict[str, Dict] = {key: {} for key, column in self.COUNTED.items() if column in self.columns}
+        self.moments = {key: RunningMoments() for key, column in self.MOMENTS.items() if column in self.columns}
+
+    def add(self, df: pd.DataFrame) -> 'SummaryAccumulator':
+        return self._update(df, 1)
+
+    def remove(self, df: pd.DataFrame) -> 'SummaryAccumulator':
+        return self._update(df, -1)
+
+    def _update(self, df: pd.DataFrame, sign: int) -> 'SummaryAccumulator':
+        self.total += sign * len(df)
+        for key, counts in self.counts.items():
+            for label, count in df[self.COUNTED[key]].value_counts().items():
+                counts[label] = counts.get(label, 0) + sign * int(count)
+                if counts[label] == 0:
+                    del counts[label]
+        for key, moments in self.moments.items():
+            (moments.add if sign > 0 else moments.remove)(df[self.MOMENTS[key]])
+        return self
+
+    def statistics(self) -> Dict:
+        """Same keys and values as get_summary_statistics of the current rows."""
+        def counted(key):
+            counts = self.counts.get(key, {})
+            return dict(sorted(counts.items(), key=lambda item: (-item[1], str(item[0]))))
+
+        def moment(key, stat):
+            moments = self.moments.get(key)
+            return np.nan if moments is None else (moments.mean_value() if stat == 'mean' else moments.std())
+
+        return {
+            'total_objects': self.total,
+            'yso_classes': counted('yso_classes'),
+            'lc_types': counted('lc_types'),
+            'mean_w2_mag': moment('w2_mag', 'mean'),
+            'std_w2_mag': moment('w2_mag', 'std'),
+            'mean_variability': moment('variability', 'mean'),
+            'std_variability': moment('variability', 'std'),
+        }
+
+    def to_dict(self) -> Dict:
+        return {'columns': self.columns, 'total': self.total,
+                'counts': {key: list(counts.items()) for key, counts in self.counts.items()},
+                'moments': {key: [m.n, m.mean, m.m2] for key, m in self.moments.items()}}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'SummaryAccumulator':
+        acc = cls(state['columns'])
+        acc.total = state['total']
+        acc.counts = {key: dict(map(tuple, items)) for key, items in state['counts'].items()}
+        acc.moments = {key: RunningMoments(*values) for key, values in state['moments'].items()}
+        return acc
+
+
+class CatalogDelta(NamedTuple):
+    """
+    Rows that differ between two versions of a table, matched on `key`.
+    changes lists every changed value (key, column, old, new).
+    """
+    key: str
+    added: np.ndarray           # positions in the new table
+    removed: np.ndarray         # positions in the old table
+    changed_old: np.ndarray     # positions of changed rows in the old table
+    changed_new: np.ndarray     # ... and of the same rows in the new table
+    unchanged_old: np.ndarray
+    unchanged_new: np.ndarray
+    changes: pd.DataFrame
+
+    def __bool__(self) -> bool:
+        return bool(len(self.added) or len(self.removed) or len(self.changed_new))
+
+    def describe(self) -> str:
+        return (f"+{len(self.added)} added, -{len(self.removed)} removed, "
+                f"{len(self.changed_new)} changed ({len(self.changes)} values)")
+
+
+def _differs(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Elementwise old != new, with missing equal to missing."""
+    if old.dtype.kind in 'biuf' and new.dtype.kind in 'biuf':
+        old, new = old.astype(np.float64), new.astype(np.float64)
+        return (old != new) & ~(np.isnan(old) & np.isnan(new))
+    old, new = old.astype(object), new.astype(object)
+    missing_old, missing_new = pd.isna(old), pd.isna(new)
+    return np.where(missing_old | missing_new, missing_old != missing_new, old != new).astype(bool)
+
+
+def diff_catalogs(old: pd.DataFrame, new: pd.DataFrame, key: str) -> CatalogDelta:
+    """
+    Match the rows of two versions of a table on `key` and compare the
+    matched rows on every column of `new` (a column `old` lacks counts
+    as changed).
+
+    Raises:
+        ValueError: if `key` is missing or not unique in either version
+    """
+    for name, df in (('old', old), ('new', new)):
+        if key not in df.columns:
+            raise ValueError(f"{name} table has no key column {key!r}")
+        if not df[key].is_unique:
+            duplicated = df.loc[df[key].duplicated(), key].iloc[:5].tolist()
+            raise ValueError(f"{name} table has duplicate {key} values, e.g. {duplicated}")
+
+    position = pd.Index(old[key].to_numpy(dtype=object)).get_indexer(new[key].to_numpy(dtype=object))
+    common_new = np.flatnonzero(position >= 0)
+    common_old = position[common_new]
+    removed = np.ones(len(old), dtype=bool)
+    removed[common_old] = False
+
+    changed = np.zeros(len(common_new), dtype=bool)
+    changes = []
+    keys = new[key].to_numpy(dtype=object)[common_new]
+    for column in new.columns:
+        new_values = new[column].to_numpy()[common_new]
+        if column not in old.columns:
+            differs = np.ones(len(common_new), dtype=bool)
+            old_values = np.full(len(common_new), np.nan, dtype=object)
+        else:
+            old_values = old[column].to_numpy()[common_old]
+            differs = _differs(old_values, new_values)
+        if differs.any():
+            changed |= differs
+            changes.append(pd.DataFrame({key: keys[differs], 'column': column,
+                                         'old': old_values[differs].astype(object),
+                                         'new': new_values[differs].astype(object)}))
+
+    changes = pd.concat(changes, ignore_index=True) if changes else \
+        pd.DataFrame({key: [], 'column': [], 'old': [], 'new': []})
+    return CatalogDelta(key, np.flatnonzero(position < 0), np.flatnonzero(removed),
+                        common_old[changed], common_new[changed], common_old[~changed], common_new[~changed],
+                        changes)
+
+
+def cube_axes(columns) -> Dict:
+    """The DEFAULT_AXES a table with these columns can be counted on."""
+    return {name: DEFAULT_AXES[name] for name, column in CUBE_AXES.items() if column in columns}
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _jsonable(stats: Dict) -> Dict:
+    """get_summary_statistics output as JSON (NaN -> null)."""
+    def convert(value):
+        if isinstance(value, dict):
+            return {str(k): convert(v) for k, v in value.items()}
+        value = _plain(value)
+        return None if isinstance(value, float) and math.isnan(value) else value
+    return convert(stats)
+
+
+class PaperState(NamedTuple):
+    """Stored state of one paper: current table (with _in_<output> flags) and per-view aggregates."""
+    table: pd.DataFrame
+    summaries: Dict[str, SummaryAccumulator]
+    cubes: Dict[str, CountCube]
+
+
+class VersionStore:
+    """
+    Versions of the Paper A/B/C tables and the aggregates derived from them.
+
+    <store>/manifest.json lists each paper's versions and names the state
+    directory of the current one. That directory, <store>/<paper>/state-v<N>,
+    holds the table in catalog_cache's column format, views.json (summary
+    accumulators and cube labels) and one <view>.counts.npy per view; a view
+    is the whole paper ('PaperB') or one of its output CSVs.
+
+    Args:
+        store_dir: Where versions are kept
+        output_dir: Where the phase 2 CSVs and summary_statistics.json are written
+    """
+
+    def __init__(self, store_dir: Path = STORE_DIR, output_dir: Path = OUTPUT_DIR):
+        self.store_dir = Path(store_dir)
+        self.output_dir = Path(output_dir)
+
+    # -- manifest ----------------------------------------------------------
+
+    def manifest(self) -> Dict:
+        try:
+            with open(self.store_dir / _MANIFEST_FILE) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {'format': STORE_FORMAT_VERSION, 'papers': {}}
+        if manifest.get('format') != STORE_FORMAT_VERSION:
+            raise ValueError(f"{self.store_dir} was written by store format {manifest.get('format')}, "
+                             f"expected {STORE_FORMAT_VERSION}; re-run init into a new store")
+        return manifest
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.store_dir, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self.store_dir / _MANIFEST_FILE)
+
+    # -- state -------------------------------------------------------------
+
+    @staticmethod
+    def views(paper: str) -> List[str]:
+        return [f'Paper{paper}'] + PAPER_OUTPUTS[paper]
+
+    def load(self, paper: str) -> Optional[PaperState]:
+        """The stored state of `paper`, or None before its first version."""
+        record = self.manifest()['papers'].get(paper)
+        if record is None:
+            return None
+        directory = self.store_dir / paper / record['state']
+        table = read_frame(directory)
+        with open(directory / 'views.json') as f:
+            views = json.load(f)
+        summaries, cubes = {}, {}
+        columns = [c for c in table.columns if not c.startswith(_MEMBER_PREFIX)]
+        for view, state in views.items():
+            summaries[view] = SummaryAccumulator.from_dict(state['summary'])
+            cube = CountCube(cube_axes(columns))
+            cube.categories = {name: list(labels) for name, labels in state['categories'].items()}
+            cube.ordered = state['ordered']
+            cube.counts = np.load(directory / f'{view}.counts.npy')
+            cubes[view] = cube
+        return PaperState(table, summaries, cubes)
+
+    def _save(self, paper: str, version: int, state: PaperState) -> str:
+        """Write `state` as the state directory of `version` and return its name (not yet in the manifest)."""
+        name = f'state-v{version:04d}'
+        directory = self.store_dir / paper
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=directory, prefix='.tmp-'))
+        try:
+            write_frame(tmp, state.table)
+            views = {}
+            for view, cube in state.cubes.items():
+                np.save(tmp / f'{view}.counts.npy', cube.counts)
+                views[view] = {'summary': state.summaries[view].to_dict(),
+                               'categories': {name: [_plain(v) for v in labels]
+                                              for name, labels in cube.categories.items()},
+                               'ordered': cube.ordered}
+            with open(tmp / 'views.json', 'w') as f:
+                json.dump(views, f)
+            # Left over from an ingest of this version that failed before its manifest
+            shutil.rmtree(directory / name, ignore_errors=True)
+            os.replace(tmp, directory / name)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return name
+
+    def _empty_state(self, paper: str, columns: List[str]) -> PaperState:
+        table = pd.DataFrame({c: [] for c in columns})
+        for name in PAPER_OUTPUTS[paper]:
+            table[_MEMBER_PREFIX + name] = np.zeros(0, dtype=bool)
+        views = self.views(paper)
+        return PaperState(table, {v: SummaryAccumulator(columns) for v in views},
+                          {v: CountCube(cube_axes(columns)) for v in views})
+
+    # -- ingest ------------------------------------------------------------
+
+    def ingest(self, paper: str, filepath, crossmatch: bool = True) -> Optional[CatalogDelta]:
+        """
+        Make `filepath` the current version of `paper`, updating the outputs
+        by the delta from the stored version (everything, the first time).
+
+        Returns:
+            The delta, or None when the file is the version already stored
+        """
+        manifest = self.manifest()
+        record = manifest['papers'].get(paper, {'key': PAPER_KEYS[paper], 'version': 0, 'history': []})
+        content_hash = file_digest(Path(filepath))
+        if record['history'] and record['history'][-1]['content_hash'] == content_hash:
+            print(f"[PAPER {paper}] {Path(filepath).name} is already version {record['version']}")
+            return None
+
+        new = PARSERS[paper](str(filepath)).reset_index(drop=True)
+        state = self.load(paper) or self._empty_state(paper, list(new.columns))
+        old = state.table
+        delta = diff_catalogs(old, new, record['key'])
+        version = record['version'] + 1
+        print(f"[PAPER {paper}] v{version} from {Path(filepath).name}: {delta.describe()}")
+
+        # Output membership: carried over for unchanged rows, evaluated for the rest
+        fresh = np.concatenate([delta.added, delta.changed_new])
+        table = new.copy()
+        old_keys, new_keys = old[record['key']].to_numpy(), new[record['key']].to_numpy()
+        rewrite = []
+        for name in PAPER_OUTPUTS[paper]:
+            flag = _MEMBER_PREFIX + name
+            was = old[flag].to_numpy(dtype=bool)
+            now = np.zeros(len(new), dtype=bool)
+            now[delta.unchanged_new] = was[delta.unchanged_old]
+            where = OUTPUT_FILTERS[name]
+            now[fresh] = True if where is None else where(new.iloc[fresh])
+            table[flag] = now
+            # Reordered rows change the CSV even when no member changed
+            if (was[delta.removed].any() or was[delta.changed_old].any() or now[fresh].any()
+                    or not np.array_equal(old_keys[was], new_keys[now])):
+                rewrite.append(name)
+
+        # Aggregates: out with the old rows, in with the new
+        gone = old.iloc[np.concatenate([delta.removed, delta.changed_old])]
+        came = new.iloc[fresh]
+        for view in self.views(paper):
+            if view == f'Paper{paper}':
+                out_rows, in_rows = gone, came
+            else:
+                flag = _MEMBER_PREFIX + view
+                out_rows = gone[gone[flag].to_numpy(dtype=bool)]
+                in_rows = came[table[flag].to_numpy(dtype=bool)[fresh]]
+            state.summaries[view].remove(out_rows).add(in_rows)
+            state.cubes[view].remove(out_rows).update(in_rows)
+        state = PaperState(table, state.summaries, state.cubes)
+
+        # The manifest is the commit point: until it names the new state, the
+        # old state and the old CSVs are what is stored, and the staged CSVs
+        # are only moved into place after it
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        staged, saved = {}, None
+        previous = record.get('state')
+        try:
+            for name in PAPER_OUTPUTS[paper]:
+                path = self.output_dir / f'{name}.csv'
+                if name in rewrite or not path.exists():
+                    tmp = self.output_dir / f'.tmp-{name}.csv'
+                    staged[name] = (tmp, path, write_csv(new[table[_MEMBER_PREFIX + name].to_numpy()], tmp))
+
+            if record['version']:
+                # Version 1 is the table itself; later versions keep their delta
+                self._save_delta(paper, version, old, new, delta)
+            saved = self._save(paper, version, state)
+            record.update(state=saved, version=version, source=str(Path(filepath).resolve()),
+                          content_hash=content_hash, rows=len(new))
+            record['history'].append({'version': version, 'source': record['source'],
+                                      'content_hash': content_hash, 'ingested': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                                      'rows': len(new), 'added': len(delta.added), 'removed': len(delta.removed),
+                                      'changed': len(delta.changed_new)})
+            manifest['papers'][paper] = record
+            self._write_manifest(manifest)
+        except BaseException:
+            for tmp, _, _ in staged.values():
+                tmp.unlink(missing_ok=True)
+            if saved is not None:
+                shutil.rmtree(self.store_dir / paper / saved, ignore_errors=True)
+            raise
+        if previous is not None:
+            shutil.rmtree(self.store_dir / paper / previous, ignore_errors=True)
+
+        for name in PAPER_OUTPUTS[paper]:
+            if name in staged:
+                tmp, path, rows = staged[name]
+                os.replace(tmp, path)
+                print(f"  ✓ Rewrote: {name}.csv ({rows} sources)")
+            else:
+                print(f"  • Unchanged: {name}.csv")
+
+        self.write_statistics()
+        if crossmatch and rewrite:
+            self.crossmatch()
+        return delta
+
+    def _save_delta(self, paper: str, version: int, old: pd.DataFrame, new: pd.DataFrame,
+                    delta: CatalogDelta) -> None:
+        directory = self.store_dir / paper / f'v{version:04d}'
+        directory.mkdir(parents=True, exist_ok=True)
+        columns = [c for c in old.columns if not c.startswith(_MEMBER_PREFIX)]
+        new.iloc[delta.added].to_csv(directory / 'added.csv', index=False)
+        old.iloc[delta.removed][columns].to_csv(directory / 'removed.csv', index=False)
+        delta.changes.to_csv(directory / 'changes.csv', index=False)
+
+    def crossmatch(self) -> None:
+        """Rebuild ZTF_Master_Crossmatched.csv from the output CSVs (they are small)."""
+        names = [name for outputs in PAPER_OUTPUTS.values() for name in outputs]
+        paths = {name: self.output_dir / f'{name}.csv' for name in names}
+        if all(path.exists() for path in paths.values()):
+            crossmatch_outputs({name: pd.read_csv(path, float_precision='round_trip') for name, path in paths.items()},
+                               self.output_dir)
+
+    # -- queries -----------------------------------------------------------
+
+    def statistics(self) -> Dict[str, Dict]:
+        """View -> get_summary_statistics, for every stored paper."""
+        stats = {}
+        for paper in sorted(self.manifest()['papers']):
+            state = self.load(paper)
+            stats.update({view: acc.statistics() for view, acc in state.summaries.items()})
+        return stats
+
+    def write_statistics(self) -> Path:
+        path = self.output_dir / STATISTICS_FILE
+        with open(path, 'w') as f:
+            json.dump(_jsonable(self.statistics()), f, indent=1)
+        return path
+
+    def crosstab(self, view: str, row: str, col: str) -> pd.DataFrame:
+        """create_contingency_table(view rows, row, col), from the stored counts."""
+        paper = next((p for p in PAPER_OUTPUTS if view in self.views(p)), None)
+        state = self.load(paper) if paper else None
+        if state is None:
+            raise KeyError(f"no stored view {view!r}")
+        return state.cubes[view].crosstab(row, col)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--store', type=Path, default=STORE_DIR)
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    init = commands.add_parser('init', help='ingest the FILE_MAPPING tables')
+    init.add_argument('--data-dir', type=Path, help='directory with the MRT tables (default: FILE_MAPPING)')
+    ingest = commands.add_parser('ingest', help='ingest a new version of one paper')
+    ingest.add_argument('paper', choices=sorted(PAPER_KEYS))
+    ingest.add_argument('file', type=Path)
+    ingest.add_argument('--no-crossmatch', action='store_true')
+    commands.add_parser('status', help='list stored versions')
+    crosstab = commands.add_parser('crosstab', help='contingency table of a stored view')
+    crosstab.add_argument('view')
+    crosstab.add_argument('row')
+    crosstab.add_argument('col')
+    args = parser.parse_args(argv)
+
+    store = VersionStore(args.store, args.output_dir)
+    if args.command == 'init':
+        deltas = [store.ingest(paper, args.data_dir / Path(path).name if args.data_dir else path, crossmatch=False)
+                  for paper, path in FILE_MAPPING.items()]
+        if any(deltas):
+            store.crossmatch()
+    elif args.command == 'ingest':
+        store.ingest(args.paper, args.file, crossmatch=not args.no_crossmatch)
+    elif args.command == 'status':
+        for paper, record in sorted(store.manifest()['papers'].items()):
+            print(f"Paper {paper} (key {record['key']}): version {record['version']}, {record['rows']:,} rows")
+            for entry in record['history']:
+                print(f"  v{entry['version']} {entry['ingested']} {Path(entry['source']).name}: "
+                      f"+{entry['added']} -{entry['removed']} ~{entry['changed']}")
+    else:
+        print(store.crosstab(args.view, args.row, args.col).to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
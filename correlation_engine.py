@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, Iterable, Iterator, List, Optional
+
+# Variability metrics from the Paper B table correlated in the notebook
+VARIABILITY_METRICS = ['W2magMean', 'sig_W2Flux', 'delW2mag', 'Period', 'slope', 'r_value', 'FLP_LSP_BOOT']
+
+METHODS = ('pearson', 'spearman')
+
+
+class CorrelationAccumulator:
+    """
+    One-pass co-moments for a set of columns, fed one chunk at a time.
+
+    For every column pair (a, b) the accumulator keeps the number of rows
+    where both are present, the mean of a over those rows, the co-moment
+    sum((a - mean_a) * (b - mean_b)) and sum((a - mean_a)**2). Chunks are
+    reduced on their own and folded in with Chan's parallel update, so
+    partial accumulators (e.g. built in worker processes and pickled back)
+    can be merged in any order.
+
+    Args:
+        columns: Columns to correlate
+        pairwise: If True, each pair uses every row where both values are
+                  present. If False, rows with any missing value are dropped
+                  (the listwise behaviour of compute_correlation_matrix)
+    """
+
+    def __init__(self, columns: List[str], pairwise: bool = False):
+        k = len(columns)
+        self.columns = list(columns)
+        self.pairwise = pairwise
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+
+    def update(self, df: pd.DataFrame) -> 'CorrelationAccumulator':
+        """Fold the rows of one chunk into the running co-moments."""
+        return self.update_values(df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan))
+
+    def update_values(self, values: np.ndarray) -> 'CorrelationAccumulator':
+        """Same as update, for a (rows, columns) float array in column order."""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if not self.pairwise:
+            values = values[valid.all(axis=1)]
+            valid = np.ones(values.shape, dtype=bool)
+        if len(values) == 0:
+            return self
+
+        # Shift by the chunk's column means so the sums below don't cancel
+        present = valid.sum(axis=0)
+        shift = np.divide(np.where(valid, values, 0.0).sum(axis=0), present,
+                          out=np.zeros(values.shape[1]), where=present > 0)
+        y = np.where(valid, values - shift, 0.0)
+        w = valid.astype(np.float64)
+
+        n = w.T @ w
+        sums = y.T @ w  # sums[a, b]: sum of a over rows where a and b are present
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, sums / n, 0.0)
+            comoment = np.where(n > 0, y.T @ y - sums * sums.T / n, 0.0)
+            m2 = np.where(n > 0, (y * y).T @ w - sums * sums / n, 0.0)
+
+        chunk = CorrelationAccumulator(self.columns, self.pairwise)
+        chunk.n, chunk.mean, chunk.comoment, chunk.m2 = n, mean + shift[:, None], comoment, m2
+        return self.merge(chunk)
+
+    def merge(self, other: 'CorrelationAccumulator') -> 'CorrelationAccumulator':
+        """Combine another accumulator over the same columns into this one."""
+        if other.columns != self.columns or other.pairwise != self.pairwise:
+            raise ValueError("Can only merge accumulators over the same columns and NaN mode")
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, other.n / n, 0.0)
+            cross = np.where(n > 0, self.n * other.n / n, 0.0)
+        self.comoment = self.comoment + other.comoment + delta * delta.T * cross
+        self.m2 = self.m2 + other.m2 + delta * delta * cross
+        self.mean = self.mean + delta * weight
+        self.n = n
+        return self
+
+    def __add__(self, other: 'CorrelationAccumulator') -> 'CorrelationAccumulator':
+        merged = CorrelationAccumulator(self.columns, self.pairwise).merge(self)
+        return merged.merge(other)
+
+    def correlation(self) -> pd.DataFrame:
+        """Pearson correlation matrix of everything seen so far."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr[(self.n < 2) | (self.m2 <= 0) | (self.m2.T <= 0)] = np.nan
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(np.isnan(np.diag(corr)), np.nan, 1.0))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def counts(self) -> pd.DataFrame:
+        """Number of rows behind each pair's coefficient."""
+        return pd.DataFrame(self.n.astype(np.int64), index=self.columns, columns=self.columns)
+
+
+class RankTransform:
+    """
+    Maps values to their average rank (1-based, ties share the mean rank)
+    within a reference sample, per column. Collected in one pass over the
+    chunks so a second pass can rank each chunk exactly for Spearman.
+
+    Exact ranks need the whole sample: every present value of each column
+    is kept (8 bytes per value), so memory grows with the row count.
+    """
+
+    def __init__(self, columns: List[str], pairwise: bool = False):
+        self.columns = list(columns)
+        self.pairwise = pairwise
+        self._parts = [[] for _ in self.columns]
+        self._sorted = None
+
+    def update(self, df: pd.DataFrame) -> 'RankTransform':
+        values = df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(values)
+        if not self.pairwise:
+            values = values[valid.all(axis=1)]
+            valid = np.ones(values.shape, dtype=bool)
+        for i, parts in enumerate(self._parts):
+            parts.append(values[valid[:, i], i])
+        self._sorted = None
+        return self
+
+    def merge(self, other: 'RankTransform') -> 'RankTransform':
+        for parts, other_parts in zip(self._parts, other._parts):
+            parts.extend(other_parts)
+        self._sorted = None
+        return self
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Rank array (rows, columns) for a chunk; missing values stay NaN."""
+        if self._sorted is None:
+            self._sorted = [np.sort(np.concatenate(parts)) if parts else np.array([]) for parts in self._parts]
+        values = df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        ranks = np.full(values.shape, np.nan)
+        for i, ref in enumerate(self._sorted):
+            valid = ~np.isnan(values[:, i])
+            left = np.searchsorted(ref, values[valid, i], side='left')
+            right = np.searchsorted(ref, values[valid, i], side='right')
+            ranks[valid, i] = (left + right + 1) / 2
+        return ranks
+
+
+def accumulate(frames: Iterable[pd.DataFrame], columns: List[str], pairwise: bool = False,
+               ranks: Optional[RankTransform] = None) -> CorrelationAccumulator:
+    """
+    Reduce a stream of chunks to one accumulator. Picklable, so it can run
+    in worker processes over separate files and the results merged.
+    """
+    acc = CorrelationAccumulator(columns, pairwise)
+    for frame in frames:
+        if ranks is None:
+            acc.update(frame)
+        else:
+            acc.update_values(ranks.transform(frame))
+    return acc
+
+
+def stream_correlation(chunks: Callable[[], Iterator[pd.DataFrame]], columns: List[str] = None,
+                       method: str = 'pearson', pairwise: bool = False) -> pd.DataFrame:
+    """
+    Correlation matrix over a table read in chunks. Pearson keeps only the
+    per-pair moments; Spearman also holds the correlated columns' values in
+    a RankTransform (not the rest of the table) to rank them exactly.
+
+    Args:
+        chunks: Zero-argument callable returning a fresh iterator of DataFrame
+                chunks, e.g. lambda: iter_mrt_file(path, usecols=VARIABILITY_METRICS).
+                Pearson reads it once; Spearman reads it twice (ranks, then moments)
+        columns: Columns to correlate. Defaults to VARIABILITY_METRICS
+        method: 'pearson' or 'spearman'
+        pairwise: Pairwise-complete rows instead of dropping any row with a NaN.
+                  Spearman ranks are then taken over each column's present
+                  values rather than re-ranked per pair
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+    if columns is None:
+        columns = VARIABILITY_METRICS
+
+    ranks = None
+    if method == 'spearman':
+        ranks = RankTransform(columns, pairwise)
+        for frame in chunks():
+            ranks.update(frame)
+    return accumulate(chunks(), columns, pairwise, ranks).correlation()
+
+
+def correlate_catalogs(filepaths: List[str], columns: List[str] = None, method: str = 'pearson',
+                       pairwise: bool = False, chunk_rows: int = None) -> pd.DataFrame:
+    """
+    Correlate columns over several MRT tables (Paper B layout) as one merged
+    catalog, streaming each file in chunks.
+    """
+    from yso_utils import DEFAULT_CHUNK_ROWS, iter_mrt_file
+
+    if columns is None:
+        columns = VARIABILITY_METRICS
+    if chunk_rows is None:
+        chunk_rows = DEFAULT_CHUNK_ROWS
+
+    def chunks():
+        for filepath in filepaths:
+            yield from iter_mrt_file(filepath, usecols=columns, chunk_rows=chunk_rows)
+
+    return stream_correlation(chunks, columns, method, pairwise)
@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Tuple
+
+from binning import bin_values
+from yso_utils import categorize_variability
+
+# Declination bands (deg). Bands are closed above, so the -30 edge matches
+# the northern-sky cut used for ZTF (DEdeg > -30): -30 itself is '<= -30'.
+DEC_BAND_EDGES = [-30, 0, 30]
+DEC_BAND_LABELS = ['<= -30', '-30 to 0', '0 to 30', '> 30']
+
+
+def _missing(df: pd.DataFrame) -> np.ndarray:
+    return np.full(len(df), np.nan, dtype=object)
+
+
+def column_axis(column: str) -> Callable[[pd.DataFrame], object]:
+    """Axis taking its labels from `column`; frames without it count as missing."""
+    return lambda df: df[column] if column in df.columns else _missing(df)
+
+
+def dec_band(df: pd.DataFrame) -> pd.Categorical:
+    """Declination band of each row; missing DEdeg stays missing."""
+    if 'DEdeg' not in df.columns:
+        return _missing(df)
+    # bin_values closes bins below; nudging the edges up closes them above instead
+    edges = np.nextafter(np.asarray(DEC_BAND_EDGES, dtype=np.float64), np.inf)
+    return bin_values(df['DEdeg'], edges=edges, labels=DEC_BAND_LABELS, unknown=None)
+
+
+def variability(df: pd.DataFrame) -> pd.Series:
+    """Variability bin of each row (the notebook's 'Variability' column)."""
+    if 'Variability' in df.columns:
+        return df['Variability']
+    if 'delW2mag' in df.columns:
+        return categorize_variability(df)
+    return _missing(df)
+
+
+# Axis name -> function giving each row's label. Every axis tolerates a
+# missing column (Paper A has no delW2mag, Paper C no YSO_CLASS or LCType),
+# so rows of all three papers can share one cube. 'Paper' has no column of
+# its own; pass it to CountCube.update (Paper='B').
+DEFAULT_AXES: Dict[str, Callable[[pd.DataFrame], object]] = {
+    'YSO_CLASS': column_axis('YSO_CLASS'),
+    'LCType': column_axis('LCType'),
+    'Variability': variability,
+    'DecBand': dec_band,
+    'Paper': column_axis('Paper'),
+}
+
+
+class CountCube:
+    """
+    N-dimensional histogram over categorical axes, built in one bincount pass.
+
+    Every axis is encoded once as integer codes, with one extra trailing slot
+    for missing values, so any pairwise contingency table is just a sum over
+    the other axes. Rows can be appended later (new categories grow the cube).
+
+    Args:
+        axes: Axis name -> function returning each row's label (array,
+              Series or Categorical). Defaults to DEFAULT_AXES
+    """
+
+    def __init__(self, axes: Dict[str, Callable[[pd.DataFrame], object]] = None):
+        self.axes = dict(DEFAULT_AXES if axes is None else axes)
+        self.names = list(self.axes)
+        self.categories: Dict[str, List] = {name: [] for name in self.names}
+        # Axes first fed a Categorical keep its category order in crosstabs
+        self.ordered: Dict[str, bool] = {}
+        self.counts = np.zeros([1] * len(self.names), dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, axes: Dict[str, Callable] = None, **constants) -> 'CountCube':
+        return cls(axes).update(df, **constants)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(len(self.categories[name]) for name in self.names)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def _encode(self, name: str, values) -> np.ndarray:
+        """Codes for one axis, registering unseen categories; -1 is missing."""
+        if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.array
+        if isinstance(values, pd.Categorical):
+            # Codes are used as they are: no per-row string matching
+            local, uniques = values.codes, values.categories
+            self.ordered.setdefault(name, True)
+        else:
+            local, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=True)
+            self.ordered.setdefault(name, False)
+
+        known = self.categories[name]
+        lookup = pd.Index(known).get_indexer(uniques) if known else np.full(len(uniques), -1)
+        new = [u for u, hit in zip(uniques, lookup) if hit < 0]
+        if new:
+            self._grow(name, len(new))
+            known.extend(new)
+            lookup = pd.Index(known).get_indexer(uniques)
+        lookup = np.append(lookup, -1)  # local -1 (missing) stays -1
+        return lookup[local]
+
+    def _grow(self, name: str, extra: int) -> None:
+        """Insert `extra` empty categories before the axis' missing slot."""
+        axis = self.names.index(name)
+        position = len(self.categories[name])
+        self.counts = np.insert(self.counts, [position] * extra, 0, axis=axis)
+
+    def update(self, df: pd.DataFrame, **constants) -> 'CountCube':
+        """
+        Add the rows of `df` to the cube.
+
+        Args:
+            df: Rows to count
+            **constants: Axis name -> label shared by every row (e.g. Paper='B')
+        """
+        # _histogram may grow the cube for new categories, so read counts after it
+        histogram = self._histogram(df, constants)
+        self.counts += histogram
+        return self
+
+    def remove(self, df: pd.DataFrame, **constants) -> 'CountCube':
+        """
+        Take previously counted rows of `df` back out of the cube (e.g. rows
+        deleted or changed in a new catalog version).
+
+        Raises:
+            ValueError: if `df` holds rows the cube never counted
+        """
+        histogram = self._histogram(df, constants)
+        counts = self.counts - histogram
+        if (counts < 0).any():
+            raise ValueError("Removing rows that were never added to the cube")
+        self.counts = counts
+        return self
+
+    def _histogram(self, df: pd.DataFrame, constants: Dict) -> np.ndarray:
+        codes = []
+        for name in self.names:
+            values = np.full(len(df), constants[name], dtype=object) if name in constants else self.axes[name](df)
+            codes.append(self._encode(name, values))
+
+        # Missing (-1) goes to the trailing slot of each axis
+        dims = tuple(n + 1 for n in self.shape)
+        slots = [np.where(c < 0, len(self.categories[name]), c) for c, name in zip(codes, self.names)]
+        flat = np.ravel_multi_index(slots, dims) if len(df) else np.array([], dtype=np.int64)
+        return np.bincount(flat, minlength=int(np.prod(dims))).reshape(dims)
+
+    append = update
+
+    def marginal(self, *names: str, dropna: bool = True) -> np.ndarray:
+        """Counts over the given axes (in that order), summed over all others."""
+        axes = [self.names.index(name) for name in names]
+        others = tuple(i for i in range(len(self.names)) if i not in axes)
+        counts = self.counts.sum(axis=others)
+        # sum keeps the remaining axes in cube order; reorder to the request
+        counts = np.moveaxis(counts, np.argsort(np.argsort(axes)), range(len(axes)))
+        if dropna:
+            counts = counts[tuple(slice(0, -1) for _ in names)]
+        return counts
+
+    def crosstab(self, row: str, col: str) -> pd.DataFrame:
+        """
+        Contingency table of two axes, equal to pd.crosstab(df[row], df[col])
+        on the counted rows: labels sorted (or in category order for
+        categorical axes), unobserved labels dropped.
+        """
+        counts = self.marginal(row, col)
+        rows = np.array(self.categories[row], dtype=object)
+        cols = np.array(self.categories[col], dtype=object)
+        keep_r, keep_c = counts.sum(axis=1) > 0, counts.sum(axis=0) > 0
+        order_r = self._label_order(row, rows[keep_r])
+        order_c = self._label_order(col, cols[keep_c])
+        table = counts[keep_r][:, keep_c][order_r][:, order_c]
+        return pd.DataFrame(table, index=pd.Index(rows[keep_r][order_r], name=row),
+                            columns=pd.Index(cols[keep_c][order_c], name=col))
+
+    def _label_order(self, name: str, labels: np.ndarray) -> np.ndarray:
+        if self.ordered.get(name):
+            return np.arange(len(labels))
+        return np.argsort(labels.astype(str), kind='stable')
+
+    def chord_matrix(self, row: str, col: str, preserve_magnitude: bool = True) -> Tuple[np.ndarray, List[str]]:
+        """
+        Symmetric block matrix of crosstab(row, col) for a chord diagram, as
+        normalize_for_chord would build it, plus 'axis:label' names.
+        """
+        table = self.crosstab(row, col)
+        values = table.to_numpy(dtype=np.float64)
+        if preserve_magnitude and values.size and values.max() > 0:
+            values = values / values.max()
+        n1, n2 = values.shape
+        matrix = np.zeros((n1 + n2, n1 + n2))
+        matrix[:n1, n1:] = values
+        matrix[n1:, :n1] = values.T
+        labels = [f"{row}:{v}" for v in table.index] + [f"{col}:{v}" for v in table.columns]
+        return matrix, labels
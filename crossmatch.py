@@ -0,0 +1,195 @@
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+DEFAULT_MATCH_RADIUS_ARCSEC = 1.0
+
+# Smallest grid cell (radians of chord length). Keeps the packed cell key
+# below 2**63; radii smaller than ~0.4" just get a few more candidates.
+_MIN_CELL = 2.0 ** -19
+
+
+def _unit_vectors(ra_deg, dec_deg) -> np.ndarray:
+    ra = np.radians(np.asarray(ra_deg, dtype=np.float64))
+    dec = np.radians(np.asarray(dec_deg, dtype=np.float64))
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+def _chord(radius_arcsec: float) -> float:
+    return 2 * np.sin(np.radians(radius_arcsec / 3600) / 2)
+
+
+class SkyGrid:
+    """
+    Spatial index over sky positions: unit vectors bucketed into a cubic
+    grid whose cells are at least the match chord wide, so every neighbour
+    within the radius lies in one of the 27 surrounding cells.
+    """
+
+    def __init__(self, ra_deg, dec_deg, radius_arcsec: float = DEFAULT_MATCH_RADIUS_ARCSEC):
+        self.chord = _chord(radius_arcsec)
+        self.cell = max(self.chord, _MIN_CELL)
+        self.offset = int(np.ceil(1 / self.cell)) + 1
+        self.size = 2 * self.offset + 1
+        self.xyz = _unit_vectors(ra_deg, dec_deg)
+
+        keys = self._keys(self._cells(self.xyz))
+        self.order = np.argsort(keys, kind='stable')
+        self.keys, self.starts = np.unique(keys[self.order], return_index=True)
+        self.ends = np.append(self.starts[1:], len(keys))
+
+    def _cells(self, xyz: np.ndarray) -> np.ndarray:
+        return np.floor(xyz / self.cell).astype(np.int64) + self.offset
+
+    def _keys(self, cells: np.ndarray) -> np.ndarray:
+        return (cells[:, 0] * self.size + cells[:, 1]) * self.size + cells[:, 2]
+
+    def query(self, ra_deg, dec_deg) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find all (query, indexed) pairs closer than the grid's radius.
+
+        Returns:
+            Query indices, indexed-catalog indices and separations in arcsec
+        """
+        xyz = _unit_vectors(ra_deg, dec_deg)
+        query_keys = self._keys(self._cells(xyz))
+        # A neighbour offset adds a constant to the packed key, so one sort
+        # of the query keys serves all 27 (cache-friendly) lookups.
+        query_order = np.argsort(query_keys, kind='stable')
+        sorted_keys = query_keys[query_order]
+        found_i, found_j = [], []
+        for dx, dy, dz in itertools.product((-1, 0, 1), repeat=3):
+            shifted = sorted_keys + (dx * self.size + dy) * self.size + dz
+            pos = np.minimum(np.searchsorted(self.keys, shifted), max(len(self.keys) - 1, 0))
+            hit = np.flatnonzero(self.keys[pos] == shifted) if len(self.keys) else np.array([], dtype=np.int64)
+            if hit.size == 0:
+                continue
+            starts, ends = self.starts[pos[hit]], self.ends[pos[hit]]
+            counts = ends - starts
+            i = np.repeat(query_order[hit], counts)
+            # Positions starts[k] .. ends[k]-1 for every hit, flattened
+            flat = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            j = self.order[flat]
+            close = ((xyz[i] - self.xyz[j]) ** 2).sum(axis=1) <= self.chord ** 2
+            found_i.append(i[close])
+            found_j.append(j[close])
+
+        if not found_i:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([], dtype=np.float64)
+        i, j = np.concatenate(found_i), np.concatenate(found_j)
+        chord = np.sqrt(((xyz[i] - self.xyz[j]) ** 2).sum(axis=1))
+        sep = np.degrees(2 * np.arcsin(np.minimum(chord / 2, 1.0))) * 3600
+        return i, j, sep
+
+
+def match_pairs(ra1, dec1, ra2, dec2, radius_arcsec: float = DEFAULT_MATCH_RADIUS_ARCSEC):
+    """
+    All pairs between two position lists within `radius_arcsec`.
+
+    Returns:
+        Indices into the first list, indices into the second, separations (arcsec)
+    """
+    return SkyGrid(ra2, dec2, radius_arcsec).query(ra1, dec1)
+
+
+def _connected_components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Label the connected components of the graph with edges (i, j), vectorized."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[i], low)
+        np.minimum.at(hooked, labels[j], low)
+        # Pointer jumping until every node points at its root
+        while True:
+            jumped = hooked[hooked]
+            if (jumped == hooked).all():
+                break
+            hooked = jumped
+        if (hooked == labels).all():
+            return labels
+        labels = hooked
+
+
+def crossmatch_members(catalogs: Dict[str, pd.DataFrame],
+                       radius_arcsec: float = DEFAULT_MATCH_RADIUS_ARCSEC) -> pd.DataFrame:
+    """
+    Assign every row of every catalog to a unique sky source.
+
+    Rows closer than `radius_arcsec` (directly or through a chain of such
+    matches) share a source, both across catalogs and within one catalog.
+
+    Args:
+        catalogs: Catalog name -> DataFrame with RAdeg/DEdeg, in priority order
+        radius_arcsec: Match radius
+
+    Returns:
+        One row per input row with columns catalog, row, source_id. Sources
+        are numbered in order of first appearance.
+    """
+    names = list(catalogs)
+    sizes = [len(catalogs[name]) for name in names]
+    ra = np.concatenate([catalogs[name]['RAdeg'].to_numpy(dtype=np.float64) for name in names])
+    dec = np.concatenate([catalogs[name]['DEdeg'].to_numpy(dtype=np.float64) for name in names])
+
+    grid = SkyGrid(ra, dec, radius_arcsec)
+    i, j, _ = grid.query(ra, dec)
+    distinct = i < j
+    labels = _connected_components(len(ra), i[distinct], j[distinct])
+    source_id, _ = pd.factorize(labels)
+
+    return pd.DataFrame({
+        'catalog': np.repeat(names, sizes),
+        'row': np.concatenate([np.arange(size) for size in sizes]) if sizes else np.array([], dtype=np.int64),
+        'source_id': source_id,
+    })
+
+
+def build_master_table(catalogs: Dict[str, pd.DataFrame],
+                       radius_arcsec: float = DEFAULT_MATCH_RADIUS_ARCSEC) -> pd.DataFrame:
+    """
+    Merge catalogs into one table with a row per unique sky source.
+
+    Position comes from the first member in catalog priority order (the
+    order of `catalogs`). For each catalog X the table has in_X (source
+    present), n_X (matched rows, >1 for duplicates) and that catalog's
+    other columns suffixed _X, taken from its first matching row.
+
+    Args:
+        catalogs: Catalog name -> DataFrame with RAdeg/DEdeg, in priority order
+        radius_arcsec: Match radius
+    """
+    members = crossmatch_members(catalogs, radius_arcsec)
+    source_id = members['source_id'].to_numpy()
+    n_sources = int(source_id.max()) + 1 if len(source_id) else 0
+
+    ra = np.concatenate([catalogs[name]['RAdeg'].to_numpy(dtype=np.float64) for name in catalogs])
+    dec = np.concatenate([catalogs[name]['DEdeg'].to_numpy(dtype=np.float64) for name in catalogs])
+    _, first = np.unique(source_id, return_index=True)
+
+    master = pd.DataFrame({
+        'source_id': np.arange(n_sources),
+        'RAdeg': ra[first],
+        'DEdeg': dec[first],
+        'n_members': np.bincount(source_id, minlength=n_sources),
+    })
+
+    start = 0
+    for name, frame in catalogs.items():
+        ids = source_id[start:start + len(frame)]
+        start += len(frame)
+        counts = np.bincount(ids, minlength=n_sources)
+        master[f'in_{name}'] = counts > 0
+        master[f'n_{name}'] = counts
+
+        groups, first_row = np.unique(ids, return_index=True)
+        carried = frame.drop(columns=['RAdeg', 'DEdeg']).iloc[first_row]
+        carried = carried.astype({c: 'Int64' for c in carried.columns if pd.api.types.is_integer_dtype(carried[c])})
+        carried.index = groups
+        carried = carried.reindex(np.arange(n_sources)).add_suffix(f'_{name}')
+        master = pd.concat([master, carried.reset_index(drop=True)], axis=1)
+
+    return master
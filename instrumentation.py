@@ -0,0 +1,381 @@
+import atexit
+import cProfile
+import fnmatch
+import functools
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+RECORD_FORMAT_VERSION = 1
+PROFILE_TOP = 15
+
+# YSO_INSTRUMENT values that record (and print the summary at exit) without saving a file
+_IN_MEMORY = ('1', 'true', 'on', 'yes')
+
+_enabled = False
+_config = {'profile': [], 'profile_dir': None, 'sample_ms': None, 'output': None}
+_records: List[Dict] = []
+_local = threading.local()
+_lock = threading.Lock()
+_epoch = time.perf_counter()
+_ids = iter(range(1, sys.maxsize))
+
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(output: Optional[str] = None, profile: Optional[List[str]] = None,
+           profile_dir: Optional[str] = None, sample_ms: Optional[float] = None) -> None:
+    """
+    Start recording.
+
+    Args:
+        output: Written at interpreter exit (see write_report), along with a
+                summary on stderr. '1' prints only the summary; None does neither
+        profile: Stage-name globs to capture with cProfile (or the sampler)
+        profile_dir: Directory for .prof dumps (default: the output's directory)
+        sample_ms: Sample the stack every `sample_ms` instead of using cProfile
+    """
+    global _enabled
+    saved = output is not None and str(output) not in _IN_MEMORY
+    _config.update(profile=list(profile or []), sample_ms=sample_ms, output=output,
+                   profile_dir=profile_dir or (str(Path(output).parent) if saved else None))
+    if output and not _config.get('registered'):
+        atexit.register(_write_at_exit)
+        _config['registered'] = True
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def records() -> List[Dict]:
+    """Records so far, in completion order."""
+    with _lock:
+        return list(_records)
+
+
+def drain() -> List[Dict]:
+    """Return and clear the records (e.g. to ship them back from a worker process)."""
+    with _lock:
+        out = list(_records)
+        _records.clear()
+    return out
+
+
+def extend(new_records: List[Dict]) -> None:
+    """Add records collected elsewhere, e.g. drained in a worker process."""
+    with _lock:
+        _records.extend(new_records)
+
+
+# --- measurements ----------------------------------------------------------------
+
+def _io_counters():
+    """(bytes read, bytes written) by this process so far, where the OS reports it."""
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            fields = dict(line.split(b':') for line in f.read().splitlines())
+        return int(fields[b'rchar']), int(fields[b'wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _io_probe_bytes() -> int:
+    """rchar added by one _io_counters() read itself, subtracted from each record."""
+    first, second = _io_counters(), _io_counters()
+    return second[0] - first[0] if first and second else 0
+
+
+_IO_PROBE_BYTES = _io_probe_bytes()
+
+
+def _peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def count_rows(obj) -> Optional[int]:
+    """Rows in a DataFrame / Series / array, or the total over a dict, list or tuple of them."""
+    if obj is None or isinstance(obj, (str, bytes, Path)):
+        return None
+    if hasattr(obj, 'shape') and getattr(obj, 'ndim', 0) >= 1:
+        return int(obj.shape[0])
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        counts = [count_rows(item) for item in obj]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+class Span:
+    """An open stage; set() adds counts or attributes before it closes."""
+
+    __slots__ = ('record',)
+
+    def __init__(self, record: Optional[Dict]):
+        self.record = record
+
+    def set(self, **values) -> None:
+        if self.record is None:
+            return
+        for key, value in values.items():
+            if key in ('rows_in', 'rows_out', 'bytes_read', 'bytes_written'):
+                self.record[key] = value
+            else:
+                self.record['attrs'][key] = value
+
+
+_NULL_SPAN = Span(None)
+
+
+class _Sampler:
+    """Collects the calling thread's stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def top(self, n: int = PROFILE_TOP) -> List[Dict]:
+        """Most frequent stacks (collapsed 'a;b;c' form, as flame graph tools read)."""
+        return [{'stack': stack, 'samples': count} for stack, count in self.stacks.most_common(n)]
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None, paths: Optional[List] = None, **attrs):
+    """
+    Record a block as one stage. Yields a Span whose set() fills in counts
+    known only inside the block (e.g. span.set(rows_out=len(df))). Stages
+    nest; each record keeps its parent's id.
+
+    Args:
+        name: Stage name
+        rows_in: Rows going in, if known up front
+        paths: Files the stage reads; their sizes stand in for bytes_read
+               where the OS gives no per-process I/O counters
+        attrs: Extra attributes stored with the record
+    """
+    if not _enabled:
+        yield _NULL_SPAN
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    record = {
+        'id': next(_ids), 'name': name, 'parent': stack[-1]['id'] if stack else None, 'depth': len(stack),
+        'pid': os.getpid(), 'tid': threading.get_ident(),
+        'rows_in': rows_in, 'rows_out': None, 'bytes_read': None, 'bytes_written': None,
+        'attrs': {key: _jsonable(value) for key, value in attrs.items()}, 'error': None,
+    }
+    stack.append(record)
+    span = Span(record)
+
+    profiled = any(fnmatch.fnmatchcase(name, pattern) for pattern in _config['profile'])
+    profiler = sampler = None
+    if profiled and _config['sample_ms']:
+        sampler = _Sampler(_config['sample_ms'] / 1000.0).__enter__()
+    elif profiled:
+        profiler = cProfile.Profile()
+
+    io_before = _io_counters()
+    rss_before = _peak_rss()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        yield span
+    except BaseException as exc:
+        record['error'] = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        end = time.perf_counter()
+        record['start_s'] = start - _epoch
+        record['wall_s'] = end - start
+        record['cpu_s'] = time.process_time() - cpu_start
+        io_after = _io_counters()
+        if io_before is not None and io_after is not None:
+            if record['bytes_read'] is None:
+                record['bytes_read'] = max(io_after[0] - io_before[0] - _IO_PROBE_BYTES, 0)
+            if record['bytes_written'] is None:
+                record['bytes_written'] = io_after[1] - io_before[1]
+        elif record['bytes_read'] is None and paths:
+            record['bytes_read'] = sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+        peak = _peak_rss()
+        record['peak_rss_bytes'] = peak
+        record['peak_rss_growth_bytes'] = peak - rss_before
+        if sampler is not None:
+            sampler.__exit__()
+            record['samples'] = sampler.top()
+        if profiler is not None:
+            record['profile'] = _profile_summary(profiler, name, record['id'])
+        stack.pop()
+        with _lock:
+            _records.append(record)
+
+
+def _profile_summary(profiler: cProfile.Profile, name: str, record_id: int) -> Dict:
+    summary = {}
+    if _config['profile_dir']:
+        directory = Path(_config['profile_dir'])
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name.replace('/', '_')}-{os.getpid()}-{record_id}.prof"
+        profiler.dump_stats(str(path))
+        summary['file'] = str(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+    summary['top'] = text.getvalue()
+    return summary
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _file_args(args, kwargs) -> List[str]:
+    return [str(a) for a in list(args) + list(kwargs.values())
+            if isinstance(a, (str, Path)) and len(str(a)) < 4096 and os.path.isfile(a)]
+
+
+def instrumented(func: Optional[Callable] = None, *, name: Optional[str] = None):
+    """
+    Decorator recording each call as a stage named `module.function`.
+    rows_in is inferred from the first table-like argument, rows_out from
+    the result, and file arguments count towards bytes_read.
+    """
+    def decorate(f):
+        label = name or f"{f.__module__}.{f.__qualname__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return f(*args, **kwargs)
+            rows_in = next((n for n in map(count_rows, args) if n is not None), None)
+            with stage(label, rows_in=rows_in, paths=_file_args(args, kwargs)) as span:
+                result = f(*args, **kwargs)
+                span.set(rows_out=count_rows(result))
+                return result
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+# --- output --------------------------------------------------------------------
+
+def trace_events(recs: Optional[List[Dict]] = None) -> Dict:
+    """Records as Chrome trace-event JSON (complete 'X' events, microseconds)."""
+    recs = records() if recs is None else recs
+    events = []
+    for r in recs:
+        args = {key: r[key] for key in ('rows_in', 'rows_out', 'bytes_read', 'bytes_written', 'cpu_s',
+                                        'peak_rss_bytes', 'error') if r.get(key) is not None}
+        args.update(r['attrs'])
+        events.append({'name': r['name'], 'cat': 'stage', 'ph': 'X', 'pid': r['pid'], 'tid': r['tid'],
+                       'ts': r['start_s'] * 1e6, 'dur': r['wall_s'] * 1e6, 'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_report(path) -> Path:
+    """Save the records: trace events for '*.trace.json', otherwise a JSON document."""
+    path = Path(path)
+    if path.name.endswith('.trace.json'):
+        payload = trace_events()
+    else:
+        payload = {'version': RECORD_FORMAT_VERSION, 'argv': sys.argv, 'records': records()}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=1, default=str))
+    return path
+
+
+def summary(recs: Optional[List[Dict]] = None) -> str:
+    """Per-stage totals (calls, wall, CPU, rows, peak RSS) as a text table."""
+    recs = records() if recs is None else recs
+    totals: Dict[str, Dict] = {}
+    for r in recs:
+        t = totals.setdefault(r['name'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows_in': 0,
+                                          'rows_out': 0, 'peak_rss_bytes': 0})
+        t['calls'] += 1
+        for key in ('wall_s', 'cpu_s', 'rows_in', 'rows_out'):
+            t[key] += r.get(key) or 0
+        t['peak_rss_bytes'] = max(t['peak_rss_bytes'], r.get('peak_rss_bytes') or 0)
+    lines = [f"{'stage':44s} {'calls':>5s} {'wall s':>8s} {'cpu s':>8s} {'rows in':>11s} {'rows out':>11s} "
+             f"{'peak MB':>8s}"]
+    for name, t in sorted(totals.items(), key=lambda item: -item[1]['wall_s']):
+        lines.append(f"{name[:44]:44s} {t['calls']:5d} {t['wall_s']:8.3f} {t['cpu_s']:8.3f} {t['rows_in']:11,d} "
+                     f"{t['rows_out']:11,d} {t['peak_rss_bytes'] / 1e6:8.1f}")
+    return '\n'.join(lines)
+
+
+def _write_at_exit() -> None:
+    if not _records:
+        return
+    print(f"\n{summary()}", file=sys.stderr)
+    if str(_config['output']) not in _IN_MEMORY:
+        print(f"✓ Instrumentation: {write_report(_config['output'])}", file=sys.stderr)
+
+
+def enable_from_env() -> None:
+    """
+    Enable from the environment, so any script can be instrumented unchanged:
+
+        YSO_INSTRUMENT=run.json python3 phase2_filtering.py
+        YSO_INSTRUMENT=run.trace.json YSO_PROFILE='*parse_*' python3 main.py
+
+    YSO_INSTRUMENT      Output file; '*.trace.json' writes Chrome trace events
+                        (chrome://tracing, Perfetto), anything else JSON records.
+                        '1' records without saving
+    YSO_PROFILE         Comma-separated stage-name globs to run under cProfile
+    YSO_PROFILE_DIR     Where .prof files go (default: next to the output)
+    YSO_SAMPLE_MS       Sample profiled stages' stacks at this interval instead of cProfile
+    """
+    output = os.environ.get('YSO_INSTRUMENT', '')
+    if output.lower() in ('', '0', 'off', 'false', 'no'):
+        return
+    profile = [p for p in os.environ.get('YSO_PROFILE', '').split(',') if p]
+    sample_ms = os.environ.get('YSO_SAMPLE_MS')
+    enable(output, profile, os.environ.get('YSO_PROFILE_DIR'), float(sample_ms) if sample_ms else None)
+
+
+enable_from_env()
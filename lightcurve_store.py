@@ -0,0 +1,368 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from ztf_analysis import BANDS, LightCurves
+
+STORE_FORMAT_VERSION = 2
+
+# One flat file per column; rows of a source live in one or more segments
+COLUMNS = {'mjd': np.float64, 'mag': np.float64, 'err': np.float64, 'band': np.int8}
+
+# Identifier columns that can be used to look a source up besides Objname
+ALIAS_COLUMNS = ['SPICY_ID', 'OBSID']
+
+# Names the live generation directory
+CURRENT_FILE = 'CURRENT'
+
+# Rows gathered per step by compact(), so rewriting never loads whole columns
+COMPACT_BLOCK_ROWS = 1 << 20
+
+# Segment table columns: source, first row, end row, next segment of the same source (-1: none)
+SOURCE, START, STOP, NEXT = range(4)
+
+
+class LightCurveStore:
+    """
+    On-disk, append-only store of per-source photometry.
+
+    Each column (mjd, mag, err, band) is one contiguous binary file read
+    through np.memmap, so tens of millions of epochs never have to fit in
+    RAM. A segment table maps every source to the row ranges holding its
+    epochs (chained per source), and an index resolves Objname, SPICY_ID
+    or OBSID to a source.
+
+    Files live in a generation directory named by <path>/CURRENT, next to
+    that generation's index.npz (segments, per-source chain heads and the
+    JSON name/alias index in one file). Appending writes new rows at the
+    end of the column files and only then replaces index.npz, so a crash
+    mid-append loses at most that append. compact() writes a complete new
+    generation, with every source one contiguous range, and switches to it
+    by replacing CURRENT; after that, get() is a plain slice and batches of
+    consecutive sources are zero-copy views.
+
+    Args:
+        path: Store directory (created if missing)
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # --- index ---------------------------------------------------------------
+
+    def _load(self) -> None:
+        current = self.path / CURRENT_FILE
+        if current.exists():
+            self.generation: Optional[str] = current.read_text().strip()
+            with np.load(self.path / self.generation / 'index.npz') as index:
+                meta = json.loads(index['meta'].tobytes())
+                if meta.get('version') != STORE_FORMAT_VERSION:
+                    raise ValueError(f"{self.path}: unsupported store version {meta.get('version')}")
+                self.segments = index['segments']
+                heads = index['sources']
+        else:
+            if (self.path / 'index.json').exists():
+                raise ValueError(f"{self.path}: unsupported store version 1 (rebuild the store)")
+            self.generation = None
+            meta = {'version': STORE_FORMAT_VERSION, 'rows': 0, 'names': [], 'compact': True,
+                    'aliases': {alias: {} for alias in ALIAS_COLUMNS}}
+            self.segments = np.zeros((0, 4), dtype=np.int64)
+            heads = np.zeros((0, 2), dtype=np.int64)
+        self.n_rows = meta['rows']
+        self.names: List[str] = meta['names']
+        self.aliases: Dict[str, Dict[str, int]] = meta['aliases']
+        self._compact = meta['compact']
+        # First and last segment of every source (-1 if it has none)
+        self._first = heads[:, 0].copy()
+        self._last = heads[:, 1].copy()
+        self._source_of = {name: i for i, name in enumerate(self.names)}
+        self._columns = None
+
+    def _commit(self, generation: Optional[str] = None) -> None:
+        """
+        Write the index of `generation` (default: the live one) with a single
+        atomic replace; a different generation then becomes the live one.
+        """
+        generation = generation or self.generation
+        meta = json.dumps({'version': STORE_FORMAT_VERSION, 'rows': self.n_rows, 'names': self.names,
+                           'aliases': self.aliases, 'compact': self._compact})
+        directory = self.path / generation
+        with open(directory / 'index.tmp.npz', 'wb') as f:
+            np.savez(f, meta=np.frombuffer(meta.encode(), dtype=np.uint8), segments=self.segments,
+                     sources=np.column_stack([self._first, self._last]).astype(np.int64))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(directory / 'index.tmp.npz', directory / 'index.npz')
+
+        if generation != self.generation:
+            tmp = self.path / f'{CURRENT_FILE}.tmp'
+            tmp.write_text(generation)
+            os.replace(tmp, self.path / CURRENT_FILE)
+            self.generation = generation
+            # Earlier generations (including ones left by an interrupted compact) are unreachable now
+            for stale in self.path.glob('g[0-9]*'):
+                if stale.name != generation and stale.is_dir():
+                    shutil.rmtree(stale, ignore_errors=True)
+        self._columns = None
+
+    def _new_generation(self) -> str:
+        number = int(self.generation[1:]) + 1 if self.generation else 1
+        generation = f'g{number:06d}'
+        directory = self.path / generation
+        if directory.exists():
+            shutil.rmtree(directory)
+        directory.mkdir()
+        return generation
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Read-only memory maps of the committed rows of each column."""
+        if self._columns is None:
+            self._columns = {}
+            for name, dtype in COLUMNS.items():
+                file = self.path / str(self.generation) / f'{name}.bin'
+                if self.n_rows == 0 or not file.exists():
+                    self._columns[name] = np.zeros(0, dtype=dtype)
+                else:
+                    self._columns[name] = np.memmap(file, dtype=dtype, mode='r', shape=(self.n_rows,))
+        return self._columns
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, key) -> bool:
+        return self.lookup(key) is not None
+
+    def lookup(self, key) -> Optional[int]:
+        """Source number for an Objname, SPICY_ID or OBSID (None if unknown)."""
+        key = str(key)
+        if key in self._source_of:
+            return self._source_of[key]
+        for alias in self.aliases.values():
+            if key in alias:
+                return alias[key]
+        return None
+
+    @property
+    def is_compact(self) -> bool:
+        """True when every source is one segment, stored in source order."""
+        return self._compact
+
+    def _check_compact(self) -> bool:
+        seg = self.segments
+        return (len(seg) == len(self.names)
+                and np.array_equal(seg[:, SOURCE], np.arange(len(seg)))
+                and bool(np.all(seg[1:, START] == seg[:-1, STOP])))
+
+    # --- ingestion -----------------------------------------------------------
+
+    def append(self, curves: LightCurves, identifiers: pd.DataFrame = None) -> None:
+        """
+        Append a batch of epochs. Sources are matched by curves.names
+        (Objname); new names become new sources.
+
+        Args:
+            curves: Epochs to add (see ztf_analysis.LightCurves)
+            identifiers: Optional frame with Objname and SPICY_ID / OBSID
+                         columns, registered as lookup aliases
+        """
+        sizes = np.diff(curves.offsets)
+        source = np.empty(curves.n_sources, dtype=np.int64)
+        for k, name in enumerate(curves.names.tolist()):
+            name = str(name)
+            if name not in self._source_of:
+                self._source_of[name] = len(self.names)
+                self.names.append(name)
+            source[k] = self._source_of[name]
+
+        if identifiers is not None:
+            for alias in ALIAS_COLUMNS:
+                if alias not in identifiers.columns:
+                    continue
+                known = identifiers[['Objname', alias]].dropna()
+                mapping = self.aliases.setdefault(alias, {})
+                for name, value in zip(known['Objname'].astype(str), known[alias]):
+                    if name in self._source_of:
+                        mapping[str(value)] = self._source_of[name]
+
+        # Data first, index second: uncommitted rows past n_rows are ignored
+        generation = self.generation or self._new_generation()
+        for name, dtype in COLUMNS.items():
+            values = np.ascontiguousarray(getattr(curves, name), dtype=dtype)
+            file = self.path / generation / f'{name}.bin'
+            with open(file, 'r+b' if file.exists() else 'wb') as f:
+                f.seek(self.n_rows * np.dtype(dtype).itemsize)
+                f.truncate()
+                f.write(values.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        keep = sizes > 0
+        starts = self.n_rows + curves.offsets[:-1]
+        new = np.column_stack([source, starts, starts + sizes, np.full(len(source), -1)])[keep].astype(np.int64)
+        self._link(new, len(self.segments))
+        self.segments = np.concatenate([self.segments, new])
+        self.n_rows += int(curves.offsets[-1])
+        self._compact = self._check_compact()
+        self._commit(generation)
+
+    def _link(self, new: np.ndarray, base: int) -> None:
+        """Chain new segments (numbered from `base`) onto their sources, in row order."""
+        grow = len(self.names) - len(self._first)
+        if grow:
+            self._first = np.concatenate([self._first, np.full(grow, -1, dtype=np.int64)])
+            self._last = np.concatenate([self._last, np.full(grow, -1, dtype=np.int64)])
+        if not len(new):
+            return
+        number = base + np.arange(len(new))
+        order = np.lexsort((number, new[:, SOURCE]))
+        source, number = new[order, SOURCE], number[order]
+        # Within a batch, each segment points at the next one of the same source
+        same = source[1:] == source[:-1]
+        new[order[:-1][same], NEXT] = number[1:][same]
+
+        head = np.concatenate([[True], ~same])
+        tail = np.concatenate([~same, [True]])
+        group_source, group_first = source[head], number[head]
+        previous = self._last[group_source]
+        linked = previous >= 0
+        self.segments[previous[linked], NEXT] = group_first[linked]
+        self._first[group_source[~linked]] = group_first[~linked]
+        self._last[source[tail]] = number[tail]
+
+    def compact(self) -> None:
+        """
+        Write a new generation with each source's epochs contiguous, in
+        source order and sorted by mjd, then switch to it. Rows are copied
+        between memory maps in blocks of about COMPACT_BLOCK_ROWS; only the
+        row permutation is held in RAM.
+        """
+        if self._compact:
+            return
+        seg = self.segments
+        order = np.lexsort((seg[:, START], seg[:, SOURCE]))
+        rows = _ranges(seg[order, START], seg[order, STOP])
+        counts = np.bincount(seg[:, SOURCE], weights=seg[:, STOP] - seg[:, START],
+                             minlength=len(self.names)).astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        generation = self._new_generation()
+        outputs = {name: np.memmap(self.path / generation / f'{name}.bin', dtype=dtype, mode='w+',
+                                   shape=(max(len(rows), 1),))
+                   for name, dtype in COLUMNS.items()}
+        columns = self.columns
+        first = 0
+        while first < len(self.names):
+            # Whole sources per block; a source larger than a block is copied on its own
+            stop = int(np.searchsorted(offsets, offsets[first] + COMPACT_BLOCK_ROWS, side='right')) - 1
+            stop = min(max(stop, first + 1), len(self.names))
+            lo, hi = offsets[first], offsets[stop]
+            block = rows[lo:hi]
+            source = np.repeat(np.arange(first, stop), counts[first:stop])
+            block = block[np.lexsort((columns['mjd'][block], source))]
+            for name, out in outputs.items():
+                out[lo:hi] = columns[name][block]
+            first = stop
+        for out in outputs.values():
+            out.flush()
+        del outputs
+        self._columns = None
+
+        n = len(self.names)
+        self.segments = np.column_stack([np.arange(n), offsets[:-1], offsets[1:], np.full(n, -1)]).astype(np.int64)
+        self._first = np.arange(n, dtype=np.int64)
+        self._last = np.arange(n, dtype=np.int64)
+        self.n_rows = len(rows)
+        self._compact = True
+        self._commit(generation)
+
+    # --- access --------------------------------------------------------------
+
+    def get(self, key) -> pd.DataFrame:
+        """All epochs of one source (Objname, SPICY_ID or OBSID) as a DataFrame."""
+        source = self.lookup(key)
+        if source is None:
+            raise KeyError(key)
+        if self._compact:
+            # Source k is segment k: a plain memmap view
+            rows = slice(int(self.segments[source, START]), int(self.segments[source, STOP]))
+        else:
+            starts, stops = [], []
+            segment = int(self._first[source])
+            while segment >= 0:
+                starts.append(self.segments[segment, START])
+                stops.append(self.segments[segment, STOP])
+                segment = int(self.segments[segment, NEXT])
+            rows = (slice(int(starts[0]), int(stops[0])) if len(starts) == 1
+                    else _ranges(np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64)))
+        cols = self.columns
+        return pd.DataFrame({
+            'mjd': cols['mjd'][rows], 'mag': cols['mag'][rows], 'err': cols['err'][rows],
+            'band': np.array(BANDS, dtype=object)[cols['band'][rows]],
+        })
+
+    def curves(self, start: int = 0, stop: int = None) -> LightCurves:
+        """
+        Sources start..stop-1 as LightCurves. On a compact store the arrays
+        are memmap views (no copy); otherwise the rows are gathered.
+        """
+        stop = len(self.names) if stop is None else stop
+        if not self._compact:
+            return self.select(self.names[start:stop])
+
+        seg = self.segments[start:stop]
+        lo = int(seg[0, START]) if len(seg) else 0
+        hi = int(seg[-1, STOP]) if len(seg) else 0
+        offsets = np.concatenate([[lo], seg[:, STOP]]).astype(np.int64) - lo
+        cols = self.columns
+        return LightCurves(np.array(self.names[start:stop], dtype=object), offsets,
+                           cols['mjd'][lo:hi], cols['mag'][lo:hi], cols['err'][lo:hi], cols['band'][lo:hi])
+
+    def select(self, keys: Iterable) -> LightCurves:
+        """
+        Gather the given sources (any identifier) into one LightCurves batch,
+        in request order. A source asked for twice (by the same or another
+        identifier) appears once, at its first position.
+        """
+        sources = {}
+        for key in keys:
+            source = self.lookup(key)
+            if source is None:
+                raise KeyError(key)
+            sources.setdefault(source, None)
+        sources = np.fromiter(sources, dtype=np.int64, count=len(sources))
+
+        seg = self.segments
+        # Segments of the requested sources, in request order then row order
+        rank = np.full(len(self.names), -1)
+        rank[sources] = np.arange(len(sources))
+        mine = seg[rank[seg[:, SOURCE]] >= 0]
+        mine = mine[np.lexsort((mine[:, START], rank[mine[:, SOURCE]]))]
+        rows = _ranges(mine[:, START], mine[:, STOP])
+
+        counts = np.bincount(rank[mine[:, SOURCE]], weights=mine[:, STOP] - mine[:, START], minlength=len(sources))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        cols = self.columns
+        return LightCurves(np.array([self.names[s] for s in sources], dtype=object), offsets,
+                           cols['mjd'][rows], cols['mag'][rows], cols['err'][rows], cols['band'][rows])
+
+    def n_epochs(self) -> np.ndarray:
+        """Number of stored epochs per source."""
+        seg = self.segments
+        return np.bincount(seg[:, SOURCE], weights=seg[:, STOP] - seg[:, START],
+                           minlength=len(self.names)).astype(np.int64)
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, stop) for every pair, vectorized."""
+    lengths = stops - starts
+    if lengths.sum() == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1])
@@ -1,63 +1,67 @@
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from catalog_stream import col, filter_chunks, select, write_csv
+from yso_utils import iter_mrt_file, parse_mrt_file as parse_paper_b_table
+
+PHASE1_COLUMNS = ['Objname', 'RAdeg', 'DEdeg', 'YSO_CLASS', 'W2magMean', 'delW2mag', 'LCType']
+
+VALID_CLASSES = ['ClassI', 'ClassII', 'ClassIII', 'FS']
+
+DATA_DIR = Path('/Users/marcus/Desktop/YSO')
+OUTPUT_DIR = DATA_DIR / 'ztf_candidates'
+
+def phase1_filter(dec_min=-30, lc_type='Linear', classes=VALID_CLASSES):
+    return (
+        (col('DEdeg') > dec_min) &
+        (col('LCType') == lc_type) &
+        col('YSO_CLASS').isin(classes)
+    )
+
+PHASE1_FILTER = phase1_filter()
+
 def parse_mrt_file(filepath):
-    data = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
-    for line in lines:
-        if line.startswith('J') or line.startswith('L'):
-            parts = line.split()
-            if len(parts) >= 16:
-                try:
-                    data.append({
-                        'Objname': parts[0],
-                        'RAdeg': float(parts[1]),
-                        'DEdeg': float(parts[2]),
-                        'YSO_CLASS': parts[4],
-                        'W2magMean': float(parts[6]),
-                        'delW2mag': float(parts[10]),
-                        'LCType': parts[-1] if len(parts) > 21 else 'Unknown'
-                    })
-                except (ValueError, IndexError):
-                    continue
-    
-    return pd.DataFrame(data)
+    return parse_paper_b_table(filepath, usecols=PHASE1_COLUMNS)
 
-def main():
-    output_dir = Path('/Users/marcus/Desktop/YSO/ztf_candidates')
+def main(stream=False, data_dir=DATA_DIR, output_dir=OUTPUT_DIR):
+    output_dir = Path(output_dir)
     output_dir.mkdir(exist_ok=True)
     
     print("="*80)
     print("PHASE 1: LOAD AND FILTER INFRARED SOURCES")
     print("="*80 + "\n")
     
-    print("Loading YSO data from 3 papers...")
-    dfs = []
-    for file in Path('/Users/marcus/Desktop/YSO').glob('*_mrt.txt'):
-        print(f"  Parsing {file.name}...")
-        df = parse_mrt_file(str(file))
-        dfs.append(df)
-    
-    combined_df = pd.concat(dfs, ignore_index=True)
-    print(f"\nTotal objects loaded: {len(combined_df):,}\n")
-    
-    combined_df = combined_df.dropna(subset=['YSO_CLASS', 'LCType'])
-    print(f"After removing missing values: {len(combined_df):,}\n")
-    
     print("Filtering criteria:")
     print("  1. Declination > -30° (northern sky accessible)")
     print("  2. Light curve type = Linear (smooth, predictable)")
     print("  3. Valid YSO classification\n")
     
-    valid_classes = ['ClassI', 'ClassII', 'ClassIII', 'FS']
-    filtered_df = combined_df[
-        (combined_df['DEdeg'] > -30) &
-        (combined_df['LCType'] == 'Linear') &
-        (combined_df['YSO_CLASS'].isin(valid_classes))
-    ].copy()
+    if stream:
+        # Filter each chunk as it is read; only surviving rows are kept
+        print("Streaming YSO data from 3 papers...")
+        filtered = []
+        for file in Path(data_dir).glob('*_mrt.txt'):
+            print(f"  Scanning {file.name}...")
+            chunks = iter_mrt_file(str(file), usecols=PHASE1_COLUMNS)
+            filtered.extend(filter_chunks(chunks, PHASE1_FILTER))
+        filtered_df = pd.concat(filtered, ignore_index=True)
+    else:
+        print("Loading YSO data from 3 papers...")
+        dfs = []
+        for file in Path(data_dir).glob('*_mrt.txt'):
+            print(f"  Parsing {file.name}...")
+            df = parse_mrt_file(str(file))
+            dfs.append(df)
+        
+        combined_df = pd.concat(dfs, ignore_index=True)
+        print(f"\nTotal objects loaded: {len(combined_df):,}\n")
+        
+        combined_df = combined_df.dropna(subset=['YSO_CLASS', 'LCType'])
+        print(f"After removing missing values: {len(combined_df):,}\n")
+        
+        filtered_df = select(combined_df, PHASE1_FILTER)
     
     print(f"After filtering: {len(filtered_df):,} sources\n")
     
@@ -75,11 +79,11 @@ def main():
     print(f"  Range: {filtered_df['delW2mag'].min():.3f} - {filtered_df['delW2mag'].max():.2f} mag")
     
     output_file = output_dir / 'filtered_sources.csv'
-    filtered_df.to_csv(output_file, index=False)
+    write_csv(filtered_df, output_file)
     print(f"\n✓ Saved filtered sources to: {output_file}")
     
     print(f"\nReady for ZTF optical analysis (Phase 2)")
     print("Run: python3 ztf_analysis.py")
 
 if __name__ == '__main__':
-    main()
+    main(stream='--stream' in sys.argv)
@@ -0,0 +1,178 @@
+"""
+Local stand-in for the IRSA ZTF light-curve service, for offline testing.
+
+Answers GET /cgi-bin/ZTF/nph_light_curve_search?POS=CIRCLE <ra> <dec> <radius>
+&BANDNAME=g,r&FORMAT=csv with a synthetic light curve in the service's CSV
+layout. Each position always gets the same curve. Keep-alive connections,
+artificial latency and random 503s (to exercise client retries) are
+supported.
+
+    python3 mock_photometry_server.py --port 8765 --latency 0.02 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import hashlib
+import numpy as np
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from ztf_analysis import DAYS_PER_YEAR, SEASON_DAYS
+
+LIGHT_CURVE_PATH = '/cgi-bin/ZTF/nph_light_curve_search'
+CSV_HEADER = 'oid,mjd,mag,magerr,catflags,filtercode,ra,dec'
+FILTER_CODES = {'g': 'zg', 'r': 'zr', 'i': 'zi'}
+
+
+def synthetic_csv(ra: float, dec: float, bands=('g', 'r'), baseline_days: float = 1000.0,
+                  start_mjd: float = 58200.0) -> bytes:
+    """A deterministic light curve (linear trend plus noise) for one position."""
+    seed = int.from_bytes(hashlib.blake2b(f'{ra:.6f},{dec:.6f}'.encode(), digest_size=8).digest(), 'little')
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(40, 160))
+
+    seasons = max(int(np.ceil(baseline_days / DAYS_PER_YEAR)), 1)
+    mjd = np.sort(start_mjd + np.minimum(rng.integers(0, seasons, n) * DAYS_PER_YEAR
+                                         + rng.uniform(0, SEASON_DAYS, n), baseline_days))
+    band = rng.choice(list(bands), n)
+    r_mean, slope, g_r = rng.uniform(12, 19), rng.normal(0, 0.4), rng.uniform(0.6, 1.6)
+    model = r_mean + slope * (mjd - mjd.mean()) / DAYS_PER_YEAR + np.where(band == 'g', g_r, 0.0)
+    err = 0.01 + 0.02 * np.exp(np.clip(model - 17.0, -10, 5))
+    mag = model + rng.normal(0, 1, n) * err
+    flags = np.where(rng.random(n) < 0.03, 32768, 0)
+    oid = 600000000000 + seed % 10**11
+
+    lines = [CSV_HEADER]
+    lines += [f'{oid},{t:.6f},{m:.4f},{e:.4f},{f},{FILTER_CODES[b]},{ra:.7f},{dec:.7f}'
+              for t, m, e, f, b in zip(mjd.tolist(), mag.tolist(), err.tolist(), flags.tolist(), band.tolist())]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def parse_query(target: str) -> Tuple[Optional[Tuple[float, float, float]], Tuple[str, ...]]:
+    """Position (ra, dec, radius) and bands from a light-curve request target."""
+    parts = urlsplit(target)
+    query = parse_qs(parts.query)
+    position = None
+    if 'POS' in query:
+        fields = query['POS'][0].split()
+        if len(fields) == 4 and fields[0].upper() == 'CIRCLE':
+            position = tuple(float(v) for v in fields[1:])
+    bands = tuple(b for b in query.get('BANDNAME', ['g,r'])[0].split(',') if b in FILTER_CODES)
+    return position, bands
+
+
+class MockPhotometryServer:
+    """
+    asyncio HTTP/1.1 server answering light-curve queries.
+
+    Args:
+        host, port: Address to listen on (port 0 picks a free port)
+        latency: Seconds to wait before each response
+        error_rate: Fraction of requests answered with 503
+        seed: Seed for the injected errors
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.host, self.port = host, port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(seed)
+        self.requests = 0
+        self.connections = 0
+        # Requests being answered right now, and the most seen at once
+        self.active = 0
+        self.max_active = 0
+        self._server = None
+        self._handlers = {}
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}{LIGHT_CURVE_PATH}'
+
+    async def start(self) -> 'MockPhotometryServer':
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        for writer in self._handlers.values():
+            writer.close()
+        # Let the handlers see the closed connections and return
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def __aenter__(self) -> 'MockPhotometryServer':
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._handlers[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                self.requests += 1
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                try:
+                    status, body = await self._respond(request_line.decode('latin-1').split())
+                finally:
+                    self.active -= 1
+                close = headers.get('connection', '').lower() == 'close'
+                writer.write((f'HTTP/1.1 {status}\r\nContent-Type: text/csv\r\n'
+                              f'Content-Length: {len(body)}\r\n'
+                              f'Connection: {"close" if close else "keep-alive"}\r\n\r\n').encode() + body)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._handlers.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _respond(self, request: list) -> Tuple[str, bytes]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if len(request) < 2 or request[0] != 'GET':
+            return '405 Method Not Allowed', b''
+        if not request[1].startswith(LIGHT_CURVE_PATH):
+            return '404 Not Found', b''
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return '503 Service Unavailable', b'busy\n'
+        position, bands = parse_query(request[1])
+        if position is None:
+            return '400 Bad Request', b'POS=CIRCLE ra dec radius required\n'
+        return '200 OK', synthetic_csv(position[0], position[1], bands or ('g', 'r'))
+
+
+async def _serve(args) -> None:
+    server = MockPhotometryServer(args.host, args.port, args.latency, args.error_rate)
+    await server.start()
+    print(f"Mock photometry service on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 503 responses')
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,380 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# One row of the "Byte-by-byte Description" table, e.g.
+#   "  33- 43 F11.7  deg      RAdeg   Right Ascension in decimal degrees (J2000)"
+#   "     145  A1     ---    DE-         Sign of the Declination (J2000)"
+_BYTE_ROW = re.compile(
+    r'^\s*(\d+)(?:\s*-\s*(\d+))?\s+([AIFE])(\d+)(?:\.(\d+))?\s+(\S+)\s+(\S+)\s*(.*)$'
+)
+# CDS null convention at the start of the explanation: "?" (blank is null)
+# or "?=-9.999" (the given value is null).
+_NULL_SPEC = re.compile(r'^\?(?:=(\S+))?')
+_SEPARATOR = re.compile(r'^[-=]{20,}\s*$')
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Rows laid out at a time when data lines differ in length
+_SPLIT_BLOCK_ROWS = 16_384
+# Beyond this many times the record width, ragged lines are gathered rather than padded
+_MAX_STRIDE_FACTOR = 4
+
+
+class MRTColumn(NamedTuple):
+    """One column of an MRT table as described in its byte-by-byte header."""
+    start: int
+    end: int
+    fmt: str
+    units: str
+    label: str
+    explanation: str
+    null: Optional[str]
+
+    @property
+    def kind(self) -> str:
+        return self.fmt[0]
+
+    @property
+    def width(self) -> int:
+        return self.end - self.start
+
+
+def _parse_byte_row(line: str) -> Optional[MRTColumn]:
+    match = _BYTE_ROW.match(line)
+    if match is None:
+        return None
+    first, last, kind, width, precision, units, label, explanation = match.groups()
+    start = int(first) - 1
+    end = int(last) if last else int(first)
+    fmt = f"{kind}{width}" + (f".{precision}" if precision else '')
+    null_match = _NULL_SPEC.match(explanation)
+    null = None
+    if null_match:
+        null = null_match.group(1) or ''
+    return MRTColumn(start, end, fmt, units, label, explanation.strip(), null)
+
+
+def read_mrt_header(filepath: str) -> Tuple[List[MRTColumn], int]:
+    """
+    Parse the byte-by-byte description at the top of an MRT file.
+
+    Returns the column specs and the byte offset at which the data block
+    starts (after the closing separator and any "Note" section).
+    """
+    columns = []
+    with open(filepath, 'rb') as f:
+        state = 'preamble'
+        while True:
+            raw = f.readline()
+            if not raw:
+                raise ValueError(f"{filepath}: no data block after MRT header")
+            line = raw.decode('ascii', errors='replace').rstrip('\r\n')
+
+            if state == 'preamble':
+                if line.startswith('Byte-by-byte Description'):
+                    state = 'table_head'
+            elif state == 'table_head':
+                # Separator, column titles, separator
+                if _SEPARATOR.match(line):
+                    state = 'titles'
+            elif state == 'titles':
+                if _SEPARATOR.match(line):
+                    state = 'table'
+            elif state == 'table':
+                if _SEPARATOR.match(line):
+                    state = 'after_table'
+                    continue
+                column = _parse_byte_row(line)
+                if column is not None:
+                    columns.append(column)
+            elif state == 'after_table':
+                if line.startswith('Note'):
+                    state = 'notes'
+                    continue
+                return columns, f.tell() - len(raw)
+            elif state == 'notes':
+                if _SEPARATOR.match(line):
+                    return columns, f.tell()
+
+
+def record_width(columns: List[MRTColumn]) -> int:
+    return max(col.end for col in columns)
+
+
+def split_records(buf: bytes, width: int) -> np.ndarray:
+    """
+    Lay out newline-terminated records as an (n_rows, width) byte matrix.
+
+    Short lines are right-padded with spaces, so blank trailing fields
+    decode as nulls instead of shifting columns. When every line has the
+    same length (the usual case for MRT data) the result is a strided
+    view of `buf` rather than a copy.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    if data.size == 0:
+        return np.empty((0, width), dtype=np.uint8)
+
+    # Fixed-stride fast path: the first newline gives the line length
+    stride = int(np.argmax(data == ord('\n'))) + 1
+    if data[stride - 1] == ord('\n') and data.size % stride == 0 and stride > width:
+        lines = data.reshape(-1, stride)
+        if (lines[:, -1] == ord('\n')).all():
+            return lines[:, :width]
+
+    ends = np.flatnonzero(data == ord('\n'))
+    if ends.size == 0 or ends[-1] != data.size - 1:
+        ends = np.append(ends, data.size)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+    # Tolerate CRLF line endings
+    has_cr = (lengths > 0) & (data[np.maximum(ends - 1, 0)] == ord('\r'))
+    lengths = lengths - has_cr
+
+    keep = lengths > 0
+    # Each line plus its line break; lines go into rows of `stride` bytes
+    spans = np.append(starts[1:], data.size) - starts
+    stride = max(int(spans.max()), width)
+    if stride > _MAX_STRIDE_FACTOR * width:
+        # A few very long lines would make the padded rows huge: gather instead
+        return _gather_records(data, starts[keep], lengths[keep], width)
+
+    records = np.empty((len(starts), width), dtype=np.uint8)
+    for lo in range(0, len(starts), _SPLIT_BLOCK_ROWS):
+        hi = min(lo + _SPLIT_BLOCK_ROWS, len(starts))
+        first, last = starts[lo], starts[lo] + spans[lo:hi].sum()
+        # One scatter moves every byte of the block to (its row * stride + its column)
+        shift = np.arange(hi - lo) * stride - (starts[lo:hi] - first)
+        padded = np.full((hi - lo) * stride, ord(' '), dtype=np.uint8)
+        padded[np.arange(last - first) + np.repeat(shift, spans[lo:hi])] = data[first:last]
+        block = padded.reshape(hi - lo, stride)[:, :width]
+        # Line breaks of short lines fall inside the record: blank them
+        block[(block == ord('\n')) | (block == ord('\r'))] = ord(' ')
+        records[lo:hi] = block
+    return records if keep.all() else records[keep]
+
+
+def _gather_records(data: np.ndarray, starts: np.ndarray, lengths: np.ndarray, width: int) -> np.ndarray:
+    # Gather in blocks of rows so the int64 index matrix stays small
+    records = np.empty((len(starts), width), dtype=np.uint8)
+    offsets = np.arange(width)
+    for lo in range(0, len(starts), _SPLIT_BLOCK_ROWS):
+        block_starts = starts[lo:lo + _SPLIT_BLOCK_ROWS, None]
+        block_lengths = lengths[lo:lo + _SPLIT_BLOCK_ROWS, None]
+        block = data[np.minimum(block_starts + offsets, data.size - 1)]
+        block[offsets >= block_lengths] = ord(' ')
+        records[lo:lo + len(block)] = block
+    return records
+
+
+# Fields this narrow are hashed as one or two uint64 words per row, which
+# makes it cheap to decode only the distinct values of low-cardinality
+# columns (classes, light-curve types, hour/degree integers, flags).
+_DICT_MAX_WIDTH = 16
+_DICT_SAMPLE = 1024
+
+
+def _dictionary_codes(field: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return (codes, distinct rows) if `field` has few distinct values, else None."""
+    n, width = field.shape
+    if width > _DICT_MAX_WIDTH or n < 4 * _DICT_SAMPLE:
+        return None
+    sample = np.ascontiguousarray(field[:_DICT_SAMPLE]).view(f'S{width}').ravel()
+    if len(np.unique(sample)) > _DICT_SAMPLE // 8:
+        return None
+
+    n_words = -(-width // 8)
+    padded = np.full((n, 8 * n_words), ord(' '), dtype=np.uint8)
+    padded[:, :width] = field
+    words = padded.view(np.uint64)
+    codes, uniques = pd.factorize(words[:, 0])
+    for j in range(1, n_words):
+        word_codes, word_uniques = pd.factorize(words[:, j])
+        codes, uniques = pd.factorize(codes * len(word_uniques) + word_codes)
+    if len(uniques) > n // 4:
+        return None
+    # One representative row per code
+    first = np.zeros(len(uniques), dtype=np.int64)
+    first[codes[::-1]] = np.arange(n - 1, -1, -1)
+    return codes, np.ascontiguousarray(field[first])
+
+
+def decode_strings(values: np.ndarray) -> np.ndarray:
+    """
+    Fixed-width bytes ('S' array) as an object array of str, with leading
+    and trailing blanks removed.
+    """
+    return _join_decode(np.char.strip(values))
+
+
+def _join_decode(stripped: np.ndarray) -> np.ndarray:
+    # Join the (NUL-padded) fields into one newline-separated buffer, then
+    # decode and split it in one pass instead of decoding a bytes object per row
+    n, width = len(stripped), stripped.dtype.itemsize
+    result = np.empty(n, dtype=object)
+    if n == 0 or width == 0:
+        result[:] = ''
+        return result
+    padded = np.empty((n, width + 1), dtype=np.uint8)
+    padded[:, :width] = np.frombuffer(np.ascontiguousarray(stripped).tobytes(), dtype=np.uint8).reshape(n, width)
+    padded[:, width] = ord('\n')
+    joined = padded[padded != 0].tobytes().decode('ascii', errors='replace')
+    result[:] = joined.split('\n')[:-1]
+    return result
+
+
+def _decode_text(raw: np.ndarray, null: Optional[str]) -> np.ndarray:
+    stripped = np.char.strip(raw)
+    values = _join_decode(stripped)
+    if null is not None:
+        values[stripped == b''] = np.nan
+        if null:
+            values[stripped == null.encode()] = np.nan
+    return values
+
+
+def _decode_number(raw: np.ndarray, kind: str, null: Optional[str]) -> np.ndarray:
+    if kind == 'I':
+        return _decode_integer(raw, null)
+    try:
+        values = raw.astype(np.float64)
+    except ValueError:
+        # Blank fields are NaN
+        blank = np.char.strip(raw) == b''
+        try:
+            values = np.where(blank, b'nan', raw).astype(np.float64)
+        except ValueError:
+            # Malformed fields (stray text in a numeric column) become NaN too
+            values = pd.to_numeric(pd.Series(np.char.decode(raw, 'ascii', errors='replace')).str.strip(),
+                                   errors='coerce').to_numpy(dtype=np.float64)
+
+    if null:
+        values[values == float(null)] = np.nan
+    return values
+
+
+def _decode_integer(raw: np.ndarray, null: Optional[str]):
+    # The dtype follows the header, not the values: a column that may hold
+    # nulls is nullable Int64 in every chunk, so chunked and whole-file reads
+    # agree (and IDs too long for float64 keep their digits)
+    try:
+        values = raw.astype(np.int64)
+        missing = np.zeros(len(values), dtype=bool)
+    except ValueError:
+        # Blank or malformed fields are missing
+        stripped = np.char.strip(raw)
+        missing = ~np.char.isdigit(np.char.lstrip(stripped, b'+-'))
+        values = np.where(missing, b'0', stripped).astype(np.int64)
+    if null:
+        missing |= values == float(null)
+    if null is None and not missing.any():
+        return values
+    return pd.arrays.IntegerArray(values, missing)
+
+
+def as_float(values) -> np.ndarray:
+    """A decoded numeric column as float64, with nulls as NaN."""
+    return pd.Series(values).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _decode_column(records: np.ndarray, column: MRTColumn, raw: bool = False) -> np.ndarray:
+    field = records[:, column.start:column.end]
+    if raw:
+        return np.char.strip(np.ascontiguousarray(field).view(f'S{column.width}').ravel())
+    dictionary = _dictionary_codes(field)
+    if dictionary is not None:
+        codes, distinct = dictionary
+        return _decode_field(distinct, column)[codes]
+    return _decode_field(field, column)
+
+
+def _decode_field(field: np.ndarray, column: MRTColumn) -> np.ndarray:
+    raw = np.ascontiguousarray(field).view(f'S{column.width}').ravel()
+    if column.kind == 'A':
+        return _decode_text(raw, column.null)
+    return _decode_number(raw, column.kind, column.null)
+
+
+def decode_records(records: np.ndarray, columns: List[MRTColumn],
+                   usecols: Optional[List[str]] = None, raw: Sequence[str] = ()) -> Dict[str, np.ndarray]:
+    """
+    Decode a byte matrix from `split_records` into typed NumPy columns.
+
+    A columns are returned as object arrays of str (NaN for nulls), I as
+    int64, or pandas nullable Int64 when the header allows nulls (or a
+    field is blank or malformed anyway), and F/E as float64 with nulls
+    and malformed fields mapped to NaN. Labels in `raw` are returned
+    undecoded, as stripped fixed-width bytes, for callers that build text
+    out of several fields.
+    """
+    wanted = set(usecols) if usecols is not None else None
+    return {
+        col.label: _decode_column(records, col, col.label in raw)
+        for col in columns
+        if wanted is None or col.label in wanted
+    }
+
+
+def read_mrt_columns(filepath: str, usecols: Optional[List[str]] = None,
+                     raw: Sequence[str] = ()) -> Dict[str, np.ndarray]:
+    """
+    Read an MRT table into typed NumPy columns keyed by header label.
+
+    Args:
+        filepath: Path to the *_mrt.txt file
+        usecols: Labels to decode (as written in the header). If None, all columns
+        raw: Labels to return as stripped bytes instead (see decode_records)
+    """
+    columns, data_offset = read_mrt_header(filepath)
+    with open(filepath, 'rb') as f:
+        f.seek(data_offset)
+        buf = f.read()
+    records = split_records(buf, record_width(columns))
+    return decode_records(records, columns, usecols, raw)
+
+
+def iter_mrt_chunks(filepath: str, usecols: Optional[List[str]] = None,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, raw: Sequence[str] = ()) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Read an MRT table as a sequence of decoded chunks of about `chunk_rows` rows.
+
+    Only one chunk of raw bytes and decoded columns is held at a time, so
+    memory stays bounded however large the table is. Always yields at
+    least one (possibly empty) chunk so callers see the column layout.
+    """
+    columns, data_offset = read_mrt_header(filepath)
+    width = record_width(columns)
+    yielded = False
+    with open(filepath, 'rb') as f:
+        f.seek(data_offset)
+        line_bytes = max(len(f.readline()), 1)
+        f.seek(data_offset)
+        tail = b''
+        while True:
+            block = f.read(chunk_rows * line_bytes)
+            if not block:
+                break
+            buf = tail + block
+            cut = buf.rfind(b'\n') + 1
+            buf, tail = buf[:cut], buf[cut:]
+            if buf:
+                yield decode_records(split_records(buf, width), columns, usecols, raw)
+                yielded = True
+        if tail.strip() or not yielded:
+            yield decode_records(split_records(tail, width), columns, usecols, raw)
+
+
+def read_mrt(filepath: str, usecols: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read an MRT table into a DataFrame using its byte-by-byte description.
+
+    Args:
+        filepath: Path to the *_mrt.txt file
+        usecols: Labels to decode (as written in the header). If None, all columns
+    """
+    decoded = read_mrt_columns(filepath, usecols)
+    order = usecols if usecols is not None else list(decoded)
+    return pd.DataFrame({label: decoded[label] for label in order if label in decoded})
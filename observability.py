@@ -0,0 +1,453 @@
+"""
+Observability and night scheduling for the spectroscopy candidates.
+
+Each night is a grid of time slots around local midnight; a slot is dark
+when the Sun is below the twilight altitude. For sources x slots, altitude,
+hour angle, airmass and Moon separation are computed as whole arrays: the
+sine of the altitude is one matrix product of source unit vectors with
+the zenith direction at every slot, and the Moon separation one with the
+Moon direction, so no per-source loop or trigonometry per element.
+
+The scheduler fills the nights greedily. At each free slot it starts the
+pending target, among those that stay observable for their whole
+exposure, with the highest priority weight divided by the number of
+nights it has left; ties go to the target whose window closes first.
+
+    python3 observability.py                                  # 3 nights from today at Palomar
+    python3 observability.py --start 2026-11-01 --nights 120 --site lick
+    python3 observability.py --candidates spectroscopy_candidates.csv --max-airmass 1.8 -o schedule.csv
+
+Sun and Moon positions use the low-precision formulae of the Astronomical
+Almanac (about 0.01 and 0.3 deg), geocentric: ample for twilight and a
+Moon-avoidance radius of tens of degrees.
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from crossmatch import _unit_vectors
+from ztf_analysis import OUTPUT_DIR as ZTF_DIR, R_PRIORITY_LABELS
+
+CANDIDATES_FILE = ZTF_DIR / 'spectroscopy_candidates.csv'
+OUTPUT_FILE = ZTF_DIR / 'observing_schedule.csv'
+
+MJD_EPOCH = np.datetime64('1858-11-17T00:00', 's')
+J2000_MJD = 51544.5
+
+
+class Site(NamedTuple):
+    name: str
+    lat: float          # deg
+    lon: float          # deg, east positive
+    elevation: float    # m
+
+
+SITES = {
+    'palomar': Site('Palomar', 33.3563, -116.8650, 1712.0),
+    'lick': Site('Lick', 37.3414, -121.6429, 1283.0),
+    'apo': Site('Apache Point', 32.7803, -105.8203, 2788.0),
+    'kpno': Site('Kitt Peak', 31.9583, -111.5967, 2096.0),
+    'maunakea': Site('Maunakea', 19.8207, -155.4681, 4205.0),
+    'lasilla': Site('La Silla', -29.2567, -70.7300, 2347.0),
+}
+DEFAULT_SITE = 'palomar'
+
+
+class Constraints(NamedTuple):
+    """When a source counts as observable."""
+    max_airmass: float = 2.0
+    min_moon_sep: float = 30.0      # deg; only applies while the Moon is up
+    twilight: float = -12.0         # Sun altitude (deg) that starts the night
+
+
+# Priority weights; TOO_FAINT (weight 0) is never scheduled. Fading sources
+# are urgent (they may drop below the spectroscopic limit), so count extra.
+PRIORITY_WEIGHTS = dict(zip(R_PRIORITY_LABELS, [3.0, 2.0, 1.0, 0.0]))
+FADING_WEIGHT = 1.5
+
+# Exposure (minutes) = EXPOSURE_MIN_AT_REF * 10^(0.4 (r - EXPOSURE_REF_MAG)),
+# clipped to [MIN_EXPOSURE, MAX_EXPOSURE], plus OVERHEAD_MIN for slew and setup
+EXPOSURE_REF_MAG = 15.5
+EXPOSURE_MIN_AT_REF = 10.0
+MIN_EXPOSURE = 5.0
+MAX_EXPOSURE = 60.0
+OVERHEAD_MIN = 3.0
+
+DEFAULT_STEP_MIN = 5.0
+# Slots run from local mean midnight -HALF_NIGHT_HOURS to +HALF_NIGHT_HOURS
+# (enough for the longest dark time below latitude ~60 deg); the Sun masks the rest
+HALF_NIGHT_HOURS = 8.0
+
+
+class NightGrid(NamedTuple):
+    """
+    Time slots of consecutive nights. Arrays are (nights, slots[, 3]);
+    `zenith` and `moon` are equatorial unit vectors, `dark` masks the slots
+    with the Sun below the twilight altitude.
+    """
+    site: Site
+    dates: np.ndarray       # local date each night starts on
+    mjd: np.ndarray
+    lst: np.ndarray         # deg
+    zenith: np.ndarray
+    moon: np.ndarray
+    dark: np.ndarray
+    step_min: float
+
+    @property
+    def n_nights(self) -> int:
+        return len(self.dates)
+
+
+class Visibility(NamedTuple):
+    """Sources x slots arrays (leading axis sources) for a set of slots."""
+    hour_angle: np.ndarray  # deg, -180..180
+    altitude: np.ndarray    # deg
+    airmass: np.ndarray     # inf below the horizon
+    moon_sep: np.ndarray    # deg
+
+
+def date_to_mjd(date) -> float:
+    """MJD at 0h UTC of a 'YYYY-MM-DD' date."""
+    return float((np.datetime64(str(date), 's') - MJD_EPOCH) / np.timedelta64(1, 'D'))
+
+
+def mjd_to_iso(mjd) -> np.ndarray:
+    """MJD -> 'YYYY-MM-DDTHH:MM' UTC strings."""
+    seconds = np.round(np.asarray(mjd, dtype=np.float64) * 86400).astype('timedelta64[s]')
+    return np.datetime_as_string(MJD_EPOCH + seconds, unit='m')
+
+
+def local_sidereal_time(mjd, lon: float) -> np.ndarray:
+    """Local mean sidereal time (deg) at longitude `lon` (deg east)."""
+    return (280.46061837 + 360.98564736629 * (np.asarray(mjd) - J2000_MJD) + lon) % 360.0
+
+
+def _ecliptic_to_equatorial(lon_deg, lat_deg, d) -> np.ndarray:
+    lon, lat = np.radians(lon_deg), np.radians(lat_deg)
+    eps = np.radians(23.439 - 4e-7 * d)
+    x, y, z = np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)
+    return np.stack([x, np.cos(eps) * y - np.sin(eps) * z, np.sin(eps) * y + np.cos(eps) * z], axis=-1)
+
+
+def sun_vector(mjd) -> np.ndarray:
+    """Geocentric equatorial unit vector of the Sun (Astronomical Almanac, ~0.01 deg)."""
+    d = np.asarray(mjd, dtype=np.float64) - J2000_MJD
+    g = np.radians(357.528 + 0.9856003 * d)
+    lam = 280.460 + 0.9856474 * d + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g)
+    return _ecliptic_to_equatorial(lam, np.zeros_like(lam), d)
+
+
+def moon_vector(mjd) -> np.ndarray:
+    """Geocentric equatorial unit vector of the Moon (Astronomical Almanac, ~0.3 deg)."""
+    d = np.asarray(mjd, dtype=np.float64) - J2000_MJD
+    t = d / 36525.0
+
+    def s(a, b):
+        return np.sin(np.radians(a + b * t))
+
+    lam = (218.32 + 481267.881 * t + 6.29 * s(135.0, 477198.87) - 1.27 * s(259.3, -413335.36)
+           + 0.66 * s(235.7, 890534.22) + 0.21 * s(269.9, 954397.74) - 0.19 * s(357.5, 35999.05)
+           - 0.11 * s(186.5, 966404.03))
+    beta = 5.13 * s(93.3, 483202.02) + 0.28 * s(228.2, 960400.89) - 0.28 * s(318.3, 6003.15) \
+        - 0.17 * s(217.6, -407332.21)
+    return _ecliptic_to_equatorial(lam, beta, d)
+
+
+def night_grid(start, nights: int, site: Site = SITES[DEFAULT_SITE], step_min: float = DEFAULT_STEP_MIN,
+               twilight: float = Constraints().twilight) -> NightGrid:
+    """
+    Slots for `nights` nights beginning on local date `start`, every
+    `step_min` minutes across local mean midnight +/- HALF_NIGHT_HOURS.
+    """
+    half = int(round(HALF_NIGHT_HOURS * 60 / step_min))
+    offsets = np.arange(-half, half + 1) * step_min / 1440.0
+    # Local mean midnight at the end of each local date, in UTC
+    midnight = date_to_mjd(start) + np.arange(nights) + 1.0 - site.lon / 360.0
+    mjd = midnight[:, None] + offsets[None, :]
+
+    lst = local_sidereal_time(mjd, site.lon)
+    lat = np.radians(site.lat)
+    zenith = np.stack([np.cos(lat) * np.cos(np.radians(lst)), np.cos(lat) * np.sin(np.radians(lst)),
+                       np.full_like(lst, np.sin(lat))], axis=-1)
+    sun = sun_vector(mjd)
+    dark = np.einsum('ijk,ijk->ij', sun, zenith) < np.sin(np.radians(twilight))
+    dates = np.datetime_as_string(np.datetime64(str(start), 'D') + np.arange(nights), unit='D')
+    return NightGrid(site, dates, mjd, lst, zenith, moon_vector(mjd), dark, step_min)
+
+
+def airmass(altitude_deg) -> np.ndarray:
+    """Kasten & Young (1989) relative airmass; inf at or below the horizon."""
+    alt = np.asarray(altitude_deg, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = 1.0 / (np.sin(np.radians(alt)) + 0.50572 * (alt + 6.07995) ** -1.6364)
+    return np.where(alt > 0, x, np.inf)
+
+
+def min_altitude(max_airmass: float) -> float:
+    """Altitude (deg) at which airmass() reaches `max_airmass`."""
+    alt = np.linspace(0.01, 90.0, 90_000)
+    return float(np.interp(-max_airmass, -airmass(alt), alt))
+
+
+def visibility(ra, dec, grid: NightGrid, nights=slice(None)) -> Visibility:
+    """
+    Hour angle, altitude, airmass and Moon separation of every source at
+    every slot of `nights` (an index or slice into the grid).
+
+    Returns:
+        Visibility of (sources, slots) arrays, or (sources, nights, slots) for a slice
+    """
+    sources = _unit_vectors(ra, dec)
+    sin_alt = np.clip(np.tensordot(sources, grid.zenith[nights], axes=([1], [-1])), -1, 1)
+    cos_sep = np.clip(np.tensordot(sources, grid.moon[nights], axes=([1], [-1])), -1, 1)
+    ra = np.asarray(ra, dtype=np.float64).reshape((-1,) + (1,) * (sin_alt.ndim - 1))
+    hour_angle = (grid.lst[nights][None] - ra + 180.0) % 360.0 - 180.0
+    altitude = np.degrees(np.arcsin(sin_alt))
+    return Visibility(hour_angle, altitude, airmass(altitude), np.degrees(np.arccos(cos_sep)))
+
+
+class _Limits(NamedTuple):
+    sin_alt: np.float32     # sine of the lowest altitude within max_airmass
+    cos_moon: np.float32    # cosine of the Moon-avoidance radius
+
+
+def _limits(constraints: Constraints) -> _Limits:
+    return _Limits(np.float32(np.sin(np.radians(min_altitude(constraints.max_airmass)))),
+                   np.float32(np.cos(np.radians(constraints.min_moon_sep))))
+
+
+def _observable(sources: np.ndarray, grid: NightGrid, night: int, slots: np.ndarray, limits: _Limits):
+    """
+    (slots, sources) bool for dark `slots` of `night`: within the airmass
+    limit and clear of the Moon. Also returns the (slots, sources) sine of
+    the altitude.
+    """
+    zenith = grid.zenith[night, slots].astype(np.float32)
+    moon = grid.moon[night, slots].astype(np.float32)
+    sin_alt = zenith @ sources.T
+    ok = sin_alt > limits.sin_alt
+    moon_up = np.einsum('ij,ij->i', moon, zenith) > 0
+    if moon_up.any():
+        ok[moon_up] &= moon[moon_up] @ sources.T < limits.cos_moon
+    return ok, sin_alt
+
+
+def _fits(ok: np.ndarray, duration: np.ndarray) -> np.ndarray:
+    """(slots, sources) bool: observable from that slot for `duration` consecutive slots."""
+    m, n = ok.shape
+    # Observable slots in a row from each slot on; a row at a time is much
+    # faster than ufunc.accumulate along axis 0
+    run = np.zeros((m + 1, n), dtype=np.int16)
+    for s in range(m - 1, -1, -1):
+        np.add(run[s + 1], 1, out=run[s])
+        run[s] *= ok[s]
+    return run[:m] >= duration[None, :]
+
+
+def exposure_slots(r_mag, step_min: float) -> np.ndarray:
+    """Slots needed per target: exposure for its r magnitude plus overhead (unknown r: MAX_EXPOSURE)."""
+    r = np.asarray(r_mag, dtype=np.float64)
+    minutes = np.clip(EXPOSURE_MIN_AT_REF * 10 ** (0.4 * (r - EXPOSURE_REF_MAG)), MIN_EXPOSURE, MAX_EXPOSURE)
+    minutes = np.where(np.isnan(minutes), MAX_EXPOSURE, minutes) + OVERHEAD_MIN
+    return np.ceil(minutes / step_min - 1e-9).astype(np.int64)
+
+
+def target_weights(candidates: pd.DataFrame) -> np.ndarray:
+    """PRIORITY_WEIGHTS by r_priority (HIGH when absent), times FADING_WEIGHT for is_fading."""
+    n = len(candidates)
+    if 'r_priority' in candidates:
+        weight = candidates['r_priority'].map(PRIORITY_WEIGHTS).fillna(0.0).to_numpy(dtype=np.float64)
+    else:
+        weight = np.full(n, PRIORITY_WEIGHTS['HIGH'])
+    if 'is_fading' in candidates:
+        weight = weight * np.where(candidates['is_fading'].fillna(False).astype(bool), FADING_WEIGHT, 1.0)
+    return weight
+
+
+class _Night(NamedTuple):
+    slots: np.ndarray       # dark slot numbers within the night
+    fits: np.ndarray        # (dark slots, sources) start-able mask, packed along sources
+    usable: np.ndarray      # (sources,) any start-able slot tonight
+
+
+def _plan_nights(sources: np.ndarray, duration: np.ndarray, grid: NightGrid,
+                 constraints: Constraints) -> List[_Night]:
+    limits = _limits(constraints)
+    duration = np.minimum(duration, np.iinfo(np.int16).max).astype(np.int16)
+    nights = []
+    for k in range(grid.n_nights):
+        slots = np.flatnonzero(grid.dark[k])
+        fits = _fits(_observable(sources, grid, k, slots, limits)[0], duration)
+        nights.append(_Night(slots, np.packbits(fits, axis=1), fits.any(axis=0)))
+    return nights
+
+
+def observability_table(candidates: pd.DataFrame, grid: NightGrid,
+                        constraints: Constraints = Constraints()) -> pd.DataFrame:
+    """
+    Per candidate over the whole grid: nights_observable, hours_observable
+    (dark time within the limits) and best_airmass.
+    """
+    sources = _unit_vectors(candidates['RAdeg'], candidates['DEdeg']).astype(np.float32)
+    n = len(candidates)
+    nights, slots = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    best = np.zeros(n, dtype=np.float32)
+    limits = _limits(constraints)
+    for k in range(grid.n_nights):
+        ok, sin_alt = _observable(sources, grid, k, np.flatnonzero(grid.dark[k]), limits)
+        count = np.add.reduce(ok, axis=0, dtype=np.int16)
+        nights += count > 0
+        slots += count
+        # Observable slots all have sin_alt > 0, so zeroing the others leaves the best one
+        np.maximum(best, np.multiply(sin_alt, ok).max(axis=0, initial=0.0), out=best)
+    best_airmass = np.where(best > 0, airmass(np.degrees(np.arcsin(np.clip(best, -1, 1)))), np.nan)
+    return pd.DataFrame({'Objname': candidates['Objname'].to_numpy() if 'Objname' in candidates else np.arange(n),
+                         'nights_observable': nights, 'hours_observable': slots * grid.step_min / 60.0,
+                         'best_airmass': best_airmass})
+
+
+def schedule(candidates: pd.DataFrame, grid: NightGrid, constraints: Constraints = Constraints(),
+             duration: Optional[np.ndarray] = None, weight: Optional[np.ndarray] = None
+             ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Pack candidates (RAdeg, DEdeg; r_mean, r_priority, is_fading when
+    present) into the nights of `grid`, each observed once.
+
+    Args:
+        candidates: Spectroscopy candidates, e.g. ztf_analysis output
+        grid: night_grid() for the site and dates
+        constraints: Airmass, Moon and twilight limits (the grid's dark mask
+            already reflects its own twilight)
+        duration: Slots per target (default exposure_slots of r_mean)
+        weight: Priority per target (default target_weights); 0 is never scheduled
+
+    Returns:
+        (schedule, unscheduled): schedule has one row per observation in
+        time order with night, start/end UTC, altitude, airmass and Moon
+        separation at mid-exposure; unscheduled holds the remaining
+        candidates with weight > 0
+    """
+    n = len(candidates)
+    if duration is None:
+        r = candidates['r_mean'] if 'r_mean' in candidates else np.full(n, np.nan)
+        duration = exposure_slots(r, grid.step_min)
+    duration = np.asarray(duration, dtype=np.int64)
+    weight = target_weights(candidates) if weight is None else np.asarray(weight, dtype=np.float64)
+
+    sources = _unit_vectors(candidates['RAdeg'], candidates['DEdeg']).astype(np.float32)
+    nights = _plan_nights(sources, duration, grid, constraints)
+    usable = np.stack([night.usable for night in nights], axis=1) if nights else np.zeros((n, 0), dtype=bool)
+    # Nights left for each target, counting tonight
+    nights_left = np.cumsum(usable[:, ::-1], axis=1)[:, ::-1]
+
+    pending = weight > 0
+    picks = []
+    for k, night in enumerate(nights):
+        open_ = pending & night.usable
+        if not open_.any():
+            continue
+        m = len(night.slots)
+        fits = np.unpackbits(night.fits, axis=1, count=n).view(bool)
+        s = 0
+        while s < m:
+            ready = np.flatnonzero(fits[s] & open_)
+            if not len(ready):
+                s += 1
+                continue
+            score = weight[ready] / nights_left[ready, k]
+            top = ready[score == score.max()]
+            if len(top) > 1:
+                # Ties go to the target whose window tonight closes first
+                top = top[np.argmin(m - np.argmax(fits[::-1, top], axis=0))]
+            best = int(np.atleast_1d(top)[0])
+            open_[best] = pending[best] = False
+            picks.append((k, best, night.slots[s], duration[best]))
+            s += int(duration[best])
+
+    columns = [c for c in ['Objname', 'RAdeg', 'DEdeg', 'YSO_CLASS', 'r_mean', 'r_priority', 'is_fading']
+               if c in candidates]
+    table = candidates.reset_index(drop=True)
+    night_k, target, start, length = np.array(picks, dtype=np.int64).reshape(-1, 4).T
+    start_mjd = grid.mjd[night_k, start]
+    end_mjd = start_mjd + length * grid.step_min / 1440.0
+    mid = np.minimum(start + length // 2, grid.mjd.shape[1] - 1)
+    # Altitude etc. at mid-exposure, evaluated for the scheduled targets only
+    zenith, moon = grid.zenith[night_k, mid], grid.moon[night_k, mid]
+    vectors = _unit_vectors(table['RAdeg'].to_numpy()[target], table['DEdeg'].to_numpy()[target])
+    altitude = np.degrees(np.arcsin(np.clip(np.einsum('ij,ij->i', vectors, zenith), -1, 1)))
+    moon_sep = np.degrees(np.arccos(np.clip(np.einsum('ij,ij->i', vectors, moon), -1, 1)))
+
+    result = table.iloc[target][columns].reset_index(drop=True)
+    result.insert(0, 'night', grid.dates[night_k])
+    result['start_utc'] = mjd_to_iso(start_mjd)
+    result['end_utc'] = mjd_to_iso(end_mjd)
+    result['altitude'] = altitude.round(1)
+    result['airmass'] = airmass(altitude).round(3)
+    result['moon_sep'] = moon_sep.round(1)
+    return result, table.loc[pending, columns].reset_index(drop=True)
+
+
+def print_summary(result: pd.DataFrame, unscheduled: pd.DataFrame, grid: NightGrid,
+                  candidates: pd.DataFrame) -> None:
+    dark_hours = grid.dark.sum(axis=1) * grid.step_min / 60.0
+    per_night = result.groupby('night').size() if len(result) else pd.Series(dtype=int)
+    print(f"\n{'Night':<12} {'Dark (h)':>8} {'Targets':>8}")
+    for date, hours in zip(grid.dates, dark_hours):
+        print(f"{date:<12} {hours:8.1f} {int(per_night.get(date, 0)):8d}")
+
+    if 'r_priority' in candidates:
+        print("\nPriority coverage:")
+        scheduled = result['r_priority'].value_counts() if len(result) else pd.Series(dtype=int)
+        totals = candidates['r_priority'].value_counts()
+        for label in R_PRIORITY_LABELS:
+            if PRIORITY_WEIGHTS[label] > 0 and totals.get(label, 0):
+                done = int(scheduled.get(label, 0))
+                mark = '✓' if done == totals[label] else '•'
+                last = result.loc[result['r_priority'] == label, 'night'].max() if done else '-'
+                print(f"  {mark} {label}: {done}/{int(totals[label])} scheduled (last on {last})")
+    print(f"\nScheduled {len(result)} targets; {len(unscheduled)} not scheduled")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--candidates', type=Path, default=CANDIDATES_FILE)
+    parser.add_argument('-o', '--output', type=Path, default=OUTPUT_FILE)
+    parser.add_argument('--site', choices=sorted(SITES), default=DEFAULT_SITE)
+    parser.add_argument('--start', default=str(np.datetime64('today', 'D')), help='first night (local date)')
+    parser.add_argument('--nights', type=int, default=3)
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP_MIN, help='slot length (minutes)')
+    parser.add_argument('--max-airmass', type=float, default=Constraints().max_airmass)
+    parser.add_argument('--min-moon-sep', type=float, default=Constraints().min_moon_sep)
+    parser.add_argument('--twilight', type=float, default=Constraints().twilight,
+                        help='Sun altitude (deg) that starts and ends the night')
+    args = parser.parse_args(argv)
+
+    candidates = pd.read_csv(args.candidates)
+    constraints = Constraints(args.max_airmass, args.min_moon_sep, args.twilight)
+    site = SITES[args.site]
+
+    print("=" * 80)
+    print(f"OBSERVING SCHEDULE: {site.name}, {args.nights} nights from {args.start}")
+    print("=" * 80)
+    print(f"Candidates: {len(candidates)} (from {args.candidates.name}); airmass < {constraints.max_airmass}, "
+          f"Moon > {constraints.min_moon_sep}°, Sun < {constraints.twilight}°")
+
+    start = time.perf_counter()
+    grid = night_grid(args.start, args.nights, site, args.step, constraints.twilight)
+    result, unscheduled = schedule(candidates, grid, constraints)
+    elapsed = time.perf_counter() - start
+    print_summary(result, unscheduled, grid, candidates)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    result.to_csv(args.output, index=False)
+    print(f"✓ Saved {args.output} ({elapsed:.2f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
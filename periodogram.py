@@ -0,0 +1,232 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from ztf_analysis import BANDS, LightCurves
+
+DEFAULT_MIN_PERIOD = 1.0      # days
+DEFAULT_OVERSAMPLING = 5
+DEFAULT_BOOTSTRAPS = 1000
+MIN_EPOCHS = 5
+
+# Upper bound on the (rows, frequencies) float64 blocks held at once
+_BLOCK_ELEMENTS = 4_000_000
+
+
+def frequency_grid(baseline_days: float, min_period: float = DEFAULT_MIN_PERIOD,
+                   max_period: Optional[float] = None, oversampling: int = DEFAULT_OVERSAMPLING) -> np.ndarray:
+    """
+    Shared frequency grid (1/day): from 1/max_period (default 1/baseline) to
+    1/min_period, stepped by 1/(oversampling * baseline).
+    """
+    f_min = 1.0 / (max_period if max_period else baseline_days)
+    step = 1.0 / (oversampling * baseline_days)
+    return np.arange(f_min, 1.0 / min_period + step / 2, step)
+
+
+def _power(w, wy, wyy, wc, ws, wc2, ws2, wyc, wys) -> np.ndarray:
+    """
+    Generalized (floating-mean, weighted) Lomb-Scargle power from raw
+    weighted sums; cos^2, sin^2 and cos*sin come from the 2x-angle terms.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y, c, s = wy / w, wc / w, ws / w
+        yy = wyy / w - y * y
+        cc = (w + wc2) / (2 * w) - c * c
+        ss = (w - wc2) / (2 * w) - s * s
+        cs = ws2 / (2 * w) - c * s
+        yc = wyc / w - y * c
+        ys = wys / w - y * s
+        d = cc * ss - cs * cs
+        return (ss * yc * yc + cc * ys * ys - 2 * cs * yc * ys) / (yy * d)
+
+
+def _trig(t: np.ndarray, freqs: np.ndarray):
+    angle = 2 * np.pi * np.outer(t, freqs)
+    return np.cos(angle), np.sin(angle), np.cos(2 * angle), np.sin(2 * angle)
+
+
+def lomb_scargle(curves: LightCurves, freqs: np.ndarray) -> np.ndarray:
+    """
+    Power spectra of every source on the shared grid, computed for blocks of
+    whole sources at once with np.add.reduceat segment sums.
+
+    Returns:
+        (n_sources, n_freqs) power; sources with fewer than MIN_EPOCHS get NaN
+    """
+    sizes = np.diff(curves.offsets)
+    power = np.full((curves.n_sources, len(freqs)), np.nan)
+    usable = np.flatnonzero(sizes >= MIN_EPOCHS)
+    if usable.size == 0:
+        return power
+    curves = curves.select(np.repeat(sizes >= MIN_EPOCHS, sizes))
+    sizes = sizes[usable]
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    # Times from each source's first epoch: small angles, and independent of batching
+    t_all = curves.mjd - np.repeat(curves.mjd[offsets[:-1]], sizes)
+
+    # Blocks of whole sources holding about _BLOCK_ELEMENTS trig values each
+    rows_per_block = max(_BLOCK_ELEMENTS // max(len(freqs), 1), 1)
+    bounds = [0]
+    while bounds[-1] < len(sizes):
+        stop = int(np.searchsorted(offsets, offsets[bounds[-1]] + rows_per_block, side='right')) - 1
+        bounds.append(min(max(stop, bounds[-1] + 1), len(sizes)))
+
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        lo, hi = offsets[start], offsets[stop]
+        t, y = t_all[lo:hi], curves.mag[lo:hi]
+        w = 1.0 / curves.err[lo:hi] ** 2
+        cos, sin, cos2, sin2 = _trig(t, freqs)
+        heads = offsets[start:stop] - lo
+
+        def seg(values):
+            return np.add.reduceat(values, heads, axis=0)
+
+        wcol, wy = w[:, None], (w * y)[:, None]
+        power[usable[start:stop]] = _power(
+            seg(wcol), seg(wy), seg(wy * y[:, None]),
+            seg(wcol * cos), seg(wcol * sin), seg(wcol * cos2), seg(wcol * sin2),
+            seg(wy * cos), seg(wy * sin))
+    return power
+
+
+def bootstrap_fap(t: np.ndarray, y: np.ndarray, err: np.ndarray, freqs: np.ndarray, peak_power: float,
+                  n_bootstrap: int = DEFAULT_BOOTSTRAPS, rng: np.random.Generator = None) -> float:
+    """
+    False-alarm probability of a peak, as in Paper B's FLP_LSP_BOOT: the
+    fraction of bootstrap light curves (magnitude/error pairs redrawn with
+    replacement onto the same epochs) whose highest peak reaches `peak_power`.
+
+    All resamples of a block are evaluated together: the weighted sums become
+    (resamples, epochs) @ (epochs, freqs) matrix products against trig tables
+    computed once for the source's epochs.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    n = len(t)
+    cos, sin, cos2, sin2 = _trig(t - t[0], freqs)
+    w_all = 1.0 / err ** 2
+    block = max(1, _BLOCK_ELEMENTS // max(len(freqs), n, 1))
+
+    exceed = 0
+    for start in range(0, n_bootstrap, block):
+        size = min(block, n_bootstrap - start)
+        picks = rng.integers(0, n, size=(size, n))
+        w, yb = w_all[picks], y[picks]
+        wy = w * yb
+        power = _power(w.sum(axis=1, keepdims=True), wy.sum(axis=1, keepdims=True),
+                       (wy * yb).sum(axis=1, keepdims=True),
+                       w @ cos, w @ sin, w @ cos2, w @ sin2, wy @ cos, wy @ sin)
+        exceed += int((np.nanmax(power, axis=1) >= peak_power).sum())
+    return exceed / n_bootstrap
+
+
+def _periodogram_task(curves: LightCurves, freqs: np.ndarray, n_bootstrap: int, seed: int,
+                      first_source: int) -> pd.DataFrame:
+    """Peak period, power and bootstrap FAP for a slice of sources (one pool task)."""
+    power = lomb_scargle(curves, freqs)
+    sizes = np.diff(curves.offsets)
+    valid = ~np.isnan(power).all(axis=1)
+    peak = np.zeros(curves.n_sources, dtype=np.int64)
+    peak[valid] = np.nanargmax(power[valid], axis=1)
+    peak_power = np.where(valid, power[np.arange(curves.n_sources), peak], np.nan)
+
+    fap = np.full(curves.n_sources, np.nan)
+    if n_bootstrap:
+        for k in np.flatnonzero(valid):
+            lo, hi = curves.offsets[k], curves.offsets[k + 1]
+            # Seeded per source, so results don't depend on how sources are split
+            rng = np.random.default_rng([seed, first_source + k])
+            fap[k] = bootstrap_fap(curves.mjd[lo:hi], curves.mag[lo:hi], curves.err[lo:hi], freqs,
+                                   peak_power[k], n_bootstrap, rng)
+
+    return pd.DataFrame({
+        'Objname': curves.names,
+        'LS_Period': np.where(valid, 1.0 / freqs[peak], np.nan),
+        'LS_Power': peak_power,
+        'LS_FAP_BOOT': fap,
+        'LS_Epochs': sizes,
+    })
+
+
+def periodogram_table(curves: LightCurves, freqs: np.ndarray = None, band: str = 'r',
+                      n_bootstrap: int = DEFAULT_BOOTSTRAPS, seed: int = 0,
+                      processes: Optional[int] = None, sources_per_task: int = 32) -> pd.DataFrame:
+    """
+    Lomb-Scargle peak period, power and bootstrap false-alarm probability
+    for every source, fanned out over a process pool.
+
+    Args:
+        curves: Light curves (see ztf_analysis.LightCurves)
+        freqs: Shared frequency grid (1/day). Default: frequency_grid over the
+               longest baseline
+        band: Band to analyse ('g', 'r', 'i'), or None for all rows together
+        n_bootstrap: Bootstrap resamples per source (0 skips the FAP)
+        seed: Seed for the bootstrap; results are identical for any process count
+        processes: Worker processes. None uses every CPU, 1 runs inline
+        sources_per_task: Sources handed to a worker at a time
+
+    Returns:
+        One row per source: Objname, LS_Period (days), LS_Power, LS_FAP_BOOT
+        and LS_Epochs. Join onto a catalog with join_periods.
+    """
+    if band is not None:
+        curves = curves.select(curves.band == BANDS.index(band))
+    if freqs is None:
+        sizes = np.diff(curves.offsets)
+        source = curves.source_index()
+        first = np.full(curves.n_sources, np.inf)
+        last = np.full(curves.n_sources, -np.inf)
+        np.minimum.at(first, source, curves.mjd)
+        np.maximum.at(last, source, curves.mjd)
+        spans = (last - first)[sizes > 0]
+        freqs = frequency_grid(float(spans.max()) if spans.size else 1.0)
+
+    starts = range(0, curves.n_sources, sources_per_task)
+    tasks = [(curves.sources(s, min(s + sources_per_task, curves.n_sources)), freqs, n_bootstrap, seed, s)
+             for s in starts]
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if processes <= 1 or len(tasks) <= 1:
+        parts = [_periodogram_task(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_periodogram_task, *zip(*tasks)))
+    if not parts:
+        return _periodogram_task(curves, freqs, 0, seed, 0)
+    return pd.concat(parts, ignore_index=True)
+
+
+def join_periods(df: pd.DataFrame, periods: pd.DataFrame) -> pd.DataFrame:
+    """Left-join periodogram columns onto a catalog (e.g. parse_mrt_file output) by Objname."""
+    return df.merge(periods, on='Objname', how='left')
+
+
+def phase_fold(curves: LightCurves, periods, t0=None) -> pd.DataFrame:
+    """
+    Phase-folded photometry: one row per epoch with Objname, mjd, phase in
+    [0, 1), mag, err and band. `periods` (days) is aligned with the sources;
+    `t0` (per source or scalar) defaults to each source's first epoch.
+    """
+    source = curves.source_index()
+    periods = np.broadcast_to(np.asarray(periods, dtype=np.float64), (curves.n_sources,))
+    if t0 is None:
+        nonempty = np.diff(curves.offsets) > 0
+        t0 = np.full(curves.n_sources, np.nan)
+        if nonempty.any():
+            t0[nonempty] = np.minimum.reduceat(curves.mjd, curves.offsets[:-1][nonempty])
+    t0 = np.broadcast_to(np.asarray(t0, dtype=np.float64), (curves.n_sources,))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        phase = np.mod((curves.mjd - t0[source]) / periods[source], 1.0)
+    return pd.DataFrame({
+        'Objname': curves.names[source],
+        'mjd': curves.mjd,
+        'phase': phase,
+        'mag': curves.mag,
+        'err': curves.err,
+        'band': np.array(BANDS, dtype=object)[curves.band],
+    })
@@ -1,143 +1,149 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from catalog_cache import cached_catalog
+from catalog_stream import col, select, stream_to_csv, write_csv
+from crossmatch import build_master_table
+from instrumentation import instrumented
+from mrt_reader import DEFAULT_CHUNK_ROWS, as_float, decode_strings, iter_mrt_chunks, read_mrt_columns
+from yso_utils import iter_mrt_file, parse_mrt_file
+
+PAPER_A_COLUMNS = ['SPICY', 'Class', 'VarClass1', 'RAh', 'RAm', 'RAs', 'DE-', 'DEd', 'DEm', 'DEs']
+PAPER_C_COLUMNS = ['OBSID', 'f_OBSID', 'Design', 'RAdeg', 'DEdeg']
+# Read as stripped bytes rather than decoded values (see mrt_reader.decode_records)
+PAPER_A_RAW_FIELDS = ['SPICY']
+PAPER_C_RAW_FIELDS = ['OBSID', 'f_OBSID']
+
+# Row filters for each output CSV, shared by the in-memory and streaming modes
+def output_filters(dec_min=-30):
+    northern_sky = col('DEdeg') > dec_min
+    return {
+        'PaperA_LinearPlus': northern_sky & (col('LCType') == 'Linear(+)'),
+        'PaperA_LinearMinus': northern_sky & (col('LCType') == 'Linear(-)'),
+        'PaperB_Linear': northern_sky & (col('LCType') == 'Linear'),
+        'PaperC_AllSources': None,
+    }
+
+NORTHERN_SKY = col('DEdeg') > -30
+OUTPUT_FILTERS = output_filters()
+
+# Sources closer than this on the sky are treated as the same object
+MATCH_RADIUS_ARCSEC = 1.0
+
+def _paper_a_frame(cols):
+    ra_deg = as_float(cols['RAh']) * 15 + as_float(cols['RAm']) * 15/60 + cols['RAs'] * 15/3600
+    de_sign = np.where(cols['DE-'] == '-', -1, 1)
+    de_deg = de_sign * (as_float(cols['DEd']) + as_float(cols['DEm'])/60 + cols['DEs']/3600)
+    
+    # Classify each distinct VarClass1 once rather than every row
+    codes, lc_classes = pd.factorize(cols['VarClass1'])
+    lc_types = np.array([
+        'Linear(+)' if 'linear(+)' in lc_class.lower() else 'Linear(-)' if 'linear(-)' in lc_class.lower() else 'Unknown'
+        for lc_class in lc_classes
+    ], dtype=object)
+    
+    # SPICY arrives as its printed digits (PAPER_A_RAW_FIELDS), so the name is built on the bytes
+    spicy = cols['SPICY']
+    return pd.DataFrame({
+        'SPICY_ID': spicy.astype(np.int64),
+        'Objname': decode_strings(np.char.add(b'SPICY_', spicy)),
+        'RAdeg': ra_deg,
+        'DEdeg': de_deg,
+        'YSO_CLASS': cols['Class'],
+        'LCType': lc_types[codes],
+        'VarClass1': cols['VarClass1']
+    })
+
+def _paper_c_frame(cols):
+    return pd.DataFrame({
+        # OBSID keeps its [*?] flag, as printed in the table
+        'OBSID': decode_strings(np.char.add(cols['OBSID'], cols['f_OBSID'])),
+        'Objname': cols['Design'],
+        'RAdeg': cols['RAdeg'],
+        'DEdeg': cols['DEdeg']
+    })
+
+@instrumented
+@cached_catalog
 def parse_paper_a(filepath):
     """Parse Paper A (apjadd25ft1_mrt.txt) - SPICY linear YSOs"""
-    data = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
-    for line in lines[39:]:
-        if not line.strip() or line.startswith('---'):
-            continue
-        try:
-            parts = line.split()
-            if len(parts) < 26:
-                continue
-            
-            spicy_id = int(parts[0])
-            yso_class = parts[1]
-            
-            lc_class = parts[18]
-            
-            rah = int(parts[20])
-            ram = int(parts[21])
-            ras = float(parts[22])
-            ra_deg = rah * 15 + ram * 15/60 + ras * 15/3600
-            
-            de_str = parts[23]
-            de_sign = -1 if de_str.startswith('-') else 1
-            ded = int(de_str.lstrip('-'))
-            dem = int(parts[24])
-            des = float(parts[25])
-            de_deg = de_sign * (ded + dem/60 + des/3600)
-            
-            lc_type = 'Linear(+)' if 'linear(+)' in lc_class.lower() else 'Linear(-)' if 'linear(-)' in lc_class.lower() else 'Unknown'
-            
-            data.append({
-                'SPICY_ID': spicy_id,
-                'Objname': f'SPICY_{spicy_id}',
-                'RAdeg': ra_deg,
-                'DEdeg': de_deg,
-                'YSO_CLASS': yso_class,
-                'LCType': lc_type,
-                'VarClass1': lc_class
-            })
-        except (ValueError, IndexError) as e:
-            print(f"Error parsing line: {e}")
-            continue
-    
-    return pd.DataFrame(data)
+    return _paper_a_frame(read_mrt_columns(filepath, PAPER_A_COLUMNS, PAPER_A_RAW_FIELDS))
 
 def parse_paper_b(filepath):
     """Parse Paper B (apjsadc397t2_mrt.txt)"""
-    data = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
-    for line in lines:
-        if line.startswith('J') or line.startswith('L'):
-            parts = line.split()
-            if len(parts) >= 16:
-                try:
-                    data.append({
-                        'Objname': parts[0],
-                        'RAdeg': float(parts[1]),
-                        'DEdeg': float(parts[2]),
-                        'SED_SLOPE': float(parts[3]) if parts[3] != '?' else np.nan,
-                        'YSO_CLASS': parts[4],
-                        'Number': int(parts[5]),
-                        'W2magMean': float(parts[6]),
-                        'W2magMed': float(parts[7]),
-                        'sig_W2Flux': float(parts[8]),
-                        'err_W2Flux': float(parts[9]),
-                        'delW2mag': float(parts[10]),
-                        'Period': float(parts[11]),
-                        'FLP_LSP_BOOT': float(parts[12]),
-                        'slope': float(parts[13]),
-                        'e_slope': float(parts[14]),
-                        'r_value': float(parts[15]),
-                        'LCType': parts[-1] if len(parts) > 21 else 'Unknown'
-                    })
-                except (ValueError, IndexError):
-                    continue
-    
-    return pd.DataFrame(data)
+    return parse_mrt_file(filepath)
 
+@instrumented
+@cached_catalog
 def parse_paper_c(filepath):
     """Parse Paper C (apjsadf4e6t4_mrt.txt) - LAMOST YSO candidates"""
-    data = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
-    for line in lines[30:]:
-        if not line.strip() or line.startswith('---'):
-            continue
-        try:
-            parts = line.split()
-            if len(parts) < 5:
-                continue
-            
-            obsid = parts[0]
-            design = parts[1]
-            ra_deg = float(parts[2])
-            de_deg = float(parts[3])
-            
-            data.append({
-                'OBSID': obsid,
-                'Objname': design,
-                'RAdeg': ra_deg,
-                'DEdeg': de_deg
-            })
-        except (ValueError, IndexError):
-            continue
-    
-    return pd.DataFrame(data)
-
-def main():
-    output_dir = Path('/Users/marcus/Desktop/YSO/culled_csvs')
+    return _paper_c_frame(read_mrt_columns(filepath, PAPER_C_COLUMNS, PAPER_C_RAW_FIELDS))
+
+def iter_paper_a(filepath, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Paper A in chunks of about `chunk_rows` rows"""
+    for cols in iter_mrt_chunks(filepath, PAPER_A_COLUMNS, chunk_rows, PAPER_A_RAW_FIELDS):
+        yield _paper_a_frame(cols)
+
+def iter_paper_b(filepath, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Paper B in chunks of about `chunk_rows` rows"""
+    return iter_mrt_file(filepath, chunk_rows=chunk_rows)
+
+def iter_paper_c(filepath, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Paper C in chunks of about `chunk_rows` rows"""
+    for cols in iter_mrt_chunks(filepath, PAPER_C_COLUMNS, chunk_rows, PAPER_C_RAW_FIELDS):
+        yield _paper_c_frame(cols)
+
+# Same default as pipeline.py: the scripts' directory unless YSO_DATA_DIR is set
+DATA_DIR = Path(os.environ.get('YSO_DATA_DIR', Path(__file__).resolve().parent))
+OUTPUT_DIR = DATA_DIR / 'culled_csvs'
+FILE_MAPPING = {
+    'A': str(DATA_DIR / 'apjadd25ft1_mrt.txt'),
+    'B': str(DATA_DIR / 'apjsadc397t2_mrt.txt'),
+    'C': str(DATA_DIR / 'apjsadf4e6t4_mrt.txt')
+}
+
+@instrumented
+def crossmatch_outputs(outputs, output_dir, radius_arcsec=MATCH_RADIUS_ARCSEC):
+    """
+    Collapse the filtered A/B/C tables into one row per unique sky source
+    and save it as ZTF_Master_Crossmatched.csv.
+    """
+    catalogs = {
+        'A': pd.concat([outputs['PaperA_LinearPlus'], outputs['PaperA_LinearMinus']], ignore_index=True),
+        'B': outputs['PaperB_Linear'],
+        'C': outputs['PaperC_AllSources'],
+    }
+    master = build_master_table(catalogs, radius_arcsec)
+    master.to_csv(str(output_dir / 'ZTF_Master_Crossmatched.csv'), index=False)
+    
+    n_rows = sum(len(df) for df in catalogs.values())
+    print(f"\nCross-match ({radius_arcsec}\" radius): {n_rows} catalog rows -> {len(master)} unique sources")
+    print(f"  In A: {master['in_A'].sum()}, B: {master['in_B'].sum()}, C: {master['in_C'].sum()}")
+    print(f"  In more than one paper: {(master[['in_A', 'in_B', 'in_C']].sum(axis=1) > 1).sum()}")
+    print(f"  Collapsed duplicate rows: {n_rows - len(master)}")
+    print(f"  ✓ Saved: ZTF_Master_Crossmatched.csv ({len(master)} sources)")
+    return master
+
+def main(file_mapping=FILE_MAPPING, output_dir=OUTPUT_DIR):
+    output_dir = Path(output_dir)
     output_dir.mkdir(exist_ok=True)
     
     print("=" * 80)
     print("PHASE 2: FILTERING AND CSV GENERATION")
     print("=" * 80)
     
-    file_mapping = {
-        'A': '/Users/marcus/Desktop/YSO/apjadd25ft1_mrt.txt',
-        'B': '/Users/marcus/Desktop/YSO/apjsadc397t2_mrt.txt',
-        'C': '/Users/marcus/Desktop/YSO/apjsadf4e6t4_mrt.txt'
-    }
-    
     print("\n[PAPER A] Loading apjadd25ft1_mrt.txt...")
     df_a = parse_paper_a(file_mapping['A'])
     print(f"  Raw records: {len(df_a)}")
     
-    df_a_filtered = df_a[df_a['DEdeg'] > -30].copy()
+    df_a_filtered = select(df_a, NORTHERN_SKY)
     print(f"  After DEdeg > -30°: {len(df_a_filtered)}")
     
-    df_a_linear_plus = df_a_filtered[df_a_filtered['LCType'] == 'Linear(+)'].copy()
-    df_a_linear_minus = df_a_filtered[df_a_filtered['LCType'] == 'Linear(-)'].copy()
+    df_a_linear_plus = select(df_a, OUTPUT_FILTERS['PaperA_LinearPlus'])
+    df_a_linear_minus = select(df_a, OUTPUT_FILTERS['PaperA_LinearMinus'])
     
     print(f"  Linear(+) sources: {len(df_a_linear_plus)}")
     print(f"  Linear(-) sources: {len(df_a_linear_minus)}")
@@ -145,8 +151,8 @@ def main():
     output_a_plus = str(output_dir / 'PaperA_LinearPlus.csv')
     output_a_minus = str(output_dir / 'PaperA_LinearMinus.csv')
     
-    df_a_linear_plus.to_csv(output_a_plus, index=False)
-    df_a_linear_minus.to_csv(output_a_minus, index=False)
+    write_csv(df_a_linear_plus, output_a_plus)
+    write_csv(df_a_linear_minus, output_a_minus)
     
     print(f"  ✓ Saved: PaperA_LinearPlus.csv ({len(df_a_linear_plus)} sources)")
     print(f"  ✓ Saved: PaperA_LinearMinus.csv ({len(df_a_linear_minus)} sources)")
@@ -155,14 +161,14 @@ def main():
     df_b = parse_paper_b(file_mapping['B'])
     print(f"  Raw records: {len(df_b)}")
     
-    df_b_filtered = df_b[df_b['DEdeg'] > -30].copy()
+    df_b_filtered = select(df_b, NORTHERN_SKY)
     print(f"  After DEdeg > -30°: {len(df_b_filtered)}")
     
-    df_b_linear = df_b_filtered[df_b_filtered['LCType'] == 'Linear'].copy()
+    df_b_linear = select(df_b, OUTPUT_FILTERS['PaperB_Linear'])
     print(f"  Linear sources: {len(df_b_linear)}")
     
     output_b_linear = str(output_dir / 'PaperB_Linear.csv')
-    df_b_linear.to_csv(output_b_linear, index=False)
+    write_csv(df_b_linear, output_b_linear)
     print(f"  ✓ Saved: PaperB_Linear.csv ({len(df_b_linear)} sources)")
     
     print("\n[PAPER C] Loading apjsadf4e6t4_mrt.txt...")
@@ -170,7 +176,7 @@ def main():
     print(f"  Raw records: {len(df_c)}")
     
     output_c_all = str(output_dir / 'PaperC_AllSources.csv')
-    df_c.to_csv(output_c_all, index=False)
+    write_csv(df_c, output_c_all)
     print(f"  ✓ Saved: PaperC_AllSources.csv ({len(df_c)} sources)")
     
     print("\n" + "=" * 80)
@@ -182,14 +188,66 @@ def main():
     print(f"  • PaperA_LinearMinus.csv: {len(df_a_linear_minus)} sources")
     print(f"  • PaperB_Linear.csv: {len(df_b_linear)} sources")
     print(f"  • PaperC_AllSources.csv: {len(df_c)} sources")
-    print(f"\nTotal sources for ZTF analysis: {len(df_a_linear_plus) + len(df_a_linear_minus) + len(df_b_linear) + len(df_c)}")
     
-    return {
+    outputs = {
         'PaperA_LinearPlus': df_a_linear_plus,
         'PaperA_LinearMinus': df_a_linear_minus,
         'PaperB_Linear': df_b_linear,
         'PaperC_AllSources': df_c
     }
+    master = crossmatch_outputs(outputs, output_dir)
+    print(f"\nTotal sources for ZTF analysis: {len(master)}")
+    
+    outputs['Master_Crossmatched'] = master
+    return outputs
+
+def main_streaming(chunk_rows=DEFAULT_CHUNK_ROWS, file_mapping=FILE_MAPPING, output_dir=OUTPUT_DIR):
+    """
+    Same outputs as main(), but each paper is read in chunks of `chunk_rows`
+    rows and OUTPUT_FILTERS are applied per chunk, writing surviving rows
+    straight to the CSVs. Peak memory is bounded by the chunk size.
+    Returns the number of rows written per output.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(exist_ok=True)
+    
+    print("=" * 80)
+    print(f"PHASE 2: FILTERING AND CSV GENERATION (streaming, {chunk_rows:,} rows/chunk)")
+    print("=" * 80)
+    
+    papers = [
+        ('A', iter_paper_a, ['PaperA_LinearPlus', 'PaperA_LinearMinus']),
+        ('B', iter_paper_b, ['PaperB_Linear']),
+        ('C', iter_paper_c, ['PaperC_AllSources']),
+    ]
+    
+    counts = {}
+    for paper, iter_paper, names in papers:
+        filepath = file_mapping[paper]
+        print(f"\n[PAPER {paper}] Streaming {Path(filepath).name}...")
+        outputs = {str(output_dir / f'{name}.csv'): OUTPUT_FILTERS[name] for name in names}
+        written = stream_to_csv(iter_paper(filepath, chunk_rows=chunk_rows), outputs)
+        for name, path in zip(names, outputs):
+            counts[name] = written[path]
+            print(f"  ✓ Saved: {name}.csv ({written[path]} sources)")
+    
+    print("\n" + "=" * 80)
+    print("SUMMARY")
+    print("=" * 80)
+    print(f"Output directory: {output_dir}")
+    
+    # The filtered tables are small, so cross-match them from the CSVs just written.
+    # round_trip parsing keeps coordinates bit-identical to the in-memory path.
+    outputs = {name: pd.read_csv(output_dir / f'{name}.csv', float_precision='round_trip')
+               for name in counts}
+    master = crossmatch_outputs(outputs, output_dir)
+    print(f"\nTotal sources for ZTF analysis: {len(master)}")
+    
+    counts['Master_Crossmatched'] = len(master)
+    return counts
 
 if __name__ == '__main__':
-    dfs = main()
+    if '--stream' in sys.argv:
+        counts = main_streaming()
+    else:
+        dfs = main()
@@ -0,0 +1,460 @@
+import asyncio
+import hashlib
+import io
+import os
+import random
+import ssl
+import sys
+import time
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote, urlsplit
+
+from ztf_analysis import BANDS, LightCurves
+
+# IRSA ZTF light-curve cone search (POS=CIRCLE ra dec radius_deg)
+IRSA_LIGHT_CURVE_URL = 'https://irsa.ipac.caltech.edu/cgi-bin/ZTF/nph_light_curve_search'
+# Response cache; override with $YSO_PHOTOMETRY_CACHE_DIR
+PHOTOMETRY_CACHE_DIR = Path(os.environ.get('YSO_PHOTOMETRY_CACHE_DIR',
+                                           Path(__file__).resolve().parent / '.photometry_cache'))
+
+DEFAULT_RADIUS_ARCSEC = 1.5
+DEFAULT_CONCURRENCY = 32
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 0.5        # seconds before the first retry; doubles each time
+DEFAULT_TIMEOUT = 60.0       # seconds per request
+
+# Worth retrying: throttled or transient server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# ZTF filtercode -> BANDS code
+FILTER_CODES = {'zg': BANDS.index('g'), 'zr': BANDS.index('r'), 'zi': BANDS.index('i')}
+
+
+class HTTPError(Exception):
+    """A non-200 response."""
+
+    def __init__(self, status: int, url: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw cone-search responses, one file per query, keyed by
+    (RA, Dec, radius, bands). Positions are rounded to 1e-7 deg so the same
+    source read from different CSVs hits the same entry.
+
+    Args:
+        path: Cache directory (created if missing)
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(ra: float, dec: float, radius_arcsec: float, bands: Sequence[str]) -> str:
+        text = f'{ra:.7f},{dec:.7f},{radius_arcsec:.4f},{",".join(sorted(bands))}'
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / f'{key}.csv'
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._file(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, body: bytes) -> None:
+        file = self._file(key)
+        file.parent.mkdir(exist_ok=True)
+        tmp = file.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_bytes(body)
+        os.replace(tmp, file)
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` requests per second, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = None
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self._last is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._last = loop.time()
+                self._tokens = 1.0
+            self._tokens -= 1
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP/1.1 connections to one host, reused across requests.
+    Built on asyncio streams so no third-party HTTP library is needed;
+    https URLs go through the default SSL context.
+
+    Args:
+        url: Any URL on the host (scheme, host and port are used)
+        timeout: Seconds allowed for one request, connection included
+    """
+
+    def __init__(self, url: str, timeout: float = DEFAULT_TIMEOUT):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.timeout = timeout
+        self.opened = 0
+        self._idle = deque()
+
+    async def _connect(self):
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def get(self, target: str) -> Tuple[int, Dict[str, str], bytes]:
+        """GET `target` (path and query). Returns (status, headers, body)."""
+        return await asyncio.wait_for(self._get(target), self.timeout)
+
+    async def _get(self, target: str):
+        request = (f'GET {target} HTTP/1.1\r\nHost: {self.host}\r\nConnection: keep-alive\r\n'
+                   f'Accept-Encoding: identity\r\nUser-Agent: YSO_Star_Plotting_Tool\r\n\r\n').encode('latin-1')
+        while True:
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await self._connect()
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, body, keep_alive = await _read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    continue       # the server dropped an idle connection; open a fresh one
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, headers, body
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed before the response")
+    version, status = status_line.decode('latin-1').split(None, 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n'):
+            break
+        if not line:
+            raise asyncio.IncompleteReadError(b'', None)
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Trailers end with an empty line
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return int(status), headers, body, keep_alive
+
+
+class PhotometryClient:
+    """
+    Concurrent cone-search client for a light-curve service (IRSA ZTF by
+    default, or mock_photometry_server for offline runs).
+
+    Up to `concurrency` requests are in flight at once over pooled keep-alive
+    connections. Connection errors, timeouts and 429/5xx responses are
+    retried with exponential backoff and jitter (honouring Retry-After).
+    Successful responses are stored in the cache and never fetched again.
+
+    Args:
+        url: Light-curve search endpoint
+        cache_dir: Response cache directory (None disables caching)
+        concurrency: Maximum simultaneous requests (and open connections)
+        rate_limit: Maximum requests per second (None for no limit)
+        retries: Retries per query after the first attempt
+        backoff: Delay before the first retry, in seconds; doubles each retry
+        timeout: Seconds allowed for one request
+
+    Use as `async with PhotometryClient(...) as client:`.
+    """
+
+    def __init__(self, url: str = IRSA_LIGHT_CURVE_URL, cache_dir: Optional[Union[str, Path]] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, rate_limit: Optional[float] = None,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.url = url
+        parts = urlsplit(url)
+        self.origin = f'{parts.scheme}://{parts.netloc}'
+        self.path = parts.path or '/'
+        self.cache = ResponseCache(cache_dir) if cache_dir is not None else None
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'cache_hits': 0, 'retries': 0, 'failures': 0}
+        self._pool = None
+        self._semaphore = None
+        self._limiter = None
+
+    async def __aenter__(self) -> 'PhotometryClient':
+        self._pool = ConnectionPool(self.url, self.timeout)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._limiter = RateLimiter(self.rate_limit, burst=self.concurrency) if self.rate_limit else None
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._pool.close()
+
+    def target(self, ra: float, dec: float, radius_arcsec: float, bands: Sequence[str]) -> str:
+        """Request path and query for one cone search."""
+        pos = quote(f'CIRCLE {ra:.7f} {dec:.7f} {radius_arcsec / 3600:.7f}')
+        return f'{self.path}?POS={pos}&BANDNAME={",".join(bands)}&FORMAT=csv'
+
+    async def fetch(self, ra: float, dec: float, radius_arcsec: float = DEFAULT_RADIUS_ARCSEC,
+                    bands: Sequence[str] = ('g', 'r')) -> bytes:
+        """Raw CSV response of one cone search, from the cache when possible."""
+        key = ResponseCache.key(ra, dec, radius_arcsec, bands) if self.cache else None
+        if key is not None:
+            body = self.cache.get(key)
+            if body is not None:
+                self.stats['cache_hits'] += 1
+                return body
+
+        target = self.target(ra, dec, radius_arcsec, bands)
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    if self._limiter is not None:
+                        await self._limiter.wait()
+                    self.stats['requests'] += 1
+                    status, headers, body = await self._pool.get(target)
+                if status == 200:
+                    break
+                retry_after = _seconds(headers.get('retry-after'))
+                error = HTTPError(status, self.origin + target, retry_after)
+                if status not in RETRY_STATUSES:
+                    raise error
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as exc:
+                error = exc
+            if attempt == self.retries:
+                raise error
+            self.stats['retries'] += 1
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+            await asyncio.sleep(max(delay, retry_after or 0.0))
+
+        if key is not None:
+            self.cache.put(key, body)
+        return body
+
+    async def fetch_many(self, ra: Sequence[float], dec: Sequence[float],
+                         radius_arcsec: float = DEFAULT_RADIUS_ARCSEC,
+                         bands: Sequence[str] = ('g', 'r')) -> Tuple[List[Optional[bytes]], Dict[int, Exception]]:
+        """
+        Cone-search every position concurrently.
+
+        Returns:
+            (bodies, errors): one response per position (None where it failed
+            after all retries) and the exception of each failed position
+        """
+        async def one(k, a, d):
+            try:
+                return await self.fetch(a, d, radius_arcsec, bands)
+            except (HTTPError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+                # ValueError: a malformed response (status line, chunk size, ...)
+                self.stats['failures'] += 1
+                errors[k] = exc
+                return None
+
+        errors = {}
+        bodies = await asyncio.gather(*(one(k, float(a), float(d)) for k, (a, d) in enumerate(zip(ra, dec))))
+        return list(bodies), errors
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_light_curves(names: Sequence[str], bodies: Sequence[Optional[bytes]],
+                       good_only: bool = True) -> LightCurves:
+    """
+    Turn cone-search CSV responses into one LightCurves batch.
+
+    Every body is tagged with its source number by prefixing its lines, and
+    all bodies sharing a header go through a single read_csv call rather
+    than one parse per source.
+
+    Args:
+        names: Source name for each body
+        bodies: CSV responses (None or empty for sources without data)
+        good_only: Keep only epochs with catflags == 0
+
+    Returns:
+        LightCurves in the order of `names`, each source sorted by mjd
+    """
+    groups: Dict[bytes, List[bytes]] = {}
+    for k, body in enumerate(bodies):
+        if not body:
+            continue
+        header, _, rows = body.partition(b'\n')
+        rows = rows.rstrip(b'\r\n')
+        if not rows:
+            continue
+        prefix = b'%d,' % k
+        groups.setdefault(header.rstrip(b'\r'), []).append(prefix + rows.replace(b'\n', b'\n' + prefix))
+
+    tables = []
+    for header, parts in groups.items():
+        text = b'source,' + header + b'\n' + b'\n'.join(parts) + b'\n'
+        tables.append(pd.read_csv(io.BytesIO(text), usecols=lambda c: c in
+                                  ('source', 'mjd', 'mag', 'magerr', 'catflags', 'filtercode')))
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(
+        {'source': [], 'mjd': [], 'mag': [], 'magerr': [], 'filtercode': []})
+
+    band = table['filtercode'].map(FILTER_CODES)
+    keep = band.notna()
+    if good_only and 'catflags' in table.columns:
+        keep &= table['catflags'] == 0
+    keep = keep.to_numpy()
+
+    source = table['source'].to_numpy(dtype=np.int64)[keep]
+    mjd = table['mjd'].to_numpy(dtype=np.float64)[keep]
+    order = np.lexsort((mjd, source))
+    counts = np.bincount(source, minlength=len(names))
+    return LightCurves(np.asarray(names, dtype=object),
+                       np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+                       mjd[order],
+                       table['mag'].to_numpy(dtype=np.float64)[keep][order],
+                       table['magerr'].to_numpy(dtype=np.float64)[keep][order],
+                       band.to_numpy()[keep][order].astype(np.int8))
+
+
+def fetch_light_curves(sources: pd.DataFrame, url: str = IRSA_LIGHT_CURVE_URL,
+                       radius_arcsec: float = DEFAULT_RADIUS_ARCSEC, bands: Sequence[str] = ('g', 'r'),
+                       cache_dir: Optional[Union[str, Path]] = PHOTOMETRY_CACHE_DIR,
+                       concurrency: int = DEFAULT_CONCURRENCY, rate_limit: Optional[float] = None,
+                       retries: int = DEFAULT_RETRIES, good_only: bool = True
+                       ) -> Tuple[LightCurves, Dict[str, Exception]]:
+    """
+    Blocking wrapper around fetch_light_curves_async (same arguments and
+    result). Inside a running event loop (e.g. a Jupyter cell) the fetch
+    runs on its own loop in a worker thread; async callers can await
+    fetch_light_curves_async directly instead.
+    """
+    fetch = fetch_light_curves_async(sources, url, radius_arcsec, bands, cache_dir, concurrency,
+                                     rate_limit, retries, good_only)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(fetch)
+    with ThreadPoolExecutor(max_workers=1) as worker:
+        return worker.submit(asyncio.run, fetch).result()
+
+
+async def fetch_light_curves_async(sources: pd.DataFrame, url: str = IRSA_LIGHT_CURVE_URL,
+                                   radius_arcsec: float = DEFAULT_RADIUS_ARCSEC, bands: Sequence[str] = ('g', 'r'),
+                                   cache_dir: Optional[Union[str, Path]] = PHOTOMETRY_CACHE_DIR,
+                                   concurrency: int = DEFAULT_CONCURRENCY, rate_limit: Optional[float] = None,
+                                   retries: int = DEFAULT_RETRIES, good_only: bool = True
+                                   ) -> Tuple[LightCurves, Dict[str, Exception]]:
+    """
+    Fetch light curves for every source of a table (Objname, RAdeg, DEdeg,
+    e.g. filtered_sources.csv or a PaperX_*.csv output).
+
+    Catalogs can list a source once per observation (Paper C), so each
+    distinct Objname is searched once, at the position of its first row,
+    and rows sharing a position (to the cache key's 1e-7 deg) share one
+    request.
+
+    Returns:
+        (curves, errors): LightCurves with one entry per distinct Objname,
+        in order of first appearance (failed sources have no epochs), and
+        the exception for each failed Objname
+    """
+    first = sources.drop_duplicates('Objname')
+    names = first['Objname'].astype(str).to_numpy()
+    position = np.column_stack([first['RAdeg'].to_numpy(dtype=np.float64).round(7),
+                                first['DEdeg'].to_numpy(dtype=np.float64).round(7)])
+    unique, query_of = np.unique(position, axis=0, return_inverse=True)
+    query_of = query_of.ravel()
+
+    async with PhotometryClient(url, cache_dir, concurrency, rate_limit, retries) as client:
+        bodies, errors = await client.fetch_many(unique[:, 0], unique[:, 1], radius_arcsec, bands)
+    stats = client.stats
+    curves = parse_light_curves(names, [bodies[q] for q in query_of], good_only)
+    print(f"Fetched {len(unique)} positions for {len(names)} sources ({len(sources)} rows): "
+          f"{stats['requests']} requests, {stats['cache_hits']} cached, "
+          f"{stats['retries']} retries, {len(errors)} failed")
+    return curves, {name: errors[q] for name, q in zip(names, query_of) if q in errors}
+
+
+def main(input_file: Path, url: str = IRSA_LIGHT_CURVE_URL, cache_dir: Path = PHOTOMETRY_CACHE_DIR,
+         store_dir: Optional[Path] = None):
+    sources = pd.read_csv(input_file)
+    start = time.perf_counter()
+    curves, errors = fetch_light_curves(sources, url, cache_dir=cache_dir)
+    print(f"{curves.n_sources} sources, {len(curves.mjd):,} epochs in {time.perf_counter() - start:.1f}s")
+    for name, exc in list(errors.items())[:10]:
+        print(f"  ✗ {name}: {exc}")
+
+    if store_dir is not None:
+        from lightcurve_store import LightCurveStore
+        store = LightCurveStore(store_dir)
+        store.append(curves, sources)
+        print(f"✓ Appended to {store_dir} ({len(store)} sources)")
+    return curves, errors
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python3 photometry_client.py <sources.csv> [url] [store_dir]")
+        sys.exit(1)
+    main(Path(sys.argv[1]),
+         sys.argv[2] if len(sys.argv) > 2 else IRSA_LIGHT_CURVE_URL,
+         store_dir=Path(sys.argv[3]) if len(sys.argv) > 3 else None)
@@ -0,0 +1,501 @@
+"""
+Incremental runner for the YSO pipeline: phase 1 (main.py), phase 2
+(phase2_filtering.py) and the ZTF trend analysis (ztf_analysis.py),
+declared as a DAG of stages with input and output artifacts.
+
+A stage reruns only when its fingerprint changes: the content of its
+inputs, its parameters, or the source of the modules it runs. Stages
+whose inputs are ready run in parallel worker processes (the three MRT
+parses run side by side). A rerun that reproduces identical outputs stops
+the change from propagating further downstream.
+
+    python3 pipeline.py --data-dir ~/YSO --output-dir ~/YSO/out
+    python3 pipeline.py --set phase2.dec_min=-20          # reruns filters + crossmatch only
+    python3 pipeline.py --dry-run crossmatch              # show what would run
+    python3 pipeline.py --set ztf.store_dir='"lc_store"'  # include the ZTF trend stages
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import instrumentation
+from catalog_cache import file_digest, source_digest
+
+STATE_FORMAT_VERSION = 1
+
+# The MRT tables sit next to the scripts unless YSO_DATA_DIR points elsewhere
+DATA_DIR = Path(os.environ.get('YSO_DATA_DIR', Path(__file__).resolve().parent))
+MRT_FILES = {
+    'A': 'apjadd25ft1_mrt.txt',
+    'B': 'apjsadc397t2_mrt.txt',
+    'C': 'apjsadf4e6t4_mrt.txt',
+}
+
+# Every tunable value, as '<group>.<name>'; override with --set group.name=value
+DEFAULT_PARAMS = {
+    'phase1.dec_min': -30,
+    'phase1.lc_type': 'Linear',
+    'phase1.classes': ['ClassI', 'ClassII', 'ClassIII', 'FS'],
+    'phase2.dec_min': -30,
+    'crossmatch.radius_arcsec': 1.0,
+    'ztf.seed': 0,
+    'ztf.photometry_url': None,
+    'ztf.store_dir': None,
+    'ztf.synthetic': False,
+    'ztf.fading_threshold': 0.2,
+    'ztf.color_threshold': 0.1,
+}
+
+
+class Stage(NamedTuple):
+    """
+    One pipeline step. `func(inputs, outputs, **params)` reads the input
+    paths and writes every output path (dicts keyed by role). `code` lists
+    the modules whose source is part of the fingerprint.
+    """
+    name: str
+    func: Callable
+    inputs: Dict[str, Path]
+    outputs: Dict[str, Path]
+    params: Dict[str, object]
+    code: Tuple[str, ...]
+
+
+# --- stage bodies (module level so worker processes can unpickle them) ------
+
+def _parse_paper(inputs, outputs, paper):
+    import phase2_filtering
+    parse = {'A': phase2_filtering.parse_paper_a, 'B': phase2_filtering.parse_paper_b,
+             'C': phase2_filtering.parse_paper_c}[paper]
+    parse(str(inputs['mrt'])).to_pickle(outputs['table'])
+
+
+def _phase1(inputs, outputs, dec_min, lc_type, classes):
+    from main import PHASE1_COLUMNS, phase1_filter
+    df = pd.read_pickle(inputs['table'])
+    df = df[[c for c in PHASE1_COLUMNS if c in df.columns]].dropna(subset=['YSO_CLASS', 'LCType'])
+    df[phase1_filter(dec_min, lc_type, classes)(df)].to_csv(outputs['csv'], index=False)
+
+
+def _phase2_filter(inputs, outputs, dec_min=None):
+    from phase2_filtering import output_filters
+    filters = output_filters() if dec_min is None else output_filters(dec_min)
+    df = pd.read_pickle(inputs['table'])
+    for name, path in outputs.items():
+        keep = filters[name]
+        (df if keep is None else df[keep(df)]).to_csv(path, index=False)
+
+
+def _crossmatch(inputs, outputs, radius_arcsec):
+    from crossmatch import build_master_table
+    tables = {role: pd.read_csv(path) for role, path in inputs.items()}
+    catalogs = {
+        'A': pd.concat([tables['PaperA_LinearPlus'], tables['PaperA_LinearMinus']], ignore_index=True),
+        'B': tables['PaperB_Linear'],
+        'C': tables['PaperC_AllSources'],
+    }
+    build_master_table(catalogs, radius_arcsec).to_csv(outputs['master'], index=False)
+
+
+def _ztf_trends(inputs, outputs, seed, photometry_url, store_dir, synthetic):
+    from ztf_analysis import fit_trends, load_light_curves
+    sources = pd.read_csv(inputs['sources'])
+    curves = load_light_curves(sources, photometry_url, store_dir, synthetic, seed)
+    fit_trends(curves).to_pickle(outputs['trends'])
+
+
+def _ztf_classify(inputs, outputs, fading_threshold, color_threshold):
+    from ztf_analysis import classify_trends, join_trends
+    sources = pd.read_csv(inputs['sources'])
+    trends = classify_trends(pd.read_pickle(inputs['trends']), fading_threshold, color_threshold)
+    results = join_trends(sources, trends)
+    results.to_csv(outputs['candidates'], index=False)
+    results[results['is_fading']].to_csv(outputs['fading'], index=False)
+    results[results['is_reddening_bluing']].to_csv(outputs['color'], index=False)
+
+
+def _params(params: Dict[str, object], group: str) -> Dict[str, object]:
+    prefix = group + '.'
+    return {key[len(prefix):]: value for key, value in params.items() if key.startswith(prefix)}
+
+
+def ztf_has_photometry(ztf_params: Dict[str, object]) -> bool:
+    """Whether the ztf.* parameters name a light-curve origin (see ztf_analysis.load_light_curves)."""
+    return bool(ztf_params['photometry_url']) or ztf_params['store_dir'] is not None or bool(ztf_params['synthetic'])
+
+
+def _store_index(store_dir: Path) -> Path:
+    """Index file of a light-curve store's live generation (CURRENT itself while the store is empty)."""
+    from lightcurve_store import CURRENT_FILE
+    current = store_dir / CURRENT_FILE
+    try:
+        return store_dir / current.read_text().strip() / 'index.npz'
+    except FileNotFoundError:
+        return current
+
+
+def build_stages(data_dir: Path = DATA_DIR, output_dir: Path = DATA_DIR,
+                 params: Optional[Dict[str, object]] = None) -> List[Stage]:
+    """
+    The pipeline DAG. Outputs keep the layout of the standalone scripts:
+    ztf_candidates/, culled_csvs/ and ztf_analysis/ under `output_dir`, with
+    intermediate tables in .pipeline/. The ZTF stages are included only when
+    a photometry source is configured (ztf.photometry_url, ztf.store_dir or
+    ztf.synthetic=true).
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    data_dir, output_dir = Path(data_dir), Path(output_dir)
+    work = output_dir / '.pipeline'
+    culled = output_dir / 'culled_csvs'
+    candidates = output_dir / 'ztf_candidates'
+    ztf = output_dir / 'ztf_analysis'
+
+    table = {paper: work / f'paper_{paper.lower()}.pkl' for paper in MRT_FILES}
+    csv = {name: culled / f'{name}.csv'
+           for name in ['PaperA_LinearPlus', 'PaperA_LinearMinus', 'PaperB_Linear', 'PaperC_AllSources']}
+    filtered = candidates / 'filtered_sources.csv'
+    trends = work / 'ztf_trends.pkl'
+
+    stages = [
+        Stage(f'parse_{paper}', _parse_paper, {'mrt': data_dir / file}, {'table': table[paper]},
+              {'paper': paper}, ('phase2_filtering', 'yso_utils', 'mrt_reader'))
+        for paper, file in MRT_FILES.items()
+    ]
+    phase2 = _params(params, 'phase2')
+    stages += [
+        # Only Paper B carries YSO_CLASS and LCType, so phase 1 reads just its table
+        Stage('phase1', _phase1, {'table': table['B']}, {'csv': filtered},
+              _params(params, 'phase1'), ('main', 'catalog_stream')),
+        Stage('filter_A', _phase2_filter, {'table': table['A']},
+              {name: csv[name] for name in ['PaperA_LinearPlus', 'PaperA_LinearMinus']},
+              phase2, ('phase2_filtering', 'catalog_stream')),
+        Stage('filter_B', _phase2_filter, {'table': table['B']}, {'PaperB_Linear': csv['PaperB_Linear']},
+              phase2, ('phase2_filtering', 'catalog_stream')),
+        # Paper C is written unfiltered, so no phase2 parameter may invalidate it
+        Stage('filter_C', _phase2_filter, {'table': table['C']}, {'PaperC_AllSources': csv['PaperC_AllSources']},
+              {}, ('phase2_filtering', 'catalog_stream')),
+        Stage('crossmatch', _crossmatch, dict(csv), {'master': culled / 'ZTF_Master_Crossmatched.csv'},
+              _params(params, 'crossmatch'), ('crossmatch',)),
+    ]
+
+    # The ZTF stages need photometry; without a source they are left out of the DAG
+    ztf_params = _params(params, 'ztf')
+    if not ztf_has_photometry(ztf_params):
+        return stages
+    ztf_inputs = {'sources': filtered}
+    if not ztf_params['photometry_url'] and ztf_params['store_dir'] is not None:
+        # Appending to the store rewrites its live index, so that reruns the fits
+        ztf_inputs['store'] = _store_index(Path(ztf_params['store_dir']))
+    stages += [
+        Stage('ztf_trends', _ztf_trends, ztf_inputs, {'trends': trends},
+              {key: ztf_params[key] for key in ['seed', 'photometry_url', 'store_dir', 'synthetic']},
+              ('ztf_analysis', 'photometry_client', 'lightcurve_store')),
+        Stage('ztf_classify', _ztf_classify, {'sources': filtered, 'trends': trends},
+              {'candidates': ztf / 'spectroscopy_candidates.csv', 'fading': ztf / 'fading_sources.csv',
+               'color': ztf / 'color_evolution.csv'},
+              {key: ztf_params[key] for key in ['fading_threshold', 'color_threshold']},
+              ('ztf_analysis', 'binning')),
+    ]
+    return stages
+
+
+class Pipeline:
+    """
+    Runs a list of stages in dependency order, skipping the up-to-date ones.
+
+    Stage state (fingerprints and output digests) is kept in
+    <state_dir>/state.json. File digests are memoized on (size, mtime), so
+    unchanged multi-megabyte inputs are not re-hashed on every run.
+
+    Args:
+        stages: Stages; dependencies follow from shared artifact paths
+        state_dir: Where state.json lives
+        processes: Worker processes (1 runs stages inline)
+    """
+
+    def __init__(self, stages: List[Stage], state_dir: Path, processes: Optional[int] = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = Path(state_dir) / 'state.json'
+        self.processes = processes or os.cpu_count() or 1
+
+        producer = {}
+        for stage in stages:
+            for path in stage.outputs.values():
+                if path in producer:
+                    raise ValueError(f"{path} is produced by both {producer[path]} and {stage.name}")
+                producer[path] = stage.name
+        self.upstream = {stage.name: sorted({producer[p] for p in stage.inputs.values() if p in producer})
+                         for stage in stages}
+        self._check_acyclic()
+        self._load()
+
+    def _check_acyclic(self) -> None:
+        done, visiting = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through {name}")
+            visiting.add(name)
+            for parent in self.upstream[name]:
+                visit(parent)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    # --- state ---------------------------------------------------------------
+
+    def _load(self) -> None:
+        try:
+            state = json.loads(self.state_file.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        if state.get('version') != STATE_FORMAT_VERSION:
+            state = {'version': STATE_FORMAT_VERSION, 'stages': {}, 'files': {}}
+        self.state = state
+
+    def _save(self) -> None:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.state, indent=1))
+        os.replace(tmp, self.state_file)
+
+    def digest(self, path: Path) -> Optional[str]:
+        """Content digest of a file (None if missing), memoized on size and mtime."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = str(Path(path).resolve())
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.state['files'].get(key)
+        if cached and cached[:2] == stamp:
+            return cached[2]
+        digest = file_digest(Path(path))
+        self.state['files'][key] = stamp + [digest]
+        return digest
+
+    def fingerprint(self, stage: Stage) -> Optional[str]:
+        """Hash of the stage's code, parameters and input contents (None if an input is missing)."""
+        inputs = {role: self.digest(path) for role, path in stage.inputs.items()}
+        if None in inputs.values():
+            return None
+        code = {name: source_digest(importlib.import_module(name)) for name in stage.code}
+        code['pipeline'] = source_digest(stage.func)
+        payload = json.dumps({'stage': stage.name, 'params': stage.params, 'inputs': inputs, 'code': code},
+                             sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def is_current(self, stage: Stage, fingerprint: Optional[str]) -> bool:
+        record = self.state['stages'].get(stage.name)
+        if fingerprint is None or record is None or record['fingerprint'] != fingerprint:
+            return False
+        # Outputs deleted or edited by hand since the last run also make a stage stale
+        return all(self.digest(path) == record['outputs'].get(str(path)) for path in stage.outputs.values())
+
+    def _record(self, stage: Stage, fingerprint: str) -> None:
+        self.state['stages'][stage.name] = {
+            'fingerprint': fingerprint,
+            'outputs': {str(path): self.digest(path) for path in stage.outputs.values()},
+        }
+        self._save()
+
+    # --- execution -----------------------------------------------------------
+
+    def _wanted(self, targets: Optional[Iterable[str]]) -> List[str]:
+        if not targets:
+            return list(self.stages)
+        wanted = set()
+
+        def add(name):
+            if name not in self.stages:
+                raise KeyError(f"Unknown stage {name!r}; stages: {', '.join(self.stages)}")
+            if name not in wanted:
+                wanted.add(name)
+                for parent in self.upstream[name]:
+                    add(parent)
+
+        for target in targets:
+            add(target)
+        return [name for name in self.stages if name in wanted]
+
+    def plan(self, targets: Optional[Iterable[str]] = None, force: bool = False) -> Dict[str, str]:
+        """
+        What run() would do, without running or writing anything: 'run' or
+        'skip' per stage. Stages downstream of a rerun are reported as 'run', although
+        run() may still skip them if the rerun reproduces the same outputs.
+        """
+        plan = {}
+        for name in self._topological(self._wanted(targets)):
+            stage = self.stages[name]
+            dirty = force or any(plan[p] == 'run' for p in self.upstream[name] if p in plan)
+            plan[name] = 'run' if dirty or not self.is_current(stage, self.fingerprint(stage)) else 'skip'
+        return plan
+
+    def _topological(self, names: List[str]) -> List[str]:
+        order, seen = [], set()
+
+        def visit(name):
+            if name not in seen:
+                seen.add(name)
+                for parent in self.upstream[name]:
+                    if parent in names:
+                        visit(parent)
+                order.append(name)
+
+        for name in names:
+            visit(name)
+        return order
+
+    def run(self, targets: Optional[Iterable[str]] = None, force: bool = False) -> Dict[str, str]:
+        """
+        Bring the target stages (default: all) and their upstream up to date.
+
+        Returns:
+            Stage name -> 'ran', 'skipped', 'failed' or 'blocked' (an
+            upstream stage failed or an input is missing)
+        """
+        pending = set(self._wanted(targets))
+        status: Dict[str, str] = {}
+        running = {}
+        pool = ProcessPoolExecutor(max_workers=self.processes) if self.processes > 1 else None
+        try:
+            while pending or running:
+                for name in sorted(pending):
+                    parents = self.upstream[name]
+                    if any(status.get(p) in ('failed', 'blocked') for p in parents):
+                        status[name] = 'blocked'
+                        pending.discard(name)
+                        continue
+                    if not all(p in status for p in parents):
+                        continue
+                    pending.discard(name)
+                    stage = self.stages[name]
+                    fingerprint = self.fingerprint(stage)
+                    if fingerprint is None:
+                        missing = [str(p) for p in stage.inputs.values() if not Path(p).exists()]
+                        print(f"  ✗ {name}: missing input {', '.join(missing)}")
+                        status[name] = 'blocked'
+                    elif not force and self.is_current(stage, fingerprint):
+                        print(f"  • {name}: up to date")
+                        status[name] = 'skipped'
+                    else:
+                        print(f"  ▶ {name}")
+                        for path in stage.outputs.values():
+                            path.parent.mkdir(parents=True, exist_ok=True)
+                        if pool is None:
+                            outcome = _run_stage(stage)
+                            self._finish(stage, fingerprint, outcome, status)
+                        else:
+                            running[pool.submit(_run_stage, stage)] = (name, fingerprint)
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, fingerprint = running.pop(future)
+                    self._finish(self.stages[name], fingerprint, future.result(), status)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            self._save()
+        return status
+
+    def _finish(self, stage: Stage, fingerprint: str, outcome, status: Dict[str, str]) -> None:
+        seconds, error, records = outcome
+        # Records from worker processes are merged here; serial runs recorded in place
+        instrumentation.extend([r for r in records if r['pid'] != os.getpid()])
+        if error is None:
+            self._record(stage, fingerprint)
+            status[stage.name] = 'ran'
+            print(f"  ✓ {stage.name} ({seconds:.1f}s)")
+        else:
+            self.state['stages'].pop(stage.name, None)
+            status[stage.name] = 'failed'
+            print(f"  ✗ {stage.name} failed:\n{error}")
+
+
+def _run_stage(stage: Stage) -> Tuple[float, Optional[str], List[Dict]]:
+    """
+    Run one stage; returns (seconds, formatted traceback or None, the
+    instrumentation records it produced).
+    """
+    mark = len(instrumentation.records())
+    start = time.perf_counter()
+    error = None
+    try:
+        with instrumentation.stage(f'pipeline.{stage.name}'):
+            stage.func(stage.inputs, stage.outputs, **stage.params)
+    except Exception:
+        error = traceback.format_exc()
+    return time.perf_counter() - start, error, instrumentation.records()[mark:]
+
+
+def _parse_assignment(text: str) -> Tuple[str, object]:
+    key, sep, value = text.partition('=')
+    if not sep or key not in DEFAULT_PARAMS:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(DEFAULT_PARAMS)} as name=value, got {text!r}")
+    try:
+        value = json.loads(value)
+    except json.JSONDecodeError:
+        pass
+    default = DEFAULT_PARAMS[key]
+    numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise argparse.ArgumentTypeError(f"{key} must be true or false, got {value!r}")
+    elif isinstance(default, (int, float)) and not numeric:
+        raise argparse.ArgumentTypeError(f"{key} must be a number, got {value!r}")
+    return key, value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('targets', nargs='*', help='stages to bring up to date (default: all)')
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR, help='directory holding the *_mrt.txt tables')
+    parser.add_argument('--output-dir', type=Path, default=None, help='where outputs go (default: --data-dir)')
+    parser.add_argument('--set', dest='params', type=_parse_assignment, action='append', default=[],
+                        metavar='NAME=VALUE', help='override a parameter (JSON value), e.g. phase2.dec_min=-20')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='rerun every selected stage')
+    parser.add_argument('--dry-run', action='store_true', help='only show which stages would run')
+    parser.add_argument('--list-params', action='store_true', help='show the parameters and their defaults')
+    args = parser.parse_args(argv)
+
+    if args.list_params:
+        for key, value in DEFAULT_PARAMS.items():
+            print(f"{key} = {json.dumps(value)}")
+        return 0
+
+    output_dir = args.output_dir or args.data_dir
+    stages = build_stages(args.data_dir, output_dir, dict(args.params))
+    pipeline = Pipeline(stages, output_dir / '.pipeline', args.processes)
+    if not ztf_has_photometry(_params({**DEFAULT_PARAMS, **dict(args.params)}, 'ztf')):
+        print("  (ZTF stages left out: set ztf.photometry_url, ztf.store_dir or ztf.synthetic=true)")
+
+    if args.dry_run:
+        for name, action in pipeline.plan(args.targets, args.force).items():
+            print(f"  {action:4s}  {name}")
+        return 0
+
+    start = time.perf_counter()
+    status = pipeline.run(args.targets, args.force)
+    counts = {key: list(status.values()).count(key) for key in ('ran', 'skipped', 'failed', 'blocked')}
+    print(f"\n{counts['ran']} ran, {counts['skipped']} up to date, {counts['failed']} failed, "
+          f"{counts['blocked']} blocked ({time.perf_counter() - start:.1f}s)")
+    return 1 if counts['failed'] or counts['blocked'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Batch renderer for the notebook's chord diagrams and correlation heatmaps.
+
+Each figure is a FigureSpec (kind, matrix, labels, threshold, title, style,
+output path). Figures render in parallel worker processes on the Agg
+backend, each worker importing matplotlib / cachai once; with one process
+they render in the caller without touching its pyplot backend. A figure
+is skipped when its output exists and was rendered from the same matrix,
+labels and style: the digest is kept next to it in `<output>.digest`.
+
+    python3 render_farm.py                                  # Paper B + every culled CSV
+    python3 render_farm.py --processes 8 --dpi 150 --output-dir figures
+    python3 render_farm.py --dry-run                        # show what would render
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from catalog_cache import source_digest
+from yso_utils import (categorize_variability, compute_correlation_matrix, create_contingency_table,
+                       normalize_for_chord)
+
+# Same default as pipeline.py: the scripts' directory unless YSO_DATA_DIR is set
+DATA_DIR = Path(os.environ.get('YSO_DATA_DIR', Path(__file__).resolve().parent))
+OUTPUT_DIR = DATA_DIR / 'figures'
+CULLED_DIR = DATA_DIR / 'culled_csvs'
+
+# Numeric columns of the notebook's correlation heatmap / chord diagram
+CORRELATION_COLUMNS = ['W2magMean', 'sig_W2Flux', 'delW2mag', 'Period', 'slope', 'r_value', 'FLP_LSP_BOOT']
+
+# Contingency chord diagrams: (row column, column column, title, file stem)
+CONTINGENCY_FIGURES = [
+    ('YSO_CLASS', 'LCType', 'YSO Class vs Light Curve Type', 'chord_yso_class_vs_lightcurve'),
+    ('YSO_CLASS', 'Variability', 'YSO Class vs Variability', 'chord_yso_class_vs_variability'),
+    ('LCType', 'Variability', 'Light Curve Type vs Variability', 'chord_lightcurve_vs_variability'),
+]
+
+# The notebook's global look (plt.style.use + sns.set_palette), applied per render
+NOTEBOOK_MPL_STYLE = 'seaborn-v0_8-darkgrid'
+NOTEBOOK_PALETTE = 'husl'
+
+# Notebook settings for each kind of figure; a spec's style overrides these
+DEFAULT_STYLES = {
+    'chord': {'figsize': [14, 12], 'dpi': 300, 'chord_alpha': 0.5, 'fontsize': 10, 'label_fontsize': 11,
+              'label_scale': 1.15, 'title_fontsize': 16},
+    'heatmap': {'figsize': [10, 8], 'dpi': 300, 'cmap': 'coolwarm', 'center': 0, 'annot': True, 'fmt': '.2f',
+                'linewidths': 1, 'cbar_shrink': 0.8, 'title_fontsize': 14},
+}
+
+
+class FigureSpec(NamedTuple):
+    """
+    One figure to render. `matrix` is square for chord diagrams; `labels`
+    default to a DataFrame matrix's columns.
+    """
+    kind: str
+    matrix: object
+    output: Path
+    title: str = ''
+    labels: Optional[List[str]] = None
+    threshold: float = 0.01
+    style: Dict = {}
+
+
+def resolved(spec: FigureSpec) -> Tuple[np.ndarray, List[str], Dict]:
+    """The spec's matrix as float64, its labels and its full style."""
+    if spec.kind not in DEFAULT_STYLES:
+        raise ValueError(f"{spec.output}: unknown figure kind {spec.kind!r}")
+    matrix = np.ascontiguousarray(np.asarray(spec.matrix, dtype=np.float64))
+    labels = spec.labels
+    if labels is None:
+        labels = [str(c) for c in spec.matrix.columns] if isinstance(spec.matrix, pd.DataFrame) else []
+    return matrix, list(labels), {**DEFAULT_STYLES[spec.kind], **spec.style}
+
+
+def spec_digest(spec: FigureSpec) -> str:
+    """Hash of everything that shapes the figure, including the rendering code itself."""
+    matrix, labels, style = resolved(spec)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps({'kind': spec.kind, 'shape': matrix.shape, 'labels': labels, 'title': spec.title,
+                         'threshold': spec.threshold, 'style': style, 'code': source_digest(sys.modules[__name__]),
+                         'output': Path(spec.output).suffix}, sort_keys=True, default=str).encode())
+    h.update(matrix.tobytes())
+    return h.hexdigest()
+
+
+def _digest_path(output: Path) -> Path:
+    return Path(f'{output}.digest')
+
+
+def is_current(spec: FigureSpec, digest: Optional[str] = None) -> bool:
+    """True if the output exists and was rendered from an identical spec."""
+    output = Path(spec.output)
+    try:
+        return output.exists() and _digest_path(output).read_text().strip() == (digest or spec_digest(spec))
+    except FileNotFoundError:
+        return False
+
+
+# --- rendering (worker processes) ----------------------------------------------
+
+def _init_worker() -> None:
+    # Workers only: switching the caller's backend would knock a notebook off inline
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def improve_chord_labels(ax, scale: float = 1.15, fontsize: float = 11) -> None:
+    """
+    Move chord diagram labels outside the circle, keep them roughly
+    horizontal and enlarge them (the notebook's label clean-up).
+    """
+    for text in ax.texts:
+        x, y = text.get_position()
+        angle = np.degrees(np.arctan2(y, x))
+        text.set_position((x * scale, y * scale))
+        text.set_rotation(angle - 180 if 90 < angle < 270 else angle)
+        text.set_fontsize(fontsize)
+        text.set_fontweight('bold')
+        text.set_ha('center')
+        text.set_va('center')
+
+
+def _draw_chord(ax, matrix: np.ndarray, labels: List[str], spec: FigureSpec, style: Dict) -> None:
+    import cachai.chplot as chp
+    data = pd.DataFrame(matrix, index=labels, columns=labels) if labels else matrix
+    chp.chord(data, ax=ax, threshold=spec.threshold, chord_alpha=style['chord_alpha'], fontsize=style['fontsize'])
+    improve_chord_labels(ax, style['label_scale'], style['label_fontsize'])
+
+
+def _draw_heatmap(ax, matrix: np.ndarray, labels: List[str], spec: FigureSpec, style: Dict) -> None:
+    import seaborn as sns
+    data = pd.DataFrame(matrix, index=labels or None, columns=labels or None)
+    sns.heatmap(data, annot=style['annot'], fmt=style['fmt'], cmap=style['cmap'], center=style['center'],
+                square=True, linewidths=style['linewidths'], cbar_kws={'shrink': style['cbar_shrink']}, ax=ax)
+
+
+_DRAW = {'chord': _draw_chord, 'heatmap': _draw_heatmap}
+
+
+def render(spec: FigureSpec, digest: Optional[str] = None) -> float:
+    """Render one figure to spec.output (atomically) and record its digest; returns seconds."""
+    # A bare Figure stays out of pyplot and renders through Agg whatever the caller's backend
+    import matplotlib
+    import seaborn as sns
+    from cycler import cycler
+    from matplotlib.figure import Figure
+    start = time.perf_counter()
+    matrix, labels, style = resolved(spec)
+    output = Path(spec.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    # Style contexts restore the caller's rcParams afterwards
+    palette = {'axes.prop_cycle': cycler(color=sns.color_palette(NOTEBOOK_PALETTE))}
+    with matplotlib.style.context(NOTEBOOK_MPL_STYLE), matplotlib.rc_context(palette):
+        fig = Figure(figsize=style['figsize'])
+        ax = fig.subplots()
+        _DRAW[spec.kind](ax, matrix, labels, spec, style)
+        if spec.title:
+            ax.set_title(spec.title, fontsize=style['title_fontsize'], fontweight='bold', pad=20)
+        fig.tight_layout()
+        tmp = output.with_name(f'.{output.stem}.tmp{output.suffix}')
+        fig.savefig(tmp, dpi=style['dpi'], bbox_inches='tight')
+    os.replace(tmp, output)
+    _digest_path(output).write_text((digest or spec_digest(spec)) + '\n')
+    return time.perf_counter() - start
+
+
+def _render_task(spec: FigureSpec, digest: str) -> Tuple[float, Optional[str]]:
+    try:
+        return render(spec, digest), None
+    except Exception:
+        return 0.0, traceback.format_exc()
+
+
+def render_all(specs: List[FigureSpec], processes: Optional[int] = None, force: bool = False,
+               dry_run: bool = False) -> Dict[str, str]:
+    """
+    Render every spec whose output is missing or stale.
+
+    Args:
+        specs: Figures to produce (outputs must be distinct)
+        processes: Worker processes (default: CPU count). 1 renders in this process
+        force: Re-render even current figures
+        dry_run: Only report what would render
+
+    Returns:
+        Output path -> 'rendered', 'skipped', 'failed' or 'pending' (dry run)
+    """
+    outputs = [str(spec.output) for spec in specs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("figure specs share an output path")
+
+    status, todo = {}, []
+    for spec in specs:
+        digest = spec_digest(spec)
+        if not force and is_current(spec, digest):
+            status[str(spec.output)] = 'skipped'
+        else:
+            todo.append((spec, digest))
+    print(f"{len(todo)} to render, {len(status)} up to date")
+    if dry_run:
+        for spec, _ in todo:
+            print(f"  ▶ {spec.output}")
+            status[str(spec.output)] = 'pending'
+        return status
+
+    # Biggest matrices first, so the slowest figures don't start last
+    todo.sort(key=lambda item: -np.size(item[0].matrix))
+    processes = min(processes or os.cpu_count() or 1, len(todo))
+    start = time.perf_counter()
+    if processes <= 1:
+        outcomes = ((spec, _render_task(spec, digest)) for spec, digest in todo)
+    else:
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker)
+        futures = {pool.submit(_render_task, spec, digest): spec for spec, digest in todo}
+        outcomes = ((futures[f], f.result()) for f in as_completed(futures))
+    try:
+        for spec, (seconds, error) in outcomes:
+            if error is None:
+                status[str(spec.output)] = 'rendered'
+                print(f"  ✓ {spec.output} ({seconds:.1f}s)")
+            else:
+                status[str(spec.output)] = 'failed'
+                print(f"  ✗ {spec.output} failed:\n{error}")
+    finally:
+        if processes > 1:
+            pool.shutdown()
+    if todo:
+        print(f"Rendered {sum(s == 'rendered' for s in status.values())} figures in "
+              f"{time.perf_counter() - start:.1f}s with {processes} process(es)")
+    return status
+
+
+# --- the notebook's figure set -------------------------------------------------
+
+def figure_set(df: pd.DataFrame, output_dir: Path, style: Optional[Dict] = None) -> List[FigureSpec]:
+    """
+    The notebook's figures for one table: correlation heatmap and chord
+    diagram, and the contingency chord diagrams. Figures whose columns the
+    table lacks (or that would be empty) are left out.
+    """
+    style = style or {}
+    output_dir = Path(output_dir)
+    specs = []
+
+    numeric = [c for c in CORRELATION_COLUMNS if c in df.columns]
+    if len(numeric) >= 2 and len(df) >= 2:
+        corr = compute_correlation_matrix(df, numeric)
+        specs.append(FigureSpec('heatmap', corr, output_dir / 'correlation_heatmap.png',
+                                'Correlation Matrix: YSO Variability Metrics', style=style))
+        specs.append(FigureSpec('chord', corr.abs(), output_dir / 'chord_correlation_metrics.png',
+                                'Correlation Matrix: Variability Metrics', threshold=0.15,
+                                style={'chord_alpha': 0.6, **style}))
+
+    if 'Variability' not in df.columns and 'delW2mag' in df.columns:
+        df = df.assign(Variability=categorize_variability(df))
+    for row, col, title, stem in CONTINGENCY_FIGURES:
+        if row not in df.columns or col not in df.columns:
+            continue
+        table = create_contingency_table(df, row, col)
+        if table.size == 0:
+            continue
+        labels = [f"{row}:{v}" for v in table.index] + [f"{col}:{v}" for v in table.columns]
+        specs.append(FigureSpec('chord', normalize_for_chord(table), output_dir / f'{stem}.png', title,
+                                labels=labels, style=style))
+    return specs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR, help='directory holding the MRT tables')
+    parser.add_argument('--culled-dir', type=Path, default=CULLED_DIR, help='phase 2 CSVs, one figure set each')
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--dpi', type=int, default=None, help='override the 300 dpi default')
+    parser.add_argument('--force', action='store_true', help='re-render figures that are up to date')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+
+    from yso_utils import parse_mrt_file
+    tables = {'PaperB': parse_mrt_file(str(args.data_dir / 'apjsadc397t2_mrt.txt'))}
+    for csv in sorted(Path(args.culled_dir).glob('*.csv')):
+        tables[csv.stem] = pd.read_csv(csv)
+
+    style = {'dpi': args.dpi} if args.dpi else {}
+    specs = [spec for name, df in tables.items() for spec in figure_set(df, args.output_dir / name, style)]
+    status = render_all(specs, args.processes, args.force, args.dry_run)
+    return 1 if 'failed' in status.values() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Optional, Tuple
+
+from yso_utils import compute_correlation_matrix, create_contingency_table
+
+DEFAULT_RESAMPLES = 10_000
+DEFAULT_BATCH_SIZE = 256
+
+# Cap on the (batch, rows, columns) float64 block a batch may allocate
+_BATCH_BYTES = 64 * 2**20
+
+
+# --- batched statistics -------------------------------------------------------
+
+def _batched_corr(x: np.ndarray) -> np.ndarray:
+    """Pearson matrices for a (batch, rows, columns) block -> (batch, columns, columns)."""
+    centered = x - x.mean(axis=1, keepdims=True)
+    cov = np.einsum('bnk,bnl->bkl', centered, centered)
+    scale = np.sqrt(np.einsum('bkk->bk', cov))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return cov / scale[:, :, None] / scale[:, None, :]
+
+
+def _batched_ranks(codes: np.ndarray, n_values: int) -> np.ndarray:
+    """
+    Average ranks (ties share the mean rank) within each resample, for one
+    column given as dense integer codes of shape (batch, rows).
+    """
+    batch, n = codes.shape
+    offsets = np.arange(batch)[:, None] * n_values
+    hist = np.bincount((codes + offsets).ravel(), minlength=batch * n_values).reshape(batch, n_values)
+    below = np.cumsum(hist, axis=1) - hist
+    rows = np.arange(batch)[:, None]
+    return below[rows, codes] + (hist[rows, codes] + 1) / 2
+
+
+def _batched_tables(row_codes: np.ndarray, col_codes: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    """Contingency tables for (batch, rows) code arrays -> (batch, n_rows, n_cols)."""
+    batch = row_codes.shape[0]
+    cells = shape[0] * shape[1]
+    flat = row_codes * shape[1] + col_codes + np.arange(batch)[:, None] * cells
+    return np.bincount(flat.ravel(), minlength=batch * cells).reshape(batch, *shape)
+
+
+def _chi2(tables: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson chi-square and standardized residuals for (..., r, c) tables."""
+    total = tables.sum(axis=(-2, -1), keepdims=True)
+    expected = tables.sum(axis=-1, keepdims=True) * tables.sum(axis=-2, keepdims=True) / total
+    with np.errstate(invalid='ignore', divide='ignore'):
+        residual = np.where(expected > 0, (tables - expected) / np.sqrt(expected), 0.0)
+    return (residual ** 2).sum(axis=(-2, -1)), residual
+
+
+# --- workers (top level so the process pool can pickle them) ------------------
+
+def _correlation_task(values: np.ndarray, codes: Optional[List[np.ndarray]], seed: np.random.SeedSequence,
+                      count: int, batch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    `count` bootstrap and permutation resamples of a complete-case (rows, k)
+    array. Returns the bootstrap correlation matrices and, per pair, how many
+    permutations gave |r| at least the observed one. With rank `codes` the
+    statistic is Spearman, re-ranked within every bootstrap resample.
+    """
+    rng = np.random.default_rng(seed)
+    n, k = values.shape
+    base = values if codes is None else _ranks(codes, np.arange(n)[None])[0]
+    observed = np.abs(_batched_corr(base[None])[0])
+
+    boot, exceed = [], np.zeros((k, k), dtype=np.int64)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        picks = rng.integers(0, n, size=(size, n))
+        boot.append(_batched_corr(values[picks] if codes is None else _ranks(codes, picks)))
+
+        # Shuffle every column independently: each pair gets its own null draw.
+        # Ranks are unchanged by a permutation, so Spearman reuses `base`.
+        perm = np.argsort(rng.random((size, n, k)), axis=1)
+        null = _batched_corr(np.take_along_axis(np.broadcast_to(base, (size, n, k)), perm, axis=1))
+        exceed += (np.abs(null) >= observed - 1e-12).sum(axis=0)
+    return np.concatenate(boot), exceed
+
+
+def _ranks(codes: List[np.ndarray], picks: np.ndarray) -> np.ndarray:
+    """Within-resample average ranks of every column -> (batch, rows, columns)."""
+    return np.stack([_batched_ranks(c[picks], int(c.max()) + 1) for c in codes], axis=-1)
+
+
+def _contingency_task(row_codes: np.ndarray, col_codes: np.ndarray, shape: Tuple[int, int],
+                      seed: np.random.SeedSequence, count: int, batch_size: int):
+    """
+    `count` bootstrap and permutation resamples of paired category codes.
+    Returns bootstrap tables, and counts of permutations whose chi-square and
+    per-cell |residual| reach the observed ones.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(row_codes)
+    observed_chi2, observed_resid = _chi2(_batched_tables(row_codes[None], col_codes[None], shape)[0])
+
+    boot, chi2_exceed, cell_exceed = [], 0, np.zeros(shape, dtype=np.int64)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        picks = rng.integers(0, n, size=(size, n))
+        boot.append(_batched_tables(row_codes[picks], col_codes[picks], shape))
+
+        perm = np.argsort(rng.random((size, n)), axis=1)
+        null_chi2, null_resid = _chi2(_batched_tables(np.broadcast_to(row_codes, (size, n)), col_codes[perm], shape))
+        chi2_exceed += int((null_chi2 >= observed_chi2 - 1e-9).sum())
+        cell_exceed += (np.abs(null_resid) >= np.abs(observed_resid) - 1e-9).sum(axis=0)
+    return np.concatenate(boot), chi2_exceed, cell_exceed
+
+
+# --- scheduling ---------------------------------------------------------------
+
+def _run_tasks(task: Callable, args: tuple, n_resamples: int, batch_size: int, seed,
+               processes: Optional[int], time_budget: Optional[float]) -> list:
+    """
+    Split `n_resamples` into batch-sized tasks with their own child seeds and
+    run them, in a process pool if processes > 1. The split and seeds depend
+    only on `seed` and `batch_size`, so results are identical for any number
+    of processes. With a time budget, only the tasks finished in order
+    before the deadline are kept (at least one always is).
+    """
+    counts = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    results = []
+    if processes <= 1:
+        for child, count in zip(seeds, counts):
+            results.append(task(*args, child, count, batch_size))
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        return results
+
+    # Submit lazily, with at most `processes` tasks in flight, so nothing is
+    # queued past the deadline; on timeout, don't wait for running tasks
+    pool = ProcessPoolExecutor(max_workers=processes)
+    pending = deque()
+    submitted = 0
+    timed_out = False
+    try:
+        while True:
+            while len(pending) < processes and submitted < len(counts):
+                if deadline is not None and results and time.monotonic() > deadline:
+                    break
+                pending.append(pool.submit(task, *args, seeds[submitted], counts[submitted], batch_size))
+                submitted += 1
+            if not pending:
+                break
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                results.append(pending[0].result(timeout=remaining if results else None))
+            except FutureTimeoutError:
+                timed_out = True
+                break
+            pending.popleft()
+            if deadline is not None and time.monotonic() > deadline:
+                timed_out = True
+                break
+    finally:
+        pool.shutdown(wait=not timed_out, cancel_futures=True)
+    return results
+
+
+def _batch_size(n_rows: int, width: int, batch_size: Optional[int]) -> int:
+    if batch_size is not None:
+        return batch_size
+    return int(max(1, min(DEFAULT_BATCH_SIZE, _BATCH_BYTES // max(n_rows * width * 8, 1))))
+
+
+# --- public API ---------------------------------------------------------------
+
+def correlation_significance(df: pd.DataFrame, columns: List[str] = None, method: str = 'pearson',
+                             n_resamples: int = DEFAULT_RESAMPLES, confidence: float = 0.95,
+                             seed: int = 0, processes: Optional[int] = None,
+                             time_budget: Optional[float] = None,
+                             batch_size: Optional[int] = None) -> pd.DataFrame:
+    """
+    Bootstrap confidence intervals and permutation p-values for every pair in
+    compute_correlation_matrix(df, columns, method=method).
+
+    Args:
+        df: DataFrame with data (rows with any missing value are dropped, as in
+            compute_correlation_matrix)
+        columns: Columns to correlate. If None, uses all numeric columns
+        method: 'pearson' or 'spearman'
+        n_resamples: Bootstrap and permutation resamples (each)
+        confidence: Two-sided percentile interval level
+        seed: Seed; the same seed gives the same table regardless of processes
+        processes: Worker processes. None uses every CPU, 1 runs inline
+        time_budget: Seconds to spend before stopping early; n_resamples in the
+                     result reports how many were actually used
+        batch_size: Resamples per vectorized call (default fits ~64 MB)
+
+    Returns:
+        One row per pair: var1, var2, r, ci_low, ci_high, p_value, n, n_resamples
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=[np.number]).columns.tolist()
+    observed = compute_correlation_matrix(df, columns, method=method)
+    values = df[columns].dropna().to_numpy(dtype=np.float64)
+    codes = None
+    if method == 'spearman':
+        codes = [np.unique(values[:, i], return_inverse=True)[1].astype(np.int64) for i in range(len(columns))]
+
+    batch = _batch_size(len(values), len(columns), batch_size)
+    results = _run_tasks(_correlation_task, (values, codes), n_resamples, batch, seed, processes, time_budget)
+    boot = np.concatenate([r[0] for r in results])
+    exceed = sum(r[1] for r in results)
+    used = len(boot)
+
+    alpha = (1 - confidence) / 2
+    low, high = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+    i, j = np.triu_indices(len(columns), k=1)
+    return pd.DataFrame({
+        'var1': np.array(columns, dtype=object)[i],
+        'var2': np.array(columns, dtype=object)[j],
+        'r': observed.to_numpy()[i, j],
+        'ci_low': low[i, j],
+        'ci_high': high[i, j],
+        'p_value': (exceed[i, j] + 1) / (used + 1),
+        'n': len(values),
+        'n_resamples': used,
+    })
+
+
+def contingency_significance(df: pd.DataFrame, col1: str, col2: str,
+                             n_resamples: int = DEFAULT_RESAMPLES, confidence: float = 0.95,
+                             seed: int = 0, processes: Optional[int] = None,
+                             time_budget: Optional[float] = None,
+                             batch_size: Optional[int] = None) -> pd.DataFrame:
+    """
+    Per-cell uncertainty for create_contingency_table(df, col1, col2).
+
+    Bootstrap intervals on each cell count, and permutation p-values (col2
+    shuffled against col1) for each cell's standardized residual and for the
+    table's chi-square, which is stored in the result's attrs as 'chi2' and
+    'chi2_p_value'.
+
+    Returns:
+        One row per cell: <col1>, <col2>, count, expected, residual, ci_low,
+        ci_high, p_value, n_resamples
+    """
+    table = create_contingency_table(df, col1, col2)
+    pairs = df[[col1, col2]].dropna()
+    row_codes = pd.Categorical(pairs[col1], categories=table.index).codes.astype(np.int64)
+    col_codes = pd.Categorical(pairs[col2], categories=table.columns).codes.astype(np.int64)
+    shape = table.shape
+
+    batch = _batch_size(len(pairs), 2, batch_size)
+    results = _run_tasks(_contingency_task, (row_codes, col_codes, shape), n_resamples, batch, seed,
+                         processes, time_budget)
+    boot = np.concatenate([r[0] for r in results])
+    chi2_exceed = sum(r[1] for r in results)
+    cell_exceed = sum(r[2] for r in results)
+    used = len(boot)
+
+    counts = table.to_numpy()
+    chi2, residual = _chi2(counts.astype(np.float64))
+    expected = counts.sum(axis=1, keepdims=True) * counts.sum(axis=0, keepdims=True) / counts.sum()
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(boot, [alpha, 1 - alpha], axis=0)
+
+    rows, cols = np.indices(shape)
+    result = pd.DataFrame({
+        col1: table.index.to_numpy()[rows.ravel()],
+        col2: table.columns.to_numpy()[cols.ravel()],
+        'count': counts.ravel(),
+        'expected': expected.ravel(),
+        'residual': residual.ravel(),
+        'ci_low': low.ravel(),
+        'ci_high': high.ravel(),
+        'p_value': ((cell_exceed + 1) / (used + 1)).ravel(),
+        'n_resamples': used,
+    })
+    result.attrs['chi2'] = float(chi2)
+    result.attrs['chi2_p_value'] = (chi2_exceed + 1) / (used + 1)
+    return result
+
+
+def annotation_matrix(tidy: pd.DataFrame, row: str = 'var1', col: str = 'var2', fmt: str = '{r:.2f}{stars}',
+                      symmetric: bool = True) -> pd.DataFrame:
+    """
+    Pivot a tidy significance table into per-cell labels for heatmap/chord
+    annotation (e.g. sns.heatmap(corr, annot=annotation_matrix(sig), fmt='')).
+    `fmt` may use any column of the table plus {stars}: * p<0.05, ** p<0.01,
+    *** p<0.001.
+    """
+    stars = np.select([tidy['p_value'] < 0.001, tidy['p_value'] < 0.01, tidy['p_value'] < 0.05],
+                      ['***', '**', '*'], '')
+    labels = [fmt.format(stars=s, **record) for s, record in zip(stars, tidy.to_dict('records'))]
+    cells = pd.DataFrame({'row': tidy[row], 'col': tidy[col], 'label': labels})
+    if symmetric:
+        cells = pd.concat([cells, cells.rename(columns={'row': 'col', 'col': 'row'})], ignore_index=True)
+    matrix = cells.pivot_table(index='row', columns='col', values='label', aggfunc='first')
+    order = list(dict.fromkeys(list(tidy[row]) + list(tidy[col])))
+    return matrix.reindex(index=order, columns=order).fillna('') if symmetric else matrix
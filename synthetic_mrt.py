@@ -0,0 +1,373 @@
+"""
+Synthetic MRT tables in the layout of Papers A, B and C, at any size.
+
+Rows are generated column by column from the byte-by-byte header (value
+ranges, nulls and category mixes follow the published tables and README
+statistics) and formatted straight into fixed-width byte blocks with numpy,
+so a 10M-row table takes seconds per column rather than minutes.
+
+    python3 synthetic_mrt.py B 1000000 /tmp/apjsadc397t2_mrt.txt
+"""
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from mrt_reader import MRTColumn, read_mrt_header, record_width
+
+HERE = Path(__file__).resolve().parent
+CHUNK_ROWS = 250_000
+
+MRT_FILES = {
+    'A': 'apjadd25ft1_mrt.txt',
+    'B': 'apjsadc397t2_mrt.txt',
+    'C': 'apjsadf4e6t4_mrt.txt',
+}
+
+# Paper B's table is not shipped with the repo, so this header is a
+# STAND-IN, not the published layout. It has the shape the original
+# line-splitting parser relied on: 22 fields, with the 16 that
+# yso_utils.PAPER_B_COLUMNS reads first, in order, and LCType last. The five
+# W1 fields before LCType are placeholders for the real table's columns there,
+# whose labels and formats are unknown.
+PAPER_B_HEADER = """\
+Title: Synthetic WISE/NEOWISE YSO variability catalog (Paper B layout)
+================================================================================
+Byte-by-byte Description of file: apjsadc397t2_mrt.txt
+--------------------------------------------------------------------------------
+   Bytes Format Units    Label        Explanations
+--------------------------------------------------------------------------------
+   1- 19 A19    ---      Objname      Object name (JHHMMSS.ss+DDMMSS.s)
+  21- 30 F10.6  deg      RAdeg        Right Ascension (J2000)
+  32- 41 F10.6  deg      DEdeg        Declination (J2000)
+  43- 47 F5.2   ---      SED_SLOPE    ? Spectral index of the SED
+  49- 56 A8     ---      YSO_CLASS    ? YSO class from the SED slope
+  58- 60 I3     ---      Number       Number of NEOWISE epochs
+  62- 66 F5.2   mag      W2magMean    Mean W2 magnitude
+  68- 72 F5.2   mag      W2magMed     Median W2 magnitude
+  74- 81 F8.3   mJy      sig_W2Flux   Standard deviation of the W2 flux
+  83- 89 F7.3   mJy      err_W2Flux   Mean W2 flux uncertainty
+  91- 95 F5.2   mag      delW2mag     W2 amplitude (max - min)
+  97-106 F10.4  d        Period       Lomb-Scargle period
+ 108-113 F6.4   ---      FLP_LSP_BOOT Bootstrap false-alarm probability
+ 115-125 E11.4  mag/d    slope        Linear fit slope
+ 127-136 E10.3  mag/d    e_slope      Uncertainty in slope
+ 138-143 F6.3   ---      r_value      Pearson r of the linear fit
+ 145-149 F5.2   mag      W1magMean    Mean W1 magnitude (placeholder)
+ 151-155 F5.2   mag      W1magMed     Median W1 magnitude (placeholder)
+ 157-164 F8.3   mJy      sig_W1Flux   Standard deviation of the W1 flux (placeholder)
+ 166-170 F5.2   mag      delW1mag     W1 amplitude (placeholder)
+ 172-174 I3     ---      NumberW1     Number of W1 epochs (placeholder)
+ 176-184 A9     ---      LCType       Light curve type
+--------------------------------------------------------------------------------
+"""
+
+_SPACE, _ZERO = ord(' '), ord('0')
+
+
+# --- vectorized fixed-width formatting ---------------------------------------
+
+def _digits(q: np.ndarray, width: int, decimals: int = 0, neg: Optional[np.ndarray] = None,
+            zero_pad: bool = False) -> np.ndarray:
+    """
+    Right-aligned decimal text of non-negative integers `q` read as
+    q / 10**decimals, with a '-' where `neg`, as an (n, width) uint8 block.
+    """
+    q = q.astype(np.int64).copy()
+    n = len(q)
+    out = np.full((n, width), _ZERO if zero_pad else _SPACE, dtype=np.uint8)
+    sign_done = np.ones(n, dtype=bool) if neg is None else ~neg
+    pos = width - 1
+    for _ in range(decimals):
+        out[:, pos] = _ZERO + q % 10
+        q //= 10
+        pos -= 1
+    if decimals:
+        out[:, pos] = ord('.')
+        pos -= 1
+    first = True
+    while pos >= 0:
+        digit = np.ones(n, dtype=bool) if first or zero_pad else q > 0
+        out[digit, pos] = _ZERO + q[digit] % 10
+        put_sign = ~digit & ~sign_done
+        out[put_sign, pos] = ord('-')
+        sign_done |= put_sign
+        q //= 10
+        pos -= 1
+        first = False
+    if (q > 0).any() or not sign_done.all():
+        raise ValueError(f"Values do not fit {width} characters with {decimals} decimals")
+    return out
+
+
+def format_fixed(values: np.ndarray, width: int, decimals: int = 0) -> np.ndarray:
+    """Fw.d / Iw fields (right-aligned, rounded half away from zero)."""
+    values = np.asarray(values, dtype=np.float64)
+    q = np.floor(np.abs(values) * 10.0 ** decimals + 0.5)
+    return _digits(q, width, decimals, neg=(values < 0) & (q > 0))
+
+
+def format_exponent(values: np.ndarray, width: int, decimals: int) -> np.ndarray:
+    """Ew.d fields, e.g. E11.4 -> '-7.8640e-04'."""
+    values = np.asarray(values, dtype=np.float64)
+    mag = np.abs(values)
+    with np.errstate(divide='ignore'):
+        exp = np.where(mag > 0, np.floor(np.log10(np.where(mag > 0, mag, 1.0))), 0).astype(np.int64)
+    q = np.floor(mag / 10.0 ** exp * 10 ** decimals + 0.5).astype(np.int64)
+    carry = q >= 10 ** (decimals + 1)
+    q[carry] //= 10
+    exp[carry] += 1
+
+    out = np.full((len(values), width), _SPACE, dtype=np.uint8)
+    mantissa = width - 4
+    out[:, :mantissa] = _digits(q, mantissa, decimals, neg=values < 0)
+    out[:, mantissa] = ord('e')
+    out[:, mantissa + 1] = np.where(exp < 0, ord('-'), ord('+'))
+    out[:, mantissa + 2:] = _digits(np.abs(exp), 2, zero_pad=True)
+    return out
+
+
+def format_text(codes: np.ndarray, vocabulary, width: int) -> np.ndarray:
+    """Left-aligned An fields: vocabulary[codes]."""
+    table = np.frombuffer(b''.join(v.encode('ascii')[:width].ljust(width) for v in vocabulary),
+                          dtype=np.uint8).reshape(len(vocabulary), width)
+    return table[codes]
+
+
+def sky_names(ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+    """J2000 designations JHHMMSS.ss+DDMMSS.s as (n, 19) bytes."""
+    ra_cs = np.floor(ra / 15 * 3600 * 100).astype(np.int64)
+    dec_ds = np.floor(np.abs(dec) * 3600 * 10).astype(np.int64)
+    out = np.empty((len(ra), 19), dtype=np.uint8)
+    out[:, 0] = ord('J')
+    out[:, 1:3] = _digits(ra_cs // 360000, 2, zero_pad=True)
+    out[:, 3:5] = _digits(ra_cs // 6000 % 60, 2, zero_pad=True)
+    out[:, 5:10] = _digits(ra_cs % 6000, 5, 2, zero_pad=True)
+    out[:, 10] = np.where(dec < 0, ord('-'), ord('+'))
+    out[:, 11:13] = _digits(dec_ds // 36000, 2, zero_pad=True)
+    out[:, 13:15] = _digits(dec_ds // 600 % 60, 2, zero_pad=True)
+    out[:, 15:19] = _digits(dec_ds % 600, 4, 1, zero_pad=True)
+    return out
+
+
+# --- column profiles -----------------------------------------------------------
+
+def _choice(rng, n, weights: Dict[str, float]):
+    labels = list(weights)
+    p = np.array([weights[k] for k in labels], dtype=np.float64)
+    return rng.choice(len(labels), size=n, p=p / p.sum()), labels
+
+
+def _mag(mean, sd, low, high):
+    return lambda rng, n, ctx: np.clip(rng.normal(mean, sd, n), low, high)
+
+
+def _uniform(low, high):
+    return lambda rng, n, ctx: rng.uniform(low, high, n)
+
+
+def _category(weights):
+    return lambda rng, n, ctx: _choice(rng, n, weights)
+
+
+def _ra_sexagesimal(ctx):
+    ticks = np.floor(ctx['ra'] / 15 * 3600 * 1e4 + 0.5).astype(np.int64) % (24 * 3600 * 10**4)
+    return ticks // (3600 * 10**4), ticks // (60 * 10**4) % 60, ticks % (60 * 10**4) / 1e4
+
+
+def _dec_sexagesimal(ctx):
+    ticks = np.floor(np.abs(ctx['dec']) * 3600 * 1e3 + 0.5).astype(np.int64)
+    return ticks // (3600 * 10**3), ticks // (60 * 10**3) % 60, ticks % (60 * 10**3) / 1e3
+
+
+def _no_ks(rng, n, ctx):
+    if 'no_ks' not in ctx:
+        ctx['no_ks'] = rng.random(n) < 0.6
+    return ctx['no_ks']
+
+
+def _w2_mean(rng, n, ctx):
+    if 'w2' not in ctx:
+        ctx['w2'] = np.clip(rng.normal(10.63, 1.48, n), 0.1, 19.5)
+    return ctx['w2']
+
+
+def _amplitude_z(rng, n, ctx):
+    if 'amp_z' not in ctx:
+        ctx['amp_z'] = rng.standard_normal(n)
+    return ctx['amp_z']
+
+
+def _b_amplitude(rng, n, ctx):
+    # Lognormal: about 23% < 0.2 mag and 24% > 0.5 mag, as in the README
+    return np.clip(np.exp(np.log(0.32) + 0.6 * _amplitude_z(rng, n, ctx)), 0.01, 99.99)
+
+
+def _b_flux_sigma(rng, n, ctx):
+    # Tied to the amplitude (README: r ~ 0.44 between the two)
+    z = 0.5 * _amplitude_z(rng, n, ctx) + rng.standard_normal(n)
+    return np.clip(np.exp(0.3 + 1.1 * z), 0.001, 9999.999)
+
+
+def _b_slope(rng, n, ctx):
+    ctx['slope'] = rng.normal(0, 5e-3, n)
+    return ctx['slope']
+
+
+PROFILES: Dict[str, Dict[str, Callable]] = {
+    'A': {
+        'SPICY': lambda rng, n, ctx: ctx['index'] % 999_999 + 1,
+        'Class': _category({'ClassII': 364, 'FS': 215, 'ClassI': 138}),
+        'I1mag': _mag(12.5, 1.8, 0, 99.999), 'I2mag': _mag(11.8, 1.8, 0, 99.999),
+        'W1mag': _mag(12.3, 1.8, 0, 99.999), 'W2mag': _mag(11.6, 1.8, 0, 99.999),
+        'e_I1mag': _uniform(0.005, 0.3), 'e_I2mag': _uniform(0.005, 0.3),
+        'e_W1mag': _uniform(0.005, 0.3), 'e_W2mag': _uniform(0.005, 0.3),
+        # Most SPICY sources have no Ks light curve (-9.999)
+        'Ksmag': lambda rng, n, ctx: np.where(_no_ks(rng, n, ctx), -9.999, np.clip(rng.normal(12, 1.5, n), 0, 99.999)),
+        'e_Ksmag': lambda rng, n, ctx: np.where(_no_ks(rng, n, ctx), -9.999, rng.uniform(0.005, 0.3, n)),
+        'DeltaW1': _uniform(0.1, 2.0), 'DeltaW2': _uniform(0.1, 2.0),
+        'DeltaKs': lambda rng, n, ctx: np.where(_no_ks(rng, n, ctx), -9.99, rng.uniform(0.1, 3.0, n)),
+        'N-W1': lambda rng, n, ctx: rng.integers(10, 20, n),
+        'N-W2': lambda rng, n, ctx: rng.integers(10, 20, n),
+        'N-Ks': lambda rng, n, ctx: rng.integers(0, 200, n),
+        'VarClass1': _category({'linear(-)': 526, 'linear(+)': 191}),
+        'VarClass2': _category({'n/a': 482, 'irregular': 87, 'linear(-)': 57, 'linear(+)': 29,
+                                'non-variable': 20, 'periodic': 14, 'drop': 13, 'curved': 10, 'burst': 5}),
+        'RAh': lambda rng, n, ctx: _ra_sexagesimal(ctx)[0],
+        'RAm': lambda rng, n, ctx: _ra_sexagesimal(ctx)[1],
+        'RAs': lambda rng, n, ctx: _ra_sexagesimal(ctx)[2],
+        'DE-': lambda rng, n, ctx: ((ctx['dec'] >= 0).astype(np.int64), ['-', '+']),
+        'DEd': lambda rng, n, ctx: _dec_sexagesimal(ctx)[0],
+        'DEm': lambda rng, n, ctx: _dec_sexagesimal(ctx)[1],
+        'DEs': lambda rng, n, ctx: _dec_sexagesimal(ctx)[2],
+    },
+    'B': {
+        'Objname': lambda rng, n, ctx: sky_names(ctx['ra'], ctx['dec']),
+        'RAdeg': lambda rng, n, ctx: ctx['ra'],
+        'DEdeg': lambda rng, n, ctx: ctx['dec'],
+        'SED_SLOPE': lambda rng, n, ctx: np.clip(rng.normal(-0.4, 0.8, n), -9.99, 99.99),
+        'YSO_CLASS': _category({'ClassII': 61.8, 'FS': 19.7, 'ClassI': 10.1, 'ClassIII': 8.0, '': 0.4}),
+        'Number': lambda rng, n, ctx: rng.integers(15, 20, n),
+        'W2magMean': _w2_mean,
+        'W2magMed': lambda rng, n, ctx: np.clip(_w2_mean(rng, n, ctx) + rng.normal(0, 0.08, n), 0.1, 19.5),
+        'sig_W2Flux': _b_flux_sigma,
+        'err_W2Flux': lambda rng, n, ctx: np.clip(np.exp(rng.normal(-0.8, 0.8, n)), 0.001, 999.999),
+        'delW2mag': _b_amplitude,
+        'Period': lambda rng, n, ctx: np.clip(np.exp(rng.uniform(np.log(2), np.log(8333.3333), n)), 0, 99999.9999),
+        'FLP_LSP_BOOT': lambda rng, n, ctx: rng.random(n) ** 3,
+        'slope': _b_slope,
+        'e_slope': lambda rng, n, ctx: np.abs(ctx.get('slope', 0)) * rng.uniform(0.05, 0.5, n) + 1e-6,
+        'r_value': lambda rng, n, ctx: np.clip(np.sign(ctx.get('slope', 1)) * rng.uniform(0.3, 1.0, n), -1, 1),
+        'W1magMean': lambda rng, n, ctx: np.clip(_w2_mean(rng, n, ctx) + rng.normal(0.6, 0.3, n), 0.1, 19.5),
+        'W1magMed': lambda rng, n, ctx: np.clip(_w2_mean(rng, n, ctx) + rng.normal(0.6, 0.3, n), 0.1, 19.5),
+        'sig_W1Flux': _b_flux_sigma,
+        'delW1mag': _b_amplitude,
+        'NumberW1': lambda rng, n, ctx: rng.integers(15, 20, n),
+        'LCType': _category({'NV': 73.6, 'Irregular': 19.9, 'Curved': 2.8, 'Linear': 1.0,
+                             'Periodic': 0.9, 'Burst': 1.1, 'Drop': 0.6}),
+    },
+    'C': {
+        'OBSID': lambda rng, n, ctx: rng.integers(100_000_000, 1_130_000_000, n),
+        'f_OBSID': _category({'': 3470, '*': 785, '?': 78}),
+        'Design': lambda rng, n, ctx: sky_names(ctx['ra'], ctx['dec']),
+        'RAdeg': lambda rng, n, ctx: ctx['ra'],
+        'DEdeg': lambda rng, n, ctx: ctx['dec'],
+        'Gaia': lambda rng, n, ctx: rng.integers(10**15, 4_600_000_000_000_000_000, n),
+        '[NII]': lambda rng, n, ctx: (rng.random(n) < 0.30).astype(np.int64),
+        '[OI]': lambda rng, n, ctx: (rng.random(n) < 0.38).astype(np.int64),
+        'HeI': lambda rng, n, ctx: (rng.random(n) < 0.14).astype(np.int64),
+        '[SII]': lambda rng, n, ctx: (rng.random(n) < 0.27).astype(np.int64),
+        'EW': lambda rng, n, ctx: -np.clip(np.exp(rng.normal(1.5, 1.2, n)), 0, 999.99),
+    },
+}
+
+# Declination range of each survey (LAMOST, Paper C, is northern; its F10.7
+# DEdeg column cannot hold values below -10)
+DEC_RANGE = {'A': (-90, 90), 'B': (-90, 90), 'C': (-9.9, 80)}
+
+# Share of null entries in columns whose header declares a null value
+NULL_FRACTION = 0.02
+
+
+def _generic(column: MRTColumn):
+    """Fallback for columns without a profile: any value that fits the format."""
+    def generate(rng, n, ctx):
+        if column.kind == 'A':
+            return rng.integers(0, 4, n), [f'X{k}' for k in range(4)]
+        digits = column.width - 1 - (int(column.fmt.split('.')[1]) + 1 if '.' in column.fmt else 0)
+        return rng.integers(0, 10 ** max(min(digits, 9), 0), n)
+    return generate
+
+
+def format_column(column: MRTColumn, values) -> np.ndarray:
+    """Format generated values into the column's (n, width) byte block."""
+    if isinstance(values, np.ndarray) and values.ndim == 2:
+        return values
+    if column.kind == 'A':
+        codes, vocabulary = values
+        return format_text(codes, vocabulary, column.width)
+    decimals = int(column.fmt.split('.')[1]) if '.' in column.fmt else 0
+    if column.kind == 'E':
+        return format_exponent(values, column.width, decimals)
+    return format_fixed(values, column.width, decimals)
+
+
+def paper_layout(paper: str) -> Tuple[bytes, List[MRTColumn]]:
+    """Header bytes and columns of a paper's table: the shipped file's, or PAPER_B_HEADER."""
+    source = HERE / MRT_FILES[paper]
+    if source.exists():
+        columns, data_offset = read_mrt_header(str(source))
+        return source.read_bytes()[:data_offset], columns
+    if paper != 'B':
+        raise FileNotFoundError(source)
+    header = PAPER_B_HEADER.encode('ascii')
+    with tempfile.NamedTemporaryFile(suffix='_mrt.txt') as f:
+        f.write(header + b'\n')
+        f.flush()
+        columns, _ = read_mrt_header(f.name)
+    return header, columns
+
+
+def write_synthetic_mrt(paper: str, n_rows: int, target, seed: int = 0) -> Path:
+    """
+    Write an n_rows table in the layout of Paper `paper` ('A', 'B' or 'C').
+
+    Rows are generated CHUNK_ROWS at a time, so memory stays flat at any
+    size, and each chunk is seeded from (seed, chunk number).
+    """
+    target = Path(target)
+    header, columns = paper_layout(paper)
+    width = record_width(columns)
+    profiles = PROFILES[paper]
+
+    with open(target, 'wb') as f:
+        f.write(header)
+        for chunk, start in enumerate(range(0, n_rows, CHUNK_ROWS)):
+            n = min(CHUNK_ROWS, n_rows - start)
+            rng = np.random.default_rng([seed, chunk])
+            ctx = {
+                'index': np.arange(start, start + n, dtype=np.int64),
+                'ra': rng.uniform(0, 360, n),
+                'dec': np.degrees(np.arcsin(rng.uniform(*np.sin(np.radians(DEC_RANGE[paper])), n))),
+            }
+            buf = np.full((n, width + 1), _SPACE, dtype=np.uint8)
+            buf[:, -1] = ord('\n')
+            for column in columns:
+                generate = profiles.get(column.label) or _generic(column)
+                block = format_column(column, generate(rng, n, ctx))
+                if column.null is not None:
+                    null = rng.random(n) < NULL_FRACTION
+                    block[null] = np.frombuffer(column.null.encode('ascii').rjust(column.width), dtype=np.uint8)
+                buf[:, column.start:column.end] = block
+            f.write(buf.tobytes())
+    return target
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        print("Usage: python3 synthetic_mrt.py <A|B|C> <rows> <output file> [seed]")
+        sys.exit(1)
+    path = write_synthetic_mrt(sys.argv[1], int(sys.argv[2]), sys.argv[3],
+                               int(sys.argv[4]) if len(sys.argv) > 4 else 0)
+    print(f"✓ Wrote {path} ({path.stat().st_size / 1e6:.1f} MB)")
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from binning import UNKNOWN, bin_columns, bin_values
+from yso_utils import categorize_variability
+
+
+def old_categorize_variability(df, col='delW2mag'):
+    """The per-row labelling categorize_variability replaced."""
+    def label(x):
+        if pd.isna(x):
+            return 'Unknown'
+        if x < 0.2:
+            return 'Low'
+        if x < 0.5:
+            return 'Medium'
+        return 'High'
+    return df[col].apply(label)
+
+
+def test_missing_values_are_unknown():
+    values = np.array([0.1, np.nan, 0.3, np.nan, 0.7])
+    binned = bin_values(values, edges=[0.2, 0.5], labels=['Low', 'Medium', 'High'])
+    assert list(binned) == ['Low', UNKNOWN, 'Medium', UNKNOWN, 'High']
+    assert list(binned.categories) == ['Low', 'Medium', 'High', UNKNOWN]
+    assert binned.codes.dtype == np.int8
+
+    kept = bin_values(pd.Series(values), edges=[0.2, 0.5], unknown=None)
+    assert kept.isna().tolist() == [False, True, False, True, False]
+    assert list(kept.categories) == ['< 0.2', '0.2 to 0.5', '>= 0.5']
+
+
+def test_categorize_variability_matches_old_labels():
+    rng = np.random.default_rng(51)
+    amplitude = rng.exponential(0.4, 5000)
+    amplitude[::11] = np.nan
+    # Values on the edges go to the upper bin
+    amplitude[:4] = [0.2, 0.5, np.nextafter(0.2, 0), np.nextafter(0.5, 0)]
+    df = pd.DataFrame({'delW2mag': amplitude})
+    new = categorize_variability(df)
+    assert new.astype(str).tolist() == old_categorize_variability(df).tolist()
+    assert new[:4].tolist() == ['Medium', 'High', 'Low', 'Medium']
+
+
+def test_quantile_bins():
+    rng = np.random.default_rng(52)
+    values = rng.normal(size=3000)
+    values[::7] = np.nan
+    binned = bin_values(values, quantiles=3)
+    counts = pd.Series(binned).value_counts()
+    assert counts[UNKNOWN] == np.isnan(values).sum()
+    assert counts.drop(UNKNOWN).max() - counts.drop(UNKNOWN).min() <= 1
+    edges = np.quantile(values[~np.isnan(values)], [1 / 3, 2 / 3])
+    assert list(binned.categories[:3]) == [f'< {edges[0]:g}', f'{edges[0]:g} to {edges[1]:g}', f'>= {edges[1]:g}']
+
+
+def test_quantiles_of_all_missing_column():
+    binned = bin_values(np.full(5, np.nan), quantiles=3)
+    assert list(binned) == [UNKNOWN] * 5
+    assert list(binned.categories) == ['Q1', 'Q2', 'Q3', UNKNOWN]
+    labelled = bin_values(np.full(5, np.nan), quantiles=3, labels=['Bright', 'Intermediate', 'Faint'])
+    assert list(labelled.categories) == ['Bright', 'Intermediate', 'Faint', UNKNOWN]
+
+    # A chunk with no magnitudes bins like any other
+    df = pd.DataFrame({'delW2mag': [0.1, np.nan], 'W2magMean': [np.nan, np.nan], 'slope': [np.nan, np.nan]})
+    binned = bin_columns(df)
+    assert binned['W2magMean'].tolist() == [UNKNOWN, UNKNOWN]
+    assert not any('nan' in str(c) for c in binned['slope'].cat.categories)
+
+    with pytest.raises(ValueError):
+        bin_values([1.0, 2.0], edges=[np.nan])
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog import PAPER_B_SCHEMA, Catalog, Field, _round_to_format
+from phase2_filtering import parse_paper_b
+from synthetic_mrt import write_synthetic_mrt
+
+
+def printed(values, fmt):
+    """Values as an MRT reader gets them back from text written with `fmt`."""
+    decimals = int(fmt.split('.')[1])
+    out = np.full(len(values), np.nan)
+    ok = np.isfinite(values)
+    out[ok] = np.char.mod(f'%.{decimals}e', values[ok]).astype(np.float64)
+    return out
+
+
+@pytest.mark.parametrize('fmt', ['E10.3', 'E11.4'])
+def test_exponent_rounding_matches_printed_text(fmt):
+    rng = np.random.default_rng(7)
+    values = rng.standard_normal(200_000) * 10.0 ** rng.integers(-15, 15, 200_000)
+    values[:6] = [0.0, np.nan, 1e3, 9.99995e3, -1e-7, 123456.5]
+    np.testing.assert_array_equal(_round_to_format(values, fmt), printed(values, fmt))
+
+
+@pytest.mark.parametrize('fmt', ['E10.3', 'E11.4'])
+def test_exponent_fields_round_trip_through_float32(fmt):
+    rng = np.random.default_rng(8)
+    values = printed(rng.standard_normal(50_000) * 10.0 ** rng.integers(-9, 9, 50_000), fmt)
+    values[::97] = np.nan
+    frame = pd.DataFrame({'slope': values})
+    catalog = Catalog.from_frame(frame, [Field('slope', 'float32', fmt)])
+    assert catalog.schema == [Field('slope', 'float32', fmt)]
+    pd.testing.assert_frame_equal(catalog.to_frame(), frame)
+
+
+def test_paper_b_round_trip_keeps_float32(tmp_path, monkeypatch):
+    monkeypatch.setenv('YSO_CACHE', '0')
+    mrt = tmp_path / 'paper_b.txt'
+    write_synthetic_mrt('B', 5000, mrt, seed=4)
+    df = parse_paper_b(str(mrt))
+    catalog = Catalog.from_frame(df, PAPER_B_SCHEMA)
+    pd.testing.assert_frame_equal(catalog.to_frame(), df)
+    kinds = {field.name: field.kind for field in catalog.schema}
+    assert kinds['slope'] == kinds['e_slope'] == 'float32'
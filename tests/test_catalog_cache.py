@@ -0,0 +1,115 @@
+import importlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog_cache import CatalogCache
+
+PARSER_SOURCE = '''
+import pandas as pd
+
+calls = []
+
+
+def parse(path, scale=1):
+    calls.append(path)
+    df = pd.read_csv(path)
+    df['value'] = df['value'] * scale
+    df['kind'] = df['kind'].astype('category')
+    df['count'] = df['count'].astype('Int64')
+    return df
+'''
+
+
+@pytest.fixture
+def parser(tmp_path, monkeypatch):
+    """A parser in its own module, so tests can edit its source."""
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    (tmp_path / 'fake_parser.py').write_text(PARSER_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module('fake_parser')
+    yield module
+    sys.modules.pop('fake_parser', None)
+
+
+def write_table(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    count = pd.array(rng.integers(0, 50, rows), dtype='Int64')
+    count[::7] = pd.NA
+    pd.DataFrame({'name': [f'J{k:05d}' if k % 9 else None for k in range(rows)],
+                  'value': rng.normal(size=rows),
+                  'kind': rng.choice(['Linear', 'Burst', 'Dip'], rows),
+                  'count': count}).to_csv(path, index=False)
+    return path
+
+
+def test_hit_and_miss(tmp_path, parser):
+    cache = CatalogCache(tmp_path / 'cache')
+    table = write_table(tmp_path / 'a.csv', 500)
+    first = cache.load(str(table), parser.parse)
+    second = cache.load(str(table), parser.parse)
+    assert len(parser.calls) == 1
+    pd.testing.assert_frame_equal(second, first)
+    # Arguments are part of the key
+    scaled = cache.load(str(table), parser.parse, scale=2)
+    assert len(parser.calls) == 2
+    np.testing.assert_allclose(scaled['value'], 2 * first['value'])
+    cache.load(str(table), parser.parse, scale=2)
+    assert len(parser.calls) == 2
+
+
+def test_source_file_change_invalidates(tmp_path, parser):
+    cache = CatalogCache(tmp_path / 'cache')
+    table = write_table(tmp_path / 'a.csv', 500)
+    cache.load(str(table), parser.parse)
+
+    # Same content, new mtime: re-hashed, still a hit
+    st = table.stat()
+    os.utime(table, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    cache.load(str(table), parser.parse)
+    assert len(parser.calls) == 1
+
+    write_table(table, 500, seed=1)
+    changed = cache.load(str(table), parser.parse)
+    assert len(parser.calls) == 2
+    pd.testing.assert_frame_equal(changed, parser.parse(str(table)))
+
+
+def test_parser_code_change_invalidates(tmp_path, parser):
+    cache = CatalogCache(tmp_path / 'cache')
+    table = write_table(tmp_path / 'a.csv', 500)
+    before = cache.load(str(table), parser.parse)
+
+    (tmp_path / 'fake_parser.py').write_text(PARSER_SOURCE.replace("* scale", "* scale + 1"))
+    edited = importlib.reload(parser)
+    after = cache.load(str(table), edited.parse)
+    assert len(edited.calls) == 1
+    np.testing.assert_allclose(after['value'], before['value'] + 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, parser, monkeypatch):
+    tables = [write_table(tmp_path / f'{name}.csv', 2000, seed=k) for k, name in enumerate('abc')]
+    probe = CatalogCache(tmp_path / 'probe')
+    probe.load(str(tables[0]), parser.parse)
+    entry = probe.total_bytes()
+
+    # Room for two entries
+    cache = CatalogCache(tmp_path / 'cache', max_bytes=int(2.5 * entry))
+    clock = iter(range(1_000_000, 2_000_000, 1000))
+    monkeypatch.setattr('catalog_cache.time.time', lambda: next(clock))
+    cache.load(str(tables[0]), parser.parse)
+    cache.load(str(tables[1]), parser.parse)
+    cache.load(str(tables[0]), parser.parse)     # a is now more recent than b
+    cache.load(str(tables[2]), parser.parse)     # evicts b
+    assert cache.total_bytes() <= cache.max_bytes
+    entries = cache._read_index()['entries'].values()
+    assert sorted(e['source'] for e in entries) == [str(tables[0].resolve()), str(tables[2].resolve())]
+
+    calls = len(parser.calls)
+    cache.load(str(tables[0]), parser.parse)
+    assert len(parser.calls) == calls
+    cache.load(str(tables[1]), parser.parse)
+    assert len(parser.calls) == calls + 1
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalog_index
+from catalog import Catalog
+from catalog_index import Bitmap, BitmapIndex, CatalogIndex, KeyIndex, SortedIndex
+from catalog_stream import col
+
+N = 20_000
+LABELS = ['ClassI', 'ClassII', 'ClassIII', 'FS', None]
+
+
+@pytest.fixture(scope='module')
+def table():
+    rng = np.random.default_rng(11)
+    dec = np.round(rng.uniform(-90, 90, N), 1)      # ties
+    dec[rng.random(N) < 0.05] = np.nan
+    amp = rng.exponential(0.5, N)
+    amp[rng.random(N) < 0.1] = np.nan
+    return pd.DataFrame({
+        'DEdeg': dec,
+        'delW2mag': amp,
+        'YSO_CLASS': rng.choice(np.array(LABELS, dtype=object), N, p=[0.1, 0.4, 0.2, 0.2, 0.1]),
+        'Objname': [f'J{k:06d}' for k in rng.permutation(N)],   # past MAX_BITMAP_LABELS: a KeyIndex
+    })
+
+
+def random_term(rng, table):
+    """One leaf predicate over a range, bitmap or key column."""
+    kind = rng.integers(6)
+    if kind == 0:
+        op = rng.choice(['>', '>=', '<', '<=', '==', '!='])
+        return getattr(col('DEdeg'), {'>': '__gt__', '>=': '__ge__', '<': '__lt__', '<=': '__le__',
+                                      '==': '__eq__', '!=': '__ne__'}[op])(float(np.round(rng.uniform(-95, 95), 1)))
+    if kind == 1:
+        low = float(rng.uniform(0, 2))
+        return col('delW2mag').between(low, low + float(rng.exponential(0.3)))
+    if kind == 2:
+        return col('YSO_CLASS') == str(rng.choice(LABELS[:-1] + ['Unknown']))
+    if kind == 3:
+        return col('YSO_CLASS').isin(list(rng.choice(LABELS[:-1], rng.integers(1, 4), replace=False)))
+    if kind == 4:
+        names = table['Objname'].to_numpy()[rng.integers(0, N, rng.integers(1, 40))]
+        return col('Objname').isin(list(names) + ['J999999'])
+    return col(str(rng.choice(['DEdeg', 'delW2mag', 'YSO_CLASS']))).notna()
+
+
+def random_predicate(rng, table, depth=3):
+    if depth == 0 or rng.random() < 0.3:
+        return random_term(rng, table)
+    kind = rng.integers(4)
+    left = random_predicate(rng, table, depth - 1)
+    if kind == 0:
+        return left & random_predicate(rng, table, depth - 1)
+    if kind == 1:
+        return left | random_predicate(rng, table, depth - 1)
+    if kind == 2:
+        return ~left
+    # Selective key lookup ANDed with anything: the probe path
+    return random_term(rng, table) & (col('Objname') == table['Objname'].iloc[int(rng.integers(N))]) | left
+
+
+@pytest.mark.parametrize('kind', ['frame', 'catalog'])
+def test_index_matches_scan(table, kind):
+    rng = np.random.default_rng(12)
+    source = table if kind == 'frame' else Catalog.from_frame(table)
+    index = CatalogIndex(source)
+    for _ in range(300):
+        where = random_predicate(rng, table)
+        expected = np.flatnonzero(where(table))
+        np.testing.assert_array_equal(index.rows(where), expected, err_msg=where.text)
+        assert index.count(where) == len(expected), where.text
+    kinds = {name: type(index.index(name)) for name in table.columns}
+    assert kinds == {'DEdeg': SortedIndex, 'delW2mag': SortedIndex, 'YSO_CLASS': BitmapIndex, 'Objname': KeyIndex}
+
+
+def test_bitmap_count_without_bitwise_count(monkeypatch):
+    mask = np.random.default_rng(13).random(1001) < 0.3
+    bitmap = Bitmap.from_mask(mask)
+    expected = int(mask.sum())
+    assert bitmap.count() == expected
+    monkeypatch.setattr(catalog_index, '_HAS_BITWISE_COUNT', False)
+    assert bitmap.count() == expected
+    assert (~bitmap).count() == len(mask) - expected
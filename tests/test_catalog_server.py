@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog_client import QueryError, request
+from catalog_server import CatalogService, serve
+from phase2_filtering import parse_paper_b
+from synthetic_mrt import MRT_FILES, write_synthetic_mrt
+
+WHERE = "YSO_CLASS == 'ClassI' and DEdeg > -30"
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    """Papers B and C only, so reload() has to skip the missing Paper A table."""
+    root = tmp_path_factory.mktemp('mrt')
+    write_synthetic_mrt('B', 3000, root / MRT_FILES['B'], seed=1)
+    write_synthetic_mrt('C', 500, root / MRT_FILES['C'], seed=2)
+    return root
+
+
+@pytest.fixture(scope='module')
+def server(data_dir):
+    file_mapping = {paper: str(data_dir / name) for paper, name in MRT_FILES.items()}
+    service = CatalogService(file_mapping, crossmatch=False)
+    httpd = serve(service, host='127.0.0.1', port=0, quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(scope='module')
+def table_b(data_dir):
+    return parse_paper_b(str(data_dir / MRT_FILES['B']))
+
+
+@pytest.fixture(scope='module')
+def paper_b(table_b):
+    return table_b[(table_b['YSO_CLASS'] == 'ClassI') & (table_b['DEdeg'] > -30)]
+
+
+def test_missing_tables_are_skipped(server):
+    assert set(request({'op': 'tables'}, server)['result']) == {'B', 'C'}
+    reloaded = request({'op': 'reload'}, server)['result']
+    assert reloaded['missing'] == ['A']
+    with pytest.raises(QueryError, match='unknown table'):
+        request({'op': 'count', 'table': 'A'}, server)
+
+
+def test_count(server, paper_b):
+    reply = request({'op': 'count', 'table': 'B', 'where': WHERE}, server)
+    assert reply['result'] == {'count': len(paper_b)}
+
+
+def test_filter(server, paper_b):
+    columns = ['Objname', 'RAdeg', 'DEdeg']
+    result = request({'op': 'filter', 'table': 'B', 'where': WHERE, 'columns': columns,
+                      'limit': 25}, server)['result']
+    assert result['count'] == len(paper_b)
+    assert result['columns'] == columns
+    expected = paper_b[columns].head(25)
+    assert [row[0] for row in result['rows']] == expected['Objname'].tolist()
+    np.testing.assert_allclose([row[1:] for row in result['rows']], expected[['RAdeg', 'DEdeg']])
+
+
+def test_crosstab(server, table_b):
+    result = request({'op': 'crosstab', 'table': 'B', 'where': "DEdeg > -30",
+                      'row': 'YSO_CLASS', 'col': 'LCType'}, server)['result']
+    got = pd.DataFrame(result['data'], index=result['index'], columns=result['columns'])
+    selected = table_b[table_b['DEdeg'] > -30]
+    expected = pd.crosstab(selected['YSO_CLASS'], selected['LCType'])
+    pd.testing.assert_frame_equal(got, expected, check_names=False, check_dtype=False)
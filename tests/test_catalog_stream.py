@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from catalog_index import CatalogIndex
+from catalog_stream import col, parse_predicate, stream_to_csv
+from mrt_reader import read_mrt_header
+from phase2_filtering import iter_paper_b, parse_paper_b
+from synthetic_mrt import write_synthetic_mrt
+
+
+def test_negation_never_matches_missing_values():
+    df = pd.DataFrame({'LCType': ['Linear', None, 'Other', 'Linear'] * 500,
+                       'delW2mag': [0.1, 0.5, np.nan, 1.5] * 500})
+    index = CatalogIndex(df)
+    cases = {
+        "not LCType == 'Linear'": [2],
+        "not (delW2mag > 1 or LCType == 'Other')": [0],
+        "not notna(delW2mag)": [2],
+    }
+    for text, expected in cases.items():
+        where = parse_predicate(text)
+        rows = np.flatnonzero(where(df))
+        assert sorted(set(rows % 4)) == expected, text
+        np.testing.assert_array_equal(index.rows(where), rows)
+    assert (~(col('LCType') == 'Linear'))(df).sum() == 500
+
+
+def test_streamed_csv_matches_whole_table_with_blank_integer(tmp_path, monkeypatch):
+    monkeypatch.setenv('YSO_CACHE', '0')
+    mrt = tmp_path / 'paper_b.txt'
+    write_synthetic_mrt('B', 3000, mrt)
+    # Blank one Number field, in the third of the streamed chunks
+    columns, offset = read_mrt_header(str(mrt))
+    number = next(c for c in columns if c.label == 'Number')
+    data = bytearray(mrt.read_bytes())
+    row = offset + 2500 * (data.index(b'\n', offset) + 1 - offset)
+    data[row + number.start:row + number.end] = b' ' * number.width
+    mrt.write_bytes(bytes(data))
+
+    parse_paper_b(str(mrt)).to_csv(tmp_path / 'whole.csv', index=False)
+    stream_to_csv(iter_paper_b(str(mrt), chunk_rows=1000), {tmp_path / 'streamed.csv': None})
+    assert (tmp_path / 'streamed.csv').read_bytes() == (tmp_path / 'whole.csv').read_bytes()
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import catalog_versions
+from catalog_stream import select, write_csv
+from catalog_versions import VersionStore
+from phase2_filtering import OUTPUT_FILTERS, parse_paper_b
+from synthetic_mrt import write_synthetic_mrt
+from yso_utils import get_summary_statistics
+
+LINEAR = 'PaperB_Linear'
+
+
+def objname(line: bytes) -> bytes:
+    return line[:19]
+
+
+@pytest.fixture
+def versions(tmp_path, monkeypatch):
+    """
+    Paper B v1 and a v2 with one row added, one removed and one changed.
+    The removed row was in PaperB_Linear; the changed one joins it.
+    """
+    monkeypatch.setenv('YSO_CACHE', '0')
+    v1, v2 = tmp_path / 'paper_b_v1.txt', tmp_path / 'paper_b_v2.txt'
+    write_synthetic_mrt('B', 2000, v1, seed=3)
+    df = parse_paper_b(str(v1))
+    linear = np.asarray(OUTPUT_FILTERS[LINEAR](df))
+    north = (df['DEdeg'] > -30).to_numpy()
+    removed = df['Objname'][linear].iloc[0]
+    changed = df['Objname'][north & ~linear & (df['LCType'] != 'Linear').to_numpy()].iloc[0]
+
+    text = v1.read_bytes()
+    header_end = text.index(b'\n', text.rindex(b'-' * 80)) + 1
+    header, rows = text[:header_end], text[header_end:].splitlines(keepends=True)
+    names = [objname(line).strip().decode() for line in rows]
+    out = []
+    for name, line in zip(names, rows):
+        if name == removed:
+            continue
+        if name == changed:
+            line = line[:175] + b'Linear   ' + line[184:]
+        out.append(line)
+    out.append(b'J000000.00+000000.0' + out[0][19:])
+    v2.write_bytes(header + b''.join(out))
+    return v1, v2, removed, changed
+
+
+def test_ingest_matches_full_recompute(versions, tmp_path):
+    v1, v2, removed, changed = versions
+    store = VersionStore(tmp_path / 'store', tmp_path / 'out')
+    store.ingest('B', v1, crossmatch=False)
+    delta = store.ingest('B', v2, crossmatch=False)
+    assert (len(delta.added), len(delta.removed), len(delta.changed_new)) == (1, 1, 1)
+    assert delta.changes[['Objname', 'column', 'new']].values.tolist() == [[changed, 'LCType', 'Linear']]
+
+    full = parse_paper_b(str(v2))
+    expected = select(full, OUTPUT_FILTERS[LINEAR])
+    assert changed in expected['Objname'].tolist() and removed not in expected['Objname'].tolist()
+    write_csv(expected, tmp_path / 'expected.csv')
+    assert (tmp_path / 'out' / f'{LINEAR}.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
+
+    stats = store.statistics()
+    for view, frame in (('PaperB', full), (LINEAR, expected)):
+        want = get_summary_statistics(frame)
+        got = stats[view]
+        assert got['total_objects'] == want['total_objects']
+        assert got['yso_classes'] == want['yso_classes']
+        assert got['lc_types'] == want['lc_types']
+        for key in ['mean_w2_mag', 'std_w2_mag', 'mean_variability', 'std_variability']:
+            assert got[key] == pytest.approx(want[key], rel=1e-9)
+
+    pd.testing.assert_frame_equal(store.crosstab('PaperB', 'YSO_CLASS', 'LCType'),
+                                  pd.crosstab(full['YSO_CLASS'], full['LCType']),
+                                  check_names=False, check_dtype=False, check_index_type=False,
+                                  check_column_type=False)
+
+    # The same file again is not a new version
+    assert store.ingest('B', v2, crossmatch=False) is None
+    assert store.manifest()['papers']['B']['version'] == 2
+
+
+def test_failed_ingest_leaves_outputs_and_state(versions, tmp_path, monkeypatch):
+    v1, v2, _, _ = versions
+    store = VersionStore(tmp_path / 'store', tmp_path / 'out')
+    store.ingest('B', v1, crossmatch=False)
+    csv = tmp_path / 'out' / f'{LINEAR}.csv'
+    before = csv.read_bytes()
+
+    def fail(manifest):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(store, '_write_manifest', fail)
+    with pytest.raises(OSError):
+        store.ingest('B', v2, crossmatch=False)
+    assert csv.read_bytes() == before
+    assert sorted(p.name for p in (tmp_path / 'out').iterdir()) == sorted([f'{LINEAR}.csv',
+                                                                           catalog_versions.STATISTICS_FILE])
+    assert store.manifest()['papers']['B']['version'] == 1
+    assert sorted(p.name for p in (tmp_path / 'store' / 'B').iterdir()) == ['state-v0001', 'v0002']
+
+    # The next attempt applies v2 in full
+    monkeypatch.undo()
+    monkeypatch.setenv('YSO_CACHE', '0')
+    delta = VersionStore(tmp_path / 'store', tmp_path / 'out').ingest('B', v2, crossmatch=False)
+    assert delta and len(delta.added) == 1
+    assert csv.read_bytes() != before
+    assert np.array_equal(pd.read_csv(csv)['Objname'].to_numpy(),
+                          select(parse_paper_b(str(v2)), OUTPUT_FILTERS[LINEAR])['Objname'].to_numpy())
@@ -0,0 +1,75 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from count_cube import CountCube, dec_band
+from yso_utils import categorize_variability, normalize_for_chord
+
+AXES = ['YSO_CLASS', 'LCType', 'Variability', 'DecBand']
+
+
+@pytest.fixture(scope='module')
+def table():
+    rng = np.random.default_rng(41)
+    n = 5000
+    df = pd.DataFrame({
+        'YSO_CLASS': rng.choice(np.array(['ClassI', 'ClassII', 'ClassIII', 'FS', None], dtype=object), n),
+        'LCType': rng.choice(np.array(['Linear', 'Curved', 'Burst', 'Dip', 'Irregular'], dtype=object), n),
+        'delW2mag': rng.exponential(0.4, n),
+        'DEdeg': rng.uniform(-90, 90, n),
+    })
+    df.loc[::13, 'delW2mag'] = np.nan
+    df.loc[::29, 'DEdeg'] = np.nan
+    df.loc[7, 'DEdeg'] = -30.0
+    return df
+
+
+def labelled(df):
+    """The table with the cube's derived axes as plain columns."""
+    return df.assign(Variability=categorize_variability(df), DecBand=dec_band(df))
+
+
+def test_crosstabs_equal_pandas(table):
+    cube = CountCube.from_frame(table)
+    assert cube.total == len(table)
+    full = labelled(table)
+    for row, col in itertools.permutations(AXES, 2):
+        expected = pd.crosstab(full[row], full[col])
+        pd.testing.assert_frame_equal(cube.crosstab(row, col), expected, check_names=False,
+                                      check_index_type=False, check_column_type=False, check_categorical=False)
+    # -30 itself is in the southern band, as in the DEdeg > -30 cut
+    assert dec_band(table.iloc[[7]])[0] == '<= -30'
+
+
+@pytest.mark.parametrize('preserve', [True, False])
+def test_chord_matrix_equals_normalize_for_chord(table, preserve):
+    cube = CountCube.from_frame(table)
+    full = labelled(table)
+    expected = normalize_for_chord(pd.crosstab(full['YSO_CLASS'], full['Variability']), preserve)
+    matrix, labels = cube.chord_matrix('YSO_CLASS', 'Variability', preserve)
+    np.testing.assert_allclose(matrix, expected)
+    crosstab = cube.crosstab('YSO_CLASS', 'Variability')
+    assert labels == ([f'YSO_CLASS:{v}' for v in crosstab.index] + [f'Variability:{v}' for v in crosstab.columns])
+
+
+def test_appending_equals_one_pass(table):
+    one_pass = CountCube.from_frame(table, Paper='B')
+    # Chunks see their categories in a different order, some only late
+    chunks = [table[table['LCType'] == 'Linear'], table[table['LCType'] != 'Linear'].iloc[::-1]]
+    appended = CountCube()
+    for chunk in chunks:
+        for start in range(0, len(chunk), 700):
+            appended.append(chunk.iloc[start:start + 700], Paper='B')
+    assert appended.total == one_pass.total
+    for row, col in itertools.permutations(AXES + ['Paper'], 2):
+        pd.testing.assert_frame_equal(appended.crosstab(row, col), one_pass.crosstab(row, col))
+
+    # Taking rows back out gives the cube of the rest
+    appended.remove(chunks[0], Paper='B')
+    rest = CountCube.from_frame(chunks[1], Paper='B')
+    for row, col in itertools.combinations(AXES, 2):
+        pd.testing.assert_frame_equal(appended.crosstab(row, col), rest.crosstab(row, col))
+    with pytest.raises(ValueError):
+        appended.remove(chunks[0], Paper='B')
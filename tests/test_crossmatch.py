@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from crossmatch import SkyGrid, build_master_table, crossmatch_members, match_pairs
+
+
+def separation_arcsec(ra1, dec1, ra2, dec2):
+    """Haversine separation, independent of the unit-vector chord the grid uses."""
+    ra1, dec1, ra2, dec2 = map(np.radians, (ra1, dec1, ra2, dec2))
+    h = np.sin((dec2 - dec1) / 2) ** 2 + np.cos(dec1) * np.cos(dec2) * np.sin((ra2 - ra1) / 2) ** 2
+    return np.degrees(2 * np.arcsin(np.sqrt(h))) * 3600
+
+
+def offset(ra, dec, arcsec, angle):
+    """Position `arcsec` away from (ra, dec) towards position angle `angle` (small-offset approximation)."""
+    d = arcsec / 3600
+    return ra + d * np.sin(angle) / np.cos(np.radians(dec)), dec + d * np.cos(angle)
+
+
+def components(n, i, j):
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(i, j):
+        parent[find(a)] = find(b)
+    roots = [find(x) for x in range(n)]
+    return pd.factorize(np.array(roots))[0]
+
+
+def test_pairs_across_grid_cells():
+    rng = np.random.default_rng(21)
+    ra = rng.uniform(0, 360, 3000)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, 3000)))
+    ra2, dec2 = offset(ra, dec, 0.95, rng.uniform(0, 2 * np.pi, 3000))
+    grid = SkyGrid(ra2, dec2, 1.0)
+    # Most pairs sit in different cells: only the neighbouring-cell lookups find them
+    crossing = (grid._cells(grid.xyz) != grid._cells(SkyGrid(ra, dec, 1.0).xyz)).any(axis=1)
+    assert crossing.sum() > 1000
+
+    i, j, sep = grid.query(ra, dec)
+    found = set(zip(i.tolist(), j.tolist()))
+    assert all((k, k) in found for k in range(3000))
+    np.testing.assert_allclose(sep[i == j], separation_arcsec(ra[i[i == j]], dec[i[i == j]],
+                                                               ra2[j[i == j]], dec2[j[i == j]]), atol=1e-6)
+
+
+def test_ra_wraparound_and_poles():
+    ra1 = np.array([359.99990, 0.00005, 10.0, 0.0])
+    dec1 = np.array([0.0, 45.0, 89.99990, -89.99995])
+    ra2 = np.array([0.00010, 359.99990, 190.0, 180.0])
+    dec2 = np.array([0.0, 45.0, 89.99990, -89.99995])
+    i, j, sep = match_pairs(ra1, dec1, ra2, dec2, 1.0)
+    assert sorted(zip(i.tolist(), j.tolist())) == [(0, 0), (1, 1), (2, 2), (3, 3)]
+    order = np.argsort(i)
+    np.testing.assert_allclose(sep[order], separation_arcsec(ra1, dec1, ra2, dec2), atol=1e-6)
+    assert sep.max() < 1.0
+
+
+def test_chained_matches_form_one_source():
+    # a - b and b - c are 0.8" apart; a - c is 1.6", beyond the radius
+    ra_b, dec_b = 120.0, 30.0
+    ra_a, dec_a = offset(ra_b, dec_b, 0.8, 0.0)
+    ra_c, dec_c = offset(ra_b, dec_b, 0.8, np.pi)
+    lonely = (121.0, 30.0)
+    catalogs = {
+        'A': pd.DataFrame({'RAdeg': [ra_a, lonely[0]], 'DEdeg': [dec_a, lonely[1]], 'name': ['a', 'lonely']}),
+        'B': pd.DataFrame({'RAdeg': [ra_b], 'DEdeg': [dec_b], 'name': ['b']}),
+        'C': pd.DataFrame({'RAdeg': [ra_c], 'DEdeg': [dec_c], 'name': ['c']}),
+    }
+    assert not len(match_pairs([ra_a], [dec_a], [ra_c], [dec_c], 1.0)[0])
+    members = crossmatch_members(catalogs, 1.0)
+    assert members['source_id'].tolist() == [0, 1, 0, 0]
+
+    master = build_master_table(catalogs, 1.0)
+    assert len(master) == 2
+    chain = master.iloc[0]
+    assert chain['n_members'] == 3 and chain['in_A'] and chain['in_B'] and chain['in_C']
+    assert (chain['name_A'], chain['name_B'], chain['name_C']) == ('a', 'b', 'c')
+    # Position from the first catalog in priority order
+    assert (chain['RAdeg'], chain['DEdeg']) == (ra_a, dec_a)
+    assert master.iloc[1][['in_B', 'in_C']].tolist() == [False, False]
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(22)
+    n = 400
+    # A 60" patch straddling RA 0 (at Dec 60 an arcsec of RA is 0.5" on the sky), with pairs and chains
+    ra = (rng.uniform(-60, 60, n) / 3600) % 360
+    dec = 60 + rng.uniform(-30, 30, n) / 3600
+    radius = 1.5
+
+    sep = separation_arcsec(ra[:, None], dec[:, None], ra[None, :], dec[None, :])
+    close = sep <= radius
+    ambiguous = np.abs(sep - radius) < 1e-6
+    i, j, found_sep = match_pairs(ra, dec, ra, dec, radius)
+    found = np.zeros((n, n), dtype=bool)
+    found[i, j] = True
+    assert not ((found != close) & ~ambiguous).any()
+    assert len(i) == found.sum()      # no pair reported twice
+    np.testing.assert_allclose(found_sep, sep[i, j], atol=1e-6)
+
+    ii, jj = np.nonzero(close & ~np.eye(n, dtype=bool))
+    expected = components(n, ii, jj)
+    members = crossmatch_members({'A': pd.DataFrame({'RAdeg': ra[:200], 'DEdeg': dec[:200]}),
+                                  'B': pd.DataFrame({'RAdeg': ra[200:], 'DEdeg': dec[200:]})}, radius)
+    np.testing.assert_array_equal(members['source_id'].to_numpy(), expected)
+    sizes = np.bincount(expected)
+    assert (sizes == 2).any() and (sizes > 2).any() and (sizes == 1).any()
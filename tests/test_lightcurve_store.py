@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightcurve_store import LightCurveStore
+from ztf_analysis import BANDS, LightCurves
+
+
+def batch(names, sizes, seed):
+    """LightCurves for `names` with `sizes` epochs each, mjd shuffled within a source."""
+    rng = np.random.default_rng(seed)
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    n = int(offsets[-1])
+    return LightCurves(np.array(names, dtype=object), offsets, rng.uniform(58000, 60000, n),
+                       rng.uniform(14, 19, n), rng.uniform(0.01, 0.1, n), rng.integers(0, len(BANDS), n))
+
+
+def expected(batches, name):
+    """All epochs of `name` over the batches, in append order."""
+    frames = []
+    for curves in batches:
+        for k, source in enumerate(curves.names):
+            if source == name:
+                rows = slice(curves.offsets[k], curves.offsets[k + 1])
+                frames.append(pd.DataFrame({'mjd': curves.mjd[rows], 'mag': curves.mag[rows],
+                                            'err': curves.err[rows],
+                                            'band': np.array(BANDS, dtype=object)[curves.band[rows]]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    first = batch(['J0', 'J1', 'J2'], [4, 0, 6], seed=1)
+    second = batch(['J2', 'J3', 'J0'], [3, 5, 2], seed=2)
+    store = LightCurveStore(tmp_path / 'store')
+    store.append(first, pd.DataFrame({'Objname': ['J0', 'J2'], 'SPICY_ID': [100, 102]}))
+    store.append(second, pd.DataFrame({'Objname': ['J3'], 'OBSID': ['obs-3']}))
+    return store, [first, second]
+
+
+def test_lookup(store):
+    store, _ = store
+    assert [store.lookup(name) for name in ['J0', 'J1', 'J2', 'J3']] == [0, 1, 2, 3]
+    assert store.lookup(102) == store.lookup('102') == 2
+    assert store.lookup('obs-3') == 3
+    assert store.lookup('J9') is None
+    assert 'obs-3' in store and 'J9' not in store
+
+
+def test_append_chains_segments(store):
+    store, batches = store
+    assert len(store) == 4
+    assert not store.is_compact
+    np.testing.assert_array_equal(store.n_epochs(), [6, 0, 9, 5])
+    for name in ['J0', 'J2', 'J3']:
+        pd.testing.assert_frame_equal(store.get(name), expected(batches, name))
+    assert store.get('J1').empty
+
+
+def test_append_survives_reopen(store, tmp_path):
+    store, batches = store
+    reopened = LightCurveStore(tmp_path / 'store')
+    assert reopened.lookup('obs-3') == 3
+    pd.testing.assert_frame_equal(reopened.get('J2'), expected(batches, 'J2'))
+
+
+def test_select(store):
+    store, batches = store
+    curves = store.select(['J3', 102, 'J0'])
+    assert curves.names.tolist() == ['J3', 'J2', 'J0']
+    np.testing.assert_array_equal(np.diff(curves.offsets), [5, 9, 6])
+    for k, name in enumerate(curves.names):
+        rows = slice(curves.offsets[k], curves.offsets[k + 1])
+        np.testing.assert_array_equal(curves.mjd[rows], expected(batches, name)['mjd'])
+    with pytest.raises(KeyError):
+        store.select(['J0', 'J9'])
+
+
+def test_select_repeated_key_appears_once(store):
+    store, _ = store
+    curves = store.select(['J2', 'J0', 'J2', '102'])
+    assert curves.names.tolist() == ['J2', 'J0']
+    np.testing.assert_array_equal(np.diff(curves.offsets), [9, 6])
+    assert len(curves.mjd) == curves.offsets[-1]
+
+
+def test_compact(store, tmp_path):
+    store, batches = store
+    before = {name: store.get(name) for name in ['J0', 'J1', 'J2', 'J3']}
+    store.compact()
+    assert store.is_compact
+    for name, frame in before.items():
+        got = store.get(name)
+        assert np.all(np.diff(got['mjd']) >= 0)
+        pd.testing.assert_frame_equal(got, frame.sort_values('mjd', ignore_index=True))
+    # Consecutive sources of a compact store are views of the same columns
+    curves = store.curves(0, 4)
+    np.testing.assert_array_equal(np.diff(curves.offsets), [6, 0, 9, 5])
+    assert store.select(['J0', 'J1', 'J2', 'J3']).mjd.tolist() == curves.mjd.tolist()
+
+    # Appending after compaction chains onto the new generation
+    extra = batch(['J1'], [3], seed=3)
+    store.append(extra)
+    assert not store.is_compact
+    reopened = LightCurveStore(tmp_path / 'store')
+    pd.testing.assert_frame_equal(reopened.get('J1'), expected([extra], 'J1'))
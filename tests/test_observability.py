@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from observability import (SITES, Constraints, airmass, mjd_to_iso, night_grid, observability_table, schedule,
+                           visibility)
+
+PALOMAR = SITES['palomar']
+
+
+@pytest.fixture(scope='module')
+def grid():
+    return night_grid('2026-01-10', 3, PALOMAR)
+
+
+@pytest.fixture(scope='module')
+def candidates():
+    rng = np.random.default_rng(81)
+    n = 120
+    return pd.DataFrame({
+        'Objname': [f'J{k:04d}' for k in range(n)],
+        'RAdeg': rng.uniform(0, 360, n),
+        'DEdeg': rng.uniform(-35, 75, n),
+        'r_mean': rng.uniform(14, 18, n),
+        'r_priority': rng.choice(['HIGH', 'MEDIUM', 'LOW', 'TOO_FAINT'], n),
+        'is_fading': rng.random(n) < 0.2,
+    })
+
+
+def test_circumpolar_altitude_near_latitude(grid):
+    ra, dec = np.array([40.0, 250.0]), np.array([89.8, 75.0])
+    vis = visibility(ra, dec, grid, 0)
+    # 0.2 deg from the pole: within that (and precession since J2000) of the latitude all night
+    assert np.abs(vis.altitude[0] - PALOMAR.lat).max() < 0.2 + 0.3
+    assert vis.altitude[1].min() > PALOMAR.lat - 15 - 0.3
+    assert np.isfinite(vis.airmass).all()
+
+    # Same as the textbook formula in hour angle
+    lat, d, h = np.radians(PALOMAR.lat), np.radians(dec)[:, None], np.radians(vis.hour_angle)
+    expected = np.degrees(np.arcsin(np.sin(lat) * np.sin(d) + np.cos(lat) * np.cos(d) * np.cos(h)))
+    np.testing.assert_allclose(vis.altitude, expected, atol=1e-6)
+
+    full = visibility(ra, dec, grid)
+    assert full.altitude.shape == (2,) + grid.mjd.shape
+    np.testing.assert_allclose(full.altitude[:, 0], vis.altitude)
+
+
+def test_schedule_respects_constraints(grid, candidates):
+    constraints = Constraints(max_airmass=1.8)
+    result, unscheduled = schedule(candidates, grid, constraints)
+    assert len(result) > 20
+    assert result['Objname'].is_unique
+    assert len(result) + len(unscheduled) == (candidates['r_priority'] != 'TOO_FAINT').sum()
+
+    by_name = candidates.set_index('Objname')
+    iso = mjd_to_iso(grid.mjd)
+    for _, night in result.groupby('night'):
+        # In time order, each observation starts after the previous one ends
+        assert (night['start_utc'].to_numpy()[1:] >= night['end_utc'].to_numpy()[:-1]).all()
+    for row in result.itertuples():
+        k = int(np.flatnonzero(grid.dates == row.night)[0])
+        start = int(np.flatnonzero(iso[k] == row.start_utc)[0])
+        # Every slot of the exposure is dark and within the airmass limit
+        length = int(round((np.datetime64(row.end_utc) - np.datetime64(row.start_utc))
+                           / np.timedelta64(1, 'm') / grid.step_min))
+        slots = np.arange(start, start + length)
+        assert grid.dark[k, slots].all()
+        source = by_name.loc[row.Objname]
+        vis = visibility([source['RAdeg']], [source['DEdeg']], grid, k)
+        assert (vis.airmass[0, slots] < constraints.max_airmass).all()
+        assert row.airmass < constraints.max_airmass
+    assert result[['night', 'start_utc']].equals(result[['night', 'start_utc']].sort_values(['night', 'start_utc']))
+
+    table = observability_table(candidates, grid, constraints)
+    observable = table.set_index('Objname')
+    assert (observable.loc[result['Objname'], 'nights_observable'] > 0).all()
+    assert (observable.loc[result['Objname'], 'best_airmass'] < constraints.max_airmass).all()
+
+
+def test_too_faint_targets_never_scheduled(grid, candidates):
+    faint = candidates.assign(r_priority='TOO_FAINT')
+    result, unscheduled = schedule(faint, grid)
+    assert result.empty and unscheduled.empty
+
+    result, unscheduled = schedule(candidates, grid)
+    assert 'TOO_FAINT' not in set(result['r_priority']) | set(unscheduled['r_priority'])
+    # Even when it is the only target up
+    weight = np.where(candidates['r_priority'] == 'TOO_FAINT', 0.0, 1.0)
+    result, _ = schedule(candidates, grid, weight=weight)
+    assert not result['Objname'].isin(candidates.loc[weight == 0, 'Objname']).any()
+
+
+def test_airmass():
+    assert airmass(90.0) == pytest.approx(1.0, abs=1e-3)
+    assert airmass(30.0) == pytest.approx(1.995, abs=0.01)
+    assert np.isinf(airmass([0.0, -10.0])).all()
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mock_photometry_server import MockPhotometryServer
+from photometry_client import PhotometryClient, fetch_light_curves, fetch_light_curves_async
+
+
+def positions(n):
+    return np.linspace(10.0, 80.0, n), np.linspace(-20.0, 60.0, n)
+
+
+def test_retries_through_injected_503s():
+    ra, dec = positions(40)
+
+    async def run():
+        async with MockPhotometryServer(error_rate=0.3, seed=1) as server:
+            async with PhotometryClient(server.url, cache_dir=None, concurrency=8, retries=8,
+                                        backoff=0.001) as client:
+                bodies, errors = await client.fetch_many(ra, dec)
+            return bodies, errors, client.stats, server.requests
+
+    bodies, errors, stats, served = asyncio.run(run())
+    assert not errors
+    assert all(body.startswith(b'oid,mjd') for body in bodies)
+    assert stats['retries'] > 0
+    assert served == stats['requests'] == len(ra) + stats['retries']
+
+
+def test_concurrency_is_bounded():
+    ra, dec = positions(30)
+
+    async def run():
+        async with MockPhotometryServer(latency=0.02) as server:
+            async with PhotometryClient(server.url, cache_dir=None, concurrency=4) as client:
+                await client.fetch_many(ra, dec)
+                opened = client._pool.opened
+            return server.max_active, opened
+
+    max_active, opened = asyncio.run(run())
+    assert 1 < max_active <= 4
+    assert opened <= 4
+
+
+def test_cached_responses_are_not_fetched_again(tmp_path):
+    ra, dec = positions(12)
+
+    async def run():
+        async with MockPhotometryServer() as server:
+            results = []
+            for _ in range(2):
+                async with PhotometryClient(server.url, cache_dir=tmp_path) as client:
+                    bodies, _ = await client.fetch_many(ra, dec)
+                results.append((bodies, dict(client.stats)))
+            return results
+
+    (first, first_stats), (second, second_stats) = asyncio.run(run())
+    assert first_stats['requests'] == 12 and first_stats['cache_hits'] == 0
+    assert second_stats['requests'] == 0 and second_stats['cache_hits'] == 12
+    assert first == second
+
+
+@pytest.fixture
+def threaded_server():
+    """A mock server on its own event loop in a background thread."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = asyncio.run_coroutine_threadsafe(MockPhotometryServer().start(), loop).result()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def test_sync_fetch_works_inside_a_running_loop(tmp_path, threaded_server):
+    sources = pd.DataFrame({'Objname': ['a', 'b', 'a'], 'RAdeg': [10.0, 20.0, 10.0], 'DEdeg': [5.0, 6.0, 5.0]})
+
+    async def notebook_cell():
+        # As in Jupyter: a blocking call made while this thread's loop is running
+        curves, errors = fetch_light_curves(sources, threaded_server.url, cache_dir=tmp_path / 'a')
+        direct, _ = await fetch_light_curves_async(sources, threaded_server.url, cache_dir=tmp_path / 'b')
+        return curves, errors, direct
+
+    curves, errors, direct = asyncio.run(notebook_cell())
+    assert not errors
+    assert curves.names.tolist() == ['a', 'b']
+    assert threaded_server.requests == 4
+    np.testing.assert_array_equal(curves.mjd, direct.mjd)
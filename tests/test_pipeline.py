@@ -0,0 +1,60 @@
+import pytest
+
+from pipeline import MRT_FILES, Pipeline, build_stages
+from synthetic_mrt import write_synthetic_mrt
+
+SIZES = {'A': 800, 'B': 1500, 'C': 400}
+
+
+@pytest.fixture
+def dirs(tmp_path, monkeypatch):
+    monkeypatch.setenv('YSO_CACHE', '0')
+    data, out = tmp_path / 'data', tmp_path / 'out'
+    data.mkdir()
+    for paper, name in MRT_FILES.items():
+        write_synthetic_mrt(paper, SIZES[paper], data / name, seed=1)
+    return data, out
+
+
+def run(data, out, **params):
+    return Pipeline(build_stages(data, out, params), out / '.pipeline', processes=1).run()
+
+
+def test_incremental_reruns(dirs):
+    data, out = dirs
+    first = run(data, out)
+    assert set(first) == {'parse_A', 'parse_B', 'parse_C', 'phase1', 'filter_A', 'filter_B', 'filter_C',
+                          'crossmatch'}
+    assert set(first.values()) == {'ran'}
+    master = out / 'culled_csvs' / 'ZTF_Master_Crossmatched.csv'
+    assert master.exists()
+
+    # Nothing changed
+    assert set(run(data, out).values()) == {'skipped'}
+
+    # A phase2 parameter reruns the filters that use it, and what reads their outputs
+    status = run(data, out, **{'phase2.dec_min': -20})
+    assert {name for name, s in status.items() if s == 'ran'} == {'filter_A', 'filter_B', 'crossmatch'}
+
+    # A new Paper C table reruns its parse and everything downstream of it
+    write_synthetic_mrt('C', SIZES['C'], data / MRT_FILES['C'], seed=2)
+    status = run(data, out, **{'phase2.dec_min': -20})
+    assert {name for name, s in status.items() if s == 'ran'} == {'parse_C', 'filter_C', 'crossmatch'}
+
+    # Rewriting a table with the same content changes its mtime, not its digest
+    write_synthetic_mrt('B', SIZES['B'], data / MRT_FILES['B'], seed=1)
+    assert set(run(data, out, **{'phase2.dec_min': -20}).values()) == {'skipped'}
+
+    # A deleted output makes its stage stale again
+    master.unlink()
+    status = run(data, out, **{'phase2.dec_min': -20})
+    assert {name for name, s in status.items() if s == 'ran'} == {'crossmatch'}
+    assert master.exists()
+
+
+def test_missing_table_blocks_downstream(dirs):
+    data, out = dirs
+    (data / MRT_FILES['A']).unlink()
+    status = run(data, out)
+    assert status['parse_A'] == status['filter_A'] == status['crossmatch'] == 'blocked'
+    assert status['parse_B'] == status['phase1'] == status['filter_C'] == 'ran'
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from render_farm import FigureSpec, figure_set, render_all, spec_digest
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(71)
+    n = 400
+    base = rng.normal(size=n)
+    return pd.DataFrame({
+        'W2magMean': 12 + base,
+        'delW2mag': np.abs(base * 0.3 + rng.normal(scale=0.1, size=n)),
+        'slope': rng.normal(size=n),
+        'YSO_CLASS': rng.choice(['ClassI', 'ClassII', 'FS'], n),
+        'LCType': rng.choice(['Linear', 'Curved', 'Burst'], n),
+    })
+
+
+def mark_rendered(specs):
+    """Outputs and digests as a previous render would have left them."""
+    for spec in specs:
+        spec.output.parent.mkdir(parents=True, exist_ok=True)
+        spec.output.write_bytes(b'png')
+        spec.output.with_name(spec.output.name + '.digest').write_text(spec_digest(spec) + '\n')
+
+
+def test_current_figures_are_skipped(table, tmp_path):
+    specs = figure_set(table, tmp_path / 'PaperB')
+    assert len(specs) == 5
+    assert set(render_all(specs, dry_run=True).values()) == {'pending'}
+
+    mark_rendered(specs)
+    assert set(render_all(specs, dry_run=True).values()) == {'skipped'}
+    assert set(render_all(specs, dry_run=True, force=True).values()) == {'pending'}
+
+    # A style change, a changed matrix or a lost output means re-rendering
+    restyled = figure_set(table, tmp_path / 'PaperB', style={'dpi': 150})
+    assert set(render_all(restyled, dry_run=True).values()) == {'pending'}
+    changed = figure_set(table.assign(slope=table['slope'] + table['W2magMean']), tmp_path / 'PaperB')
+    status = render_all(changed, dry_run=True)
+    assert status[str(tmp_path / 'PaperB' / 'correlation_heatmap.png')] == 'pending'
+    assert status[str(tmp_path / 'PaperB' / 'chord_yso_class_vs_lightcurve.png')] == 'skipped'
+    specs[0].output.unlink()
+    assert render_all(specs, dry_run=True)[str(specs[0].output)] == 'pending'
+
+    with pytest.raises(ValueError):
+        render_all(specs + specs[:1], dry_run=True)
+
+
+def test_second_render_skips_and_style_change_rerenders(table, tmp_path):
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('seaborn')
+    pytest.importorskip('cachai')
+    specs = figure_set(table, tmp_path / 'PaperB', style={'dpi': 40, 'figsize': [4, 4]})
+    first = render_all(specs, processes=1)
+    assert set(first.values()) == {'rendered'}
+    mtimes = {spec.output: spec.output.stat().st_mtime_ns for spec in specs}
+
+    assert set(render_all(specs, processes=1).values()) == {'skipped'}
+    assert {spec.output: spec.output.stat().st_mtime_ns for spec in specs} == mtimes
+
+    restyled = [spec._replace(style={**spec.style, 'dpi': 50}) for spec in specs]
+    assert set(render_all(restyled, processes=2).values()) == {'rendered'}
+    assert set(render_all(restyled, processes=2).values()) == {'skipped'}
+
+    broken = FigureSpec('heatmap', np.ones((2, 3)), tmp_path / 'broken.png', labels=['a', 'b'])
+    assert render_all([broken], processes=1)[str(broken.output)] == 'failed'
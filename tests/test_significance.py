@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from significance import contingency_significance, correlation_significance
+from yso_utils import compute_correlation_matrix
+
+
+@pytest.fixture(scope='module')
+def sample():
+    rng = np.random.default_rng(31)
+    n = 300
+    base = rng.normal(size=n)
+    df = pd.DataFrame({
+        'strong': base,
+        'linked': base + rng.normal(scale=0.5, size=n),
+        'noise': rng.normal(size=n),
+        'tied': np.round(base),
+        'YSO_CLASS': np.where(base > 0.5, 'ClassI', rng.choice(['ClassII', 'FS'], n)),
+        'LCType': np.where(base > 0.5, 'Burst', rng.choice(['Linear', 'Dip'], n)),
+    })
+    df.loc[::17, 'noise'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman'])
+def test_correlation_reproducible_serial_and_pool(sample, method):
+    columns = ['strong', 'linked', 'noise', 'tied']
+    kwargs = dict(columns=columns, method=method, n_resamples=300, seed=7, batch_size=64)
+    serial = correlation_significance(sample, processes=1, **kwargs)
+    pd.testing.assert_frame_equal(correlation_significance(sample, processes=1, **kwargs), serial)
+    pd.testing.assert_frame_equal(correlation_significance(sample, processes=2, **kwargs), serial)
+    other = correlation_significance(sample, processes=1, **{**kwargs, 'seed': 8})
+    assert not np.array_equal(other['ci_low'], serial['ci_low'])
+
+    expected = compute_correlation_matrix(sample, columns, method=method)
+    pairs = serial.set_index(['var1', 'var2'])
+    assert pairs.loc[('strong', 'linked'), 'r'] == pytest.approx(expected.loc['strong', 'linked'])
+    assert (serial['ci_low'] <= serial['r']).all() and (serial['r'] <= serial['ci_high']).all()
+    assert pairs.loc[('strong', 'linked'), 'p_value'] == pytest.approx(1 / 301)
+    assert pairs.loc[('strong', 'noise'), 'p_value'] > 0.01
+    assert (serial['n'] == sample[columns].dropna().shape[0]).all()
+    assert (serial['n_resamples'] == 300).all()
+
+
+def test_contingency_reproducible_serial_and_pool(sample):
+    kwargs = dict(n_resamples=300, seed=3, batch_size=64)
+    serial = contingency_significance(sample, 'YSO_CLASS', 'LCType', processes=1, **kwargs)
+    again = contingency_significance(sample, 'YSO_CLASS', 'LCType', processes=1, **kwargs)
+    pooled = contingency_significance(sample, 'YSO_CLASS', 'LCType', processes=2, **kwargs)
+    for result in (again, pooled):
+        pd.testing.assert_frame_equal(result, serial)
+        assert result.attrs == serial.attrs
+
+    table = pd.crosstab(sample['YSO_CLASS'], sample['LCType'])
+    counts = serial.set_index(['YSO_CLASS', 'LCType'])['count']
+    assert counts.unstack().loc[table.index, table.columns].to_numpy().tolist() == table.to_numpy().tolist()
+    assert serial.attrs['chi2_p_value'] == pytest.approx(1 / 301)
+    assert ((serial['ci_low'] <= serial['count']) & (serial['count'] <= serial['ci_high'])).all()
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation_engine import CorrelationAccumulator, accumulate, stream_correlation
+from synthetic_mrt import write_synthetic_mrt
+from yso_utils import compute_correlation_matrix, iter_mrt_file, parse_mrt_file
+
+COLUMNS = ['a', 'b', 'c', 'd']
+
+
+@pytest.fixture(scope='module')
+def sample():
+    """Correlated columns with ties in 'd' and about 10% NaN per column."""
+    rng = np.random.default_rng(5)
+    n = 5000
+    base = rng.normal(size=n)
+    df = pd.DataFrame({
+        'a': base * 3 + 100,
+        'b': base + rng.normal(scale=0.5, size=n),
+        'c': np.exp(rng.normal(size=n)) - base,
+        'd': np.round(base * 2),
+    })
+    for column in COLUMNS:
+        df.loc[rng.random(n) < 0.1, column] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman'])
+def test_correlation_matches_pandas_listwise(sample, method):
+    got = compute_correlation_matrix(sample, COLUMNS, method=method)
+    pd.testing.assert_frame_equal(got, sample.dropna().corr(method=method), rtol=1e-10, atol=1e-12)
+
+
+def test_correlation_pairwise(sample):
+    got = compute_correlation_matrix(sample, COLUMNS, pairwise=True)
+    pd.testing.assert_frame_equal(got, sample.corr(), rtol=1e-10, atol=1e-12)
+    # Pairwise Spearman ranks each column over its present values
+    got = compute_correlation_matrix(sample, COLUMNS, method='spearman', pairwise=True)
+    pd.testing.assert_frame_equal(got, sample.rank().corr(), rtol=1e-10, atol=1e-12)
+
+
+@pytest.mark.parametrize('pairwise', [False, True])
+def test_chunked_merge_matches_one_pass(sample, pairwise):
+    chunks = [sample.iloc[start:start + 700] for start in range(0, len(sample), 700)]
+    # Merge per-chunk accumulators out of order, as worker results would arrive
+    merged = CorrelationAccumulator(COLUMNS, pairwise)
+    for chunk in chunks[::-1]:
+        merged.merge(accumulate([chunk], COLUMNS, pairwise))
+    expected = sample.corr() if pairwise else sample.dropna().corr()
+    pd.testing.assert_frame_equal(merged.correlation(), expected, rtol=1e-10, atol=1e-12)
+
+    got = stream_correlation(lambda: iter(chunks), COLUMNS, method='spearman', pairwise=pairwise)
+    expected = sample.rank().corr() if pairwise else sample.dropna().corr(method='spearman')
+    pd.testing.assert_frame_equal(got, expected, rtol=1e-10, atol=1e-12)
+
+
+def test_missing_required_paper_b_label_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.setenv('YSO_CACHE', '0')
+    mrt = tmp_path / 'paper_b.txt'
+    write_synthetic_mrt('B', 200, mrt)
+    assert (parse_mrt_file(str(mrt))['LCType'] != 'Unknown').any()
+
+    # Rename the LCType label in the header only
+    mrt.write_bytes(mrt.read_bytes().replace(b' LCType ', b' LCKind ', 1))
+    with pytest.raises(ValueError, match='LCType'):
+        parse_mrt_file(str(mrt))
+    with pytest.raises(ValueError, match='LCType'):
+        next(iter_mrt_file(str(mrt)))
+    # Columns the caller does not ask for are not required
+    assert len(parse_mrt_file(str(mrt), usecols=['Objname', 'DEdeg'])) == 200
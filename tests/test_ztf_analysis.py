@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ztf_analysis
+from ztf_analysis import (
+    LightCurves, analyze_sources, classify_trends, fit_segments, fit_trends, load_light_curves,
+    pack_light_curves, synthetic_light_curves,
+)
+
+
+def make_sources(n: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Objname': [f'J{k:04d}' for k in range(n)],
+        'RAdeg': np.linspace(80.0, 90.0, n),
+        'DEdeg': np.linspace(-20.0, 10.0, n),
+        'YSO_CLASS': ['ClassII'] * n,
+        'W2magMean': np.full(n, 11.0),
+    })
+
+
+# Injected truth: (r_mean, r_slope mag/yr, color_slope mag/yr, expected r_priority)
+INJECTED = [
+    (15.0, 0.50, 0.00, 'HIGH'),
+    (16.0, -0.30, 0.20, 'MEDIUM'),
+    (16.8, 0.00, -0.25, 'LOW'),
+    (18.0, 0.35, 0.05, 'TOO_FAINT'),
+    (15.2, 0.10, 0.30, 'HIGH'),
+]
+
+
+@pytest.fixture(scope='module')
+def injected():
+    sources = make_sources(len(INJECTED))
+    r_mean, r_slope, color_slope, _ = map(np.array, zip(*INJECTED))
+    curves, truth = synthetic_light_curves(sources, seed=3, epochs=(150, 200), r_mean=r_mean,
+                                           r_slope=r_slope, color_slope=color_slope)
+    return sources, curves, truth
+
+
+def test_synthetic_truth_reports_injected_values(injected):
+    _, curves, truth = injected
+    assert curves.n_sources == len(INJECTED)
+    np.testing.assert_allclose(truth['r_mean'], [row[0] for row in INJECTED])
+    np.testing.assert_allclose(truth['r_slope'], [row[1] for row in INJECTED])
+    np.testing.assert_allclose(truth['color_slope'], [row[2] for row in INJECTED])
+
+
+def test_fit_trends_recovers_injected_rates(injected):
+    _, curves, truth = injected
+    trends = fit_trends(curves)
+
+    fading = trends['fading_mag_per_year'].to_numpy()
+    color = trends['color_change_1yr'].to_numpy()
+    np.testing.assert_allclose(fading, truth['r_slope'], atol=0.03)
+    np.testing.assert_allclose(color, truth['color_slope'], atol=0.05)
+    assert np.all(np.abs(fading - truth['r_slope']) < 5 * trends['fading_err'])
+    # r_mean is the weighted mean over the epochs; the truth is the mid-baseline magnitude
+    np.testing.assert_allclose(trends['r_mean'], truth['r_mean'], atol=0.2)
+    assert np.all(trends['baseline_days'] > 700)
+
+
+def test_classification_of_injected_sources(injected):
+    sources, curves, _ = injected
+    results = analyze_sources(sources, curves).set_index('Objname')
+
+    assert results['r_priority'].tolist() == [row[3] for row in INJECTED]
+    assert results['is_fading'].tolist() == [r_slope > 0.2 for _, r_slope, _, _ in INJECTED]
+    assert results['is_reddening_bluing'].tolist() == [abs(color) > 0.1 for _, _, color, _ in INJECTED]
+    assert results['fading_status'].iloc[1].startswith('BRIGHTENING')
+    assert results['color_status'].iloc[2].startswith('BLUEING')
+    assert results['color_status'].iloc[4].startswith('REDDENING')
+
+
+def test_classify_thresholds_are_parameters(injected):
+    _, curves, _ = injected
+    strict = classify_trends(fit_trends(curves), fading_threshold=1.0, color_threshold=1.0)
+    assert not strict['is_fading'].any()
+    assert not strict['is_reddening_bluing'].any()
+
+
+def test_fit_segments_is_exact_on_noiseless_lines():
+    t = np.tile(np.linspace(-1.0, 1.0, 5), 3)
+    segment = np.repeat(np.arange(3), 5)
+    slopes = np.array([0.4, -1.5, 0.0])
+    y = 12.0 + slopes[segment] * t
+    fit = fit_segments(t, y, np.full_like(t, 0.02), segment, 4)
+
+    np.testing.assert_allclose(fit['slope'][:3], slopes, atol=1e-12)
+    np.testing.assert_allclose(fit['mean'][:3], 12.0)
+    assert fit['n'].tolist() == [5, 5, 5, 0]
+    assert np.isnan(fit['slope'][3])
+
+
+def test_pack_light_curves_matches_sources():
+    frames = {
+        'a': pd.DataFrame({'mjd': [1.0, 2.0], 'mag': [15.0, 15.1], 'err': [0.01, 0.01], 'band': ['g', 'r']}),
+        'b': pd.DataFrame({'mjd': [3.0], 'mag': [16.0], 'err': [0.02], 'band': ['r']}),
+    }
+    curves = pack_light_curves(frames)
+    assert curves.names.tolist() == ['a', 'b']
+    assert curves.offsets.tolist() == [0, 2, 3]
+    assert curves.band.tolist() == [ztf_analysis.G, ztf_analysis.R, ztf_analysis.R]
+    assert curves.sources(1, 2).mag.tolist() == [16.0]
+
+
+def test_missing_photometry_origin_is_an_error(tmp_path):
+    sources = make_sources(3)
+    with pytest.raises(ValueError):
+        load_light_curves(sources)
+
+    input_file = tmp_path / 'sources.csv'
+    sources.to_csv(input_file, index=False)
+    with pytest.raises(ValueError):
+        ztf_analysis.main(input_file, tmp_path / 'out')
+    assert not (tmp_path / 'out' / 'spectroscopy_candidates.csv').exists()
+
+
+def test_synthetic_run_is_opt_in(tmp_path):
+    input_file = tmp_path / 'sources.csv'
+    make_sources(4).to_csv(input_file, index=False)
+    results = ztf_analysis.main(input_file, tmp_path / 'out', synthetic=True)
+    assert len(results) == 4
+    assert (tmp_path / 'out' / 'spectroscopy_candidates.csv').exists()
+    curves = load_light_curves(make_sources(4), synthetic=True)
+    assert isinstance(curves, LightCurves) and curves.n_sources == 4
+
+
+def test_duplicate_objnames_keep_one_row_per_source():
+    # Paper C lists one row per observation, so Objnames repeat
+    sources = make_sources(3)
+    sources = sources.iloc[[0, 1, 1, 2, 1, 0]].reset_index(drop=True)
+    curves, _ = synthetic_light_curves(sources, seed=5)
+    assert curves.n_sources == len(sources)
+
+    results = analyze_sources(sources, curves)
+    assert results['Objname'].tolist() == sources['Objname'].tolist()
+    first = results.drop_duplicates('Objname').set_index('Objname')['fading_mag_per_year']
+    np.testing.assert_array_equal(results['fading_mag_per_year'], first.loc[results['Objname']])
+
+
+def test_pack_light_curves_drops_unknown_bands():
+    frames = {
+        'a': pd.DataFrame({'mjd': [1.0, 2.0], 'mag': [15.0, 15.1], 'err': [0.01, 0.01], 'band': ['zi', 'r']}),
+        'b': pd.DataFrame({'mjd': [3.0, 4.0], 'mag': [16.0, 16.1], 'err': [0.02, 0.02], 'band': [None, 'g']}),
+    }
+    curves = pack_light_curves(frames)
+    assert curves.offsets.tolist() == [0, 1, 2]
+    assert curves.mjd.tolist() == [2.0, 4.0]
+    assert curves.band.tolist() == [ztf_analysis.R, ztf_analysis.G]
+
+    coded = {'a': pd.DataFrame({'mjd': [1.0], 'mag': [15.0], 'err': [0.01], 'band': [len(ztf_analysis.BANDS)]})}
+    with pytest.raises(ValueError):
+        pack_light_curves(coded)
+
+
+def test_sources_without_photometry_are_unknown():
+    frames = {
+        'a': pd.DataFrame({'mjd': [1.0, 400.0, 800.0] * 2, 'mag': [15.0, 15.01, 15.0] * 2,
+                           'err': [0.01] * 6, 'band': ['r'] * 3 + ['g'] * 3}),
+        'b': pd.DataFrame({'mjd': [], 'mag': [], 'err': [], 'band': []}),
+    }
+    results = classify_trends(fit_trends(pack_light_curves(frames)))
+    assert results.loc['a', 'fading_status'] == 'STABLE'
+    assert bool(results.loc['a', 'is_fading']) is False
+    assert results.loc['b', 'fading_status'] == 'UNKNOWN'
+    assert results.loc['b', 'color_status'] == 'UNKNOWN'
+    assert pd.isna(results.loc['b', 'is_fading']) and pd.isna(results.loc['b', 'is_reddening_bluing'])
+    assert results[results['is_fading']].empty
@@ -1,90 +1,135 @@
 import pandas as pd
 import numpy as np
-from pathlib import Path
-from typing import Tuple, Dict, List
+from typing import Dict, Iterator, List
 
-def parse_mrt_file(filepath: str) -> pd.DataFrame:
+from binning import VARIABILITY_BINS, bin_values
+from catalog_cache import cached_catalog
+from instrumentation import instrumented
+from correlation_engine import CorrelationAccumulator, RankTransform
+from mrt_reader import DEFAULT_CHUNK_ROWS, iter_mrt_chunks, read_mrt_columns, read_mrt_header
+
+# Columns kept from the Paper B (apjsadc397t2_mrt.txt) table, by MRT label
+PAPER_B_COLUMNS = [
+    'Objname', 'RAdeg', 'DEdeg', 'SED_SLOPE', 'YSO_CLASS', 'Number',
+    'W2magMean', 'W2magMed', 'sig_W2Flux', 'err_W2Flux', 'delW2mag',
+    'Period', 'FLP_LSP_BOOT', 'slope', 'e_slope', 'r_value', 'LCType'
+]
+# Labels the filters and joins depend on; the measurement columns may be
+# absent from a header and come back as NaN
+PAPER_B_REQUIRED = ['Objname', 'RAdeg', 'DEdeg', 'YSO_CLASS', 'LCType']
+
+def _check_labels(filepath: str, labels: List[str], usecols: List[str]) -> None:
+    missing = [label for label in PAPER_B_REQUIRED if label in usecols and label not in labels]
+    if missing:
+        raise ValueError(f"{filepath}: MRT header has no {', '.join(missing)} column "
+                         f"(required Paper B labels: {', '.join(PAPER_B_REQUIRED)})")
+
+def _paper_b_frame(cols: Dict[str, np.ndarray], usecols: List[str]) -> pd.DataFrame:
+    df = pd.DataFrame(cols)
+    df = df[df['Objname'].str.startswith(('J', 'L'))].reset_index(drop=True)
+    df = df.reindex(columns=usecols)
+    
+    # Blank text fields are missing values (e.g. an unclassified YSO_CLASS)
+    text_cols = df.select_dtypes(exclude=[np.number]).columns
+    df[text_cols] = df[text_cols].replace('', np.nan)
+    if 'LCType' in df.columns:
+        df['LCType'] = df['LCType'].fillna('Unknown')
+    
+    return df
+
+@instrumented
+@cached_catalog
+def parse_mrt_file(filepath: str, usecols: List[str] = None) -> pd.DataFrame:
     """
     Parse MRT table format for different paper sources.
-    Handles Papers B & C format (Tab-separated with J/L prefixed objects).
+    Handles Papers B & C format (J/L prefixed objects), decoding the fixed-width
+    columns described in the file's byte-by-byte header.
+    
+    Args:
+        filepath: Path to the *_mrt.txt file
+        usecols: Subset of PAPER_B_COLUMNS to return. If None, returns all of them
+    
+    Raises:
+        ValueError: If a Paper B table's header lacks a PAPER_B_REQUIRED label
     """
-    data = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
+    if usecols is None:
+        usecols = PAPER_B_COLUMNS
     
-    for line in lines:
-        if line.startswith('J') or line.startswith('L'):
-            parts = line.split()
-            if len(parts) >= 16:
-                try:
-                    data.append({
-                        'Objname': parts[0],
-                        'RAdeg': float(parts[1]),
-                        'DEdeg': float(parts[2]),
-                        'SED_SLOPE': float(parts[3]) if parts[3] != '?' else np.nan,
-                        'YSO_CLASS': parts[4],
-                        'Number': int(parts[5]),
-                        'W2magMean': float(parts[6]),
-                        'W2magMed': float(parts[7]),
-                        'sig_W2Flux': float(parts[8]),
-                        'err_W2Flux': float(parts[9]),
-                        'delW2mag': float(parts[10]),
-                        'Period': float(parts[11]),
-                        'FLP_LSP_BOOT': float(parts[12]),
-                        'slope': float(parts[13]),
-                        'e_slope': float(parts[14]),
-                        'r_value': float(parts[15]),
-                        'LCType': parts[-1] if len(parts) > 21 else 'Unknown'
-                    })
-                except (ValueError, IndexError):
-                    continue
+    labels = [col.label for col in read_mrt_header(filepath)[0]]
+    if 'Objname' not in labels:
+        return pd.DataFrame(columns=usecols)
+    _check_labels(filepath, labels, usecols)
     
-    return pd.DataFrame(data)
+    cols = read_mrt_columns(filepath, usecols=list(dict.fromkeys(['Objname'] + usecols)))
+    return _paper_b_frame(cols, usecols)
 
-def compute_correlation_matrix(df: pd.DataFrame, columns: List[str] = None, standardize: bool = True) -> pd.DataFrame:
+def iter_mrt_file(filepath: str, usecols: List[str] = None,
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
     """
-    Compute Pearson correlation matrix for specified columns.
-    Handles NaN values by dropping rows with missing data.
+    Chunked counterpart of parse_mrt_file, yielding DataFrames of about
+    `chunk_rows` rows so large tables can be filtered without loading them whole.
+    """
+    if usecols is None:
+        usecols = PAPER_B_COLUMNS
+    
+    labels = [col.label for col in read_mrt_header(filepath)[0]]
+    if 'Objname' not in labels:
+        yield pd.DataFrame(columns=usecols)
+        return
+    _check_labels(filepath, labels, usecols)
+    
+    for cols in iter_mrt_chunks(filepath, list(dict.fromkeys(['Objname'] + usecols)), chunk_rows):
+        yield _paper_b_frame(cols, usecols)
+
+@instrumented
+def compute_correlation_matrix(df: pd.DataFrame, columns: List[str] = None, standardize: bool = True,
+                               method: str = 'pearson', pairwise: bool = False) -> pd.DataFrame:
+    """
+    Compute Pearson (or Spearman) correlation matrix for specified columns.
+    Handles NaN values by dropping rows with missing data, or per pair with
+    pairwise=True. Built on the mergeable co-moment accumulator in
+    correlation_engine, so chunked/streamed tables give the same result.
     
     Args:
         df: DataFrame with data
         columns: Columns to correlate. If None, uses all numeric columns
-        standardize: If True, standardize (z-score) columns before correlation to prevent
-                   variables with large scales from dominating
+        standardize: Kept for compatibility. Correlation is scale-invariant, so
+                   z-scoring never changes the result and is no longer done
+        method: 'pearson' or 'spearman' (Pearson on average ranks)
+        pairwise: If True, each pair uses all rows where both values are present
     """
     if columns is None:
         columns = df.select_dtypes(include=[np.number]).columns.tolist()
+    if method not in ('pearson', 'spearman'):
+        raise ValueError(f"method must be 'pearson' or 'spearman', got {method!r}")
     
-    subset = df[columns].dropna()
-    
-    if standardize:
-        subset = (subset - subset.mean()) / subset.std()
-    
-    return subset.corr()
+    acc = CorrelationAccumulator(columns, pairwise=pairwise)
+    if method == 'spearman':
+        acc.update_values(RankTransform(columns, pairwise=pairwise).update(df).transform(df))
+    else:
+        acc.update(df)
+    return acc.correlation()
 
-def categorize_variability(df: pd.DataFrame, col: str = 'delW2mag') -> pd.Series:
+@instrumented
+def categorize_variability(df: pd.DataFrame, col: str = 'delW2mag', edges: List[float] = None,
+                           labels: List[str] = None) -> pd.Series:
     """
     Categorize sources by variability amplitude.
-    Low: < 0.2 mag, Medium: 0.2-0.5 mag, High: > 0.5 mag
+    Low: < 0.2 mag, Medium: 0.2-0.5 mag, High: > 0.5 mag, Unknown: missing.
+    Returns a categorical Series (int8 codes); see binning.bin_values for
+    other edges, quantile bins and several columns at once.
     """
-    categories = []
-    for val in df[col]:
-        if pd.isna(val):
-            categories.append('Unknown')
-        elif val < 0.2:
-            categories.append('Low')
-        elif val < 0.5:
-            categories.append('Medium')
-        else:
-            categories.append('High')
-    return pd.Series(categories, index=df.index)
+    return pd.Series(bin_values(df[col], edges=edges or VARIABILITY_BINS['edges'],
+                                labels=labels or VARIABILITY_BINS['labels']), index=df.index)
 
+@instrumented
 def create_contingency_table(df: pd.DataFrame, col1: str, col2: str) -> pd.DataFrame:
     """
     Create contingency table for two categorical variables.
     """
     return pd.crosstab(df[col1], df[col2])
 
+@instrumented
 def normalize_for_chord(matrix: pd.DataFrame, preserve_magnitude: bool = True) -> np.ndarray:
     """
     Normalize contingency/correlation matrix for chord diagram visualization.
@@ -110,13 +155,13 @@ def normalize_for_chord(matrix: pd.DataFrame, preserve_magnitude: bool = True) -
     else:
         matrix_norm = matrix_float
     
-    for i in range(n1):
-        for j in range(n2):
-            normalized[i, n1 + j] = matrix_norm.iloc[i, j]
-            normalized[n1 + j, i] = matrix_norm.iloc[i, j]
+    values = np.asarray(matrix_norm, dtype=float)
+    normalized[:n1, n1:] = values
+    normalized[n1:, :n1] = values.T
     
     return normalized
 
+@instrumented
 def get_summary_statistics(df: pd.DataFrame) -> Dict:
     """
     Generate summary statistics for the dataset.
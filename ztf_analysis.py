@@ -1,133 +1,379 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Tuple, Dict, List
-
-def parse_mrt_file(filepath: str) -> pd.DataFrame:
-    """
-    Parse MRT table format for different paper sources.
-    Handles Papers B & C format (Tab-separated with J/L prefixed objects).
-    """
-    data = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-    
-    for line in lines:
-        if line.startswith('J') or line.startswith('L'):
-            parts = line.split()
-            if len(parts) >= 16:
-                try:
-                    data.append({
-                        'Objname': parts[0],
-                        'RAdeg': float(parts[1]),
-                        'DEdeg': float(parts[2]),
-                        'SED_SLOPE': float(parts[3]) if parts[3] != '?' else np.nan,
-                        'YSO_CLASS': parts[4],
-                        'Number': int(parts[5]),
-                        'W2magMean': float(parts[6]),
-                        'W2magMed': float(parts[7]),
-                        'sig_W2Flux': float(parts[8]),
-                        'err_W2Flux': float(parts[9]),
-                        'delW2mag': float(parts[10]),
-                        'Period': float(parts[11]),
-                        'FLP_LSP_BOOT': float(parts[12]),
-                        'slope': float(parts[13]),
-                        'e_slope': float(parts[14]),
-                        'r_value': float(parts[15]),
-                        'LCType': parts[-1] if len(parts) > 21 else 'Unknown'
-                    })
-                except (ValueError, IndexError):
-                    continue
-    
-    return pd.DataFrame(data)
-
-def compute_correlation_matrix(df: pd.DataFrame, columns: List[str] = None, standardize: bool = True) -> pd.DataFrame:
-    """
-    Compute Pearson correlation matrix for specified columns.
-    Handles NaN values by dropping rows with missing data.
-    
-    Args:
-        df: DataFrame with data
-        columns: Columns to correlate. If None, uses all numeric columns
-        standardize: If True, standardize (z-score) columns before correlation to prevent
-                   variables with large scales from dominating
-    """
-    if columns is None:
-        columns = df.select_dtypes(include=[np.number]).columns.tolist()
-    
-    subset = df[columns].dropna()
-    
-    if standardize:
-        subset = (subset - subset.mean()) / subset.std()
-    
-    return subset.corr()
-
-def categorize_variability(df: pd.DataFrame, col: str = 'delW2mag') -> pd.Series:
-    """
-    Categorize sources by variability amplitude.
-    Low: < 0.2 mag, Medium: 0.2-0.5 mag, High: > 0.5 mag
-    """
-    categories = []
-    for val in df[col]:
-        if pd.isna(val):
-            categories.append('Unknown')
-        elif val < 0.2:
-            categories.append('Low')
-        elif val < 0.5:
-            categories.append('Medium')
-        else:
-            categories.append('High')
-    return pd.Series(categories, index=df.index)
-
-def create_contingency_table(df: pd.DataFrame, col1: str, col2: str) -> pd.DataFrame:
-    """
-    Create contingency table for two categorical variables.
-    """
-    return pd.crosstab(df[col1], df[col2])
-
-def normalize_for_chord(matrix: pd.DataFrame, preserve_magnitude: bool = True) -> np.ndarray:
-    """
-    Normalize contingency/correlation matrix for chord diagram visualization.
-    Converts to symmetric matrix compatible with Cachai chord diagrams.
-    
-    Args:
-        matrix: Contingency or correlation matrix
-        preserve_magnitude: If True, normalizes by global max to preserve relative magnitudes.
-                           If False, normalizes by row/column to show proportions.
-    """
-    n1, n2 = matrix.shape
-    matrix_size = n1 + n2
-    normalized = np.zeros((matrix_size, matrix_size))
-    
-    matrix_float = matrix.astype(float)
-    
-    if preserve_magnitude:
-        max_val = matrix_float.max().max()
-        if max_val > 0:
-            matrix_norm = matrix_float / max_val
-        else:
-            matrix_norm = matrix_float
+from typing import Dict, NamedTuple, Optional, Sequence
+
+from binning import bin_values
+from instrumentation import instrumented
+
+# ZTF filters; light curves store the index into this tuple as an int8 band code
+BANDS = ('g', 'r', 'i')
+G, R = BANDS.index('g'), BANDS.index('r')
+
+DAYS_PER_YEAR = 365.25
+SEASON_DAYS = 240
+
+# Classification thresholds (r-band trend and g-r trend, mag/yr). The STABLE
+# bands reproduce the status columns of the published ZTF CSVs.
+FADING_THRESHOLD = 0.2
+COLOR_THRESHOLD = 0.1
+STABLE_TREND = 0.05
+STABLE_COLOR = 0.0375
+
+# Spectroscopy priority by mean r magnitude
+R_PRIORITY_EDGES = [15.5, 16.5, 17.0]
+R_PRIORITY_LABELS = ['HIGH', 'MEDIUM', 'LOW', 'TOO_FAINT']
+
+OUTPUT_COLUMNS = [
+    'Objname', 'RAdeg', 'DEdeg', 'YSO_CLASS', 'W2magMean', 'r_mean', 'r_priority',
+    'fading_mag_per_year', 'is_fading', 'fading_status',
+    'color_change_1yr', 'is_reddening_bluing', 'color_status', 'baseline_days'
+]
+
+INPUT_FILE = Path('/Users/marcus/Desktop/YSO/ztf_candidates/filtered_sources.csv')
+OUTPUT_DIR = Path('/Users/marcus/Desktop/YSO/ztf_analysis')
+
+
+class LightCurves(NamedTuple):
+    """
+    Photometry of many sources as flat columns. Source k owns rows
+    offsets[k]:offsets[k + 1] of mjd/mag/err/band.
+    """
+    names: np.ndarray
+    offsets: np.ndarray
+    mjd: np.ndarray
+    mag: np.ndarray
+    err: np.ndarray
+    band: np.ndarray
+
+    @property
+    def n_sources(self) -> int:
+        return len(self.names)
+
+    def source_index(self) -> np.ndarray:
+        """Source number of every row."""
+        return np.repeat(np.arange(self.n_sources), np.diff(self.offsets))
+
+    def sources(self, start: int, stop: int) -> 'LightCurves':
+        """Sources start..stop-1 as views into the same arrays (no copy)."""
+        lo, hi = self.offsets[start], self.offsets[stop]
+        return LightCurves(self.names[start:stop], self.offsets[start:stop + 1] - lo,
+                           self.mjd[lo:hi], self.mag[lo:hi], self.err[lo:hi], self.band[lo:hi])
+
+    def select(self, mask: np.ndarray) -> 'LightCurves':
+        """Keep only the rows where `mask` is True (e.g. one band)."""
+        kept = np.concatenate([[0], np.cumsum(mask)])[self.offsets]
+        return LightCurves(self.names, kept.astype(np.int64), self.mjd[mask], self.mag[mask],
+                           self.err[mask], self.band[mask])
+
+
+def pack_light_curves(curves: Dict[str, pd.DataFrame]) -> LightCurves:
+    """
+    Concatenate per-source tables (columns mjd, mag, err, band with band as
+    'g'/'r'/'i' or its code) into one LightCurves batch. Epochs in any other
+    filter, or without a band, are dropped.
+
+    Raises:
+        ValueError: If an integer band code is not an index into BANDS
+    """
+    names = np.array(list(curves), dtype=object)
+    frames = list(curves.values())
+    sizes = [len(frame) for frame in frames]
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    if not frames:
+        empty = np.array([], dtype=np.float64)
+        return LightCurves(names, offsets, empty, empty, empty, np.array([], dtype=np.int8))
+
+    table = pd.concat(frames, ignore_index=True)
+    band = table['band']
+    if pd.api.types.is_integer_dtype(band):
+        band = band.to_numpy()
+        if len(band) and (band.min() < 0 or band.max() >= len(BANDS)):
+            raise ValueError(f"Band codes must be in 0..{len(BANDS) - 1} (indices into {BANDS})")
     else:
-        matrix_norm = matrix_float
-    
-    for i in range(n1):
-        for j in range(n2):
-            normalized[i, n1 + j] = matrix_norm.iloc[i, j]
-            normalized[n1 + j, i] = matrix_norm.iloc[i, j]
-    
-    return normalized
-
-def get_summary_statistics(df: pd.DataFrame) -> Dict:
-    """
-    Generate summary statistics for the dataset.
-    """
-    stats = {
-        'total_objects': len(df),
-        'yso_classes': df['YSO_CLASS'].value_counts().to_dict() if 'YSO_CLASS' in df.columns else {},
-        'lc_types': df['LCType'].value_counts().to_dict() if 'LCType' in df.columns else {},
-        'mean_w2_mag': df['W2magMean'].mean() if 'W2magMean' in df.columns else np.nan,
-        'std_w2_mag': df['W2magMean'].std() if 'W2magMean' in df.columns else np.nan,
-        'mean_variability': df['delW2mag'].mean() if 'delW2mag' in df.columns else np.nan,
-        'std_variability': df['delW2mag'].std() if 'delW2mag' in df.columns else np.nan,
-    }
-    return stats
+        band = pd.Index(BANDS).get_indexer(band)
+
+    # Unknown filters and missing bands have code -1: drop those epochs
+    keep = band >= 0
+    if not keep.all():
+        source = np.repeat(np.arange(len(frames)), sizes)[keep]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(source, minlength=len(frames)))]).astype(np.int64)
+        table = table[keep]
+        band = band[keep]
+    return LightCurves(names, offsets,
+                       table['mjd'].to_numpy(dtype=np.float64),
+                       table['mag'].to_numpy(dtype=np.float64),
+                       table['err'].to_numpy(dtype=np.float64),
+                       np.asarray(band, dtype=np.int8))
+
+
+def fit_segments(t: np.ndarray, y: np.ndarray, err: np.ndarray, segment: np.ndarray,
+                 n_segments: int) -> Dict[str, np.ndarray]:
+    """
+    Weighted (1/err^2) least-squares line through every segment at once,
+    using bincount segment sums instead of a loop over segments.
+
+    Args:
+        t, y, err: Flat arrays of abscissa, value and 1-sigma error
+        segment: Segment number of each row, in [0, n_segments)
+        n_segments: Number of segments
+
+    Returns:
+        Per-segment arrays: n, mean (weighted mean of y), slope, slope_err and
+        chi2_red. slope_err is the formal error inflated by sqrt(chi2_red) when
+        the scatter exceeds the errors. Segments with fewer than two points
+        or no spread in t get NaN.
+    """
+    def total(weights):
+        return np.bincount(segment, weights=weights, minlength=n_segments)
+
+    w = 1.0 / err ** 2
+    n = np.bincount(segment, minlength=n_segments)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sw = total(w)
+        t_mean = total(w * t) / sw
+        y_mean = total(w * y) / sw
+
+        # Centre on the segment means so the sums don't lose precision
+        dt = t - t_mean[segment]
+        dy = y - y_mean[segment]
+        stt = total(w * dt * dt)
+        slope = total(w * dt * dy) / stt
+        resid = dy - slope[segment] * dt
+        chi2_red = total(w * resid * resid) / (n - 2)
+        slope_err = np.sqrt(1.0 / stt) * np.sqrt(np.fmax(chi2_red, 1.0))
+
+    bad = (n < 2) | ~(stt > 0)
+    slope[bad] = np.nan
+    slope_err[bad] = np.nan
+    chi2_red[n < 3] = np.nan
+    return {'n': n, 'mean': y_mean, 'slope': slope, 'slope_err': slope_err, 'chi2_red': chi2_red}
+
+
+@instrumented
+def fit_trends(curves: LightCurves) -> pd.DataFrame:
+    """
+    Fit linear magnitude trends per source and band in one vectorized pass.
+
+    Returns:
+        One row per source (indexed by Objname): n_<band>, <band>_mean,
+        <band>_slope and <band>_slope_err (mag/yr) for g, r and i, plus
+        fading_mag_per_year / fading_err (the r trend), color_change_1yr /
+        color_change_err (the g-r trend, g slope minus r slope) and
+        baseline_days (first to last epoch over all bands).
+
+    Raises:
+        ValueError: If a band code is not an index into BANDS
+    """
+    n_sources, n_bands = curves.n_sources, len(BANDS)
+    if len(curves.band) and (curves.band.min() < 0 or curves.band.max() >= n_bands):
+        raise ValueError(f"Band codes must be in 0..{n_bands - 1} (indices into {BANDS})")
+    source = curves.source_index()
+    segment = source * n_bands + curves.band
+    t = (curves.mjd - np.nanmean(curves.mjd)) / DAYS_PER_YEAR if len(curves.mjd) else curves.mjd
+    fit = fit_segments(t, curves.mag, curves.err, segment, n_sources * n_bands)
+
+    result = pd.DataFrame(index=pd.Index(curves.names, name='Objname'))
+    for code, band in enumerate(BANDS):
+        result[f'n_{band}'] = fit['n'][code::n_bands]
+        result[f'{band}_mean'] = fit['mean'][code::n_bands]
+        result[f'{band}_slope'] = fit['slope'][code::n_bands]
+        result[f'{band}_slope_err'] = fit['slope_err'][code::n_bands]
+
+    result['fading_mag_per_year'] = result['r_slope']
+    result['fading_err'] = result['r_slope_err']
+    # For straight-line trends d(g-r)/dt = dg/dt - dr/dt, so no epoch pairing is needed
+    result['color_change_1yr'] = result['g_slope'] - result['r_slope']
+    result['color_change_err'] = np.hypot(result['g_slope_err'], result['r_slope_err'])
+
+    first = np.full(n_sources, np.inf)
+    last = np.full(n_sources, -np.inf)
+    np.minimum.at(first, source, curves.mjd)
+    np.maximum.at(last, source, curves.mjd)
+    result['baseline_days'] = np.where(np.isfinite(first), last - first, np.nan)
+    return result
+
+
+@instrumented
+def classify_trends(trends: pd.DataFrame, fading_threshold: float = FADING_THRESHOLD,
+                    color_threshold: float = COLOR_THRESHOLD) -> pd.DataFrame:
+    """
+    Add the r_priority, is_fading, fading_status, is_reddening_bluing and
+    color_status columns (as in the ZTF CSVs) to a fit_trends result.
+    Sources whose trend could not be fitted get status UNKNOWN and NA flags.
+    """
+    out = trends.copy()
+    out['r_priority'] = pd.Series(bin_values(out['r_mean'], edges=R_PRIORITY_EDGES, labels=R_PRIORITY_LABELS),
+                                  index=out.index).astype(object)
+
+    # Sources without r (or g) epochs have NaN trends: UNKNOWN, with missing flags
+    fading = out['fading_mag_per_year'].to_numpy(dtype=np.float64)
+    out['is_fading'] = _flag(fading > fading_threshold, np.isnan(fading))
+    out['fading_status'] = np.select(
+        [np.isnan(fading), fading > STABLE_TREND, fading < -STABLE_TREND],
+        ['UNKNOWN', 'FADING (brightening in mag = getting dimmer)', 'BRIGHTENING (dimming in mag = getting brighter)'],
+        'STABLE')
+
+    color = out['color_change_1yr'].to_numpy(dtype=np.float64)
+    out['is_reddening_bluing'] = _flag(np.abs(color) > color_threshold, np.isnan(color))
+    label = np.array([f'(Δ(g-r) = {c:+.2f} mag/yr)' for c in color.tolist()], dtype=object)
+    out['color_status'] = np.select(
+        [np.isnan(color), color > STABLE_COLOR, color < -STABLE_COLOR],
+        ['UNKNOWN', 'REDDENING ' + label, 'BLUEING ' + label],
+        'STABLE')
+    return out
+
+
+def _flag(values: np.ndarray, missing: np.ndarray) -> pd.arrays.BooleanArray:
+    """Nullable boolean column: NA where `missing`, so it still works as a row mask."""
+    return pd.arrays.BooleanArray(values, missing)
+
+
+def analyze_sources(sources: pd.DataFrame, curves: LightCurves) -> pd.DataFrame:
+    """
+    Fit and classify the light curves of `sources` (matched on Objname) and
+    return them in the ZTF CSV layout, in the order of `sources`.
+    """
+    return join_trends(sources, classify_trends(fit_trends(curves)))
+
+
+def join_trends(sources: pd.DataFrame, trends: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inner-join classified trends onto `sources` by Objname, in the ZTF CSV
+    layout. Objnames repeat in some catalogs (Paper C lists one source per
+    observation), so each row gets the first trend fitted for its name.
+    """
+    trends = trends[~trends.index.duplicated()]
+    merged = sources.merge(trends, left_on='Objname', right_index=True, how='inner', validate='many_to_one')
+    return merged[[c for c in OUTPUT_COLUMNS if c in merged.columns]].reset_index(drop=True)
+
+
+def synthetic_light_curves(sources: pd.DataFrame, seed: int = 0, epochs: Sequence[int] = (60, 140),
+                           baseline_days: float = 1000.0, start_mjd: float = 58200.0,
+                           r_mean=None, r_slope=None, color_slope=None):
+    """
+    Simulated ZTF g/r light curves for `sources` with known linear trends,
+    for exercising the fitting code without network access.
+
+    Each source gets a random number of epochs in `epochs`, spread over
+    `baseline_days` with seasonal gaps, an r magnitude tied to W2magMean when
+    present, and random r and g-r slopes. Errors grow with magnitude.
+    r_mean, r_slope and color_slope (scalars or one value per source)
+    replace the random draws when given.
+
+    Returns:
+        (LightCurves, truth) where truth is indexed by Objname with the
+        simulated r_mean, r_slope and color_slope (mag/yr)
+    """
+    rng = np.random.default_rng(seed)
+    names = sources['Objname'].to_numpy(dtype=object)
+    n = len(names)
+
+    w2 = sources['W2magMean'].to_numpy(dtype=np.float64) if 'W2magMean' in sources else np.full(n, 10.0)
+    drawn_mean = np.where(np.isnan(w2), 16.0, w2) + rng.normal(4.5, 1.2, n)
+    drawn_slope = rng.normal(0.0, 0.4, n)
+    drawn_color = rng.normal(0.0, 0.15, n)
+    r_mean = drawn_mean if r_mean is None else np.broadcast_to(np.asarray(r_mean, dtype=np.float64), n)
+    r_slope = drawn_slope if r_slope is None else np.broadcast_to(np.asarray(r_slope, dtype=np.float64), n)
+    color_slope = drawn_color if color_slope is None else np.broadcast_to(np.asarray(color_slope, dtype=np.float64), n)
+    g_r = rng.uniform(0.6, 1.6, n)
+
+    sizes = rng.integers(epochs[0], epochs[1] + 1, n)
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    source = np.repeat(np.arange(n), sizes)
+    total = int(offsets[-1])
+
+    # Observable ~8 months a year: each epoch falls inside one season
+    seasons = max(int(np.ceil(baseline_days / DAYS_PER_YEAR)), 1)
+    day = rng.integers(0, seasons, total) * DAYS_PER_YEAR + rng.uniform(0, SEASON_DAYS, total)
+    mjd = start_mjd + np.minimum(day, baseline_days)
+    band = np.where(rng.random(total) < 0.5, G, R).astype(np.int8)
+
+    t = (mjd - start_mjd - baseline_days / 2) / DAYS_PER_YEAR
+    r_model = r_mean[source] + r_slope[source] * t
+    g_model = r_model + g_r[source] + color_slope[source] * t
+    model = np.where(band == G, g_model, r_model)
+    err = 0.01 + 0.02 * np.exp(np.clip(model - 17.0, -10, 5))
+    mag = model + rng.normal(0, 1, total) * err
+
+    order = np.lexsort((mjd, source))
+    curves = LightCurves(names, offsets, mjd[order], mag[order], err[order], band[order])
+    truth = pd.DataFrame({'r_mean': r_mean, 'r_slope': r_slope, 'color_slope': color_slope},
+                         index=pd.Index(names, name='Objname'))
+    return curves, truth
+
+
+def load_light_curves(sources: pd.DataFrame, photometry_url: Optional[str] = None,
+                      store_dir: Optional[Path] = None, synthetic: bool = False, seed: int = 0) -> LightCurves:
+    """
+    Light curves for `sources` from the first configured origin: the
+    light-curve service at `photometry_url`, a lightcurve_store directory,
+    or (only when asked for) simulated photometry.
+
+    Raises:
+        ValueError: If no origin is given
+    """
+    if photometry_url:
+        # Cone-search the light-curve service (IRSA, or mock_photometry_server offline)
+        from photometry_client import fetch_light_curves
+        curves, _ = fetch_light_curves(sources, photometry_url)
+        return curves
+    if store_dir is not None:
+        from lightcurve_store import LightCurveStore
+        store = LightCurveStore(store_dir)
+        names = dict.fromkeys(sources['Objname'].astype(str))
+        return store.select([name for name in names if name in store])
+    if synthetic:
+        curves, _ = synthetic_light_curves(sources, seed=seed)
+        return curves
+    raise ValueError("No photometry: give a light-curve service URL or a light-curve store "
+                     "(or ask for synthetic light curves explicitly)")
+
+
+def main(input_file: Path = INPUT_FILE, output_dir: Path = OUTPUT_DIR, seed: int = 0,
+         photometry_url: Optional[str] = None, store_dir: Optional[Path] = None, synthetic: bool = False):
+    output_dir.mkdir(exist_ok=True)
+
+    print("=" * 80)
+    print("ZTF OPTICAL ANALYSIS: LIGHT-CURVE TRENDS")
+    print("=" * 80)
+
+    sources = pd.read_csv(input_file)
+    print(f"\nSources: {len(sources)} (from {input_file.name})")
+
+    curves = load_light_curves(sources, photometry_url, store_dir, synthetic, seed)
+    if synthetic and not photometry_url and store_dir is None:
+        print("⚠ Using SYNTHETIC light curves (simulated photometry, not ZTF data)")
+    print(f"Light curves: {curves.n_sources} sources, {len(curves.mjd):,} epochs")
+
+    results = analyze_sources(sources, curves)
+    fading = results[results['is_fading']]
+    color = results[results['is_reddening_bluing']]
+
+    results.to_csv(output_dir / 'spectroscopy_candidates.csv', index=False)
+    fading.to_csv(output_dir / 'fading_sources.csv', index=False)
+    color.to_csv(output_dir / 'color_evolution.csv', index=False)
+
+    print("\nSpectroscopy priority (r-band):")
+    for priority, count in results['r_priority'].value_counts().reindex(R_PRIORITY_LABELS, fill_value=0).items():
+        print(f"  {priority}: {count}")
+    print(f"\nFading sources (> {FADING_THRESHOLD} mag/yr): {len(fading)}")
+    print(f"Color evolution (|Δ(g-r)| > {COLOR_THRESHOLD} mag/yr): {len(color)}")
+    print(f"\n✓ Saved spectroscopy_candidates.csv, fading_sources.csv, color_evolution.csv to {output_dir}")
+
+    return results
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Fit and classify ZTF light-curve trends')
+    parser.add_argument('input_file', nargs='?', type=Path, default=INPUT_FILE)
+    parser.add_argument('photometry_url', nargs='?', default=None, help='light-curve cone-search URL')
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR)
+    parser.add_argument('--store', type=Path, default=None, help='read light curves from a lightcurve_store')
+    parser.add_argument('--synthetic', action='store_true', help='use simulated light curves (testing only)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    try:
+        main(args.input_file, args.output_dir, args.seed, args.photometry_url, args.store, args.synthetic)
+    except ValueError as exc:
+        parser.error(str(exc))